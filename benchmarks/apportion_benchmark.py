@@ -0,0 +1,79 @@
+"""
+Benchmark: last-week apportioning of weekly KPIs (Weekly -> Monthly).
+
+Compares the original row-wise apply (one DataFrame.apply per KPI, tests/reference.py)
+with the polars engine used by modify_granularity and the streaming mode
+(proctimize.ingestion.last_week_apportion_lazy), and checks that both give the same rows.
+The original is only run up to --reference-max-rows, as it takes minutes beyond that.
+
+    python benchmarks/apportion_benchmark.py
+    python benchmarks/apportion_benchmark.py --rows 1000000 10000000 50000000 --kpis 3
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from proctimize.ingestion import last_week_apportion_lazy
+from tests.reference import last_week_apportion
+
+
+def make_weekly(n_rows, n_kpis, n_weeks=156, seed=0):
+    rng = np.random.default_rng(seed)
+    n_geos = max(n_rows // n_weeks, 1)
+    weeks = np.arange(np.datetime64("2022-01-03"), np.datetime64("2022-01-03") + np.timedelta64(7 * n_weeks, "D"),
+                      np.timedelta64(7, "D"))
+    n = n_geos * n_weeks
+    return pl.DataFrame({
+        "geo": np.repeat(np.arange(n_geos, dtype=np.int64), n_weeks),
+        "week": np.tile(weeks, n_geos),
+        **{f"kpi_{i}": rng.gamma(2.0, 50.0, n) for i in range(n_kpis)},
+    })
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000, 50_000_000])
+    parser.add_argument("--kpis", type=int, default=2)
+    parser.add_argument("--work-days", type=int, default=5, choices=[5, 7])
+    parser.add_argument("--reference-max-rows", type=int, default=1_000_000,
+                        help="Largest size the row-wise original is timed at")
+    args = parser.parse_args(argv)
+
+    for n_rows in args.rows:
+        df = make_weekly(n_rows, args.kpis)
+        kpis = [f"kpi_{i}" for i in range(args.kpis)]
+        print(f"{len(df):,} geo-week rows, {args.kpis} KPIs, {args.work_days}-day weeks")
+
+        engine, engine_seconds = timed(
+            lambda: last_week_apportion_lazy(df.lazy(), "week", kpis, args.work_days).collect()
+        )
+        print(f"  polars engine:  {engine_seconds:8.3f}s  ({len(engine):,} rows out)")
+
+        if len(df) <= args.reference_max_rows:
+            pdf = df.to_pandas()
+            pdf["week"] = pd.to_datetime(pdf["week"])
+            original, original_seconds = timed(lambda: last_week_apportion(pdf, "week", kpis, args.work_days))
+            print(f"  row-wise apply: {original_seconds:8.3f}s  ({original_seconds / engine_seconds:,.0f}x slower)")
+
+            keys = ["geo", "week"] + kpis
+            expected = original.sort_values(keys).reset_index(drop=True)
+            result = engine.to_pandas().sort_values(keys).reset_index(drop=True)
+            same = len(result) == len(expected) and np.allclose(result[kpis], expected[kpis], rtol=1e-12, atol=0)
+            print(f"  same rows:      {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: granularity rollup (Daily -> Weekly / Monthly, Weekly -> Monthly).
+
+Compares the original pandas rollup (to_pandas round-trip, named aggregation with a
+Python lambda for "product", tests/reference.py) with the polars engine
+(proctimize.ingestion.modify_granularity) on every KPI table operation, and checks that
+both give the same table.
+
+    python benchmarks/granularity_benchmark.py
+    python benchmarks/granularity_benchmark.py --rows 10000000 --source Weekly --target Monthly
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from proctimize.ingestion import modify_granularity
+from tests.reference import modify_granularity_pandas
+
+NUMERICAL = {"calls": "sum", "reach": "average", "index": "product", "low": "min", "high": "max"}
+CATEGORICAL = {"rep": "count", "segment": "distinct count"}
+
+
+def make_activity(n_rows, source, seed=0):
+    rng = np.random.default_rng(seed)
+    n_periods, step = (364, 1) if source == "Daily" else (156, 7)
+    n_geos = max(n_rows // n_periods, 1)
+    dates = np.datetime64("2022-01-03") + np.arange(n_periods) * np.timedelta64(step, "D")
+    n = n_geos * n_periods
+    return pl.DataFrame({
+        "geo": np.repeat(np.arange(n_geos, dtype=np.int64), n_periods),
+        "date": np.tile(dates, n_geos),
+        "calls": rng.poisson(4, n).astype(np.float64),
+        "reach": rng.normal(10, 3, n),
+        "index": rng.uniform(0.99, 1.01, n),
+        "low": rng.normal(0, 1, n),
+        "high": rng.normal(0, 1, n),
+        "rep": rng.choice(np.array(["a", "b", "c"]), n),
+        "segment": rng.choice(np.array(["x", "y"]), n),
+    })
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--source", default="Daily", choices=["Daily", "Weekly"])
+    parser.add_argument("--target", default="Weekly", choices=["Weekly", "Monthly"])
+    parser.add_argument("--work-days", type=int, default=5, choices=[5, 7])
+    parser.add_argument("--skip-pandas", action="store_true", help="Only time the polars engine")
+    args = parser.parse_args(argv)
+    settings = (args.source, args.target, args.work_days, NUMERICAL, CATEGORICAL)
+
+    for n_rows in args.rows:
+        df = make_activity(n_rows, args.source)
+        print(f"{len(df):,} rows, {args.source} -> {args.target}")
+
+        (engine, date_col), engine_seconds = timed(lambda: modify_granularity(df, "geo", "date", *settings))
+        print(f"  polars engine:   {engine_seconds:8.3f}s  ({len(engine):,} rows out)")
+
+        if not args.skip_pandas:
+            (original, _), original_seconds = timed(
+                lambda: modify_granularity_pandas(df.to_pandas(), "geo", "date", *settings)
+            )
+            print(f"  pandas original: {original_seconds:8.3f}s  ({original_seconds / engine_seconds:,.1f}x slower)")
+
+            result = engine.to_pandas()
+            columns = list(NUMERICAL) + list(CATEGORICAL)
+            same = len(result) == len(original) and np.allclose(
+                result[columns].to_numpy(dtype=float), original[columns].to_numpy(dtype=float), rtol=1e-9, equal_nan=True
+            )
+            print(f"  same table:      {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,117 +6,20 @@ import requests
 import io
 import json
 import time
-from datetime import datetime,timedelta
+from proctimize.file_cache import read_csv_cached, collect_cached
+from proctimize.date_inference import infer_date_format, parse_dates
+from proctimize.ingestion import (
+    GRANULARITY_ORDER, normalize_columns, scan_uploaded_csv, build_file_plan,
+    join_key_stats, merge_file_plans, parse_date_like_columns, modify_granularity,
+    stream_granularity
+)
+from proctimize.recipe import new_recipe, file_recipe, compose_renames, dumps_recipe
+from proctimize.filtering import (
+    NUMERIC_OPERATORS, dataset_fingerprint, distinct_value_counts,
+    categorical_condition, numeric_condition, combine_conditions
+)
 
 # Helper functions
-def normalize_columns(df, columns, method="zscore"):
-    df_normalized = df.copy()
-    
-    for col in columns:
-        suffix = "_z" if method == "zscore" else "_iqr"
-        if method == "zscore":
-            mean = df[col].mean()
-            std = df[col].std()
-            if std != 0:
-                df_normalized[col + suffix] = (df[col] - mean) / std
-        elif method == "iqr":
-            Q1 = df[col].quantile(0.25)
-            Q3 = df[col].quantile(0.75)
-            IQR = Q3 - Q1
-            if IQR != 0:
-                df_normalized[col + suffix] = (df[col] - Q1) / IQR
-    return df_normalized
-
-# Last week apportioning 
-
-# Step 1: Set the 'last Non Weekend day of every month' as the last working date
-# create a dictionary for this date for each unique month in the data
-
-def last_working_day(year, month, work_days):
-    """""
-    Sets the last non-weekend day of every month as the last working date
-
-    Args:
-        year (scalar): Year of the date
-        month (scalar): Month of the date
-        work_days (scalar): Number of working days in the week
-
-    Returns
-        last_day (scalar): The last working day of the month
-    """
-
-
-    if month==12:
-        month=0
-        year+=1
-
-    last_day = datetime(year, month+1, 1) - timedelta(days=1)
-
-    if work_days==5:
-        while last_day.weekday() > 4:  # Friday is weekday 4
-            last_day -= timedelta(days=1) #subtracting 1 day at a time
-
-    return last_day
-
-
-def last_week_apportion(tactic_df,date_col_name,kpi_col_list,work_days):
-    """""
-    Proportionately allocates KPIs of last week in that month accurately to each month 
-    based on number of working days in that week
-    
-    Args:
-        tactic_df (dataframe): Dataframe containing geo-month and KPI information
-        date_col_name (string): Column in tactic_df which corresponds to date
-        kpi_col_list (list): List of KPI columns to be apportioned 
-        work_days (scalar): Number of working days in the week
-
-    Returns
-        tactic_df (dataframe): Dataframe with KPI columns apportioned
-    """
-    def rename_adjusted(kpi_name):
-        new_name = "adjusted_" + kpi_name
-        return new_name
-
-    # Step 1: Calculate last working date and create month level column
-
-    tactic_df['month'] = tactic_df[date_col_name].dt.to_period('M')
-    last_working_day_dict = {month: last_working_day(month.year, month.month,work_days) for month in tactic_df['month'].unique()}
-    tactic_df['last_working_date'] = tactic_df['month'].map(last_working_day_dict)
-
-    # Step 2: Calculate day difference from week_start_date to working_date
-    tactic_df['day_diff'] = (tactic_df['last_working_date'] - tactic_df[date_col_name] + timedelta(days=1)).dt.days
-
-    # Step 3: Filter weeks with day_diff < work_days and calculate adjusted calls
-    adjusted_col_list = []
-    for kpi_name in kpi_col_list:
-        tactic_df[rename_adjusted(kpi_name)] = tactic_df.apply(lambda row: ((work_days-row['day_diff']) / work_days) * row[kpi_name] if row['day_diff'] < work_days else 0, axis=1)
-        adjusted_col_list.append(rename_adjusted(kpi_name))
-
-    # Step 4: Subtract adjusted calls from original calls and add new rows with adjusted calls for the next month
-    # Original rows with calls subtracted
-
-
-    for kpi_name in kpi_col_list:
-        tactic_df[kpi_name] = tactic_df[kpi_name] - tactic_df[rename_adjusted(kpi_name)]
-
-    # New rows with adjusted calls on the first day of the month
-    new_rows = tactic_df[tactic_df[adjusted_col_list].gt(0).any(axis=1)].copy()
-    new_rows[date_col_name] = new_rows[date_col_name] + pd.offsets.MonthBegin()
-
-    # Add new rows
-    for kpi_name in kpi_col_list:
-        new_rows[kpi_name] = new_rows[rename_adjusted(kpi_name)]
-
-    # Combine original and new rows
-    tactic_df = pd.concat([tactic_df, new_rows], ignore_index=True)
-    tactic_df.drop(['last_working_date','day_diff','month'], axis=1, inplace=True)
-
-    #Removing the adjusted calls columns
-    for adj_col in adjusted_col_list:
-        tactic_df.drop(adj_col, axis=1, inplace=True)
-
-    return tactic_df
-
 
 # ------------------------------------------------------------------------------
 
@@ -145,6 +48,8 @@ def detect_date_granularity(df, date_column):
             return "Weekly"
         elif most_common_diff.days in [28, 29, 30, 31]:
             return "Monthly"
+        elif most_common_diff.days in [89, 90, 91, 92]:
+            return "Quarterly"
         elif most_common_diff.days >= 365:
             return "Yearly"
         else:
@@ -156,74 +61,35 @@ def detect_date_granularity(df, date_column):
 
 # ------------------------------------------------------------------------------
 
-def modify_granularity_pandas(
-    df,
-    geo_column,
-    date_column,
-    granularity_level_df,
-    granularity_level_user_input,
-    work_days,
-    numerical_config_dict,
-    categorical_config_dict
-):
-    def get_agg_dict(numerical_dict, categorical_dict):
-        agg_dict = {}
-        
-        for col, op in numerical_dict.items():
-            if op == "sum":
-                agg_dict[col] = "sum"
-            elif op == "average":
-                agg_dict[col] = "mean"
-            elif op == "min":
-                agg_dict[col] = "min"
-            elif op == "max":
-                agg_dict[col] = "max"
-            elif op == "product":
-                agg_dict[col] = lambda x: np.prod(x.dropna())
-
-        for col, op in categorical_dict.items():
-            if op == "count":
-                #agg_dict[f"{col}_count"] = (col, "count")
-                agg_dict[col] = (col, "count")
-            elif op == "distinct count":
-                #agg_dict[f"{col}_count_distinct"] = (col, pd.Series.nunique)
-                agg_dict[col] = (col, pd.Series.nunique)
-
-        return agg_dict
-
-    # No transformation needed
-    if granularity_level_df == granularity_level_user_input:
-        selected_cols = [geo_column, date_column] + list(numerical_config_dict.keys()) + list(categorical_config_dict.keys())
-        return df[selected_cols], date_column
-
-    df[date_column] = pd.to_datetime(df[date_column])
-    agg_dict = get_agg_dict(numerical_config_dict, categorical_config_dict)
-
-    # Daily → Weekly
-    if granularity_level_df == "Daily" and granularity_level_user_input == "Weekly":
-        df["week_date"] = df[date_column] - pd.to_timedelta(df[date_column].dt.weekday, unit='D')
-        grouped = df.groupby([geo_column, "week_date"]).agg(**agg_dict).reset_index()
-        #grouped = df.groupby([geo_column, "week_date"]).agg(agg_dict).reset_index()
-        return grouped, "week_date"
-
-    # Daily → Monthly
-    elif granularity_level_df == "Daily" and granularity_level_user_input == "Monthly":
-        df["month_date"] = df[date_column].values.astype('datetime64[M]')
-        grouped = df.groupby([geo_column, "month_date"]).agg(**agg_dict).reset_index()
-        #grouped = df.groupby([geo_column, "month_date"]).agg(agg_dict).reset_index()
-        return grouped, "month_date"
-
-    # Weekly → Monthly (requires apportioning)
-    elif granularity_level_df == "Weekly" and granularity_level_user_input == "Monthly":
-        df = last_week_apportion(df, date_column, list(numerical_config_dict.keys()), work_days)
-        df["month_date"] = df[date_column].values.astype('datetime64[M]')
-        grouped = df.groupby([geo_column, "month_date"]).agg(**agg_dict).reset_index()
-        #grouped = df.groupby([geo_column, "month_date"]).agg(agg_dict).reset_index()
-        return grouped, "month_date"
+def resolve_date_format(date_format, sample_values, date_col):
+    """
+    Runs sampling-based format detection when 'Auto-detect' is chosen and reports the outcome
 
-    else:
-        raise ValueError("Unsupported granularity transformation")
+    Args:
+        date_format (string): Format chosen in the page ('Auto-detect' or a strptime format)
+        sample_values (Series): Sample of the raw date column (polars Series)
+        date_col (string): Name of the date column, for messages
 
+    Returns
+        date_format (string): strptime format to parse with, None if detection failed
+    """
+    if date_format != "Auto-detect":
+        return date_format
+
+    detection = infer_date_format(sample_values)
+    if detection["format"] is None:
+        st.error(f"❌ Could not detect a date format for `{date_col}`. Please choose one manually.")
+        return None
+
+    message = (
+        f"🔎 Detected format `{detection['format']}` for `{date_col}` "
+        f"({detection['failure_rate']:.1%} of {detection['sample_size']:,} sampled values failed to parse)"
+    )
+    if detection["ambiguous"]:
+        st.warning(message + ". Day and month order is ambiguous in this data, please confirm the format.")
+    else:
+        st.info(message)
+    return detection["format"]
 
 
 # --- CONFIGURATION ---
@@ -459,6 +325,148 @@ with st.expander("Connect to Azure Blob Storage (Coming Soon)"):
     # stream = blob_client.download_blob().readall()
     # df_final = pd.read_csv(io.BytesIO(stream))
 
+# --- 🗄️ OUT-OF-CORE STREAMING MODE ---
+with st.expander("Stream Large Files from Server (Out-of-Core)"):
+    st.markdown("For extracts larger than memory. Files are read from the server in batches and only the aggregated geo × period table is kept in memory.")
+
+    stream_source = st.text_input(
+        "Path or glob of the CSV file(s) on the server:",
+        placeholder="e.g., /data/raw_calls_file*.csv",
+        key="stream_source"
+    )
+    memory_budget_mb = st.number_input(
+        "Memory budget for batch sizing (MB):",
+        min_value=256,
+        value=2048,
+        step=256,
+        help="Used to choose how many rows are read per batch. It is a sizing hint, not a hard limit: "
+             "the aggregated table still grows with the number of geo × period groups.",
+        key="stream_memory_limit"
+    )
+
+    if stream_source:
+        try:
+            stream_lf = pl.scan_csv(stream_source, low_memory=True)
+            stream_schema = stream_lf.collect_schema()
+            stream_sample = stream_lf.head(1000).collect()
+        except Exception as e:
+            st.error(f"❌ Failed to scan `{stream_source}`: {e}")
+            st.stop()
+
+        st.dataframe(stream_sample.head().to_pandas())
+        stream_columns = list(stream_schema.names())
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            stream_geo_col = st.selectbox("Grouping column:", stream_columns, key="stream_geo_col")
+        with col2:
+            stream_date_col = st.selectbox("Date column:", stream_columns, key="stream_date_col")
+        with col3:
+            stream_date_format = st.selectbox(
+                "Date format:",
+                ["Auto-detect", "%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "Custom"],
+                key="stream_date_format"
+            )
+            if stream_date_format == "Custom":
+                stream_date_format = st.text_input("Enter custom date format (e.g., %d-%b-%Y):", key="stream_custom_date_format")
+        if stream_schema[stream_date_col] == pl.Utf8:
+            stream_date_format = resolve_date_format(stream_date_format, stream_sample[stream_date_col], stream_date_col)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            stream_start_date = st.date_input("Start Date (optional):", value=None, key="stream_start_date")
+        with col2:
+            stream_end_date = st.date_input("End Date (optional):", value=None, key="stream_end_date")
+
+        # Categorical filters: values are typed in, so no full pass over the file is needed
+        stream_cat_cols = [col for col, dtype in stream_schema.items() if dtype == pl.Utf8 and col != stream_date_col]
+        stream_filter_cols = st.multiselect("Categorical columns to filter:", stream_cat_cols, key="stream_filter_cols")
+        category_filters = {}
+        for col in stream_filter_cols:
+            sample_vals = sorted(str(val) for val in stream_sample[col].drop_nulls().unique().to_list())
+            values_text = st.text_input(
+                f"Values to retain in '{col}' (comma separated), e.g. {', '.join(sample_vals[:3])}",
+                key=f"stream_filter_{col}"
+            )
+            category_filters[col] = [val.strip() for val in values_text.split(",") if val.strip()]
+
+        col1, col2 = st.columns(2)
+        with col1:
+            stream_granularity_df = st.selectbox("Granularity of the file:", GRANULARITY_ORDER[:-1], key="stream_granularity_df")
+        with col2:
+            stream_granularity_user = st.selectbox(
+                "Target granularity:",
+                GRANULARITY_ORDER[GRANULARITY_ORDER.index(stream_granularity_df) + 1:],
+                key="stream_granularity_user"
+            )
+
+        # KPI operations
+        numeric_dtypes = [pl.Int8, pl.Int16, pl.Int32, pl.Int64, pl.Float32, pl.Float64]
+        stream_kpi_df = pd.DataFrame(
+            [{"Column": col, "Operation": None} for col, dtype in stream_schema.items()
+             if dtype in numeric_dtypes and col not in [stream_geo_col, stream_date_col]]
+            + [{"Column": col, "Operation": None} for col in stream_cat_cols if col != stream_geo_col]
+        )
+        edited_stream_kpi_df = st.data_editor(
+            stream_kpi_df,
+            column_config={
+                "Column": st.column_config.Column(disabled=True),
+                "Operation": st.column_config.SelectboxColumn(
+                    "Operation",
+                    options=["average", "sum", "product", "min", "max", "count", "distinct count"]
+                )
+            },
+            hide_index=True,
+            key="stream_kpi_editor"
+        )
+
+        if st.button("Run Streaming Aggregation", key="stream_run"):
+            stream_numerical_config = {}
+            stream_categorical_config = {}
+            for _, row in edited_stream_kpi_df.dropna(subset=["Operation"]).iterrows():
+                if row["Operation"] in ["count", "distinct count"]:
+                    stream_categorical_config[row["Column"]] = row["Operation"]
+                else:
+                    stream_numerical_config[row["Column"]] = row["Operation"]
+
+            if not stream_numerical_config and not stream_categorical_config:
+                st.warning("Please choose an operation for at least one column.")
+            elif stream_schema[stream_date_col] == pl.Utf8 and not stream_date_format:
+                st.warning("Please choose the date format.")
+            else:
+                try:
+                    with st.spinner("Streaming file(s) ..."):
+                        df_streamed, stream_new_date_col = stream_granularity(
+                            source=stream_source,
+                            geo_column=stream_geo_col,
+                            date_column=stream_date_col,
+                            date_format=stream_date_format,
+                            start_date=stream_start_date,
+                            end_date=stream_end_date,
+                            category_filters=category_filters,
+                            granularity_level_df=stream_granularity_df,
+                            granularity_level_user_input=stream_granularity_user,
+                            work_days=7,
+                            numerical_config_dict=stream_numerical_config,
+                            categorical_config_dict=stream_categorical_config,
+                            memory_budget_mb=memory_budget_mb
+                        )
+                    st.session_state["df_streamed"] = df_streamed
+                    st.success(f"✅ Aggregated to {df_streamed.shape[0]:,} rows ({df_streamed.estimated_size('mb'):,.1f} MB)")
+                except Exception as e:
+                    st.error(f"❌ Streaming aggregation failed: {e}")
+
+        if "df_streamed" in st.session_state:
+            df_streamed = st.session_state["df_streamed"]
+            st.dataframe(df_streamed.head(100).to_pandas())
+            st.download_button(
+                "📥 Download CSV",
+                data=df_streamed.write_csv(),
+                file_name="final_streamed_transformed_data.csv",
+                mime="text/csv",
+                key="stream_download"
+            )
+
 df_final = None
 
 if uploaded_files:
@@ -466,7 +474,7 @@ if uploaded_files:
     if len(uploaded_files) == 1:
         with st.expander("Standardize Columns for Single File"):
             file = uploaded_files[0]
-            df = pd.read_csv(file)
+            df = read_csv_cached(file).to_pandas()
             st.markdown(f"**File: {file.name}**")
             
             # Step 1: Column Selection
@@ -508,17 +516,15 @@ if uploaded_files:
                 key="date_cols_single"
             )
 
+            single_date_formats = {}
             for date_col in date_cols:
                 st.markdown(f"📅 **Standardizing `{date_col}`**")
                 date_format = st.selectbox(
                     f"Select current date format for `{date_col}` being used:",
-                    ["%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "Custom"],
-                    index=None,
+                    ["Auto-detect", "%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "Custom"],
                     key=f"date_format_single_{date_col}"
                 )
 
-                # Need to double check this
-
                 if date_format == "Custom":
                     date_format = st.text_input(
                         "Enter custom date format (e.g., %d-%b-%Y):", 
@@ -527,12 +533,15 @@ if uploaded_files:
 
                 if date_format:
                     try:
-                        df[date_col] = pd.to_datetime(
-                            df[date_col], 
-                            format=date_format, 
-                            errors='coerce'
-                        )
-                        st.success(f"✅ Date column `{date_col}` standardized from `{date_format}` to `YYYY/MM/DD` format!")
+                        raw_dates = pl.from_pandas(df[[date_col]])[date_col]
+                        date_format = resolve_date_format(date_format, raw_dates, date_col)
+                        if date_format:
+                            parsed_dates, date_format, failure_rate = parse_dates(raw_dates, date_format)
+                            df[date_col] = parsed_dates.to_pandas().to_numpy()
+                            single_date_formats[date_col] = date_format
+                            st.success(f"✅ Date column `{date_col}` standardized from `{date_format or 'date'}` to `YYYY/MM/DD` format! Parse failures: {failure_rate:.1%}")
+                            if failure_rate > 0:
+                                st.warning(f"⚠️ {failure_rate:.1%} of the values in `{date_col}` could not be parsed and were set to empty.")
                     except Exception as e:
                         st.error(f"❌ Failed to parse date column `{date_col}`: {e}")
 
@@ -548,27 +557,29 @@ if uploaded_files:
                     if dtype == pl.Datetime
                 ])
             st.session_state["df_final"] = df_final
+            st.session_state["recipe_files"] = [file_recipe(file.name, selected_cols, rename_dict, single_date_formats)]
+            st.session_state["recipe_merge"] = None
 
     else:
         
         with st.expander("🧱 Standardize Columns for Multiple Files"):
             column_mappings = []
-            dfs = []
+            file_plans = []
+            file_recipes = []
             renamed_columns_list = []
 
             for i, file in enumerate(uploaded_files):
                 st.markdown(f"**File {i+1}: {file.name}**")
-                df = pd.read_csv(file)
-                dfs.append(df)
+                lf = scan_uploaded_csv(file)
+                file_columns = lf.collect_schema().names()
 
-                # ✅ Step 1: Column Selection
+                # ✅ Step 1: Column Selection (pushed down into the CSV scan)
                 selected_cols = st.multiselect(
                     f"Select columns from `{file.name}`:", 
-                    df.columns.tolist(), 
-                    default=df.columns.tolist(), 
+                    file_columns, 
+                    default=file_columns, 
                     key=f"select_cols_{i}"
                 )
-                df = df[selected_cols]
 
                 # ✅ Step 2: Interactive Data Editor for Renaming
                 rename_df = pd.DataFrame({
@@ -598,23 +609,21 @@ if uploaded_files:
                 # ✅ Collect Final Mappings
                 column_mappings.append(rename_dict)
                 renamed_columns_list.append(set(edited_rename_df["New Column Name"]))
-
-                # ✅ Optional: Apply renaming immediately if needed
-                df = df.rename(columns=rename_dict)
+                renamed_cols = [rename_dict.get(col) or col for col in selected_cols]
 
                 # 📅 Step: Ask for Date Format and Standardize Date Columns
                 date_cols = st.multiselect(
                     f"Select Date Columns in `{file.name}` (if any):", 
-                    selected_cols, 
+                    renamed_cols, 
                     key=f"date_cols_{i}"
                 )
 
+                date_formats = {}
                 for date_col in date_cols:
                     st.markdown(f"📅 **Standardizing `{date_col}` in file `{file.name}`**")
                     date_format = st.selectbox(
                         f"Select the current date format used for `{date_col}`:",
-                        ["%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "Custom"],
-                        index=None,
+                        ["Auto-detect", "%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "Custom"],
                         key=f"date_format_{i}_{date_col}"
                     )
 
@@ -624,28 +633,19 @@ if uploaded_files:
                             key=f"custom_date_format_{i}_{date_col}"
                         )
 
-                    # Convert and standardize to YYYY/MM/DD format
+                    if date_format == "Auto-detect":
+                        # Detect on the first rows of the file; the full column is parsed inside the lazy plan
+                        source_col = selected_cols[renamed_cols.index(date_col)]
+                        date_sample = lf.select(pl.col(source_col).cast(pl.Utf8)).head(5000).collect().to_series()
+                        date_format = resolve_date_format(date_format, date_sample, date_col)
+
+                    # Parsing happens inside the lazy plan when it is collected
                     if date_format:
-                        try:
-                            # df[date_col] = pd.to_datetime(
-                            #     df[date_col], 
-                            #     format=date_format, 
-                            #     errors='coerce'
-                            # ).dt.strftime("%Y/%m/%d")
-                            # df[date_col] = df[date_col].fillna("")
-
-                            df[date_col] = pd.to_datetime(
-                                df[date_col], 
-                                format=date_format, 
-                                errors='coerce'
-                            )
-                            # df[date_col] = df[date_col].fillna("")
-
-                            st.success(f"✅ Date column `{date_col}` standardized from `{date_format}` to `YYYY/MM/DD` format!")
-                            # st.dataframe(df.dt.strftime("%Y/%m/%d"))
-                            # st.write(df.dtypes)
-                        except Exception as e:
-                            st.error(f"❌ Failed to parse date column `{date_col}`: {e}")
+                        date_formats[date_col] = date_format
+                        st.success(f"✅ Date column `{date_col}` will be standardized from `{date_format}` to `YYYY/MM/DD` format!")
+
+                file_plans.append(build_file_plan(lf, selected_cols, rename_dict, date_formats))
+                file_recipes.append(file_recipe(file.name, selected_cols, rename_dict, date_formats))
                             
 
         with st.expander("Merge Files:"):
@@ -659,48 +659,58 @@ if uploaded_files:
                 join_type = st.selectbox("Join type:", ["inner", "left", "right", "outer"])
             else:
                 join_keys = join_type = None
-        
-            # Merge DataFrames
-            if merge_strategy in ["vertical", "Vertical Stack"]:
-                df_final = pd.concat(dfs, ignore_index=True, sort=False)
-
-            elif merge_strategy in ["horizontal", "Horizontal Join"]:
-                if not join_keys:
-                    #raise ValueError("Join key must be provided for horizontal joins.")
-                    st.warning("Join key must be provided for horizontal joins.")
-                    st.stop()
-                df_final = dfs[0]
-                for df in dfs[1:]:
-                    df_final = pd.merge(df_final, df, on=join_keys, how=join_type)
-            else:
-                #raise ValueError("Invalid merge strategy. Choose 'vertical' or 'horizontal'.")
-                st.error("Invalid merge strategy. Choose 'vertical' or 'horizontal'.")
+
+            if merge_strategy in ["horizontal", "Horizontal Join"] and not join_keys:
+                #raise ValueError("Join key must be provided for horizontal joins.")
+                st.warning("Join key must be provided for horizontal joins.")
                 st.stop()
-                
-            # Remove rows with nulls in identifier columns and drop duplicates
-            if join_keys:
-                for col_name in join_keys:
-                    if col_name in df_final.columns:
-                        df_final = df_final[df_final[col_name].notnull()]
-                # merged_df = df_final.drop_duplicates()
-            else:
+            if not join_keys:
                 print("⚠️ No join_keys provided — skipping null identifier filtering.")
 
-            for col in df_final.select_dtypes(include="object").columns:
-                    if "date" in col.lower():
-                        try:
-                            df_final[col] = pd.to_datetime(df_final[col], errors='coerce')
-                        except:
-                            pass
-            # st.write(df_final.dtypes)
-            df_final = pl.from_pandas(df_final)
-            # st.write(df_final.dtypes)
-            df_final = df_final.with_columns([
-                    pl.col(col).cast(pl.Date) 
-                    for col, dtype in zip(df_final.columns, df_final.dtypes) 
-                    if dtype == pl.Datetime
-                ])
+            key_stats = None
+            pre_aggregate = False
+            if merge_strategy == "Horizontal Join":
+                # Profile the join keys of every file before running the join
+                try:
+                    key_stats = join_key_stats(file_plans, join_keys, uploaded_files)
+                except Exception as e:
+                    st.error(f"❌ Failed to profile join keys: {e}")
+                    st.stop()
+
+                st.markdown("**Join key profile**")
+                st.dataframe(key_stats, use_container_width=True, hide_index=True)
+
+                duplicated = key_stats[key_stats["duplicated_keys"] > 0]
+                if not duplicated.empty:
+                    worst_case = int(np.prod(key_stats["max_rows_per_key"].clip(lower=1)))
+                    st.warning(
+                        f"⚠️ Join keys are not unique in {', '.join(duplicated['file'])}. "
+                        f"Each key can fan out to up to {worst_case:,} rows in the joined output."
+                    )
+                    duplicate_handling = st.radio(
+                        "Duplicate join keys:",
+                        ["Pre-aggregate (sum numeric, keep first otherwise)", "Join as is"],
+                        key="duplicate_key_handling"
+                    )
+                    pre_aggregate = duplicate_handling.startswith("Pre-aggregate")
+
+            # Merge the lazy plans and collect the whole pipeline once
+            try:
+                merged_plan = merge_file_plans(file_plans, merge_strategy, join_keys, join_type, key_stats, pre_aggregate)
+                df_final = collect_cached(merged_plan, uploaded_files)
+            except Exception as e:
+                st.error(f"❌ Failed to merge files: {e}")
+                st.stop()
+
+            df_final = parse_date_like_columns(df_final)
             st.session_state["df_final"] = df_final
+            st.session_state["recipe_files"] = file_recipes
+            st.session_state["recipe_merge"] = {
+                "strategy": merge_strategy,
+                "join_keys": join_keys or [],
+                "join_type": join_type,
+                "pre_aggregate": pre_aggregate,
+            }
             st.write(df_final)
 
 
@@ -761,55 +771,52 @@ if uploaded_files:
                 if start_date > end_date:
                     st.error("Start date must be before or equal to end date.")
                     st.stop()
-                else:
-                    df_final = df_final.filter((pl.col(date_column) >= start_date) & (pl.col(date_column) <= end_date))
 
-            df_filtered = df_final.clone()
+            # Distinct values are cached per dataset: the file digests plus the column, rename, date
+            # and merge choices identify it without hashing its rows on every rerun
+            fingerprint = dataset_fingerprint(
+                uploaded_files, st.session_state.get("recipe_files"), st.session_state.get("recipe_merge"), date_column
+            )
 
+            schema = df_final.schema
+            filter_conditions = []
+            recipe_filters = {
+                "date_column": date_column,
+                # A full date range is not recorded, so a replayed refresh keeps its new dates
+                "start_date": start_date if date_column and start_date != min_date else None,
+                "end_date": end_date if date_column and end_date != max_date else None,
+                "categorical": {},
+                "numeric": [],
+            }
+            if date_column:
+                filter_conditions.append(pl.col(date_column).is_between(start_date, end_date))
 
-            categorical_cols = [col for col in df_filtered.columns if df_filtered[col].dtype == pl.Utf8]
+            categorical_cols = [col for col, dtype in schema.items() if dtype == pl.Utf8]
+            selected_cat_cols = []
 
             if categorical_cols:
                 st.write("### Categorical Column(s) to filter on")
                 selected_cat_cols = st.multiselect("Select categorical columns to filter:", categorical_cols)
 
                 for col in selected_cat_cols:
-                    unique_vals = df_filtered[col].unique().to_list()
-                    display_vals = []
-                    for val in unique_vals:
-                        if val is None or str(val).strip() == "":
-                            display_vals.append("<BLANK>")
-                        else:
-                            display_vals.append(str(val))
-                    display_vals = sorted(display_vals)
+                    value_counts = distinct_value_counts(df_final, col, fingerprint)
+                    display_vals = list(value_counts)
 
                     selected_vals = st.multiselect(
                         f"Select values to retain in '{col}'",
                         options=display_vals,
                         default=display_vals,
+                        format_func=lambda val, counts=value_counts: f"{val} ({counts[val]:,})",
                         key=f"filter_{col}"
                     )
-
-                    filter_conditions = []
-
-                    if "<BLANK>" in selected_vals:
-                        filter_conditions.append(pl.col(col).is_null() | (pl.col(col).cast(str).str.strip_chars().eq("")))
-
-                    selected_non_blank_vals = [val for val in selected_vals if val != "<BLANK>"]
-                    if selected_non_blank_vals:
-                        filter_conditions.append(pl.col(col).cast(str).is_in(selected_non_blank_vals))
-
-                    if filter_conditions:
-                        combined_condition = filter_conditions[0]
-                        for cond in filter_conditions[1:]:
-                            combined_condition = combined_condition | cond
-                        df_filtered = df_filtered.filter(combined_condition)
-                        st.session_state["df_filtered"] = df_filtered
-                        st.session_state["filter_complete"] = True
+                    condition = categorical_condition(col, selected_vals, display_vals)
+                    filter_conditions.append(condition)
+                    if condition is not None:
+                        recipe_filters["categorical"][col] = selected_vals
            
             # --- NUMERICAL FILTERING ---
-            numeric_cols = [col for col in df_filtered.columns if df_filtered[col].dtype in [pl.Int32, pl.Int64, pl.Float32, pl.Float64]]
-            numerical_conditions = []
+            numeric_cols = [col for col, dtype in schema.items() if dtype in [pl.Int32, pl.Int64, pl.Float32, pl.Float64]]
+            selected_num_cols = []
 
             if numeric_cols:
                 st.write("### 🔢 Numerical Column(s) to filter on")
@@ -819,42 +826,24 @@ if uploaded_files:
                     st.markdown(f"**Filter for `{col}`**")
                     operator = st.selectbox(
                         f"Choose condition for `{col}`:",
-                        options=[
-                            "Equals", "Does not equal",
-                            "Greater than", "Greater than or equal to",
-                            "Less than", "Less than or equal to"
-                        ],
+                        options=list(NUMERIC_OPERATORS),
                         key=f"num_op_{col}"
                     )
 
                     value = st.number_input(f"Enter value for `{col}`:", key=f"num_val_{col}")
+                    filter_conditions.append(numeric_condition(col, operator, value, schema[col]))
+                    recipe_filters["numeric"].append([col, operator, value])
+
+            # Apply the date, categorical and numerical conditions as one predicate.
+            # This runs on the collected df_final rather than inside merged_plan: the widgets
+            # above take their options (date range, distinct values) from the merged data, and
+            # re-collecting the plan on every widget change would re-read every file.
+            predicate = combine_conditions(filter_conditions)
+            df_filtered = df_final.lazy().filter(predicate).collect() if predicate is not None else df_final
+            st.session_state["recipe_filters"] = recipe_filters
 
-                    # Round the column for equality comparison if float
-                    if df_filtered[col].dtype in [pl.Float32, pl.Float64]:
-                        df_filtered = df_filtered.with_columns(pl.col(col).round(3))
-
-                    # Build condition
-                    if operator == "Equals":
-                        numerical_conditions.append(pl.col(col) == value)
-                    if operator == "Does not equal":
-                        numerical_conditions.append(pl.col(col) != value)
-                    elif operator == "Greater than":
-                        numerical_conditions.append(pl.col(col) > value)
-                    elif operator == "Greater than or equal to":
-                        numerical_conditions.append(pl.col(col) >= value)
-                    elif operator == "Less than":
-                        numerical_conditions.append(pl.col(col) < value)
-                    elif operator == "Less than or equal to":
-                        numerical_conditions.append(pl.col(col) <= value)
-
-            # Apply numerical filters together
-            if numerical_conditions:
-                combined_condition = numerical_conditions[0]
-                for cond in numerical_conditions[1:]:
-                    combined_condition = combined_condition & cond
-                df_filtered = df_filtered.filter(combined_condition)
-
-                st.info(f"🔎 Rows after numerical filtering: {df_filtered.shape[0]}")
+            if selected_cat_cols or selected_num_cols:
+                st.info(f"🔎 Rows after filtering: {df_filtered.shape[0]}")
 
                 st.session_state["df_filtered"] = df_filtered
                 st.session_state["filter_complete"] = True
@@ -931,11 +920,15 @@ if uploaded_files:
 
             if granularity:
                 if granularity == 'Daily':
-                    granularity_options = ['Weekly','Monthly']
+                    granularity_options = ['Weekly','Monthly','Quarterly','Yearly']
                 elif granularity == 'Weekly':
-                    granularity_options = ['Weekly','Monthly']
+                    granularity_options = ['Weekly','Monthly','Quarterly','Yearly']
                 elif granularity == 'Monthly':
-                    granularity_options = ['Monthly']
+                    granularity_options = ['Monthly','Quarterly','Yearly']
+                elif granularity == 'Quarterly':
+                    granularity_options = ['Quarterly','Yearly']
+                else:
+                    granularity_options = ['Yearly']
 
                 time_granularity_user_input = st.selectbox('Choose the time granularity level', granularity_options)
                 st.write('You selected time granularity: ', time_granularity_user_input)
@@ -953,8 +946,8 @@ if uploaded_files:
                         st.warning("Please enter the required columns")
                     else:
                         # Modify granularity
-                        df_transformed, new_date_col = modify_granularity_pandas(
-                            df=df_filtered.to_pandas(),
+                        df_transformed, new_date_col = modify_granularity(
+                            df=df_filtered,
                             geo_column=geo_col,
                             date_column=date_col,
                             granularity_level_df=granularity,
@@ -963,6 +956,7 @@ if uploaded_files:
                             numerical_config_dict=numerical_config_dict,
                             categorical_config_dict=categorical_config_dict
                         )
+                        df_transformed = df_transformed.to_pandas()
 
                         # Reapply rename dict if available
                         if "rename_dict" in st.session_state:
@@ -970,6 +964,19 @@ if uploaded_files:
 
                         st.session_state["df_transformed"] = df_transformed
                         st.session_state["transform_complete"] = True
+
+                        # Record the choices for the replayable recipe
+                        st.session_state["recipe_granularity"] = {
+                            "geo_column": geo_col,
+                            "date_column": date_col,
+                            "source": granularity,
+                            "target": time_granularity_user_input,
+                            "work_days": 7,
+                            "numerical": numerical_config_dict,
+                            "categorical": categorical_config_dict,
+                        }
+                        st.session_state["recipe_normalize"] = []
+                        st.session_state["recipe_output_rename"] = compose_renames({}, st.session_state.get("rename_dict", {}))
             
             # --- NORMALIZATION SECTION ---
             if st.session_state.get("transform_complete") and "df_transformed" in st.session_state:
@@ -986,6 +993,13 @@ if uploaded_files:
                     method_key = "zscore" if norm_method == "Z-Score" else "iqr"
                     df_normalized = normalize_columns(df_transformed, selected_norm_cols, method=method_key)
                     st.session_state["df_transformed"] = df_normalized
+
+                    # Normalization is replayed before the output renames, so record the original column names
+                    current_to_original = {new: old for old, new in st.session_state.get("recipe_output_rename", {}).items()}
+                    st.session_state.setdefault("recipe_normalize", []).append({
+                        "columns": [current_to_original.get(col, col) for col in selected_norm_cols],
+                        "method": method_key,
+                    })
                     st.success("✅ Normalization applied.")
                     st.dataframe(df_normalized.head())
 
@@ -1014,6 +1028,9 @@ if uploaded_files:
                         edited_rename_df["New Column Name"]
                     ))
                     st.session_state["rename_dict"] = rename_dict
+                    st.session_state["recipe_output_rename"] = compose_renames(
+                        st.session_state.get("recipe_output_rename", {}), rename_dict
+                    )
 
                     df_transformed = df_transformed.rename(columns=rename_dict)
                     st.session_state["df_transformed"] = df_transformed
@@ -1038,6 +1055,32 @@ if uploaded_files:
                         file_name=file_name,
                         mime="text/csv"
                     )
+
+                    # Recipe export: replays every choice above on a refreshed extract
+                    # with `python -m proctimize.batch <recipe> <files...>`
+                    st.subheader("📜 Export Ingestion Recipe")
+                    channel_name = st.text_input("Channel name:", value=file_name[:-len(".csv")], key="recipe_channel")
+                    recipe_format = st.radio("Recipe format:", ["JSON", "YAML"], horizontal=True, key="recipe_format")
+
+                    recipe = new_recipe(channel_name)
+                    recipe["files"] = st.session_state.get("recipe_files", [])
+                    recipe["merge"] = st.session_state.get("recipe_merge")
+                    recipe["filters"] = st.session_state.get("recipe_filters")
+                    recipe["granularity"] = st.session_state.get("recipe_granularity")
+                    recipe["normalize"] = st.session_state.get("recipe_normalize", [])
+                    recipe["output_rename"] = st.session_state.get("recipe_output_rename", {})
+
+                    try:
+                        recipe_text = dumps_recipe(recipe, fmt=recipe_format.lower())
+                        st.download_button(
+                            "📥 Download Recipe",
+                            data=recipe_text.encode("utf-8"),
+                            file_name=f"{channel_name}_recipe.{recipe_format.lower()}",
+                            mime="application/json" if recipe_format == "JSON" else "application/x-yaml",
+                            key="recipe_download"
+                        )
+                    except ImportError as e:
+                        st.error(f"❌ {e}")
                    
             else:
                 st.warning("⚠️ Please load granularity before selecting granularity level.")
@@ -1,7 +1,8 @@
 import streamlit as st
 import polars as pl
-from datetime import timedelta
+from proctimize.integration import date_spine, attach_dtc
 from PIL import Image
+from proctimize.file_cache import read_csv_cached, read_csv_columns, read_csvs_parallel
 
 st.set_page_config(page_title="ProcTimize", layout="wide")
 st.title("Integrated Analytics Dataset Builder")
@@ -124,6 +125,13 @@ hcp_files = st.file_uploader("Upload HCP Channel CSVs", type=["csv"], accept_mul
 dtc_files = st.file_uploader("Upload DTC Channel CSVs", type=["csv"], accept_multiple_files=True, key="dtc")
 #dtc_files
 
+# Parse all file headers concurrently up front; later header reads hit the parse cache
+_, header_errors = read_csvs_parallel({
+    file.name: (file, {"n_rows": 0}) for file in (sales_files or []) + (hcp_files or []) + (dtc_files or [])
+})
+for file_name, error in header_errors.items():
+    st.error(f"❌ Error reading {file_name}: {error}")
+
 # Store uploaded data
 uploaded_data = {
     "Sales": {},
@@ -134,8 +142,7 @@ uploaded_data = {
 # Helper to read with Polars and get columns
 def get_column_names(file):
     try:
-        df = pl.read_csv(file, n_rows=5)  # read just a few rows for column detection
-        return df.columns
+        return read_csv_columns(file)  # header only, cached across reruns
     except Exception as e:
         st.error(f"Error reading {file.name}: {e}")
         return []
@@ -193,7 +200,7 @@ with col_dma:
     st.markdown("### Granularity Columns")
     for source, file in all_files:
         try:
-            df_cols = pl.read_csv(file, n_rows=5).columns
+            df_cols = read_csv_columns(file)
             column_options = [""] + [col for col in df_cols if col.strip() != ""]
 
             st.markdown(f"**{file.name}**")
@@ -222,7 +229,7 @@ with col_date:
     st.markdown("### Date Columns")
     for source, file in all_files:
         try:
-            df_cols = pl.read_csv(file, n_rows=5).columns
+            df_cols = read_csv_columns(file)
             column_options = [""] + [col for col in df_cols if col.strip()  != ""]
 
             st.markdown(f"**{file.name}**")
@@ -252,7 +259,7 @@ with col_zip:
     st.markdown("### ZIP Columns")
     for source, file in all_files:
         try:
-            df_cols = pl.read_csv(file, n_rows=5).columns
+            df_cols = read_csv_columns(file)
             column_options = [""] + [col for col in df_cols if col.strip() != ""]
 
             st.markdown(f"**{file.name}**")
@@ -298,7 +305,7 @@ with col_dma:
     st.markdown("### Granularity Columns")
     for source, file in dtc_files_all:
         try:
-            df_cols = pl.read_csv(file, n_rows=5).columns
+            df_cols = read_csv_columns(file)
             column_options = [""] + [col for col in df_cols if col.strip() != ""]
 
             st.markdown(f"**{file.name}**")
@@ -328,7 +335,7 @@ with col_date:
     st.markdown("### Date Columns")
     for source, file in dtc_files_all:
         try:
-            df_cols = pl.read_csv(file, n_rows=5).columns
+            df_cols = read_csv_columns(file)
             column_options = [""] + [col for col in df_cols if col.strip()  != ""]
 
             st.markdown(f"**{file.name}**")
@@ -368,33 +375,45 @@ granularity = st.session_state["granularity"]
 unique_hcps = pl.DataFrame()
 # st.write(hcp_column_mapping)
 
+hcp_read_tasks = {}
 for file_obj, hcp_col in hcp_column_mapping.values():
+    if file_obj.name not in zip_column_mapping:
+        st.error(f"❌ Error reading HCPs from {file_obj.name}: no ZIP column selected")
+        continue
+    zip_col = zip_column_mapping[file_obj.name][1]
+    hcp_read_tasks[file_obj.name] = (file_obj, {"columns": [hcp_col, zip_col]})
+
+hcp_frames, hcp_errors = read_csvs_parallel(hcp_read_tasks)
+for file_name, error in hcp_errors.items():
+    st.error(f"❌ Error reading HCPs from {file_name}: {error}")
+
+for file_name, df in hcp_frames.items():
     try:
-        # st.write(file_obj)
-        # st.write(hcp_col)s
-        zip_col = zip_column_mapping[file_obj.name][1]
-        df = pl.read_csv(file_obj, columns=[hcp_col, zip_col])
+        hcp_col, zip_col = hcp_read_tasks[file_name][1]["columns"]
         df = df.rename({hcp_col: "HCP_ID", zip_col: "ZIP"}).drop_nulls()
         unique_hcps = unique_hcps.vstack(df)
     except Exception as e:
-        # st.write(zip_col)
-        st.error(f"❌ Error reading HCPs from {file_obj.name}: {e}")
+        st.error(f"❌ Error reading HCPs from {file_name}: {e}")
 
 
 unique_hcps = unique_hcps.unique()
 
 # Step 3C: Find min and max date across all selected files
 all_dates = []
-for file_obj, date_col in date_column_mapping.values():
-    if not date_col:
-        continue
+date_frames, date_errors = read_csvs_parallel({
+    file_obj.name: (file_obj, {"columns": [date_col]})
+    for file_obj, date_col in date_column_mapping.values() if date_col
+})
+for file_name, error in date_errors.items():
+    st.error(f"❌ Error reading dates from {file_name}: {error}")
+
+for file_name, df in date_frames.items():
     try:
-        df = pl.read_csv(file_obj, columns=[date_col])
-        df = df.rename({date_col: "Date"}).drop_nulls()
+        df = df.rename({df.columns[0]: "Date"}).drop_nulls()
         df = df.with_columns(pl.col("Date").str.strptime(pl.Date, "%Y-%m-%d", strict=False))
         all_dates.append(df)
     except Exception as e:
-        st.error(f"❌ Error reading dates from {file_obj.name}: {e}")
+        st.error(f"❌ Error reading dates from {file_name}: {e}")
 
 if all_dates:
     all_dates_df = pl.concat(all_dates)
@@ -402,25 +421,7 @@ if all_dates:
     max_date = all_dates_df.select(pl.col("Date").max())[0, 0]
 
     # Step 3D: Generate date range
-    date_range = []
-    granularity = granularity.lower()
-
-    if granularity == "weekly":
-        current = min_date
-        while current <= max_date:
-            date_range.append(current)
-            current += timedelta(weeks=1)
-
-    elif granularity == "monthly":
-        current = min_date.replace(day=1)
-        while current <= max_date:
-            date_range.append(current)
-            if current.month == 12:
-                current = current.replace(year=current.year + 1, month=1)
-            else:
-                current = current.replace(month=current.month + 1)
-
-    dates_df = pl.DataFrame({"Date": date_range})
+    dates_df = date_spine(min_date, max_date, granularity)
 
     # Step 3E: Cartesian Product of HCPs × Dates
     cartesian_df = unique_hcps.join(dates_df, how="cross")
@@ -436,7 +437,7 @@ file_join_configs = {}  # Will hold configs per file
 
 for idx, (source, file) in enumerate(all_files):
     try:
-        df_cols = pl.read_csv(file, n_rows=5).columns
+        df_cols = read_csv_columns(file)
 
         # Get pre-selected HCP/Date columns from Step 2
         default_hcp = st.session_state["column_mappings"].get(file.name, {}).get("hcp", df_cols[0])
@@ -506,6 +507,12 @@ st.subheader("Step 5: Join Files to HCP-Date Base")
 if st.button("🔗 Join Files to HCP-Date Base"):
     final_df = cartesian_df.clone()
 
+    # Parse every file's join and KPI columns concurrently, then join in order
+    join_frames, join_errors = read_csvs_parallel({
+        fname: (config["file_obj"], {"columns": [config["join_hcp_col"], config["join_date_col"], config["join_zip_col"]] + config["import_cols"]})
+        for fname, config in file_join_configs.items()
+    })
+
     for fname, config in file_join_configs.items():
         file = config["file_obj"]
         hcp_col = config["join_hcp_col"]
@@ -515,8 +522,9 @@ if st.button("🔗 Join Files to HCP-Date Base"):
         col_renames = config["col_renames"]
 
         try:
-            use_cols = [hcp_col, date_col,zip_col] + import_cols
-            df = pl.read_csv(file, columns=use_cols)
+            if fname in join_errors:
+                raise join_errors[fname]
+            df = join_frames[fname]
             df = df.rename({hcp_col: "HCP_ID", date_col: "Date",zip_col : "ZIP"})  #Standardized
             if col_renames:
                 df = df.rename(col_renames)
@@ -583,30 +591,39 @@ granularity = st.session_state["granularity"]
 
 # Step 3B: Build unique DMA list
 unique_dma = pl.DataFrame()
-for file_obj, dtc_col in dtc_column_mapping.values():
+dma_frames, dma_errors = read_csvs_parallel({
+    file_obj.name: (file_obj, {"columns": [dtc_col]})
+    for file_obj, dtc_col in dtc_column_mapping.values()
+})
+for file_name, error in dma_errors.items():
+    st.error(f"❌ Error reading DMA's from {file_name}: {error}")
+
+for file_name, df in dma_frames.items():
     try:
-       
-        df = pl.read_csv(file_obj, columns=[dtc_col])
-        df = df.rename({dtc_col: "DMA_CODE"}).drop_nulls()
+        df = df.rename({df.columns[0]: "DMA_CODE"}).drop_nulls()
         unique_dma = unique_dma.vstack(df)
     except Exception as e:
-        st.error(f"❌ Error reading DMA's from {file_obj.name}: {e}")
+        st.error(f"❌ Error reading DMA's from {file_name}: {e}")
 
 unique_dma = unique_dma.unique()
 
 
 # Step 3C: Find min and max date across all selected files
 all_dates = []
-for file_obj, date_col in date_column_mapping_dtc.values():
-    if not date_col:
-        continue
+date_frames, date_errors = read_csvs_parallel({
+    file_obj.name: (file_obj, {"columns": [date_col]})
+    for file_obj, date_col in date_column_mapping_dtc.values() if date_col
+})
+for file_name, error in date_errors.items():
+    st.error(f"❌ Error reading dates from {file_name}: {error}")
+
+for file_name, df in date_frames.items():
     try:
-        df = pl.read_csv(file_obj, columns=[date_col])
-        df = df.rename({date_col: "Date"}).drop_nulls()
+        df = df.rename({df.columns[0]: "Date"}).drop_nulls()
         df = df.with_columns(pl.col("Date").str.strptime(pl.Date, "%Y-%m-%d", strict=False))
         all_dates.append(df)
     except Exception as e:
-        st.error(f"❌ Error reading dates from {file_obj.name}: {e}")
+        st.error(f"❌ Error reading dates from {file_name}: {e}")
 
 if all_dates:
     all_dates_df = pl.concat(all_dates)
@@ -614,25 +631,7 @@ if all_dates:
     max_date = all_dates_df.select(pl.col("Date").max())[0, 0]
 
     # Step 3D: Generate date range
-    date_range = []
-    granularity = granularity.lower()
-
-    if granularity == "weekly":
-        current = min_date
-        while current <= max_date:
-            date_range.append(current)
-            current += timedelta(weeks=1)
-
-    elif granularity == "monthly":
-        current = min_date.replace(day=1)
-        while current <= max_date:
-            date_range.append(current)
-            if current.month == 12:
-                current = current.replace(year=current.year + 1, month=1)
-            else:
-                current = current.replace(month=current.month + 1)
-
-    dates_df = pl.DataFrame({"Date": date_range})
+    dates_df = date_spine(min_date, max_date, granularity)
 
     # Step 3E: Cartesian Product of DMA's × Dates
     cartesian_df_dtc = unique_dma.join(dates_df, how="cross")
@@ -653,7 +652,7 @@ file_join_configs = {}  # Will hold configs per file
 
 for idx, (source, file) in enumerate(dtc_files_all):
     try:
-        df_cols = pl.read_csv(file, n_rows=5).columns
+        df_cols = read_csv_columns(file)
 
         # Get pre-selected HCP/Date columns from Step 2
         default_dtc = st.session_state["column_mapping_dtc"].get(file.name, {}).get("dtc", df_cols[0])
@@ -717,6 +716,12 @@ st.subheader("Step 5: Join Files to DTC-Date Base")
 if st.button("🔗 Join Files to DTC-Date Base"):
     final_df = cartesian_df_dtc.clone()
 
+    # Parse every file's join and KPI columns concurrently, then join in order
+    join_frames, join_errors = read_csvs_parallel({
+        fname: (config["file_obj"], {"columns": [config["join_dtc_col"], config["join_date_col"]] + config["import_cols"]})
+        for fname, config in file_join_configs.items()
+    })
+
     for fname, config in file_join_configs.items():
         file = config["file_obj"]
         dtc_col = config["join_dtc_col"]
@@ -725,8 +730,9 @@ if st.button("🔗 Join Files to DTC-Date Base"):
         col_renames = config["col_renames"]
 
         try:
-            use_cols = [dtc_col, date_col] + import_cols
-            df = pl.read_csv(file, columns=use_cols)
+            if fname in join_errors:
+                raise join_errors[fname]
+            df = join_frames[fname]
             df = df.rename({dtc_col: "DMA_CODE", date_col: "Date"})
             if col_renames:
                 df = df.rename(col_renames)
@@ -775,7 +781,7 @@ if "joined_output_df_hcp" in st.session_state and "joined_output_df_dtc" in st.s
     zip_dma_file = st.file_uploader("Upload ZIP to DMA Mapping CSV", type=["csv"])
 
     if zip_dma_file is not None:
-        zip_dma_df = pl.read_csv(zip_dma_file)
+        zip_dma_df = read_csv_cached(zip_dma_file)
         st.dataframe(zip_dma_df)
 
         df_cols = zip_dma_df.columns
@@ -793,13 +799,8 @@ if "joined_output_df_hcp" in st.session_state and "joined_output_df_dtc" in st.s
         
         if selected_zip_col and selected_dma_col:
 
-            zip_dma_df = zip_dma_df.select([selected_zip_col, selected_dma_col])
-            # First join: HCP + ZIP-DMA on 'zip'
-            hcp_dma_df = final_hcp_data.join(zip_dma_df, left_on="ZIP",right_on=selected_zip_col ,how="left")
-
-            # Second join: HCP+DMA with DTC on 'dma_id' and 'date'
-            final_df = hcp_dma_df.join(final_dtc_data, left_on=[selected_dma_col, "Date"],right_on=["DMA_CODE", "Date"], how="left")
-            final_df = final_df.rename({selected_dma_col: "DMA_CODE"})   #Standardized
+            # HCP + ZIP-DMA on 'zip', then HCP+DMA with DTC on 'dma_id' and 'date'
+            final_df = attach_dtc(final_hcp_data, final_dtc_data, zip_dma_df, selected_zip_col, selected_dma_col)
 
             geo_column_hcp = st.session_state["geo_column_hcp"]
             date_column_hcp = st.session_state["date_column_hcp"] 
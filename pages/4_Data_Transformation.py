@@ -1,8 +1,20 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+from proctimize.transformation import (
+    ADSTOCK_TYPES, HALF_SATURATION_FUNCTIONS, SATURATION_FUNCTIONS, SHAPED_SATURATIONS, transform_edited_df, lagged_carryover
+)
+from proctimize.kernels import warm_kernels
+from proctimize.panel import Panel
+from proctimize.grid_search import (
+    DEFAULT_ADSTOCK, DEFAULT_HALF_SATURATION, DEFAULT_LAGS, DEFAULT_POWER, SCORING, best_transformations,
+    search_transformations
+)
 
 st.set_page_config(page_title="ProcTimize", layout="wide")
+
+# Compile the recursive Adstock kernel while the page renders (no-op without Numba)
+warm_kernels(background=True)
 #st.image("img/data-transform.png")
 
 st.markdown("""
@@ -27,35 +39,6 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-# Define Adstock function
-def geometric_adstock(series, lags, adstock_coeff):
-    """Applies geometric Adstock transformation within each region."""
-
-    series = np.array(series, dtype=np.float64)  # Ensure it's numeric
-    adstocked = np.zeros_like(series)
-
-    for i in range(len(series)):
-        for j in range(lags + 1):
-            if i - j >= 0:
-                adstocked[i] += (adstock_coeff ** j) * series[i - j]
-
-    return adstocked
-
-
-
-# Define Saturation function
-def apply_saturation(series, method, power_k=0.5):
-    """Applies saturation function on a Pandas Series or NumPy array."""
-    series = np.array(series, dtype=np.float64)  # Ensure it's numeric
-    
-    if method.lower() == "log":
-        return np.log1p(series)  # log(1 + x) to avoid log(0)
-    elif method.lower() == "power":
-        return np.power(series, power_k)
-    
-    return series  # Return unchanged if no valid method is given
-
-
 # # Function to apply transformations on df (original data), grouped by geo_column  
 # def transform_edited_df(df, edited_df, geo_column):
 #     transformed_df = df.copy()
@@ -123,81 +106,76 @@ def apply_saturation(series, method, power_k=0.5):
 
 #     return transformed_df
 
-def transform_edited_df(df, edited_df, geo_column, dependent_variable):
-    transformed_df = df.copy()
-
-    for _, row in edited_df.iterrows():
-        channel = row["Channel Name"]
-        lags = int(row["Lags"]) if pd.notna(row["Lags"]) else None
-        adstock_coeff = float(row["Adstock"]) if pd.notna(row["Adstock"]) else None
-        sat_function = row["Saturation Function"]
-        power_k = float(row["Power (k)"]) if sat_function == "Power" else None
-
-        if channel in transformed_df.columns:
-            # Case 1: No transformation
-            if sat_function is None and adstock_coeff is None and lags is None:
-                transformed_df[channel] = transformed_df[channel]
-
-            # Case 2: Adstock with no lag – invalid
-            elif sat_function is None and lags is None and adstock_coeff is not None:
-                st.warning("Please ensure value for Lag is not 'None' when applying Ad Stock")
-                return None
-
-            # Case 3: Lag only
-            elif sat_function is None and lags is not None and adstock_coeff is None:
-                lagged_series = (
-                    transformed_df.groupby(geo_column, as_index=False)[channel]
-                    .shift(lags, fill_value=0)
-                    .fillna(0)
-                )
-                transformed_df[f"{channel}_transformed"] = lagged_series
-
-            # Case 4: Lag + Adstock
-            elif sat_function is None and lags is not None and adstock_coeff is not None:
-                transformed_df[f"{channel}_transformed"] = (
-                    transformed_df.groupby(geo_column)[channel]
-                    .transform(lambda x: geometric_adstock(x, lags, adstock_coeff))
-                )
-
-            # Case 5: Saturation only
-            elif sat_function is not None and lags is None and adstock_coeff is None:
-                transformed_df[f"{channel}_transformed"] = (
-                    transformed_df.groupby(geo_column)[channel]
-                    .transform(lambda x: apply_saturation(x, sat_function, power_k))
-                )
-
-            # Case 6: Saturation + Adstock but no lag – invalid
-            elif sat_function is not None and lags is None and adstock_coeff is not None:
-                st.warning("Please ensure value for Lag is not 'None' when applying Ad Stock")
-                return None
-            
-            # Case 7: Lag + Saturation
-            elif sat_function is not None and lags is not None and adstock_coeff is None:
-                lagged_series = (
-                    transformed_df.groupby(geo_column, as_index = False)[channel]
-                    .shift(lags, fill_value=0).fillna(0))
-
-            # Store raw lagged value if this is the special channel
-                if channel == "Carryover":
-                    st.session_state["raw_lagged_dependent_variable"] = lagged_series.copy()
-
-                transformed_df[f"{channel}_transformed"] = (
-                    lagged_series.groupby(transformed_df[geo_column])
-                    .transform(lambda x: apply_saturation(x, sat_function, power_k))
+
+
+# Function to search the transformation grid and suggest the best parameters per channel
+def search_parameters(date_column, geo_column, df, channel_names, dependent_variable):
+
+    with st.expander("🔎 Search transformation parameters", expanded=False):
+        numeric_channels = [col for col in channel_names
+                            if col not in [dependent_variable, "Carryover"] and pd.api.types.is_numeric_dtype(df[col])]
+        channels = st.multiselect("Channels to search", numeric_channels, default=numeric_channels, key="search_channels")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            lags = st.multiselect("Lags", DEFAULT_LAGS + [5, 7, 9, 10, 11], default=DEFAULT_LAGS,
+                                  format_func=lambda v: "None" if v is None else str(v), key="search_lags")
+            adstock = st.multiselect("Adstock", DEFAULT_ADSTOCK, default=DEFAULT_ADSTOCK,
+                                     format_func=lambda v: "None" if v is None else str(v), key="search_adstock")
+            adstock_type = st.selectbox("Adstock Type", ADSTOCK_TYPES, key="search_adstock_type")
+            adstock_shape = None
+            if adstock_type in ["Weibull", "Delayed"]:
+                adstock_shape = st.number_input("Adstock Shape", min_value=0.0, value=1.0, step=0.1,
+                                                key="search_adstock_shape")
+        with col2:
+            saturation = st.multiselect("Saturation Function", [None] + SATURATION_FUNCTIONS, default=[None, "Log", "Power"],
+                                        format_func=lambda v: "None" if v is None else v, key="search_saturation")
+            power = st.multiselect("Power (k)", [round(0.1 * i, 1) for i in range(1, 10)] + [1.0, 2.0, 3.0, 5.0],
+                                   default=DEFAULT_POWER, key="search_power")
+            half_saturation = st.multiselect("Half Saturation (x mean activity)", [0.25, 0.5, 1.0, 1.5, 2.0, 3.0],
+                                             default=DEFAULT_HALF_SATURATION, key="search_half_saturation")
+
+        scoring = st.radio("Score candidates by", list(SCORING), format_func=lambda s: SCORING[s], key="search_scoring")
+        controls = []
+        if scoring == "partial_fit":
+            controls = st.multiselect("Control variables", [col for col in numeric_channels if col not in channels],
+                                      key="search_controls")
+
+        dates = sorted(pd.to_datetime(df[date_column]).dt.date.unique())
+        score_start = st.selectbox("Score from (earlier periods are only used as Adstock burn-in)", dates,
+                                   index=min(len(dates) - 1, len(dates) // 3) if dates else 0, key="search_start")
+
+        n_saturations = sum(
+            (len(power) if function and function.lower() in SHAPED_SATURATIONS else 1)
+            * (len(half_saturation) if function and function.lower() in HALF_SATURATION_FUNCTIONS else 1)
+            for function in saturation
+        )
+        n_candidates = len(channels) * len(lags) * len(adstock) * n_saturations
+        st.caption(f"Up to {n_candidates:,} candidates")
+
+        if st.button("Run Search") and channels and lags and saturation:
+            try:
+                search_df = df.assign(**{date_column: pd.to_datetime(df[date_column])})
+                panel = Panel.from_frame(search_df, geo_column, date_column, channels + [dependent_variable] + controls)
+                with st.spinner("Scoring candidates..."):
+                    results = search_transformations(
+                        panel, channels, dependent_variable,
+                        start=score_start, scoring=scoring, controls=controls,
+                        lags=lags, adstock=adstock, saturation=saturation, power=power or DEFAULT_POWER,
+                        half_saturation=half_saturation or DEFAULT_HALF_SATURATION,
+                        adstock_type=adstock_type, adstock_shape=adstock_shape
                     )
+                st.session_state["transformation_search_results"] = results
+                st.session_state["transformation_search_best"] = best_transformations(results)
+            except ValueError as e:
+                st.warning(str(e))
 
-            # Case 8: Full pipeline – Lag + Adstock + Saturation
-            else:
-                transformed_df[f"{channel}_transformed"] = (
-                    transformed_df.groupby(geo_column)[channel]
-                    .transform(lambda x: apply_saturation(
-                        geometric_adstock(x, lags, adstock_coeff),
-                        sat_function,
-                        power_k
-                    ))
-                )
+        if "transformation_search_best" in st.session_state:
+            st.success("Best parameters per channel (used as the defaults of the table below)")
+            st.dataframe(st.session_state["transformation_search_best"], hide_index=True)
+            if st.checkbox("Show all candidates", key="search_show_all"):
+                st.dataframe(st.session_state["transformation_search_results"].head(500), hide_index=True)
 
-    return transformed_df
 
 
 # Function to handle user input and apply transformations
@@ -214,10 +192,26 @@ def user_input(date_column, geo_column, dma_column, zip_column, df):
         "Channel Name": channel_names,
         "Saturation Function": [None] * len(channel_names),
         "Power (k)": [0.5] * len(channel_names),
+        "Half Saturation": [1.0] * len(channel_names),
         "Lags": [1] * len(channel_names),
-        "Adstock": [0.5] * len(channel_names)
+        "Adstock": [0.5] * len(channel_names),
+        "Adstock Type": ["Geometric"] * len(channel_names),
+        "Adstock Shape": [1.0] * len(channel_names)
     })
 
+    # Start from the parameter search's suggestions where available
+    if "transformation_search_best" in st.session_state:
+        best = st.session_state["transformation_search_best"].set_index("Channel Name")
+        data = data.astype({"Power (k)": float, "Lags": float, "Adstock": float})
+        for i, channel in enumerate(channel_names):
+            if channel in best.index:
+                data.at[i, "Saturation Function"] = best.at[channel, "Saturation Function"]
+                for col in ["Lags", "Adstock"]:
+                    data.at[i, col] = np.nan if best.at[channel, col] is None else best.at[channel, col]
+                for col in ["Power (k)", "Half Saturation", "Adstock Type", "Adstock Shape"]:
+                    if col in best.columns and best.at[channel, col] is not None:
+                        data.at[i, col] = best.at[channel, col]
+
     # Streamlit Data Editor
     edited_df = st.data_editor(
         data,
@@ -225,11 +219,26 @@ def user_input(date_column, geo_column, dma_column, zip_column, df):
             "Channel Name": st.column_config.TextColumn("Channel Name", disabled=True),
             "Saturation Function": st.column_config.SelectboxColumn(
                                     "Saturation Function",
-                                    options=["Power", "Log"],
+                                    options=SATURATION_FUNCTIONS,
                                     help="Select the saturation function for the channel"),
-            "Power (k)": st.column_config.NumberColumn("Power (k)", min_value=0.0, step=0.1, max_value=1),
+            "Power (k)": st.column_config.NumberColumn(
+                                    "Power (k)", min_value=0.0, step=0.1, max_value=10,
+                                    help="Power: exponent (up to 1). Hill: slope. Logistic: steepness. "
+                                         "Negative Exponential: rate"),
+            "Half Saturation": st.column_config.NumberColumn(
+                                    "Half Saturation", min_value=0.0, step=0.1,
+                                    help="Hill / Michaelis-Menten half saturation point, or Logistic midpoint, "
+                                         "in multiples of the channel's mean activity"),
             "Lags": st.column_config.NumberColumn("Lags", min_value=0, step=1, max_value=12),
-            "Adstock": st.column_config.NumberColumn("Adstock", min_value=0.0, step=0.1, max_value=1)
+            "Adstock": st.column_config.NumberColumn("Adstock", min_value=0.0, step=0.1, max_value=1),
+            "Adstock Type": st.column_config.SelectboxColumn(
+                                    "Adstock Type",
+                                    options=ADSTOCK_TYPES,
+                                    help="Geometric decay over Lags periods, Weibull decay, Delayed (peaking) "
+                                         "carryover, or Infinite geometric decay over the full history"),
+            "Adstock Shape": st.column_config.NumberColumn(
+                                    "Adstock Shape", min_value=0.0, step=0.1,
+                                    help="Weibull: shape (below 1 gives a long tail). Delayed: lag of the peak effect")
         },
         hide_index=True,
         key="editable_table"
@@ -252,12 +261,17 @@ def user_input(date_column, geo_column, dma_column, zip_column, df):
 
     # Post-processing logic
     for i, row in edited_df.iterrows():
-        if row["Saturation Function"] in ["Log" , None]:
+        method = row["Saturation Function"].lower() if isinstance(row["Saturation Function"], str) else None
+        if method not in SHAPED_SATURATIONS:
             edited_df.at[i, "Power (k)"] = None  # or some ignored flag like np.nan
+        if method not in HALF_SATURATION_FUNCTIONS:
+            edited_df.at[i, "Half Saturation"] = None
+        if not isinstance(row["Adstock Type"], str) or row["Adstock Type"] in ["Geometric", "Infinite"]:
+            edited_df.at[i, "Adstock Shape"] = None
 
     # Optionally display a note
-    if edited_df["Saturation Function"].isin(["Log" , None]).any():
-        st.warning("Note: For channels using the 'Log' saturation function, 'Power (k)' will be ignored.")
+    if edited_df["Saturation Function"].isin(["Log", "Michaelis-Menten", None]).any():
+        st.warning("Note: For channels using the 'Log' or 'Michaelis-Menten' saturation function, 'Power (k)' will be ignored.")
 
 
 
@@ -271,7 +285,17 @@ def user_input(date_column, geo_column, dma_column, zip_column, df):
 
         # Apply transformations to df (actual spend data), grouped by geo_column
         column_list = [col for col in df.columns if col not in [geo_column, date_column]]
-        transformed_df = transform_edited_df(df, edited_df, geo_column, dependent_variable)
+        try:
+            transformed_df = transform_edited_df(df, edited_df, geo_column, dependent_variable, date_column=date_column)
+        except ValueError as e:
+            st.warning(str(e))
+            return None
+
+        # Store raw lagged value of the special channel
+        raw_lagged = lagged_carryover(df, edited_df, geo_column, date_column)
+        if raw_lagged is not None:
+            st.session_state["raw_lagged_dependent_variable"] = raw_lagged
+
         # to reorder the columns:
         transformed_df = transformed_df[[col for col in transformed_df.columns if col not in column_list] + column_list]
 
@@ -337,6 +361,7 @@ if __name__ == '__main__':
             pass
         
         if option is not None:
+            search_parameters(date_column, geo_column, df, [col for col in df.columns if col not in [date_column, geo_column, dma_column, zip_column]], dependent_variable)
             st.subheader("Please specify data transformations below")
             transformed_df = user_input(date_column, geo_column, dma_column, zip_column, df)
             st.session_state["transformed_df"] = transformed_df
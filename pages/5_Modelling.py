@@ -1,7 +1,10 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import statsmodels.api as sm
+from proctimize.modelling import FIXED_EFFECTS, default_modeling_range, modeling_windows, fit_ols, coefficient_table, coefficient_bounds
+from proctimize.model_search import DEFAULT_ROI_RANGE, candidate_models, search_models
+from proctimize.regularization import PENALTIES, SELECTION_RULES, fit_regularized
+from proctimize.bayesian import CREDIBLE_LEVEL, N_DRAWS, fit_bayesian, roi_intervals
 
 st.set_page_config(page_title="ProcTimize", layout="wide")
 # st.image("img/modelling.png")
@@ -36,12 +39,10 @@ def modeling_input(date_column, geo_column, granular_df, transformed_df, depende
         return None
 
     try:
-        max_date = transformed_df[date_column].max().date()
-        all_years = sorted(transformed_df[date_column].dt.year.unique())
-        if len(all_years) < 2:
-            st.error("Not enough years of data to exclude the first year.")
-            return None
-        adjusted_min_date = pd.to_datetime(f"{all_years[1]}-01-01").date()
+        adjusted_min_date, max_date = default_modeling_range(transformed_df, date_column)
+    except ValueError as e:
+        st.error(str(e))
+        return None
     except Exception as e:
         st.error(f"Could not compute min/max dates: {e}")
         return None
@@ -52,18 +53,9 @@ def modeling_input(date_column, geo_column, granular_df, transformed_df, depende
         end_date = st.date_input("Select End Date",
                                  value=max_date, min_value=adjusted_min_date, max_value=max_date, key="end_date")
 
-        modeling_duration_days = (end_date - start_date).days + 1
-        prior_end_date = start_date - pd.Timedelta(days=1)
-        prior_start_date = prior_end_date - pd.Timedelta(days=modeling_duration_days - 1)
-
-        transformed_df_date_filtered = transformed_df[(transformed_df[date_column] >= pd.to_datetime(start_date)) &
-                                                      (transformed_df[date_column] <= pd.to_datetime(end_date))]
-        
-        granular_df_date_filtered = granular_df[(granular_df[date_column] >= pd.to_datetime(start_date)) &
-                                                (granular_df[date_column] <= pd.to_datetime(end_date))]
-        
-        granular_df_prior_date_filtered = granular_df[(granular_df[date_column] >= pd.to_datetime(prior_start_date)) &
-                                                       (granular_df[date_column] <= pd.to_datetime(prior_end_date))]
+        transformed_df_date_filtered, granular_df_date_filtered, granular_df_prior_date_filtered = modeling_windows(
+            transformed_df, granular_df, date_column, start_date, end_date
+        )
         if dependent_variable == dependent_variable_user_input:
             try:
                 remove_cols = [date_column, geo_column, dependent_variable, f"{dependent_variable}_transformed"]
@@ -81,6 +73,8 @@ def modeling_input(date_column, geo_column, granular_df, transformed_df, depende
                 col for col in transformed_df_date_filtered.drop(columns=remove_cols).columns
                 if col.endswith('_transformed')]
 
+        st.session_state['available_channels'] = available_channels
+        st.session_state['modeling_date_bounds'] = (adjusted_min_date, max_date)
         selected_channels = st.multiselect("Select channels to model on", available_channels, key="channel_selector")
 
 
@@ -111,121 +105,251 @@ def modeling_input(date_column, geo_column, granular_df, transformed_df, depende
     return None
 
 
+def model_summary_table(params):
+    """Shows the coefficients table (Impactable %, ROI, Long Term ROI) of fitted params and returns it"""
+    st.subheader("Model Summary Table")
+    coefficients, long_term_factor = coefficient_table(
+        params,
+        st.session_state['transformed_df_channel_filtered'],
+        st.session_state['granular_df_date_filtered'],
+        st.session_state['granular_df_prior_date_filtered'],
+        dependent_variable,
+        dependent_variable_user_input
+    )
+
+    if long_term_factor is not None:
+        st.write("(3-year) Long Term Factor:", f"{long_term_factor:,.2f}")
+    else:
+        st.warning("No 'Carryover' term found. Long Term ROI cannot be calculated.")
+
+    format_dict = {col: "{:,.2f}" for col in coefficients.select_dtypes(include='number').columns}
+    styled_df = coefficients.drop(columns=['Impactable %', 'Note']).style.format(format_dict)
+    st.write(styled_df)
+    #st.dataframe(coefficients.drop(columns=['Impactable %', 'Note']))
+    return coefficients
+
+
 def run_regression():
     
-    transformed_df_channel_filtered = st.session_state['transformed_df_channel_filtered'].copy()
+    transformed_df_channel_filtered = st.session_state['transformed_df_channel_filtered']
     selected_channels = st.session_state['selected_channels']
     granular_df_date_filtered = st.session_state['granular_df_date_filtered']
     granular_df_prior_date_filtered = st.session_state['granular_df_prior_date_filtered']
 
-    y = transformed_df_channel_filtered[dependent_variable_user_input]
-
-    X = transformed_df_channel_filtered[selected_channels]
-    X = sm.add_constant(X)
-
-    model = sm.OLS(y, X).fit()
+    try:
+        model = fit_ols(transformed_df_channel_filtered, dependent_variable_user_input, selected_channels,
+                        fixed_effects, geo_column, date_column, bounds)
+    except ValueError as e:
+        st.error(str(e))
+        return
 
-    regression_summary = model.summary().as_text()
+    if model.active_bounds:
+        st.info("Coefficients held at their bound: " +
+                ", ".join(f"{name} ({side} bound)" for name, side in model.active_bounds.items()))
 
+    # Headline statistics only; the full summary is rendered on the Modelling Results page when viewed
     st.subheader("OLS Regression Results")
-    st.code(regression_summary, language='text')
+    col1, col2, col3, col4 = st.columns(4)
+    within = " (within)" if model.df_absorbed else ""
+    col1.metric("R-squared" + within, f"{model.rsquared:.3f}")
+    col2.metric("Adj. R-squared" + within, f"{model.rsquared_adj:.3f}")
+    col3.metric("F-statistic", f"{model.fvalue:,.4g}")
+    col4.metric("No. Observations", f"{int(model.nobs):,}")
+    params_table = model.params_table()
+    st.dataframe(params_table.style.format({col: "{:,.4f}" for col in params_table.columns if col != "Variable"}),
+                 hide_index=True)
+
+    coefficients = model_summary_table(model.params)
 
-    st.subheader("Model Summary Table")
-    coefficients = pd.DataFrame({
-        'Variable': model.params.index,
-        'Coefficient': model.params.values
-    })
+    if 'regression_outputs' not in st.session_state:
+        st.session_state['regression_outputs'] = []
 
-    
+    st.session_state['regression_outputs'].append({
+        'model': model,
+        'coefficients': coefficients,
+        'start_date': st.session_state['selected_start_date'],
+        'end_date': st.session_state['selected_end_date'],
+        'fixed_effects': fixed_effects,
+        'active_bounds': model.active_bounds
+    })
 
-    # Use raw sales for impactable % and ROI
-    sum_sales = transformed_df_channel_filtered[dependent_variable_user_input].sum()
-    sum_raw_sales = granular_df_date_filtered[dependent_variable].sum()
-    sum_raw_sales_prior = granular_df_prior_date_filtered[dependent_variable].sum()
+    # except Exception as e:
+    #     st.error(f"An error occurred while running the regression: {e}")
 
-    transformed_df_channel_filtered['const'] = 1
-    granular_df_date_filtered['const'] = 1
 
-    transformed_to_raw = { col: 'const' if col == 'const' else col.replace('_transformed', '')
-                          for col in coefficients['Variable']
-                          }
-    
-    coefficients['Raw Variable'] = coefficients['Variable'].map(transformed_to_raw)
+def run_regularized(penalty, l1_ratio, n_folds, rule):
+    """Fits a ridge / lasso / elastic-net path tuned by rolling-origin folds and stores the chosen model"""
+    try:
+        with st.spinner(f"Fitting the {penalty} path..."):
+            result = fit_regularized(
+                st.session_state['transformed_df_channel_filtered'], date_column, dependent_variable_user_input,
+                st.session_state['selected_channels'], penalty, l1_ratio, n_folds, rule=rule
+            )
+    except ValueError as e:
+        st.error(str(e))
+        return
 
-    coefficients['Raw Activity'] = coefficients['Variable'].apply(
-        lambda var: granular_df_date_filtered[var.replace('_transformed', '')].sum()
-        if var.replace('_transformed', '') in granular_df_date_filtered.columns else 0
-    )
+    st.subheader(f"{penalty} Regression Results")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Chosen penalty (lambda)", f"{result.chosen_lambda:.4g}")
+    col2.metric("R-squared", f"{result.rsquared:.3f}")
+    col3.metric("CV MSE", f"{result.cv.loc[result.chosen_lambda, 'mean']:,.4g}")
 
-    coefficients['Modelled Activity'] = coefficients['Variable'].apply(
-        lambda var: transformed_df_channel_filtered[var].sum()
-        if var in transformed_df_channel_filtered.columns else 0
-    )
+    log_lambda = pd.Index(np.log10(result.lambdas), name="log10(lambda)")
+    st.write("Coefficient path")
+    st.line_chart(result.path.drop(columns='const').set_axis(log_lambda))
+    st.write("Validation error (rolling-origin folds)")
+    st.line_chart(result.cv[['mean']].set_axis(log_lambda))
 
-    lagged_col = "Carryover"
-    no_spend_vars = ['const', lagged_col]
+    coefficients = model_summary_table(result.params)
 
-    #st.dataframe(granular_df_date_filtered)
-    #st.dataframe(coefficients)
-    
-    #Changed
-    coefficients['Spend'] = coefficients['Raw Variable'].apply(
-    lambda var: 0 if var in no_spend_vars else (
-        granular_df_date_filtered[var].sum()
-        if 'Spend' in var and var in granular_df_date_filtered.columns else (
-            granular_df_date_filtered[var + ' Spend'].sum()
-            if var + ' Spend' in granular_df_date_filtered.columns else 0
-            )
-        )
-    )
-
-    coefficients['Impactable %'] = coefficients.apply(
-        lambda row: (row['Coefficient'] * row['Modelled Activity'] * 100) / sum_sales if y.sum() != 0 else 0,
-        axis=1
-    )
+    if 'regression_outputs' not in st.session_state:
+        st.session_state['regression_outputs'] = []
 
-    coefficients['Impactable (%)'] = coefficients['Impactable %'].map(lambda x: f"{x:.2f}%")
-    coefficients['Impactable Sales'] = coefficients['Impactable %'] * sum_raw_sales / 100  #this should be raw sales
+    st.session_state['regression_outputs'].append({
+        'summary': result.summary_text(),
+        'coefficients': coefficients,
+        'start_date': st.session_state['selected_start_date'],
+        'end_date': st.session_state['selected_end_date'],
+        'estimator': penalty
+    })
 
-    coefficients['ROI'] = coefficients.apply(
-        lambda row: row['Impactable Sales'] / row['Spend'] if row['Spend'] != 0 else 0,
-        axis=1
-    )
 
-    coefficients['Note'] = coefficients['Raw Variable'].apply(
-        lambda var: 'Intercept' if var == 'const' else ('Carryover' if var == lagged_col else '')
-    )
-
-    carryover_percentage_series = coefficients[coefficients['Note'] == 'Carryover']['Impactable %'] / 100
-    if not carryover_percentage_series.empty:
-        carryover_percentage = carryover_percentage_series.iloc[0]
-        carryover_rate = (carryover_percentage * sum_raw_sales) / sum_raw_sales_prior
-        long_term_factor = (3 + 2 * carryover_rate + carryover_rate ** 2) / 3
-        st.write("(3-year) Long Term Factor:", f"{long_term_factor:,.2f}")
-        coefficients['Long Term ROI'] = long_term_factor * coefficients['ROI']
+def run_bayesian(priors, n_draws, level, noise_variance=None):
+    """Fits the conjugate Bayesian regression, shows credible intervals on ROI and stores the model"""
+    transformed_df_channel_filtered = st.session_state['transformed_df_channel_filtered']
+    try:
+        result = fit_bayesian(transformed_df_channel_filtered, dependent_variable_user_input,
+                              st.session_state['selected_channels'], priors, n_draws, noise_variance=noise_variance)
+        intervals = roi_intervals(
+            result,
+            transformed_df_channel_filtered,
+            st.session_state['granular_df_date_filtered'],
+            st.session_state['granular_df_prior_date_filtered'],
+            dependent_variable,
+            dependent_variable_user_input,
+            level
+        )
+    except ValueError as e:
+        st.error(str(e))
+        return
+
+    st.subheader("Bayesian Regression Results")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("R-squared (posterior mean)", f"{result.rsquared:.3f}")
+    col2.metric("Posterior draws", f"{len(result.draws):,}")
+    col3.metric("Prior noise variance", f"{result.noise_prior[0]:,.4g}", help=result.noise_prior[2])
+    st.write("Coefficients")
+    st.dataframe(result.params_table(level).style.format("{:,.4g}", na_rep="flat"))
+
+    st.write(f"{level:.0%} credible intervals")
+    media = intervals[intervals['Spend'] != 0].drop(columns='Spend').set_index('Variable')
+    if media.empty:
+        st.warning("No channel with spend in the model; ROI intervals are not available.")
     else:
-        st.warning("No 'Carryover' term found. Long Term ROI cannot be calculated.")
-        coefficients['Long Term ROI'] = 0
+        st.dataframe(media.style.format("{:,.4g}"))
 
-    coefficients = coefficients.drop(['Raw Variable'], axis=1)
-
-    format_dict = {col: "{:,.2f}" for col in coefficients.select_dtypes(include='number').columns}
-    styled_df = coefficients.drop(columns=['Impactable %', 'Note'], axis=1).style.format(format_dict)
-    st.write(styled_df)
-    #st.dataframe(coefficients.drop(columns=['Impactable %', 'Note'], axis=1))
+    coefficients = model_summary_table(result.params)
 
     if 'regression_outputs' not in st.session_state:
         st.session_state['regression_outputs'] = []
 
     st.session_state['regression_outputs'].append({
-        'summary': regression_summary,
+        'summary': result.summary_text(level),
         'coefficients': coefficients,
+        'intervals': intervals,
         'start_date': st.session_state['selected_start_date'],
-        'end_date': st.session_state['selected_end_date']
+        'end_date': st.session_state['selected_end_date'],
+        'estimator': "Bayesian"
     })
 
-    # except Exception as e:
-    #     st.error(f"An error occurred while running the regression: {e}")
+
+def batch_model_search():
+    """Fits every candidate channel subset and window, ranks them and stores the best as iterations"""
+    available_channels = st.session_state['available_channels']
+    min_date, max_date = st.session_state['modeling_date_bounds']
+
+    col1, col2 = st.columns(2)
+    required = col1.multiselect("Channels in every model", available_channels, key="batch_required")
+    optional = col2.multiselect("Candidate channels", [c for c in available_channels if c not in required],
+                                default=[c for c in st.session_state['selected_channels'] if c not in required],
+                                key="batch_optional")
+    col1, col2 = st.columns(2)
+    min_optional = col1.number_input("Min candidate channels per model", min_value=0, max_value=max(len(optional), 0),
+                                     value=min(1, len(optional)), step=1, key="batch_min_optional")
+    max_optional = col2.number_input("Max candidate channels per model", min_value=0, max_value=max(len(optional), 0),
+                                     value=len(optional), step=1, key="batch_max_optional")
+
+    st.write("Modelling windows")
+    windows_df = st.data_editor(
+        pd.DataFrame({
+            'Start Date': [st.session_state['selected_start_date']],
+            'End Date': [st.session_state['selected_end_date']]
+        }),
+        column_config={
+            'Start Date': st.column_config.DateColumn(min_value=min_date, max_value=max_date, required=True),
+            'End Date': st.column_config.DateColumn(min_value=min_date, max_value=max_date, required=True),
+        },
+        num_rows="dynamic",
+        hide_index=True,
+        key="batch_windows"
+    )
+
+    col1, col2, col3 = st.columns(3)
+    roi_min = col1.number_input("Min plausible ROI", value=DEFAULT_ROI_RANGE[0], key="batch_roi_min")
+    roi_max = col2.number_input("Max plausible ROI", value=DEFAULT_ROI_RANGE[1], key="batch_roi_max")
+    top_n = col3.number_input("Models to keep as iterations", min_value=1, value=5, step=1, key="batch_top_n")
+
+    windows = [(row['Start Date'], row['End Date']) for _, row in windows_df.dropna().iterrows()
+               if row['Start Date'] <= row['End Date']]
+    candidates = candidate_models(required, optional, windows, int(min_optional), int(max_optional))
+    st.caption(f"{len(candidates):,} candidate models")
+
+    if not st.button("Run Batch Search", disabled=not candidates):
+        return
+
+    try:
+        with st.spinner(f"Fitting {len(candidates):,} models..."):
+            ranking = search_models(transformed_df, granular_df, date_column, dependent_variable,
+                                    dependent_variable_user_input, candidates, (roi_min, roi_max))
+    except ValueError as e:
+        st.error(str(e))
+        return
+
+    if ranking.empty:
+        st.warning("No candidate could be fitted; check the windows and channels for missing values.")
+        return
+
+    st.subheader("Ranked Models")
+    st.dataframe(ranking, hide_index=True)
+
+    # The best models are refitted on their rows so the stored iterations carry the full summary
+    if 'regression_outputs' not in st.session_state:
+        st.session_state['regression_outputs'] = []
+    first = len(st.session_state['regression_outputs']) + 1
+    for _, row in ranking.head(int(top_n)).iterrows():
+        channels = row['Channels'].split(', ')
+        transformed_df_date_filtered, granular_df_date_filtered, granular_df_prior_date_filtered = modeling_windows(
+            transformed_df, granular_df, date_column, row['Start Date'], row['End Date']
+        )
+        model = fit_ols(transformed_df_date_filtered, dependent_variable_user_input, channels)
+        coefficients, _ = coefficient_table(
+            model.params,
+            transformed_df_date_filtered,
+            granular_df_date_filtered,
+            granular_df_prior_date_filtered,
+            dependent_variable,
+            dependent_variable_user_input
+        )
+        st.session_state['regression_outputs'].append({
+            'model': model,
+            'coefficients': coefficients,
+            'start_date': row['Start Date'],
+            'end_date': row['End Date'],
+            'rank': int(row['Rank'])
+        })
+    st.success(f"Stored the top {min(int(top_n), len(ranking))} models as iterations "
+               f"{first} to {len(st.session_state['regression_outputs'])}; view them on the Modelling Results page.")
 
 
 
@@ -264,7 +388,76 @@ if __name__ == '__main__':
             st.write(styled_df)
             #st.dataframe(st.session_state['transformed_df_channel_filtered'])
 
+            fixed_effects = st.radio(
+                "Fixed effects", FIXED_EFFECTS, horizontal=True, key="fixed_effects",
+                help="Geo (and period) effects absorb baseline differences; standard errors are then clustered by geo"
+            )
+
+            bounds = None
+            if st.checkbox("Constrain coefficients", value=False, key="constrain_coefficients",
+                           help="Bounded least squares; by default media coefficients are kept non-negative"):
+                defaults = coefficient_bounds(st.session_state['selected_channels'])
+                bounds_df = st.data_editor(
+                    pd.DataFrame({
+                        'Variable': st.session_state['selected_channels'],
+                        'Lower Bound': [defaults.get(c, (None, None))[0] for c in st.session_state['selected_channels']],
+                        'Upper Bound': [None] * len(st.session_state['selected_channels']),
+                    }).astype({'Lower Bound': float, 'Upper Bound': float}),
+                    column_config={'Variable': st.column_config.TextColumn(disabled=True)},
+                    hide_index=True,
+                    key=f"bounds_{'_'.join(st.session_state['selected_channels'])}"
+                )
+                bounds = {
+                    row['Variable']: (None if pd.isna(row['Lower Bound']) else row['Lower Bound'],
+                                      None if pd.isna(row['Upper Bound']) else row['Upper Bound'])
+                    for _, row in bounds_df.iterrows()
+                }
+
             if st.button("Run OLS Regression"):
                 run_regression()
+
+            with st.expander("Regularized Regression"):
+                col1, col2, col3 = st.columns(3)
+                penalty = col1.selectbox("Penalty", list(PENALTIES), key="penalty")
+                n_folds = col2.number_input("Rolling-origin folds", min_value=2, max_value=20, value=5, step=1, key="cv_folds")
+                rule = col3.selectbox("Selection rule", list(SELECTION_RULES), format_func=SELECTION_RULES.get, key="cv_rule")
+                l1_ratio = None
+                if penalty == "Elastic Net":
+                    l1_ratio = st.slider("L1 ratio", min_value=0.05, max_value=0.95, value=PENALTIES[penalty], step=0.05,
+                                         key="l1_ratio")
+                if st.button("Run Regularized Regression"):
+                    run_regularized(penalty, l1_ratio, int(n_folds), rule)
+
+            with st.expander("Bayesian Regression"):
+                st.caption("Normal priors on the channel coefficients (blank SD for a flat prior); "
+                           "the posterior is exact and the intervals come from posterior draws. "
+                           "The noise variance prior is centred on the value below or, if blank, on the OLS "
+                           "residual variance of the same window (empirical Bayes, slightly narrower intervals).")
+                priors_df = st.data_editor(
+                    pd.DataFrame({
+                        'Variable': st.session_state['selected_channels'],
+                        'Prior Mean': [0.0] * len(st.session_state['selected_channels']),
+                        'Prior SD': [None] * len(st.session_state['selected_channels']),
+                    }).astype({'Prior Mean': float, 'Prior SD': float}),
+                    column_config={'Variable': st.column_config.TextColumn(disabled=True)},
+                    hide_index=True,
+                    key=f"priors_{'_'.join(st.session_state['selected_channels'])}"
+                )
+                col1, col2, col3 = st.columns(3)
+                n_draws = col1.number_input("Posterior draws", min_value=500, max_value=100000, value=N_DRAWS, step=500,
+                                            key="posterior_draws")
+                level = col2.slider("Credible level", min_value=0.5, max_value=0.99, value=CREDIBLE_LEVEL, step=0.01,
+                                    key="credible_level")
+                noise_variance = col3.number_input("Prior noise variance", min_value=0.0, value=None,
+                                                   placeholder="OLS residual variance", key="prior_noise_variance")
+                if st.button("Run Bayesian Regression"):
+                    priors = {
+                        row['Variable']: (0.0 if pd.isna(row['Prior Mean']) else row['Prior Mean'], row['Prior SD'])
+                        for _, row in priors_df.iterrows() if not pd.isna(row['Prior SD'])
+                    }
+                    run_bayesian(priors, int(n_draws), level, noise_variance or None)
+
+            with st.expander("Batch Model Search"):
+                batch_model_search()
     else:
         st.warning("No file has been uploaded")
@@ -31,7 +31,8 @@ def display_regression_results():
         st.subheader("Previous Regression Results")
 
         # Dropdown to select model run
-        model_labels = [f"Iteration {i+1}" for i in range(len(st.session_state['regression_outputs']))]
+        model_labels = [f"Iteration {i+1}" + (f" (batch rank {output['rank']})" if 'rank' in output else "")
+                        for i, output in enumerate(st.session_state['regression_outputs'])]
         selected_run_label = st.selectbox("Select the iteration to view", model_labels)
 
         # Get index of selected model
@@ -46,6 +47,15 @@ def display_regression_results():
         end_date = selected_result.get('end_date', None)
         if start_date and end_date:
             st.info(f"Modeling Time Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
+        if selected_result.get('fixed_effects', "None") != "None":
+            st.info(f"Fixed effects: {selected_result['fixed_effects']} (standard errors clustered by geo)")
+        if selected_result.get('estimator') == "Bayesian":
+            st.info("Estimator: Bayesian (conjugate normal-inverse-gamma; coefficients are posterior means)")
+        elif selected_result.get('estimator'):
+            st.info(f"Estimator: {selected_result['estimator']} (penalty tuned by rolling-origin cross-validation)")
+        if selected_result.get('active_bounds'):
+            st.info("Coefficients held at their bound: " +
+                    ", ".join(f"{name} ({side} bound)" for name, side in selected_result['active_bounds'].items()))
 
         # Display configuration table
         # st.subheader('Configuration Table')
@@ -53,16 +63,26 @@ def display_regression_results():
         # st.dataframe(configuration_list[selected_index])
 
         st.subheader("OLS Regression Summary")
-        st.code(selected_result['summary'])
+        if 'model' in selected_result:
+            # Rendered from the stored statistics only when asked for
+            if st.checkbox("Show full OLS regression summary", key=f"show_summary_{selected_index}"):
+                st.code(selected_result['model'].summary().as_text(), language='text')
+        else:
+            st.code(selected_result['summary'])
 
         st.subheader("Coefficients Table")
         coefficients = selected_result['coefficients']
         format_dict = {col: "{:,.2f}" for col in coefficients.select_dtypes(include='number').columns}
-        styled_df = coefficients.drop(columns=['Impactable %', 'Note'], axis=1).style.format(format_dict)
+        styled_df = coefficients.drop(columns=['Impactable %', 'Note']).style.format(format_dict)
         st.write(styled_df)
 
         #st.dataframe(selected_result['coefficients'])
 
+        if 'intervals' in selected_result:
+            st.subheader("Credible Intervals")
+            intervals = selected_result['intervals']
+            st.dataframe(intervals[intervals['Spend'] != 0].drop(columns='Spend').set_index('Variable').style.format("{:,.4g}"))
+
         # Save only the coefficients DataFrame
         if st.button("Save this model's coefficients for response curve generation"):
             st.session_state['selected_model_coefficients'] = selected_result['coefficients'].copy()
@@ -9,6 +9,7 @@ import seaborn as sns
 import streamlit as st
 import plotly.express as px
 import re
+from proctimize.response_curves import create_final_merged_response_curve
 
 st.set_page_config(page_title="ProcTimize", layout="wide")
 #st.image("img/response_curves.png")
@@ -49,82 +50,6 @@ num_geo = 2614  # number of bricks [geo_id.nunique()]
 # st.set_page_config(page_title="Response Curves", layout="centered")
 # st.title("Response Curve Viewer")
 
-# ----------------------------------------------------------------------------------------------------
-# Function Definitions
-# ----------------------------------------------------------------------------------------------------
-
-def calc_calibration_factor(impactable_sales_nation, beta_coeff, spend_nation, saturation_function, power_value):   #to fetch choice of function  
-    
-    if saturation_function == 'log':
-        calib_factor = (impactable_sales_nation / (num_time * num_geo)) / (
-        beta_coeff * np.log(1 + (spend_nation / (num_time * num_geo))))   
-
-    elif saturation_function == 'power':
-        calib_factor = (impactable_sales_nation / (num_time * num_geo)) / (
-        beta_coeff * np.power(spend_nation / (num_time * num_geo), power_value))  
-
-    return calib_factor
-
-
-def create_response_curve(channel_name, impactable_sales_nation, beta_coeff, spend_nation, start, stop, step, price, saturation_function, power_value):
-    calibration_factor = calc_calibration_factor(impactable_sales_nation, beta_coeff, spend_nation, saturation_function, power_value)
-    spend_values = range(start, stop + 1, step)
-
-    response_df = pd.DataFrame({
-        'spend': spend_values,
-        'impactable_geo_time': [None] * len(spend_values),
-        'impactable_nation': [None] * len(spend_values),
-        'impactable_nation_currency': [None] * len(spend_values),
-        'roi': [None] * len(spend_values),
-        'mroi': [None] * len(spend_values)
-    })
-
-    if saturation_function == 'log':
-        response_df['impactable_geo_time'] = calibration_factor * beta_coeff * np.log(1 + (response_df['spend'] / (num_time * num_geo)))
-
-    elif saturation_function == 'power':
-        response_df['impactable_geo_time'] = calibration_factor * beta_coeff * np.power((response_df['spend'] / (num_time * num_geo)),power_value)
-
-
-    response_df['impactable_nation'] = num_time * num_geo * response_df['impactable_geo_time']
-    response_df['impactable_nation_currency'] = price * response_df['impactable_nation']
-    response_df['roi'] = response_df['impactable_nation_currency'] / response_df['spend']
-    response_df['mroi'] = (response_df['impactable_nation_currency'].shift(-1) -
-                           response_df['impactable_nation_currency']) / (response_df['spend'].shift(-1) -
-                                                                          response_df['spend'])
-
-    channel_prefix = channel_name + '_'
-    response_df = response_df.add_prefix(channel_prefix)
-
-    return response_df
-
-
-def create_final_merged_response_curve(model_result_df, start, stop, step, price):
-    final_merged_response_curve = pd.DataFrame()
-
-    for channel_name in model_result_df['channel']:
-        impactable_sales_nation = float(model_result_df[model_result_df['channel'] == channel_name]['impactable_sensors'])
-        beta_coeff = float(model_result_df[model_result_df['channel'] == channel_name]['coefficient'])
-        spend_nation = float(model_result_df[model_result_df['channel'] == channel_name]['spend'])
-        saturation_function = model_result_df[model_result_df['channel'] == channel_name]['saturation'].values[0]
-        power_value = model_result_df[model_result_df['channel'] == channel_name]['power'].values[0]
-
-        response_curve = create_response_curve(channel_name, impactable_sales_nation, beta_coeff, spend_nation,
-                                               start, stop, step, price,saturation_function,power_value)
-
-        if final_merged_response_curve.empty:
-            final_merged_response_curve = response_curve
-        else:
-            final_spend_col = final_merged_response_curve.columns[0]
-            new_spend_col = response_curve.columns[0]
-            final_merged_response_curve = final_merged_response_curve.merge(response_curve,
-                                                                            left_on=final_spend_col,
-                                                                            right_on=new_spend_col,
-                                                                            how='inner')
-
-    return final_merged_response_curve
-
-
 # ----------------------------------------------------------------------------------------------------
 # Streamlit Interface
 # ----------------------------------------------------------------------------------------------------
@@ -144,7 +69,7 @@ if uploaded_file:
         model_result_df = pd.read_csv(uploaded_file)
 
         if {'channel', 'impactable_sensors', 'coefficient', 'spend'}.issubset(model_result_df.columns):
-            merged_rc = create_final_merged_response_curve(model_result_df, start, stop, step, price)
+            merged_rc = create_final_merged_response_curve(model_result_df, start, stop, step, price, num_time, num_geo)
 
             # Storing session state variables
             st.session_state['model_result_df'] = model_result_df
@@ -8,6 +8,7 @@ import matplotlib.ticker as ticker
 import seaborn as sns
 import streamlit as st
 import plotly.graph_objects as go
+from proctimize.optimization import run_optimizer, optimizer_result, dict_sum, min_max_check
 
 st.set_page_config(page_title="ProcTimize", layout="wide")
 #st.image("img/optimization.png")
@@ -36,134 +37,6 @@ st.markdown("""
 
 # All functions
 
-# Function to sum up kpi's
-def calc_rc_kpi(merged_rc,optimizer_dict,kpi,k):
-    total_kpi = 0
-
-    for channel in list(optimizer_dict.keys()):
-        iterator = optimizer_dict[channel]['iter']
-        iterator -= k
-
-        if iterator>=0:
-            total_kpi += merged_rc[f'{channel}_{kpi}'][iterator]
-    return total_kpi
-
-# Function to calculate total iterations
-def total_iter(optimizer_dict):
-    total = 0
-    for channel in optimizer_dict.keys():
-        total += optimizer_dict[channel]['iter']
-    return (total - 11)
-
-
-# Function to run the optimizer
-def run_optimizer(optimizer_dict,merged_rc,target,opt_type,k):
-
-
-    if (opt_type=='Budget Goal'):
-        criteria = 'spend'
-    
-    elif opt_type == 'Sales Goal' :
-        criteria = 'impactable_nation'
-
-    # Ensuring min criteria
-    current_val = calc_rc_kpi(merged_rc,optimizer_dict,criteria,k)
-
-    for channel in list(optimizer_dict.keys()):
-
-        iterator = optimizer_dict[channel]['iter']
-        while(merged_rc[f'{channel}_spend'][iterator] <= optimizer_dict[channel]['min'] ):
-
-            # Debugging step
-            # print(channel,"----",iterator,'----',calc_rc_kpi(merged_rc,optimizer_dict,criteria,k), '----',total_iter(optimizer_dict))
-            optimizer_dict[channel]['iter'] += k
-            iterator = optimizer_dict[channel]['iter']
-
-
-    # Running for Fixed Budget and Sensor Goal
-    current_val = calc_rc_kpi(merged_rc,optimizer_dict,criteria,k)
-    max_mroi_channel=None
-    
-    while current_val < target:
-        
-        max_mroi =-1
-        max_mroi_channel = None
-
-        for channel in list(optimizer_dict.keys()):
-            
-            iterator = optimizer_dict[channel]['iter']
-            if iterator < len(merged_rc)  :
-                #Checking the max limit
-                if merged_rc[f'{channel}_spend'][iterator] <= optimizer_dict[channel]['max'] :
-
-                    if merged_rc[f'{channel}_mroi'][iterator] > max_mroi:
-                        max_mroi =  merged_rc[f'{channel}_mroi'][iterator]
-                        max_mroi_channel = channel
-
-        # Debugging step
-        # print(max_mroi_channel,'----',optimizer_dict[max_mroi_channel]['iter'],'----',current_val, '----',total_iter(optimizer_dict))
-        
-        optimizer_dict[max_mroi_channel]['iter'] += k
-
-        
-        current_val  = calc_rc_kpi(merged_rc,optimizer_dict,criteria,k)
-
-
-        if(current_val>target) and opt_type=='Budget Goal':
-            optimizer_dict[max_mroi_channel]['iter'] -= k
-            break
-
-
-    current_val  = calc_rc_kpi(merged_rc,optimizer_dict,criteria,k)
-
-    return optimizer_dict
-
-
-def optimizer_result(optimizer_dict,model_result_df,merged_rc,k):
-
-    channel_list = list(optimizer_dict.keys())
-
-    optimizer_result_df = pd.DataFrame({
-        'channel' : channel_list,
-        'optimal_spend' : [None] * len(channel_list),
-        'sensor_volume' : [None] * len(channel_list),
-        'net_sales' : [None] * len(channel_list),
-        'roi' : [None] * len(channel_list),
-        'mroi' : [None] * len(channel_list)
-    })
-
-    # Calculation of all columns
-    for channel in channel_list:
-
-        iterator = optimizer_dict[channel]['iter'] - k
-
-        if iterator < 0:
-            iterator = 0
-
-        optimizer_result_df.loc[optimizer_result_df['channel']==channel,'optimal_spend'] = merged_rc[f'{channel}_spend'][iterator]
-        optimizer_result_df.loc[optimizer_result_df['channel']==channel,'sensor_volume'] = merged_rc[f'{channel}_impactable_nation'][iterator]
-        optimizer_result_df.loc[optimizer_result_df['channel']==channel,'net_sales'] = merged_rc[f'{channel}_impactable_nation_currency'][iterator]
-        optimizer_result_df.loc[optimizer_result_df['channel']==channel,'roi'] = merged_rc[f'{channel}_roi'][iterator]
-        optimizer_result_df.loc[optimizer_result_df['channel']==channel,'mroi'] = merged_rc[f'{channel}_mroi'][iterator]
-
-
-    optimizer_result_df = pd.merge(model_result_df,optimizer_result_df,on='channel',how='inner')
-
-    optimizer_result_df = optimizer_result_df.drop(columns=['impactable%','impactable_sensors','coefficient','saturation','power'])
-    # Converting from object to float type
-    optimizer_result_df = optimizer_result_df.apply(pd.to_numeric, errors='ignore')
-
-
-    # Adding total row
-    total_row = optimizer_result_df.select_dtypes(include='number').sum(numeric_only=True)
-    total_row['roi']  = total_row['net_sales']/total_row['optimal_spend']
-    total_row['mroi'] = optimizer_result_df['mroi'].min()
-    total_row['channel'] = 'Total'
-    # Append the total row to the DataFrame
-    optimizer_result_df = pd.concat([optimizer_result_df, pd.DataFrame([total_row])], ignore_index=True)
-        
-    return optimizer_result_df
-
 def plot_delta_spend(optimizer_result_df):
 
     #Dropping total
@@ -239,23 +112,6 @@ def plot_optimal_spend_pie(optimizer_result_df):
 
     st.plotly_chart(fig, use_container_width=True)
 
-def dict_sum(optimizer_dict, value):
-
-    sum =0 
-
-    for channel in optimizer_dict.keys():
-        sum += optimizer_dict[channel][value]
-
-    return sum
-
-def min_max_check(optimizer_dict):
-
-    for channel in optimizer_dict.keys():
-        if optimizer_dict[channel]['min'] >= optimizer_dict[channel]['max']:
-            return False
-        
-    return True
-
 
 # End of functions -----------------------------------------------------------------------------------------------------------------
 
@@ -0,0 +1 @@
+"""Shared, Streamlit-free helpers used by the ProcTimize pages."""
@@ -0,0 +1,188 @@
+"""
+Headless batch runner for ingestion recipes.
+
+Replays recipes exported from the Data Ingestion page on new extracts and writes
+one Parquet file per channel, running the channels in parallel processes.
+
+Single channel:
+    python -m proctimize.batch calls_recipe.json data/calls_*.csv -o out/calls.parquet
+
+Many channels from a manifest (JSON, or YAML with PyYAML installed):
+    python -m proctimize.batch --manifest monthly_refresh.json --workers 8
+
+    {
+      "input_dir": "data/2024-06",
+      "output_dir": "out/2024-06",
+      "jobs": [
+        {"recipe": "recipes/calls.json"},
+        {"recipe": "recipes/emails.json", "files": ["emails_a.csv", "emails_b.csv"]},
+        {"recipe": "recipes/tv.json", "output": "tv_monthly.parquet"}
+      ]
+    }
+
+Relative paths in a manifest are resolved against the manifest's directory. A job
+without "files" reads the file names recorded in its recipe from "input_dir", and
+a job without "output" is written to "<output_dir>/<channel>.parquet".
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+
+from proctimize.pools import process_pool
+from proctimize.recipe import load_recipe, read_config, resolve_recipe_files, run_recipe
+
+
+def run_job(job):
+    """
+    Runs one recipe job and writes its Parquet output (executed in a worker process)
+
+    Args:
+        job (dict): 'recipe' path, 'files' list of input paths and 'output' Parquet path
+
+    Returns
+        summary (dict): Job name, output path, rows, columns and elapsed seconds
+    """
+    start = time.perf_counter()
+    recipe = load_recipe(job["recipe"])
+    df = run_recipe(recipe, job["files"])
+
+    os.makedirs(os.path.dirname(os.path.abspath(job["output"])), exist_ok=True)
+    df.write_parquet(job["output"])
+    return {
+        "job": job["name"],
+        "output": job["output"],
+        "rows": df.height,
+        "columns": df.width,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def expand_files(patterns, base_dir="."):
+    """Expands globs (relative to base_dir), keeping the given order and literal paths that match nothing"""
+    files = []
+    for pattern in patterns:
+        path = pattern if os.path.isabs(pattern) else os.path.join(base_dir, pattern)
+        matches = sorted(glob.glob(path))
+        files.extend(matches or [path])
+    return files
+
+
+def load_manifest(path):
+    """
+    Reads a batch manifest and resolves every job to absolute recipe, input and output paths
+
+    Args:
+        path (string): Path of the manifest file
+
+    Returns
+        jobs (list): Job dicts accepted by run_job
+    """
+    return resolve_jobs(read_config(path), os.path.dirname(os.path.abspath(path)))
+
+
+def resolve_jobs(manifest, base_dir):
+    """
+    Resolves the jobs of a manifest mapping to absolute recipe, input and output paths
+
+    Args:
+        manifest (dict): "input_dir", "output_dir" and "jobs" sections of a manifest
+        base_dir (string): Directory relative paths are resolved against
+
+    Returns
+        jobs (list): Job dicts accepted by run_job
+    """
+    resolve = lambda p: p if os.path.isabs(p) else os.path.join(base_dir, p)
+    input_dir = resolve(manifest.get("input_dir", "."))
+    output_dir = resolve(manifest.get("output_dir", "."))
+
+    jobs = []
+    for job in manifest.get("jobs", []):
+        recipe_path = resolve(job["recipe"])
+        recipe = load_recipe(recipe_path)
+        name = job.get("name") or recipe.get("channel") or os.path.splitext(os.path.basename(recipe_path))[0]
+
+        if job.get("files"):
+            files = expand_files(job["files"], input_dir)
+        else:
+            files = resolve_recipe_files(recipe, input_dir)
+
+        output = job.get("output") or f"{name}.parquet"
+        output = output if os.path.isabs(output) else os.path.join(output_dir, output)
+        jobs.append({"name": name, "recipe": recipe_path, "files": files, "output": output})
+    return jobs
+
+
+def run_batch(jobs, workers=None):
+    """
+    Runs jobs in parallel processes, reporting each one as it finishes
+
+    Args:
+        jobs (list): Job dicts accepted by run_job
+        workers (int): Number of worker processes, defaults to min(len(jobs), cpu count)
+
+    Returns
+        (list, dict): Summaries of successful jobs and job name to error message for failed jobs
+    """
+    summaries, errors = [], {}
+    if not jobs:
+        return summaries, errors
+
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    if workers == 1:
+        results = []
+        for job in jobs:
+            try:
+                results.append((job, run_job(job), None))
+            except Exception as e:
+                results.append((job, None, e))
+    else:
+        results = []
+        with process_pool(workers) as pool:
+            futures = {pool.submit(run_job, job): job for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    results.append((futures[future], future.result(), None))
+                except Exception as e:
+                    results.append((futures[future], None, e))
+
+    for job, summary, error in results:
+        if error is None:
+            summaries.append(summary)
+            print(f"✅ {summary['job']}: {summary['rows']:,} rows x {summary['columns']} columns -> {summary['output']} ({summary['seconds']}s)")
+        else:
+            errors[job["name"]] = str(error)
+            print(f"❌ {job['name']}: {error}", file=sys.stderr)
+    return summaries, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m proctimize.batch",
+        description="Replay Data Ingestion recipes on new extracts and write Parquet outputs."
+    )
+    parser.add_argument("recipe", nargs="?", help="Recipe file (.json/.yaml) for a single channel")
+    parser.add_argument("files", nargs="*", help="Input CSV file(s) or globs, in the recipe's file order")
+    parser.add_argument("-o", "--output", help="Parquet output path for a single channel")
+    parser.add_argument("-m", "--manifest", help="Manifest listing several channel jobs")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Number of parallel processes")
+    args = parser.parse_args(argv)
+
+    if args.manifest:
+        jobs = load_manifest(args.manifest)
+    elif args.recipe:
+        recipe = load_recipe(args.recipe)
+        name = recipe.get("channel") or os.path.splitext(os.path.basename(args.recipe))[0]
+        files = expand_files(args.files) if args.files else resolve_recipe_files(recipe, ".")
+        jobs = [{"name": name, "recipe": args.recipe, "files": files, "output": args.output or f"{name}.parquet"}]
+    else:
+        parser.error("either a recipe or --manifest is required")
+
+    _, errors = run_batch(jobs, args.workers)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
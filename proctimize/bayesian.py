@@ -0,0 +1,246 @@
+import numpy as np
+import pandas as pd
+
+from proctimize.modelling import coefficient_table, three_year_factor
+from proctimize.regression import CrossProducts, solve_normal_equations
+
+# Conjugate Bayesian regression for the Modelling page.
+# The coefficients get a normal prior given their noise variance and the noise variance an
+# inverse-gamma prior (normal-inverse-gamma), so the posterior is again normal-inverse-gamma
+# and follows in closed form from the cross-products of the window; the intercept has a
+# flat prior, which leaves the slopes to the centered cross-products. The noise variance
+# prior is centred on a given variance or, by default, on the OLS residual variance of the
+# window itself (empirical Bayes: the data sets the prior's scale). Posterior draws are
+# generated in one batch (a gamma draw for the variance and a Cholesky-correlated normal
+# draw for the coefficients) and, as Impactable Sales, ROI and Long Term ROI are linear in
+# the coefficients (the long term factor through the carryover coefficient), pushed
+# through the coefficient table as array products to give credible intervals per channel.
+
+N_DRAWS = 4000
+CREDIBLE_LEVEL = 0.9
+# Default weight of the noise variance prior, in observations
+PRIOR_NOISE_DF = 2.0
+
+
+def _noise_scale(cross_products):
+    """Residual variance of the OLS fit of the window (variance of y if OLS has no residual df)"""
+    n, comoment = cross_products.n, cross_products.comoment
+    cxx, cxy, cyy = comoment[:-1, :-1], comoment[:-1, -1], comoment[-1, -1]
+    slopes, _, rank = solve_normal_equations(cxx, cxy)
+    df_resid = n - 1 - rank
+    if df_resid <= 0:
+        return cyy / max(n - 1, 1)
+    return max(cyy - 2 * slopes @ cxy + slopes @ cxx @ slopes, 0.0) / df_resid
+
+
+class BayesianResult:
+    """
+    Normal-inverse-gamma posterior of a linear model and a batch of draws from it
+
+    Attributes:
+        params (series): Posterior mean of the coefficients ('const' first)
+        draws (dataframe): Posterior draws of the coefficients, one row per draw
+        sigma2 (array): Posterior draws of the noise variance
+        prior (dataframe): Prior mean and standard deviation per variable (NaN sd for a flat prior)
+        noise_prior (tuple): (variance, degrees of freedom, source) of the noise variance prior; source is
+            "OLS residual variance" for the empirical Bayes default, else "given"
+        shape, scale (scalar): Inverse-gamma posterior of the noise variance
+        nobs (int): Rows in the window
+        rsquared (scalar): In-window R-squared at the posterior mean
+        yname (string): Dependent variable
+    """
+
+    def __init__(self, params, draws, sigma2, prior, noise_prior, shape, scale, nobs, rsquared, yname):
+        self.params = params
+        self.draws = draws
+        self.sigma2 = sigma2
+        self.prior = prior
+        self.noise_prior = noise_prior
+        self.shape = shape
+        self.scale = scale
+        self.nobs = nobs
+        self.rsquared = rsquared
+        self.yname = yname
+
+    def params_table(self, level=CREDIBLE_LEVEL):
+        """Posterior mean, standard deviation, equal-tailed credible interval and P(coef > 0) per variable"""
+        tail = (1 - level) / 2
+        lower, upper = np.quantile(self.draws.to_numpy(), [tail, 1 - tail], axis=0)
+        return pd.DataFrame({
+            "Prior Mean": self.prior["mean"],
+            "Prior SD": self.prior["sd"],
+            "Posterior Mean": self.params,
+            "Posterior SD": self.draws.std(ddof=1),
+            f"{level:.0%} Lower": lower,
+            f"{level:.0%} Upper": upper,
+            "P(> 0)": (self.draws > 0).mean(),
+        }, index=self.params.index)
+
+    def summary_text(self, level=CREDIBLE_LEVEL):
+        """Plain-text summary in the spirit of the OLS summary"""
+        table = self.params_table(level)
+        lines = [
+            "Bayesian Regression Results (normal-inverse-gamma prior)".center(78),
+            "=" * 78,
+            f"Dep. Variable: {self.yname:>20}    Posterior draws: {len(self.draws):>19,}",
+            f"No. Observations: {int(self.nobs):>17,}    R-squared (posterior mean): {self.rsquared:>8.3f}",
+            f"Noise variance: {self.scale / (self.shape - 1) if self.shape > 1 else np.nan:>19.4g}    "
+            f"Credible level: {level:>20.0%}",
+            f"Noise prior: {self.noise_prior[0]:.4g} ({self.noise_prior[2]}), weight {self.noise_prior[1]:g} observations",
+            "-" * 78,
+            f"{'':<24}{'prior':>9}{'prior sd':>9}{'mean':>9}{'sd':>9}{'lower':>9}{'upper':>9}",
+        ]
+        for name, row in table.iterrows():
+            values = row.iloc[:6].tolist()
+            lines.append(f"{name[:23]:<24}" + "".join("       --" if np.isnan(v) else f"{v:>9.4g}" for v in values))
+        lines += ["=" * 78, "Intercept and variables without a prior sd have flat priors."]
+        return "\n".join(lines)
+
+
+def fit_bayesian(
+    transformed_df_channel_filtered,
+    dependent_variable_user_input,
+    selected_channels,
+    priors=None,
+    n_draws=N_DRAWS,
+    seed=None,
+    noise_variance=None,
+    noise_df=PRIOR_NOISE_DF
+):
+    """
+    Conjugate normal-inverse-gamma regression of the dependent variable on the selected channels
+
+    Prior: coefficients ~ N(mean, sd^2 * sigma^2 / s^2) given the noise variance sigma^2 (so sd is on
+    the coefficient's own scale when sigma^2 is near s^2), and sigma^2 ~ scaled inverse chi-square
+    with noise_df degrees of freedom and scale s^2. s^2 is noise_variance if given; by default it is
+    the OLS residual variance of the same window, an empirical Bayes choice that uses the data
+    twice and so makes the intervals somewhat narrower than a fully specified prior would.
+
+    Args:
+        transformed_df_channel_filtered (dataframe): Modelling data in the window
+        dependent_variable_user_input (string): Dependent variable
+        selected_channels (list): Regressor columns
+        priors (dict): Variable to (mean, sd); variables left out (and the intercept) get a flat prior
+        n_draws (int): Posterior draws
+        seed (int): Seed of the draws
+        noise_variance (scalar): Prior guess s^2 of the noise variance, defaults to the OLS residual variance
+        noise_df (scalar): Weight of that guess, in observations
+
+    Returns
+        result (BayesianResult): Posterior mean, draws and prior
+    """
+    priors = priors or {}
+    unknown = [name for name in priors if name not in selected_channels]
+    if unknown:
+        raise ValueError(f"Priors given for {unknown}, which are not in the model")
+
+    y = transformed_df_channel_filtered[dependent_variable_user_input].to_numpy(dtype="float64")
+    X = transformed_df_channel_filtered[selected_channels].to_numpy(dtype="float64")
+    cross_products = CrossProducts(len(selected_channels)).update(X, y)
+    n, mean, comoment = cross_products.n, cross_products.mean, cross_products.comoment
+    if n < 2:
+        raise ValueError("Too few rows to fit the model on")
+    mean_x, mean_y = mean[:-1], mean[-1]
+    cxx, cxy, cyy = comoment[:-1, :-1], comoment[:-1, -1], comoment[-1, -1]
+
+    prior_mean = np.array([priors.get(name, (0.0, None))[0] or 0.0 for name in selected_channels], dtype=float)
+    prior_sd = np.array([np.nan if priors.get(name, (0.0, None))[1] is None else priors[name][1]
+                         for name in selected_channels], dtype=float)
+    if (prior_sd <= 0).any():
+        raise ValueError("Prior standard deviations must be positive")
+    prior_sd[np.isinf(prior_sd)] = np.nan
+
+    if noise_variance is not None and not noise_variance > 0:
+        raise ValueError("Prior noise variance must be positive")
+    if noise_df < 0:
+        raise ValueError("Noise prior weight must not be negative")
+    noise = _noise_scale(cross_products) if noise_variance is None else float(noise_variance)
+    noise_prior = (noise, float(noise_df), "OLS residual variance" if noise_variance is None else "given")
+
+    # Prior precision of the slopes relative to the noise variance; a flat prior adds none
+    prior_precision = np.diag(np.where(np.isnan(prior_sd), 0.0, noise / np.nan_to_num(prior_sd, nan=1.0) ** 2))
+
+    precision = cxx + prior_precision
+    try:
+        factor = np.linalg.cholesky(precision)
+    except np.linalg.LinAlgError:
+        raise ValueError("The model is not identified: add priors to collinear or constant channels") from None
+    posterior_mean = np.linalg.solve(precision, prior_precision @ prior_mean + cxy)
+
+    ssr = max(cyy - 2 * posterior_mean @ cxy + posterior_mean @ cxx @ posterior_mean, 0.0)
+    offset = posterior_mean - prior_mean
+    # The intercept and every flat-prior slope use up one observation, as in OLS; proper priors do not
+    n_flat = int(np.isnan(prior_sd).sum())
+    shape = (noise_df + n - 1 - n_flat) / 2
+    if shape <= 0:
+        raise ValueError("Too few rows for the flat-prior variables: add priors or rows")
+    scale = (noise_df * noise + ssr + offset @ prior_precision @ offset) / 2
+
+    # sigma^2 ~ IG(shape, scale); slopes | sigma^2 ~ N(mean, sigma^2 precision^-1) (precision = L L',
+    # so L'^-1 z has covariance precision^-1); intercept | slopes, sigma^2 ~ N(mean_y - mean_x'b, sigma^2 / n)
+    rng = np.random.default_rng(seed)
+    sigma2 = scale / rng.gamma(shape, size=n_draws)
+    sigma = np.sqrt(sigma2)[:, None]
+    slopes = posterior_mean + sigma * np.linalg.solve(factor.T, rng.standard_normal((len(selected_channels), n_draws))).T
+    intercepts = mean_y - slopes @ mean_x + sigma[:, 0] * rng.standard_normal(n_draws) / np.sqrt(n)
+
+    names = ["const"] + list(selected_channels)
+    draws = pd.DataFrame(np.column_stack([intercepts, slopes]), columns=names)
+    params = pd.Series(np.concatenate([[mean_y - posterior_mean @ mean_x], posterior_mean]), index=names)
+    prior = pd.DataFrame({"mean": np.concatenate([[np.nan], prior_mean]), "sd": np.concatenate([[np.nan], prior_sd])},
+                         index=names)
+    rsquared = 1 - ssr / cyy if cyy > 0 else np.nan
+    return BayesianResult(params, draws, sigma2, prior, noise_prior, shape, scale, n, rsquared,
+                          dependent_variable_user_input)
+
+
+def roi_intervals(
+    result,
+    transformed_df_channel_filtered,
+    granular_df_date_filtered,
+    granular_df_prior_date_filtered,
+    dependent_variable,
+    dependent_variable_user_input,
+    level=CREDIBLE_LEVEL
+):
+    """
+    Credible intervals of Impactable Sales, ROI and Long Term ROI per variable, from the posterior draws
+
+    Args:
+        result (BayesianResult): Fitted posterior
+        transformed_df_channel_filtered, granular_df_date_filtered, granular_df_prior_date_filtered,
+            dependent_variable, dependent_variable_user_input: As for coefficient_table
+
+    Returns
+        intervals (dataframe): Posterior mean and equal-tailed interval of each measure, one row per variable
+    """
+    # Every measure is the coefficient times a per-unit multiplier: the table of unit coefficients
+    unit, _ = coefficient_table(
+        pd.Series(1.0, index=result.params.index),
+        transformed_df_channel_filtered,
+        granular_df_date_filtered,
+        granular_df_prior_date_filtered,
+        dependent_variable,
+        dependent_variable_user_input
+    )
+    unit = unit.set_index("Variable")
+    draws = result.draws.to_numpy()
+    impactable_sales = draws * unit["Impactable Sales"].to_numpy()
+    roi = draws * unit["ROI"].to_numpy()
+
+    measures = {"Impactable Sales": impactable_sales, "ROI": roi}
+    carryover = np.flatnonzero(unit["Note"].to_numpy() == "Carryover")
+    if len(carryover):
+        sum_raw_sales_prior = granular_df_prior_date_filtered[dependent_variable].sum()
+        carryover_rate = impactable_sales[:, carryover[0]] / sum_raw_sales_prior
+        measures["Long Term ROI"] = roi * three_year_factor(carryover_rate)[:, None]
+
+    tail = (1 - level) / 2
+    intervals = pd.DataFrame({"Variable": result.params.index})
+    for measure, values in measures.items():
+        lower, upper = np.quantile(values, [tail, 1 - tail], axis=0)
+        intervals[measure] = values.mean(axis=0)
+        intervals[f"{measure} {level:.0%} Lower"] = lower
+        intervals[f"{measure} {level:.0%} Upper"] = upper
+    intervals["Spend"] = unit["Spend"].to_numpy()
+    return intervals
@@ -0,0 +1,169 @@
+import polars as pl
+
+# Sampling-based date format detection.
+# Candidate formats are scored on a sample of the column by the share of values
+# polars' strptime can parse. Day/month ambiguity is resolved from the value
+# ranges in the sample (a first field above 12 can only be a day); when every
+# sampled value is ambiguous, the format giving the most regular spacing of dates
+# wins, falling back to month-first as used by our US data providers.
+
+CANDIDATE_DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%Y/%m/%d",
+    "%Y%m%d",
+    "%m/%d/%Y",
+    "%d/%m/%Y",
+    "%m-%d-%Y",
+    "%d-%m-%Y",
+    "%d.%m.%Y",
+    "%m/%d/%y",
+    "%d/%m/%y",
+    "%d-%b-%Y",
+    "%d %b %Y",
+    "%b %d, %Y",
+    "%d-%b-%y",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%m/%d/%Y %H:%M",
+    "%d/%m/%Y %H:%M",
+]
+
+# Formats that read the same text with day and month swapped
+DAY_MONTH_PAIRS = {
+    "%m/%d/%Y": "%d/%m/%Y",
+    "%m-%d-%Y": "%d-%m-%Y",
+    "%m/%d/%y": "%d/%m/%y",
+    "%m/%d/%Y %H:%M": "%d/%m/%Y %H:%M",
+}
+DAY_MONTH_PAIRS.update({day_first: month_first for month_first, day_first in list(DAY_MONTH_PAIRS.items())})
+
+SAMPLE_SIZE = 5000
+
+
+def date_parse_expr(expr, date_format):
+    """
+    Vectorized polars expression parsing text to pl.Date with the given format
+
+    Args:
+        expr (Expr): Expression of the column to parse
+        date_format (string): strptime format; formats with a time part are truncated to the date
+
+    Returns
+        expr (Expr): Parsed pl.Date expression (unparseable values become null)
+    """
+    expr = expr.cast(pl.Utf8).str.strip_chars()
+    if "%H" in date_format:
+        return expr.str.to_datetime(date_format, strict=False).dt.date()
+    return expr.str.to_date(date_format, strict=False)
+
+
+def _sample_values(values, sample_size):
+    values = values.cast(pl.Utf8).str.strip_chars()
+    values = values.filter(values.is_not_null() & (values != ""))
+    if values.len() > sample_size:
+        values = values.sample(n=sample_size, seed=0)
+    return values
+
+
+def _spacing_regularity(parsed):
+    # Share of consecutive distinct dates separated by the most common gap
+    dates = parsed.drop_nulls().unique().sort()
+    if dates.len() < 3:
+        return 0.0
+    gaps = dates.diff().drop_nulls()
+    return gaps.value_counts(sort=True)["count"][0] / gaps.len()
+
+
+def infer_date_format(values, sample_size=SAMPLE_SIZE, candidate_formats=None):
+    """
+    Detects the date format of a text column from a sample of its values
+
+    Args:
+        values (Series): Column values (polars Series)
+        sample_size (scalar): Number of non-empty values to score candidate formats on
+        candidate_formats (list): Formats to try, defaults to CANDIDATE_DATE_FORMATS
+
+    Returns
+        result (dict): 'format' (None if nothing parses), 'failure_rate' on the sample,
+            'ambiguous' (day/month order could not be settled from value ranges) and
+            'sample_size'
+    """
+    candidate_formats = candidate_formats or CANDIDATE_DATE_FORMATS
+    sample = _sample_values(values, sample_size)
+
+    result = {"format": None, "failure_rate": 1.0, "ambiguous": False, "sample_size": sample.len()}
+    if sample.len() == 0:
+        return result
+
+    parsed_by_format = {}
+    scores = {}
+    for date_format in candidate_formats:
+        parsed = sample.to_frame("value").select(date_parse_expr(pl.col("value"), date_format)).to_series()
+        parsed_by_format[date_format] = parsed
+        scores[date_format] = 1 - parsed.null_count() / sample.len()
+
+    best_score = max(scores.values())
+    if best_score == 0:
+        return result
+
+    best_formats = [date_format for date_format in candidate_formats if scores[date_format] == best_score]
+    best_format = best_formats[0]
+
+    # Day/month order only remains ambiguous if the swapped format parses every value too
+    swapped = DAY_MONTH_PAIRS.get(best_format)
+    if swapped in best_formats:
+        result["ambiguous"] = True
+        month_first = best_format if best_format.startswith("%m") else swapped
+        day_first = swapped if month_first == best_format else best_format
+        if _spacing_regularity(parsed_by_format[day_first]) > _spacing_regularity(parsed_by_format[month_first]):
+            best_format = day_first
+        else:
+            best_format = month_first
+
+    result["format"] = best_format
+    result["failure_rate"] = 1 - best_score
+    return result
+
+
+def parse_failure_rate(raw_values, parsed_values):
+    """
+    Share of non-empty raw values that did not parse to a date
+
+    Args:
+        raw_values (Series): Original text values
+        parsed_values (Series): Parsed pl.Date values
+
+    Returns
+        failure_rate (float): Failures / non-empty raw values (0 if there are none)
+    """
+    raw = raw_values.cast(pl.Utf8).str.strip_chars()
+    non_empty = raw.is_not_null() & (raw != "")
+    total = non_empty.sum()
+    if not total:
+        return 0.0
+    return (non_empty & parsed_values.is_null()).sum() / total
+
+
+def parse_dates(values, date_format=None):
+    """
+    Parses a text column to pl.Date, detecting the format when none is given
+
+    Args:
+        values (Series): Column values (polars Series)
+        date_format (string): strptime format, None to auto-detect
+
+    Returns
+        (Series, string, float): Parsed dates, format used and the column's failure rate
+    """
+    if values.dtype == pl.Date:
+        return values, None, 0.0
+    if isinstance(values.dtype, pl.Datetime):
+        return values.dt.date(), None, 0.0
+
+    if date_format is None:
+        date_format = infer_date_format(values)["format"]
+        if date_format is None:
+            return pl.Series(values.name, [None] * values.len(), dtype=pl.Date), None, 1.0
+
+    parsed = values.to_frame("value").select(date_parse_expr(pl.col("value"), date_format)).to_series().alias(values.name)
+    return parsed, date_format, parse_failure_rate(values, parsed)
@@ -0,0 +1,284 @@
+import atexit
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import polars as pl
+
+# Content-addressed parse cache shared by all pages.
+# Every Streamlit widget interaction reruns the page script, which used to re-parse
+# every uploaded CSV. Parsed frames are now keyed on a hash of the uploaded bytes plus
+# the read options, kept in an in-memory LRU bounded by size, and spilled to disk as
+# Arrow IPC when evicted so a later rerun can load them back instead of re-parsing.
+# The spill is an LRU of its own, bounded on disk, in a directory private to the process
+# that is removed when it exits; spill files are written outside the cache lock so one
+# session's disk I/O does not block the others.
+
+CACHE_MEMORY_MB = float(os.environ.get("PROCTIMIZE_CACHE_MB", 1024))
+CACHE_SPILL_MB = float(os.environ.get("PROCTIMIZE_CACHE_SPILL_MB", 4096))
+CACHE_SPILL_DIR = os.environ.get(
+    "PROCTIMIZE_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "proctimize_parse_cache")
+)
+MAX_PARSE_WORKERS = int(os.environ.get("PROCTIMIZE_PARSE_WORKERS", min(8, os.cpu_count() or 1)))
+# Uploads whose digests are remembered (one entry per Streamlit file_id)
+MAX_DIGEST_MEMO = 4096
+
+
+class ParseCache:
+    """
+    LRU of parsed polars DataFrames bounded by memory, with a bounded Arrow IPC spill to disk
+
+    Args:
+        max_memory_mb (scalar): Upper bound on the estimated size of the frames held in memory
+        spill_dir (string): Directory under which evicted frames are written as Arrow IPC files
+            (each cache uses its own subdirectory, removed at exit)
+        max_spill_mb (scalar): Upper bound on the spilled files; the least recently used are deleted
+    """
+
+    def __init__(self, max_memory_mb=CACHE_MEMORY_MB, spill_dir=CACHE_SPILL_DIR, max_spill_mb=CACHE_SPILL_MB):
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024
+        self.max_spill_bytes = max_spill_mb * 1024 * 1024
+        self.spill_root = spill_dir
+        self.spill_dir = None
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+        self._spilled = OrderedDict()
+        self._spill_bytes = 0
+        self._lock = threading.RLock()
+
+    def _spill_path(self, key):
+        return os.path.join(self.spill_dir, f"{key}.arrow") if self.spill_dir else None
+
+    def _evict(self):
+        """Drops the least recently used frames over the memory bound and returns them for spilling"""
+        # Always keep the most recently used frame, even if it alone exceeds the bound
+        evicted = []
+        while self._memory_bytes > self.max_memory_bytes and len(self._entries) > 1:
+            key, (df, size) = self._entries.popitem(last=False)
+            self._memory_bytes -= size
+            if key not in self._spilled:
+                evicted.append((key, df))
+        return evicted
+
+    def _put(self, key, df):
+        size = int(df.estimated_size())
+        self._entries[key] = (df, size)
+        self._memory_bytes += size
+        return self._evict()
+
+    def _spill(self, evicted):
+        """Writes evicted frames to disk (called without the lock) and trims the spill to its bound"""
+        for key, df in evicted:
+            if self.max_spill_bytes <= 0:
+                return
+            try:
+                with self._lock:
+                    if self.spill_dir is None:
+                        os.makedirs(self.spill_root, exist_ok=True)
+                        self.spill_dir = tempfile.mkdtemp(prefix=f"{os.getpid()}_", dir=self.spill_root)
+                        atexit.register(shutil.rmtree, self.spill_dir, True)
+                    path = self._spill_path(key)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                df.write_ipc(tmp_path)
+                os.replace(tmp_path, path)
+                size = os.path.getsize(path)
+            except Exception:
+                continue
+
+            expired = []
+            with self._lock:
+                self._spilled[key] = size
+                self._spill_bytes += size
+                while self._spill_bytes > self.max_spill_bytes and self._spilled:
+                    old_key, old_size = self._spilled.popitem(last=False)
+                    self._spill_bytes -= old_size
+                    expired.append(self._spill_path(old_key))
+            for old_path in expired:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+
+    def get(self, key):
+        """Returns the cached frame for key (from memory or the disk spill) or None"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            if key not in self._spilled:
+                return None
+            self._spilled.move_to_end(key)
+            path = self._spill_path(key)
+
+        try:
+            df = pl.read_ipc(path)
+        except Exception:
+            return None
+        with self._lock:
+            evicted = self._put(key, df) if key not in self._entries else []
+        self._spill(evicted)
+        return df
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached frame for key, computing and caching it on a miss
+
+        Args:
+            key (string): Content-addressed cache key
+            compute (callable): Zero-argument function producing the polars DataFrame
+
+        Returns
+            df (DataFrame): Cached or freshly computed frame
+        """
+        df = self.get(key)
+        if df is None:
+            df = compute()
+            with self._lock:
+                evicted = self._put(key, df) if key not in self._entries else []
+            self._spill(evicted)
+        return df
+
+    def clear(self):
+        """Drops all in-memory entries (spilled files are left for reuse)"""
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+
+    @property
+    def spill_mb(self):
+        return self._spill_bytes / (1024 * 1024)
+
+
+_parse_cache = ParseCache()
+_digest_memo = OrderedDict()
+_digest_lock = threading.Lock()
+
+
+def get_parse_cache():
+    """Returns the process-wide parse cache shared by all pages and sessions"""
+    return _parse_cache
+
+
+def file_bytes(file):
+    """Returns the raw bytes of an uploaded file, a path or a bytes object"""
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as f:
+            return f.read()
+    return file.getvalue()
+
+
+def file_digest(file):
+    """
+    SHA-256 of the file contents, memoised per Streamlit upload so a rerun does not re-hash
+
+    Args:
+        file (UploadedFile | bytes | string): Uploaded file, raw bytes or a path
+
+    Returns
+        digest (string): Hex digest of the contents
+    """
+    file_id = getattr(file, "file_id", None)
+    if file_id is not None:
+        with _digest_lock:
+            if file_id in _digest_memo:
+                _digest_memo.move_to_end(file_id)
+                return _digest_memo[file_id]
+
+    digest = hashlib.sha256(file_bytes(file)).hexdigest()
+
+    if file_id is not None:
+        with _digest_lock:
+            _digest_memo[file_id] = digest
+            while len(_digest_memo) > MAX_DIGEST_MEMO:
+                _digest_memo.popitem(last=False)
+    return digest
+
+
+def cache_key(digests, options):
+    """Builds a cache key from content digests and JSON-serialisable read options"""
+    payload = json.dumps({"digests": list(digests), "options": options}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def read_csv_cached(file, **read_options):
+    """
+    Cached equivalent of pl.read_csv(file, **read_options)
+
+    Args:
+        file (UploadedFile | bytes | string): Uploaded file, raw bytes or a path
+        **read_options: Keyword arguments passed to pl.read_csv (e.g. n_rows, columns)
+
+    Returns
+        df (DataFrame): Parsed polars dataframe
+    """
+    key = cache_key([file_digest(file)], {"reader": "read_csv", **read_options})
+    return _parse_cache.get_or_compute(
+        key,
+        lambda: pl.read_csv(io.BytesIO(file_bytes(file)), **read_options)
+    )
+
+
+def read_csv_columns(file):
+    """Column names of a CSV without parsing its rows (cached)"""
+    return read_csv_cached(file, n_rows=0).columns
+
+
+def collect_cached(lf, files):
+    """
+    Collects a LazyFrame built over uploaded files, reusing the result while
+    neither the files nor the query plan change
+
+    Args:
+        lf (LazyFrame): Query plan over the files
+        files (list): Files the plan reads from
+
+    Returns
+        df (DataFrame): Collected polars dataframe
+    """
+    key = cache_key(
+        [file_digest(file) for file in files],
+        {"reader": "lazy", "plan": lf.explain(optimized=False)}
+    )
+    return _parse_cache.get_or_compute(key, lf.collect)
+
+
+def read_csvs_parallel(tasks, max_workers=MAX_PARSE_WORKERS):
+    """
+    Parses several uploaded files concurrently on a bounded thread pool.
+    polars releases the GIL while parsing, so wall-clock time is bounded by the
+    largest file rather than the sum of all files.
+
+    Args:
+        tasks (dict): Key (e.g. file name) to (file, read_options) passed to read_csv_cached
+        max_workers (int): Upper bound on concurrent parses
+
+    Returns
+        (dict, dict): Key to parsed DataFrame for successful files (in task order),
+            and key to the exception raised for files that failed
+    """
+    frames, errors = {}, {}
+    if not tasks:
+        return frames, errors
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks)))) as pool:
+        futures = {
+            pool.submit(read_csv_cached, file, **read_options): key
+            for key, (file, read_options) in tasks.items()
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                frames[key] = future.result()
+            except Exception as e:
+                errors[key] = e
+
+    return {key: frames[key] for key in tasks if key in frames}, errors
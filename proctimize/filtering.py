@@ -0,0 +1,150 @@
+import threading
+from collections import OrderedDict
+
+import polars as pl
+
+from proctimize.file_cache import cache_key, file_digest
+
+# Filter Data helpers.
+# Distinct values of a column only change when the dataset does, so they are computed
+# once per (dataset fingerprint, column) and reused across Streamlit reruns. All the
+# categorical and numeric conditions chosen in the UI are combined into one predicate
+# and applied in a single lazy filter.
+
+BLANK_LABEL = "<BLANK>"
+MAX_CACHED_DATASETS = 8
+
+NUMERIC_OPERATORS = {
+    "Equals": lambda col, value: col == value,
+    "Does not equal": lambda col, value: col != value,
+    "Greater than": lambda col, value: col > value,
+    "Greater than or equal to": lambda col, value: col >= value,
+    "Less than": lambda col, value: col < value,
+    "Less than or equal to": lambda col, value: col <= value,
+}
+
+_distinct_cache = OrderedDict()
+_distinct_lock = threading.Lock()
+
+
+def dataset_fingerprint(files, recipe_files, recipe_merge, date_column):
+    """
+    Fingerprint of the dataset built on the Data Ingestion page, from what defines it rather
+    than its rows: the uploaded files' contents and the choices applied to them
+
+    Args:
+        files (list): Uploaded files (their digests are memoised per upload)
+        recipe_files (list): file_recipe entries (columns kept, renames, date formats)
+        recipe_merge (dict): Merge settings, None for a single file
+        date_column (string): Column parsed as the date
+
+    Returns
+        fingerprint (string): Hex digest identifying the dataset
+    """
+    return cache_key(
+        [file_digest(file) for file in files],
+        {"files": recipe_files, "merge": recipe_merge, "date_column": date_column}
+    )
+
+
+def blank_label_expr(col):
+    """Text of a column with nulls and whitespace-only values mapped to BLANK_LABEL"""
+    text = pl.col(col).cast(pl.Utf8)
+    return (
+        pl.when(text.is_null() | (text.str.strip_chars() == ""))
+        .then(pl.lit(BLANK_LABEL))
+        .otherwise(text)
+        .alias(col)
+    )
+
+
+def distinct_value_counts(df, col, fingerprint):
+    """
+    Sorted distinct display values of a column with their row counts, cached per dataset
+
+    Args:
+        df (DataFrame): Polars dataframe the fingerprint was computed on
+        col (string): Column to profile
+        fingerprint (string): Output of dataset_fingerprint for df
+
+    Returns
+        counts (dict): Display value (BLANK_LABEL for blanks) to number of rows, sorted by value
+    """
+    with _distinct_lock:
+        columns = _distinct_cache.get(fingerprint)
+        if columns is not None:
+            _distinct_cache.move_to_end(fingerprint)
+            if col in columns:
+                return columns[col]
+
+    counts = (
+        df.lazy()
+        .select(blank_label_expr(col))
+        .group_by(col)
+        .len()
+        .sort(col)
+        .collect()
+    )
+    counts = dict(zip(counts[col].to_list(), counts["len"].to_list()))
+
+    with _distinct_lock:
+        _distinct_cache.setdefault(fingerprint, {})[col] = counts
+        _distinct_cache.move_to_end(fingerprint)
+        while len(_distinct_cache) > MAX_CACHED_DATASETS:
+            _distinct_cache.popitem(last=False)
+    return counts
+
+
+def categorical_condition(col, selected_vals, all_vals=None):
+    """
+    Condition keeping rows whose value is one of selected_vals (BLANK_LABEL matches blanks)
+
+    Args:
+        col (string): Column to filter
+        selected_vals (list): Display values to retain
+        all_vals (list): All display values of the column; if every one is selected no condition is needed
+
+    Returns
+        condition (Expr): Boolean expression, or None when the filter keeps every row
+    """
+    if not selected_vals:
+        return None
+    if all_vals is not None and set(all_vals) <= set(selected_vals):
+        return None
+
+    conditions = []
+    if BLANK_LABEL in selected_vals:
+        conditions.append(pl.col(col).is_null() | pl.col(col).cast(pl.Utf8).str.strip_chars().eq(""))
+
+    selected_non_blank_vals = [val for val in selected_vals if val != BLANK_LABEL]
+    if selected_non_blank_vals:
+        conditions.append(pl.col(col).cast(pl.Utf8).is_in(selected_non_blank_vals))
+
+    return pl.any_horizontal(conditions)
+
+
+def numeric_condition(col, operator, value, dtype):
+    """
+    Comparison of a numeric column against a value; floats are compared at 3 decimals
+
+    Args:
+        col (string): Column to filter
+        operator (string): Key of NUMERIC_OPERATORS
+        value (scalar): Value to compare against
+        dtype (DataType): Polars dtype of the column
+
+    Returns
+        condition (Expr): Boolean expression
+    """
+    expr = pl.col(col)
+    if dtype in [pl.Float32, pl.Float64]:
+        expr = expr.round(3)
+    return NUMERIC_OPERATORS[operator](expr, value)
+
+
+def combine_conditions(conditions):
+    """ANDs the non-empty conditions into one predicate (None if there are none)"""
+    conditions = [condition for condition in conditions if condition is not None]
+    if not conditions:
+        return None
+    return pl.all_horizontal(conditions)
@@ -0,0 +1,273 @@
+import itertools
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from proctimize.pools import process_pool
+from proctimize.transformation import (
+    ADSTOCK_TYPES, SHAPED_SATURATIONS, HALF_SATURATION_FUNCTIONS, apply_adstock, apply_saturation, lag_matrix, saturation_scale
+)
+
+# Automated search over the Data Transformation page's parameters.
+# Every (Lags, Adstock, Saturation Function, Power (k), Half Saturation) candidate of a channel is
+# transformed on the geo x period panel and scored against the dependent variable, over
+# the panel's observed cells only (padding is neither scored nor part of the saturation scale).
+# One Adstock Type (and shape) is searched at a time, through the same apply_adstock as the page.
+# Candidates sharing a lag/adstock are grouped so the adstock is computed once per
+# group and only the (cheap, elementwise) saturations vary. Groups are spread over a
+# process pool; the untransformed panel is placed in shared memory once and every
+# worker maps it instead of receiving a pickled copy per task.
+
+MAX_SEARCH_WORKERS = int(os.environ.get("PROCTIMIZE_SEARCH_WORKERS", os.cpu_count() or 1))
+
+DEFAULT_LAGS = [None, 0, 1, 2, 3, 4, 6, 8, 12]
+DEFAULT_ADSTOCK = [None, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
+DEFAULT_SATURATION = [None, "Log", "Power"]
+DEFAULT_POWER = [0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8]
+DEFAULT_HALF_SATURATION = [0.5, 1.0, 2.0]
+
+SCORING = {
+    "correlation": "Pearson correlation of the transformed channel with the dependent variable",
+    "partial_fit": "Signed R-squared gained by adding the channel to an OLS of the dependent variable on the controls",
+}
+
+RESULT_COLUMNS = [
+    "Channel Name", "Saturation Function", "Power (k)", "Half Saturation", "Lags", "Adstock", "Adstock Type",
+    "Adstock Shape", "Score"
+]
+
+# Worker state, set once per process by _init_worker
+_worker = {}
+
+
+def parameter_grid(
+    lags=DEFAULT_LAGS,
+    adstock=DEFAULT_ADSTOCK,
+    saturation=DEFAULT_SATURATION,
+    power=DEFAULT_POWER,
+    half_saturation=DEFAULT_HALF_SATURATION,
+    adstock_type="Geometric"
+):
+    """
+    Valid (lags, adstock) groups and the saturations tried within each
+
+    Args:
+        lags (list): Lags to try (None for no lag)
+        adstock (list): Adstock coefficients to try (None for no adstock)
+        saturation (list): transformation.SATURATION_FUNCTIONS and/or None
+        power (list): Power (k) values tried with the functions that take one
+        half_saturation (list): Half Saturation values tried with the functions that take one
+        adstock_type (string): One of ADSTOCK_TYPES
+
+    Returns
+        (list, list): (lags, adstock) groups, and (saturation, power, half saturation) triples
+    """
+    # Adstock needs a lag, exactly as on the Data Transformation page
+    groups = [(lag, coeff) for lag, coeff in itertools.product(lags, adstock) if not (lag is None and coeff is not None)]
+    if (adstock_type or "Geometric").lower() == "infinite":
+        # Infinite Adstock does not use Lags as a horizon: one group per coefficient is enough
+        adstock_lag = min((lag for lag in lags if lag is not None), default=None)
+        groups = [(lag, coeff) for lag, coeff in groups if coeff is None or lag == adstock_lag]
+    saturations = []
+    for function in saturation:
+        method = function.lower() if function else None
+        powers = power if method in SHAPED_SATURATIONS else [None]
+        halves = half_saturation if method in HALF_SATURATION_FUNCTIONS else [None]
+        saturations.extend((function, k, half) for k, half in itertools.product(powers, halves))
+    return groups, saturations
+
+
+def _residualizer(controls, n_rows):
+    """Orthonormal basis of [const, controls] used to partial them out of y and each candidate"""
+    design = np.column_stack([np.ones(n_rows)] + [controls[:, i] for i in range(controls.shape[1])])
+    q, _ = np.linalg.qr(design)
+    return q
+
+
+def _score(x, y, scoring, q):
+    if scoring == "correlation":
+        x = x - x.mean()
+        denominator = np.sqrt((x @ x) * (y @ y))
+        return float((x @ y) / denominator) if denominator > 0 else np.nan
+
+    # y is already residualized and scaled by its total sum of squares
+    rx = x - q @ (q.T @ x)
+    rxx = rx @ rx
+    if rxx <= 0:
+        return np.nan
+    rxy = rx @ y
+    return float(np.sign(rxy) * rxy ** 2 / rxx)
+
+
+def _init_worker(shm_name, shape, dtype, observed, channel_index, dependent_index, periods, control_indexes, scoring,
+                 saturations, adstock):
+    """Maps the shared panel and precomputes the scoring target once per worker process"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    values = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _setup(values, observed, channel_index, dependent_index, periods, control_indexes, scoring, saturations, adstock)
+    _worker["shm"] = shm
+
+
+def _setup(values, observed, channel_index, dependent_index, periods, control_indexes, scoring, saturations, adstock):
+    lo, hi = periods
+    scored = observed[:, lo:hi]
+    y = values[:, lo:hi, dependent_index][scored].astype(np.float64)
+
+    q = None
+    if scoring == "partial_fit":
+        controls = np.column_stack(
+            [values[:, lo:hi, i][scored].astype(np.float64) for i in control_indexes]
+        ) if control_indexes else np.empty((y.size, 0))
+        q = _residualizer(controls, y.size)
+        total = ((y - y.mean()) ** 2).sum()
+        y = y - q @ (q.T @ y)
+        y = y / np.sqrt(total) if total > 0 else y
+    else:
+        y = y - y.mean()
+
+    _worker.update({
+        "values": values, "observed": observed, "scored": scored, "channel_index": channel_index, "periods": periods,
+        "y": y, "q": q, "scoring": scoring, "saturations": saturations, "adstock": adstock,
+    })
+
+
+def _score_group(task):
+    """Scores every saturation of one (channel, lags, adstock) group"""
+    channel, lags, adstock_coeff = task
+    values, (lo, hi) = _worker["values"], _worker["periods"]
+    adstock_type, adstock_shape = _worker["adstock"]
+    matrix = values[:, :, _worker["channel_index"][channel]].astype(np.float64)
+
+    # Transform over the full history (burn-in), score on the window only
+    if lags is not None and adstock_coeff is not None:
+        matrix = apply_adstock(matrix, lags, adstock_coeff, adstock_type, adstock_shape)
+    elif lags is not None:
+        matrix = lag_matrix(matrix, lags)
+
+    rows = []
+    scale = saturation_scale(matrix[_worker["observed"]])
+    if adstock_coeff is None:
+        adstock_type = adstock_shape = None
+    for function, power_k, half_saturation in _worker["saturations"]:
+        if function is None and lags is None:
+            continue  # untransformed channel
+        x = matrix if function is None else apply_saturation(matrix, function, power_k, half_saturation, scale)
+        x = x[:, lo:hi][_worker["scored"]]
+        score = _score(x, _worker["y"], _worker["scoring"], _worker["q"]) if np.isfinite(x).all() else np.nan
+        rows.append((channel, function, power_k, half_saturation, lags, adstock_coeff, adstock_type, adstock_shape, score))
+    return rows
+
+
+def search_transformations(
+    panel,
+    channels,
+    dependent_variable,
+    start=None,
+    end=None,
+    scoring="correlation",
+    controls=None,
+    lags=DEFAULT_LAGS,
+    adstock=DEFAULT_ADSTOCK,
+    saturation=DEFAULT_SATURATION,
+    power=DEFAULT_POWER,
+    half_saturation=DEFAULT_HALF_SATURATION,
+    adstock_type="Geometric",
+    adstock_shape=None,
+    workers=None
+):
+    """
+    Sweeps the lag, adstock and saturation grid for each channel and scores every candidate
+
+    Args:
+        panel (Panel): Untransformed geo x period panel containing the channels and dependent variable
+        channels (list): Channels to search
+        dependent_variable (string): Channel of the panel the candidates are scored against
+        start, end (date): Scoring window (the transformation itself uses the full history)
+        scoring (string): Key of SCORING
+        controls (list): Channels partialled out with "partial_fit"
+        lags, adstock, saturation, power, half_saturation (list): Grid values (see parameter_grid)
+        adstock_type (string): One of ADSTOCK_TYPES, applied to every adstocked candidate
+        adstock_shape (scalar): Weibull shape, or the Delayed peak lag
+        workers (int): Worker processes, defaults to MAX_SEARCH_WORKERS; 1 runs in this process
+
+    Returns
+        results (dataframe): RESULT_COLUMNS, best score first within each channel
+    """
+    if scoring not in SCORING:
+        raise ValueError(f"Unknown scoring {scoring!r}; choose one of {list(SCORING)}")
+    adstock_type = adstock_type or "Geometric"
+    if adstock_type.lower() not in [name.lower() for name in ADSTOCK_TYPES]:
+        raise ValueError(f"Unknown Adstock Type {adstock_type!r}; choose one of {ADSTOCK_TYPES}")
+    missing = [col for col in list(channels) + [dependent_variable] + list(controls or []) if col not in panel.channel_index]
+    if missing:
+        raise ValueError(f"Columns {missing} are not in the panel")
+
+    groups, saturations = parameter_grid(lags, adstock, saturation, power, half_saturation, adstock_type)
+    tasks = [(channel, lag, coeff) for channel in channels for lag, coeff in groups]
+
+    window = panel.window(start, end)
+    lo = panel.periods.get_loc(window.periods[0]) if len(window.periods) else 0
+    periods = (lo, lo + len(window.periods))
+    if periods[1] - periods[0] < 2:
+        raise ValueError("Scoring window needs at least two periods")
+    if window.observed.sum() < 2:
+        raise ValueError("Scoring window needs at least two observed cells")
+
+    setup_args = (
+        panel.observed,
+        panel.channel_index,
+        panel.channel_index[dependent_variable],
+        periods,
+        [panel.channel_index[col] for col in controls or []],
+        scoring,
+        saturations,
+        (adstock_type, adstock_shape),
+    )
+
+    workers = min(workers or MAX_SEARCH_WORKERS, len(tasks)) or 1
+    rows = []
+    if workers == 1:
+        _setup(panel.values, *setup_args)
+        for task in tasks:
+            rows.extend(_score_group(task))
+        _worker.clear()
+    else:
+        values = np.ascontiguousarray(panel.values)
+        shm = shared_memory.SharedMemory(create=True, size=values.nbytes)
+        try:
+            np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+            with process_pool(
+                workers,
+                initializer=_init_worker,
+                initargs=(shm.name, values.shape, values.dtype.str, *setup_args)
+            ) as pool:
+                chunksize = max(1, len(tasks) // (workers * 4))
+                for group_rows in pool.map(_score_group, tasks, chunksize=chunksize):
+                    rows.extend(group_rows)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    results = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+    results = results.astype({"Lags": "Int64"})
+    results["_order"] = results["Channel Name"].map({channel: i for i, channel in enumerate(channels)})
+    results = results.sort_values(["_order", "Score"], ascending=[True, False], na_position="last")
+    return results.drop(columns="_order").reset_index(drop=True)
+
+
+def best_transformations(results):
+    """
+    Best-scoring candidate per channel, in the Data Transformation page's editor layout
+
+    Args:
+        results (dataframe): Output of search_transformations
+
+    Returns
+        edited_df (dataframe): Channel Name, Saturation Function, Power (k), Half Saturation, Lags, Adstock,
+            Adstock Type, Adstock Shape and Score
+    """
+    best = results.dropna(subset=["Score"]).groupby("Channel Name", sort=False).head(1)
+    best = best.astype(object).where(best.notna(), None)
+    return best.reset_index(drop=True)
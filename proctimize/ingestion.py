@@ -0,0 +1,527 @@
+import io
+import os
+
+import pandas as pd
+import polars as pl
+
+from proctimize.file_cache import collect_cached
+from proctimize.date_inference import date_parse_expr
+
+# Streamlit-free ingestion engines shared by the Data Ingestion page and the
+# headless recipe runner (proctimize.recipe / proctimize.batch).
+
+
+def normalize_columns(df, columns, method="zscore"):
+    df_normalized = df.copy()
+    
+    for col in columns:
+        suffix = "_z" if method == "zscore" else "_iqr"
+        if method == "zscore":
+            mean = df[col].mean()
+            std = df[col].std()
+            if std != 0:
+                df_normalized[col + suffix] = (df[col] - mean) / std
+        elif method == "iqr":
+            Q1 = df[col].quantile(0.25)
+            Q3 = df[col].quantile(0.75)
+            IQR = Q3 - Q1
+            if IQR != 0:
+                df_normalized[col + suffix] = (df[col] - Q1) / IQR
+    return df_normalized
+
+
+# ------------------------------------------------------------------------------
+
+# Lazy multi-file ingestion: every uploaded file becomes a polars LazyFrame and
+# the column selection, renames, date parsing and merge are chained into a single
+# query plan that is only collected once at the end.
+
+def scan_uploaded_csv(file):
+    """
+    Creates a lazy CSV scan over an uploaded file without parsing its rows
+
+    Args:
+        file (UploadedFile | string): File object returned by st.file_uploader, or a path
+
+    Returns
+        lf (LazyFrame): Lazy scan of the file
+    """
+    if isinstance(file, (str, os.PathLike)):
+        return pl.scan_csv(file)
+    return pl.scan_csv(io.BytesIO(file.getvalue()))
+
+
+def source_name(file):
+    """Display name of an uploaded file or a path"""
+    if isinstance(file, (str, os.PathLike)):
+        return os.path.basename(file)
+    return file.name
+
+
+def build_file_plan(lf, selected_cols, rename_dict, date_formats):
+    """
+    Adds column selection, renaming and date parsing for one file to its lazy plan
+
+    Args:
+        lf (LazyFrame): Lazy scan of the file
+        selected_cols (list): Columns to keep, projected down into the CSV scan
+        rename_dict (dict): Mapping of current column name to new column name
+        date_formats (dict): Mapping of (renamed) date column to its strptime format
+
+    Returns
+        lf (LazyFrame): Lazy plan for the standardized file
+    """
+    lf = lf.select(selected_cols)
+
+    rename_dict = {
+        old: new for old, new in rename_dict.items()
+        if old in selected_cols and new and new != old
+    }
+    if rename_dict:
+        lf = lf.rename(rename_dict)
+
+    if date_formats:
+        lf = lf.with_columns([
+            date_parse_expr(pl.col(col), date_format).alias(col)
+            for col, date_format in date_formats.items()
+        ])
+    return lf
+
+
+def join_key_stats(plans, join_keys, files):
+    """
+    Key cardinality and duplicate statistics per file, computed on the join keys only
+
+    Args:
+        plans (list): Lazy plans returned by build_file_plan
+        join_keys (list): Columns the files will be joined on
+        files (list): Uploaded files or paths the plans read from (used for naming and caching)
+
+    Returns
+        stats (DataFrame): One row per file with rows, distinct_keys, duplicated_keys
+            and max_rows_per_key (rows with a null key are ignored, as in the join)
+    """
+    rows = []
+    for plan, file in zip(plans, files):
+        # Only the key columns are read thanks to projection pushdown into the scan
+        stats_plan = (
+            plan.select(join_keys)
+            .drop_nulls()
+            .group_by(join_keys)
+            .len()
+            .select(
+                pl.col("len").sum().alias("rows"),
+                pl.len().alias("distinct_keys"),
+                (pl.col("len") > 1).sum().alias("duplicated_keys"),
+                pl.col("len").max().alias("max_rows_per_key"),
+            )
+            .fill_null(0)
+        )
+        stats = collect_cached(stats_plan, [file]).row(0, named=True)
+        rows.append({"file": source_name(file), **stats})
+    return pd.DataFrame(rows)
+
+
+def aggregate_duplicate_keys(lf, join_keys):
+    """
+    Collapses a plan to one row per join key: numeric columns are summed, other columns keep their first value
+
+    Args:
+        lf (LazyFrame): Per-file lazy plan
+        join_keys (list): Columns the file will be joined on
+
+    Returns
+        lf (LazyFrame): Plan with unique join keys
+    """
+    schema = lf.collect_schema()
+    aggs = [
+        pl.col(col).sum() if dtype.is_numeric() else pl.col(col).first()
+        for col, dtype in schema.items()
+        if col not in join_keys
+    ]
+    return lf.group_by(join_keys, maintain_order=True).agg(aggs)
+
+
+def plan_join_order(plans, join_keys, join_type, key_stats):
+    """
+    Orders the files of a multi-way join so intermediate results stay small
+
+    Inner joins start from the file with the fewest distinct keys, which bounds every
+    intermediate. Left joins keep the first file as the base and apply fanning-out files
+    last. Right and outer joins depend on the file order and are left unchanged, as are
+    joins where files share non-key column names (their suffixes depend on position).
+
+    Args:
+        plans (list): Lazy plans to join
+        join_keys (list): Columns to join on
+        join_type (string): One of inner, left, right, outer
+        key_stats (DataFrame): Output of join_key_stats for the plans
+
+    Returns
+        order (list): Indices of plans in the order they should be joined
+    """
+    order = list(range(len(plans)))
+    if key_stats is None or join_type not in ["inner", "left"]:
+        return order
+
+    value_cols = [set(plan.collect_schema().names()) - set(join_keys) for plan in plans]
+    if sum(len(cols) for cols in value_cols) != len(set().union(*value_cols)):
+        return order
+
+    distinct = key_stats["distinct_keys"].tolist()
+    fan_out = key_stats["max_rows_per_key"].tolist()
+    if join_type == "inner":
+        return sorted(order, key=lambda i: (distinct[i], fan_out[i]))
+    return [0] + sorted(order[1:], key=lambda i: (fan_out[i], distinct[i]))
+
+
+def merge_file_plans(plans, merge_strategy, join_keys=None, join_type="inner", key_stats=None, pre_aggregate=False):
+    """
+    Stacks or joins the per-file lazy plans and applies the post-merge clean-up
+
+    Args:
+        plans (list): Lazy plans returned by build_file_plan
+        merge_strategy (string): "Vertical Stack" or "Horizontal Join"
+        join_keys (list): Columns to join on for horizontal joins
+        join_type (string): One of inner, left, right, outer
+        key_stats (DataFrame): Output of join_key_stats, used to order horizontal joins
+        pre_aggregate (bool): Collapse files with duplicate join keys before joining
+
+    Returns
+        lf (LazyFrame): Single lazy plan for the merged dataset
+    """
+    if merge_strategy in ["vertical", "Vertical Stack"]:
+        lf = pl.concat(plans, how="diagonal_relaxed")
+
+    elif merge_strategy in ["horizontal", "Horizontal Join"]:
+        how = "full" if join_type == "outer" else join_type
+        if pre_aggregate:
+            plans = [
+                aggregate_duplicate_keys(plan, join_keys)
+                if key_stats is None or key_stats["duplicated_keys"].iloc[i] > 0 else plan
+                for i, plan in enumerate(plans)
+            ]
+
+        order = plan_join_order(plans, join_keys, join_type, key_stats)
+        lf = plans[order[0]]
+        for i in order[1:]:
+            lf = lf.join(plans[i], on=join_keys, how=how, coalesce=True)
+
+        # Restore the column order the files were uploaded in
+        if order != sorted(order):
+            columns = []
+            for plan in plans:
+                columns += [col for col in plan.collect_schema().names() if col not in columns]
+            lf = lf.select(columns)
+    else:
+        raise ValueError("Invalid merge strategy. Choose 'vertical' or 'horizontal'.")
+
+    # Remove rows with nulls in identifier columns
+    if join_keys:
+        lf = lf.filter(pl.all_horizontal([pl.col(col).is_not_null() for col in join_keys]))
+
+    # Store all datetimes as pl.Date
+    schema = lf.collect_schema()
+    lf = lf.with_columns([
+        pl.col(col).cast(pl.Date)
+        for col, dtype in schema.items()
+        if isinstance(dtype, pl.Datetime)
+    ])
+    return lf
+
+
+def parse_date_like_columns(df):
+    """
+    Best-effort parsing of remaining text columns whose name contains 'date'
+
+    Args:
+        df (DataFrame): Collected polars dataframe
+
+    Returns
+        df (DataFrame): Dataframe with date-like text columns parsed to pl.Date
+    """
+    for col, dtype in zip(df.columns, df.dtypes):
+        if dtype == pl.Utf8 and "date" in col.lower():
+            try:
+                df = df.with_columns(pl.col(col).str.to_date(strict=False))
+            except Exception:
+                pass
+    return df
+
+
+# ------------------------------------------------------------------------------
+
+# Polars granularity engine: apportioning, period truncation and every KPI table
+# aggregation are expressed on a LazyFrame and run as a single group_by. The same
+# plan is collected in memory by modify_granularity and by the streaming engine
+# in stream_granularity.
+
+GRANULARITY_ORDER = ["Daily", "Weekly", "Monthly", "Quarterly", "Yearly"]
+
+# Target granularity -> (name of the new date column, polars truncation interval)
+GRANULARITY_PERIODS = {
+    "Weekly": ("week_date", "1w"),
+    "Monthly": ("month_date", "1mo"),
+    "Quarterly": ("quarter_date", "1q"),
+    "Yearly": ("year_date", "1y"),
+}
+
+def last_week_apportion_lazy(lf, date_col_name, kpi_col_list, work_days):
+    """""
+    Lazy (polars) equivalent of last_week_apportion, usable by the streaming engine
+
+    Args:
+        lf (LazyFrame): Lazy frame containing geo-week and KPI information
+        date_col_name (string): Column in lf which corresponds to date
+        kpi_col_list (list): List of KPI columns to be apportioned
+        work_days (scalar): Number of working days in the week
+
+    Returns
+        lf (LazyFrame): Lazy frame with KPI columns apportioned
+    """
+    date = pl.col(date_col_name).cast(pl.Date)
+
+    last_working_date = date.dt.month_end()
+    if work_days == 5:
+        # polars weekday: Monday=1 ... Sunday=7
+        weekend_days = pl.max_horizontal(last_working_date.dt.weekday() - 5, pl.lit(0))
+        last_working_date = last_working_date - pl.duration(days=weekend_days)
+
+    day_diff = (last_working_date - date).dt.total_days() + 1
+    split_ratio = (
+        pl.when(day_diff < work_days)
+        .then((work_days - day_diff) / work_days)
+        .otherwise(0.0)
+    )
+
+    lf = lf.with_columns(split_ratio.alias("__split_ratio"))
+    adjusted = {kpi: pl.col(kpi).cast(pl.Float64) * pl.col("__split_ratio") for kpi in kpi_col_list}
+
+    current_rows = lf.with_columns([
+        (pl.col(kpi).cast(pl.Float64) - adjusted[kpi]).alias(kpi) for kpi in kpi_col_list
+    ])
+    new_rows = lf.filter(pl.any_horizontal([adjusted[kpi] > 0 for kpi in kpi_col_list])).with_columns(
+        [adjusted[kpi].alias(kpi) for kpi in kpi_col_list]
+        + [pl.col(date_col_name).dt.month_start().dt.offset_by("1mo")]
+    )
+
+    return pl.concat([current_rows, new_rows]).drop("__split_ratio")
+
+
+def granularity_agg_exprs(numerical_config_dict, categorical_config_dict):
+    """
+    Polars aggregation expressions matching the KPI table operations
+
+    Args:
+        numerical_config_dict (dict): Numerical column to operation
+        categorical_config_dict (dict): Categorical column to operation
+
+    Returns
+        agg_exprs (list): Aggregation expressions, one per configured column
+    """
+    agg_exprs = []
+
+    for col, op in numerical_config_dict.items():
+        if op == "sum":
+            agg_exprs.append(pl.col(col).sum())
+        elif op == "average":
+            agg_exprs.append(pl.col(col).mean())
+        elif op == "min":
+            agg_exprs.append(pl.col(col).min())
+        elif op == "max":
+            agg_exprs.append(pl.col(col).max())
+        elif op == "product":
+            # Product of non-null values as exp(sum(log|x|)) with the sign from the count of negatives
+            magnitude = pl.col(col).abs().log().sum().exp()
+            sign = pl.when((pl.col(col) < 0).sum() % 2 == 1).then(-1.0).otherwise(1.0)
+            agg_exprs.append((sign * magnitude).alias(col))
+
+    for col, op in categorical_config_dict.items():
+        if op == "count":
+            agg_exprs.append(pl.col(col).count())
+        elif op == "distinct count":
+            agg_exprs.append(pl.col(col).drop_nulls().n_unique())
+
+    return agg_exprs
+
+
+def modify_granularity_lazy(
+    lf,
+    geo_column,
+    date_column,
+    granularity_level_df,
+    granularity_level_user_input,
+    work_days,
+    numerical_config_dict,
+    categorical_config_dict
+):
+    """
+    Rolls a geo x date LazyFrame up to a coarser time grain in a single group_by
+
+    Args:
+        lf (LazyFrame): Lazy frame with geo, date and KPI columns
+        geo_column (string): Grouping column
+        date_column (string): Date column
+        granularity_level_df (string): Granularity of the data (Daily, Weekly, Monthly, Quarterly)
+        granularity_level_user_input (string): Target granularity (Weekly, Monthly, Quarterly, Yearly)
+        work_days (scalar): Number of working days in the week, used when apportioning weeks
+        numerical_config_dict (dict): Numerical column to operation
+        categorical_config_dict (dict): Categorical column to operation
+
+    Returns
+        (LazyFrame, string): Aggregated lazy frame and the name of its date column
+    """
+    # No transformation needed
+    if granularity_level_df == granularity_level_user_input:
+        selected_cols = [geo_column, date_column] + list(numerical_config_dict.keys()) + list(categorical_config_dict.keys())
+        return lf.select(selected_cols), date_column
+
+    if (
+        granularity_level_df not in GRANULARITY_ORDER
+        or granularity_level_user_input not in GRANULARITY_PERIODS
+        or GRANULARITY_ORDER.index(granularity_level_df) > GRANULARITY_ORDER.index(granularity_level_user_input)
+    ):
+        raise ValueError("Unsupported granularity transformation")
+
+    lf = lf.with_columns(pl.col(date_column).cast(pl.Date))
+    agg_exprs = granularity_agg_exprs(numerical_config_dict, categorical_config_dict)
+    new_date_col, every = GRANULARITY_PERIODS[granularity_level_user_input]
+
+    # Weeks straddle month (and so quarter and year) boundaries and must be apportioned first
+    if granularity_level_df == "Weekly":
+        lf = last_week_apportion_lazy(lf, date_column, list(numerical_config_dict.keys()), work_days)
+
+    grouped = (
+        lf.with_columns(pl.col(date_column).dt.truncate(every).alias(new_date_col))
+        .group_by([geo_column, new_date_col])
+        .agg(agg_exprs)
+    )
+    return grouped, new_date_col
+
+
+def modify_granularity(
+    df,
+    geo_column,
+    date_column,
+    granularity_level_df,
+    granularity_level_user_input,
+    work_days,
+    numerical_config_dict,
+    categorical_config_dict
+):
+    """
+    In-memory granularity change of a polars DataFrame (see modify_granularity_lazy)
+
+    Returns
+        (DataFrame, string): Aggregated dataframe sorted by geo and date, and its date column
+    """
+    grouped, new_date_col = modify_granularity_lazy(
+        df.lazy(),
+        geo_column,
+        date_column,
+        granularity_level_df,
+        granularity_level_user_input,
+        work_days,
+        numerical_config_dict,
+        categorical_config_dict
+    )
+    return grouped.collect().sort([geo_column, new_date_col]), new_date_col
+
+
+def streaming_chunk_size(schema, memory_budget_mb):
+    """
+    Number of rows each polars thread takes per batch so that the batches fit a memory budget
+
+    The budget only sizes the batches from an estimate of the row width; polars does not
+    enforce it, and the aggregation state grows with the number of geo x period groups.
+
+    Args:
+        schema (Schema): Schema of the scanned file(s)
+        memory_budget_mb (scalar): Memory budget for the streaming run
+
+    Returns
+        chunk_size (int): Streaming chunk size in rows
+    """
+    row_bytes = 0
+    for dtype in schema.values():
+        if dtype in [pl.Utf8, pl.Categorical]:
+            row_bytes += 32
+        else:
+            row_bytes += 8
+
+    # Reserve half the budget for the aggregation state and intermediate copies
+    budget_bytes = memory_budget_mb * 1024 * 1024 / 2
+    chunk_size = int(budget_bytes / (max(row_bytes, 1) * pl.thread_pool_size()))
+    return int(min(max(chunk_size, 1_000), 1_000_000))
+
+
+def stream_granularity(
+    source,
+    geo_column,
+    date_column,
+    date_format,
+    start_date,
+    end_date,
+    category_filters,
+    granularity_level_df,
+    granularity_level_user_input,
+    work_days,
+    numerical_config_dict,
+    categorical_config_dict,
+    memory_budget_mb
+):
+    """
+    Filters, standardizes dates and changes granularity of CSV(s) larger than memory
+
+    Args:
+        source (string): Path or glob of the CSV file(s) on the server
+        geo_column (string): Grouping column
+        date_column (string): Date column
+        date_format (string): strptime format of the date column
+        start_date, end_date (date): Date range to retain (inclusive)
+        category_filters (dict): Categorical column to the list of values to retain
+        granularity_level_df (string): Granularity of the source data
+        granularity_level_user_input (string): Target granularity
+        work_days (scalar): Number of working days in the week
+        numerical_config_dict (dict): Numerical column to operation
+        categorical_config_dict (dict): Categorical column to operation
+        memory_budget_mb (scalar): Memory budget the streaming chunk size is derived from
+            (see streaming_chunk_size; a sizing hint, not an enforced limit)
+
+    Returns
+        (DataFrame, string): Aggregated geo x period table and its date column
+    """
+    lf = pl.scan_csv(source, low_memory=True)
+    schema = lf.collect_schema()
+
+    if schema[date_column] == pl.Utf8:
+        lf = lf.with_columns(date_parse_expr(pl.col(date_column), date_format))
+    else:
+        lf = lf.with_columns(pl.col(date_column).cast(pl.Date))
+
+    conditions = [pl.col(date_column).is_not_null()]
+    if start_date is not None:
+        conditions.append(pl.col(date_column) >= start_date)
+    if end_date is not None:
+        conditions.append(pl.col(date_column) <= end_date)
+    for col, values in category_filters.items():
+        if values:
+            conditions.append(pl.col(col).cast(pl.Utf8).is_in(values))
+    lf = lf.filter(pl.all_horizontal(conditions))
+
+    grouped, new_date_col = modify_granularity_lazy(
+        lf,
+        geo_column,
+        date_column,
+        granularity_level_df,
+        granularity_level_user_input,
+        work_days,
+        numerical_config_dict,
+        categorical_config_dict
+    )
+
+    with pl.Config():
+        pl.Config.set_streaming_chunk_size(streaming_chunk_size(schema, memory_budget_mb))
+        df_grouped = grouped.collect(engine="streaming")
+
+    return df_grouped.sort([geo_column, new_date_col]), new_date_col
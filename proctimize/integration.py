@@ -0,0 +1,98 @@
+import polars as pl
+
+# Streamlit-free integration engines shared by the Create Integrated Analytics page
+# and the headless pipeline (proctimize.pipeline).
+# Every channel file is left-joined onto a geo x date base (HCP x date or DMA x date)
+# so channels with sparse activity still get a row (filled with 0) for every period.
+
+HCP_KEYS = ["HCP_ID", "Date", "ZIP"]
+DTC_KEYS = ["DMA_CODE", "Date"]
+
+
+def parse_date_column(df, col="Date", date_format="%Y-%m-%d"):
+    """Casts a text (or datetime) date column to pl.Date; pl.Date columns are returned unchanged"""
+    dtype = df.schema[col]
+    if dtype == pl.Utf8:
+        return df.with_columns(pl.col(col).str.strptime(pl.Date, date_format, strict=False))
+    if isinstance(dtype, pl.Datetime):
+        return df.with_columns(pl.col(col).cast(pl.Date))
+    return df
+
+
+def date_spine(min_date, max_date, granularity):
+    """
+    Periods between two dates at the chosen granularity
+
+    Args:
+        min_date (date): First date in the data
+        max_date (date): Last date in the data
+        granularity (string): "Weekly" (every 7 days from min_date) or "Monthly" (first of each month)
+
+    Returns
+        dates_df (DataFrame): Single "Date" column of pl.Date values
+    """
+    granularity = granularity.lower()
+    if granularity == "weekly":
+        dates = pl.date_range(min_date, max_date, "1w", eager=True)
+    elif granularity == "monthly":
+        dates = pl.date_range(min_date.replace(day=1), max_date, "1mo", eager=True)
+    else:
+        dates = pl.Series([], dtype=pl.Date)
+    return pl.DataFrame({"Date": dates})
+
+
+def geo_date_base(geo_frames, date_frames, granularity):
+    """
+    Cartesian product of every distinct geo key with every period in the data
+
+    Args:
+        geo_frames (list): DataFrames of standardized geo key columns (e.g. HCP_ID and ZIP)
+        date_frames (list): DataFrames with a standardized pl.Date "Date" column
+        granularity (string): "Weekly" or "Monthly"
+
+    Returns
+        base_df (DataFrame): One row per geo key and period
+    """
+    unique_geos = pl.concat([df.drop_nulls() for df in geo_frames]).unique()
+    all_dates = pl.concat([df.select("Date").drop_nulls() for df in date_frames])
+    min_date = all_dates.select(pl.col("Date").min())[0, 0]
+    max_date = all_dates.select(pl.col("Date").max())[0, 0]
+    return unique_geos.join(date_spine(min_date, max_date, granularity), how="cross")
+
+
+def join_to_base(base_df, frames, keys):
+    """
+    Left-joins channel frames onto the geo x date base and fills missing activity with 0
+
+    Args:
+        base_df (DataFrame): Output of geo_date_base
+        frames (list): Channel DataFrames with standardized key columns
+        keys (list): Join keys (HCP_KEYS or DTC_KEYS)
+
+    Returns
+        final_df (DataFrame): Base with every channel's KPI columns
+    """
+    final_df = base_df
+    for df in frames:
+        final_df = final_df.join(df, on=keys, how="left")
+    return final_df.fill_null(0)
+
+
+def attach_dtc(hcp_df, dtc_df, zip_dma_df, zip_col, dma_col):
+    """
+    Maps HCP ZIPs to DMAs and joins the DTC data on DMA and date
+
+    Args:
+        hcp_df (DataFrame): Joined HCP dataset (HCP_KEYS)
+        dtc_df (DataFrame): Joined DTC dataset (DTC_KEYS)
+        zip_dma_df (DataFrame): ZIP to DMA mapping
+        zip_col (string): ZIP column of the mapping
+        dma_col (string): DMA code column of the mapping
+
+    Returns
+        final_df (DataFrame): HCP x date dataset with its DMA_CODE and DTC KPI columns
+    """
+    zip_dma_df = zip_dma_df.select([zip_col, dma_col])
+    hcp_dma_df = hcp_df.join(zip_dma_df, left_on="ZIP", right_on=zip_col, how="left")
+    final_df = hcp_dma_df.join(dtc_df, left_on=[dma_col, "Date"], right_on=["DMA_CODE", "Date"], how="left")
+    return final_df.rename({dma_col: "DMA_CODE"})
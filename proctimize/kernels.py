@@ -0,0 +1,199 @@
+import os
+import threading
+
+import numpy as np
+
+# Recursive transformation and solver kernels with an optional compiled backend.
+# Infinite-horizon adstock (y[t] = x[t] + decay * y[t - 1]) is a recurrence along the
+# period axis, so it does not reduce to a handful of shifted array ops like the truncated
+# kernels in proctimize.transformation. When Numba is installed the recurrence is compiled
+# and geos are spread over threads; otherwise a NumPy loop over periods (vectorized across
+# geos) is used. Both backends perform the same floating point operations in the same
+# order, so they return identical values. The coordinate-descent solver behind the
+# regularized regression paths (proctimize.regularization) is a sequential loop over
+# coefficients for the same reason and uses the same backends.
+#
+# PROCTIMIZE_KERNEL_BACKEND selects "numba", "numpy" or "auto" (Numba when available).
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+if numba is not None and "NUMBA_THREADING_LAYER" not in os.environ:
+    # Streamlit runs pages on worker threads; TBB started from a non-main thread can hang
+    # the process on exit, so prefer OpenMP and the built-in workqueue
+    numba.config.THREADING_LAYER_PRIORITY = ["omp", "workqueue", "tbb"]
+
+KERNEL_BACKEND = os.environ.get("PROCTIMIZE_KERNEL_BACKEND", "auto").lower()
+if KERNEL_BACKEND == "auto":
+    KERNEL_BACKEND = "numba" if numba is not None else "numpy"
+elif KERNEL_BACKEND == "numba" and numba is None:
+    KERNEL_BACKEND = "numpy"
+
+_warm = threading.Event()
+_warm_lock = threading.Lock()
+# The workqueue layer is not safe for concurrent launches (several sessions); each launch already uses every core
+_launch_lock = threading.Lock()
+
+
+def _recursive_adstock_numpy(matrix, decay):
+    adstocked = np.empty_like(matrix)
+    carry = np.zeros(matrix.shape[0], dtype=matrix.dtype)
+    for t in range(matrix.shape[1]):
+        carry = matrix[:, t] + decay * carry
+        adstocked[:, t] = carry
+    return adstocked
+
+
+if numba is not None:
+    @numba.njit(parallel=True, nogil=True, cache=True)
+    def _recursive_adstock_numba(matrix, decay):
+        adstocked = np.empty_like(matrix)
+        n_geos, n_periods = matrix.shape
+        for g in numba.prange(n_geos):
+            carry = 0.0
+            for t in range(n_periods):
+                carry = matrix[g, t] + decay * carry
+                adstocked[g, t] = carry
+        return adstocked
+else:
+    _recursive_adstock_numba = None
+
+
+def recursive_adstock(matrix, decay, backend=None):
+    """
+    Infinite-horizon geometric Adstock along the last axis: y[t] = x[t] + decay * y[t - 1]
+
+    Args:
+        matrix (array): Activity, one row per geo (any leading shape) and periods on the last axis
+        decay (scalar): Retention per period
+        backend (string): "numba" or "numpy", defaults to KERNEL_BACKEND
+
+    Returns
+        adstocked (array): float64 array of the same shape
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    shape = matrix.shape
+    rows = np.ascontiguousarray(matrix.reshape(-1, shape[-1]) if matrix.ndim != 1 else matrix[None, :])
+
+    if (backend or KERNEL_BACKEND) == "numba" and _recursive_adstock_numba is not None:
+        with _launch_lock:
+            adstocked = _recursive_adstock_numba(rows, float(decay))
+    else:
+        adstocked = _recursive_adstock_numpy(rows, float(decay))
+    return adstocked.reshape(shape)
+
+
+def _elastic_net_path_numpy(gram, xy, lambdas, l1_ratio, tol, max_iter):
+    k = len(xy)
+    path = np.zeros((len(lambdas), k))
+    beta = np.zeros(k)
+    gradient = xy.copy()  # xy - gram @ beta
+    diagonal = np.diag(gram).tolist()
+    for i, lam in enumerate(lambdas.tolist()):
+        l1, l2 = lam * l1_ratio, lam * (1 - l1_ratio)
+        for _ in range(max_iter):
+            largest_step, largest_beta = 0.0, 0.0
+            for j in range(k):
+                denominator = diagonal[j] + l2
+                if denominator <= 0:
+                    continue
+                rho = gradient[j] + diagonal[j] * beta[j]
+                updated = (rho - l1 if rho > l1 else (rho + l1 if rho < -l1 else 0.0)) / denominator
+                step = updated - beta[j]
+                if step != 0.0:
+                    gradient -= gram[:, j] * step
+                    beta[j] = updated
+                    largest_step = max(largest_step, abs(step))
+                largest_beta = max(largest_beta, abs(updated))
+            if largest_step <= tol * max(largest_beta, 1e-12):
+                break
+        path[i] = beta
+    return path
+
+
+if numba is not None:
+    @numba.njit(nogil=True, cache=True)
+    def _elastic_net_path_numba(gram, xy, lambdas, l1_ratio, tol, max_iter):
+        k = len(xy)
+        path = np.zeros((len(lambdas), k))
+        beta = np.zeros(k)
+        gradient = xy.copy()
+        for i in range(len(lambdas)):
+            l1, l2 = lambdas[i] * l1_ratio, lambdas[i] * (1 - l1_ratio)
+            for _ in range(max_iter):
+                largest_step, largest_beta = 0.0, 0.0
+                for j in range(k):
+                    denominator = gram[j, j] + l2
+                    if denominator <= 0:
+                        continue
+                    rho = gradient[j] + gram[j, j] * beta[j]
+                    updated = (rho - l1 if rho > l1 else (rho + l1 if rho < -l1 else 0.0)) / denominator
+                    step = updated - beta[j]
+                    if step != 0.0:
+                        for m in range(k):
+                            gradient[m] -= gram[m, j] * step
+                        beta[j] = updated
+                        largest_step = max(largest_step, abs(step))
+                    largest_beta = max(largest_beta, abs(updated))
+                if largest_step <= tol * max(largest_beta, 1e-12):
+                    break
+            path[i] = beta
+        return path
+else:
+    _elastic_net_path_numba = None
+
+
+def elastic_net_path(gram, xy, lambdas, l1_ratio, tol=1e-7, max_iter=10000, backend=None):
+    """
+    Coordinate-descent elastic-net path on a Gram matrix, warm-started along the penalties
+
+    Minimizes b'Gb / 2 - b'xy + lambda * (l1_ratio * |b|_1 + (1 - l1_ratio) / 2 * |b|^2) for
+    each penalty in turn, starting from the previous solution.
+
+    Args:
+        gram (array): k x k Gram matrix (X'X / n of standardized regressors)
+        xy (array): X'y / n
+        lambdas (array): Penalties, in the order they are solved (largest first)
+        l1_ratio (scalar): Share of the L1 penalty
+        tol (scalar): Stop when no coefficient moves by more than tol times the largest
+        max_iter (int): Maximum sweeps per penalty
+        backend (string): "numba" or "numpy", defaults to KERNEL_BACKEND
+
+    Returns
+        path (array): Coefficients, one row per penalty
+    """
+    gram = np.ascontiguousarray(gram, dtype=np.float64)
+    xy = np.ascontiguousarray(xy, dtype=np.float64)
+    lambdas = np.ascontiguousarray(lambdas, dtype=np.float64)
+    if (backend or KERNEL_BACKEND) == "numba" and _elastic_net_path_numba is not None:
+        return _elastic_net_path_numba(gram, xy, lambdas, float(l1_ratio), float(tol), int(max_iter))
+    return _elastic_net_path_numpy(gram, xy, lambdas, float(l1_ratio), float(tol), int(max_iter))
+
+
+def warm_kernels(background=False):
+    """
+    Compiles the Numba kernels once per process so the first transformation does not pay for it
+
+    Args:
+        background (bool): Compile on a daemon thread and return immediately
+
+    Returns
+        backend (string): Backend in use ("numba" or "numpy")
+    """
+    if KERNEL_BACKEND != "numba" or _warm.is_set():
+        return KERNEL_BACKEND
+
+    def warm():
+        with _warm_lock:
+            if not _warm.is_set():
+                recursive_adstock(np.zeros((2, 3)), 0.5, backend="numba")
+                elastic_net_path(np.eye(2), np.zeros(2), np.ones(1), 0.5, backend="numba")
+                _warm.set()
+
+    if background:
+        threading.Thread(target=warm, daemon=True).start()
+    else:
+        warm()
+    return KERNEL_BACKEND
@@ -0,0 +1,183 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from proctimize.modelling import MAX_MODEL_WORKERS, coefficient_table_from_sums, raw_columns
+from proctimize.pools import process_pool
+from proctimize.regression import PeriodCrossProducts, fit_cross_products
+
+# Batch model runner for the Modelling page.
+# Every candidate (channel subset, modelling window) is an OLS fit of the same dependent
+# variable on a subset of the transformed columns over a contiguous range of periods. The
+# data is reduced once to per-period sums and cross-products of all candidate columns
+# (centered on their overall means and accumulated as prefix sums), so the cross-products
+# of any window are a difference of two prefixes and those of any subset a sub-block of
+# them; each fit is then a small solve that never touches the rows again. Candidates are
+# spread over a process pool and ranked by coefficient signs, ROI plausibility, adjusted
+# R-squared and AIC.
+
+RANKING_COLUMNS = [
+    "Rank", "Channels", "Start Date", "End Date", "No. Observations", "R-squared", "Adj. R-squared", "AIC",
+    "Signs Valid", "ROI Plausible", "Min ROI", "Max ROI", "Long Term Factor",
+]
+
+DEFAULT_ROI_RANGE = (0.0, 50.0)
+CANDIDATES_PER_TASK = 32
+
+# Worker state, set once per process by _init_worker
+_worker = {}
+
+
+def candidate_models(required, optional, windows, min_optional=0, max_optional=None):
+    """
+    Every (channels, start date, end date) combination to fit
+
+    Args:
+        required (list): Channels in every candidate
+        optional (list): Channels added in every combination of min_optional to max_optional of them
+        windows (list): (start date, end date) modelling windows
+        min_optional, max_optional (int): Bounds on the number of optional channels (max defaults to all)
+
+    Returns
+        candidates (list): (tuple of channels, start date, end date)
+    """
+    optional = [channel for channel in optional if channel not in required]
+    max_optional = len(optional) if max_optional is None else min(max_optional, len(optional))
+    subsets = [
+        tuple(required) + subset
+        for size in range(max(min_optional, 0), max_optional + 1)
+        for subset in itertools.combinations(optional, size)
+    ]
+    return [(subset, start, end) for start, end in windows for subset in subsets if subset]
+
+
+def _init_worker(modelled, raw, dependent_variable, dependent_variable_user_input, roi_range):
+    _worker.update({
+        "modelled": modelled, "raw": raw, "dependent_variable": dependent_variable,
+        "dependent_variable_user_input": dependent_variable_user_input, "roi_range": roi_range,
+    })
+
+
+def _evaluate(candidate):
+    """Fits one candidate and returns its ranking row (None if its window has too few or missing rows)"""
+    channels, start, end = candidate
+    modelled, raw = _worker["modelled"], _worker["raw"]
+    dependent_variable, y = _worker["dependent_variable"], _worker["dependent_variable_user_input"]
+    channels = list(channels)
+
+    lo, hi = modelled.bounds(start, end)
+    try:
+        cross_products = modelled.cross_products(channels + [y], lo, hi)
+    except ValueError:
+        return None
+    if cross_products.n <= len(channels) + 1:
+        return None
+    model = fit_cross_products(cross_products, channels, yname=y)
+
+    n, modelled_sums = modelled.totals(channels + [y], lo, hi)
+    raw_lo, raw_hi = raw.bounds(start, end)
+    raw_n, raw_sums = raw.totals([col for col in raw_columns(model.params.index) + [dependent_variable] if col in raw.columns],
+                                 raw_lo, raw_hi)
+
+    # Prior window of the same length, as in modelling.modeling_windows
+    prior_end = pd.Timestamp(start) - pd.Timedelta(days=1)
+    prior_start = prior_end - pd.Timedelta(days=(pd.Timestamp(end) - pd.Timestamp(start)).days)
+    _, prior_sums = raw.totals([dependent_variable], *raw.bounds(prior_start, prior_end))
+
+    coefficients, long_term_factor = coefficient_table_from_sums(
+        model.params,
+        {**modelled_sums, "const": n},
+        {**raw_sums, "const": raw_n},
+        modelled_sums[y],
+        raw_sums[dependent_variable],
+        prior_sums[dependent_variable]
+    )
+
+    # Media effects must be positive; the intercept and carryover are unconstrained
+    media = coefficients[~coefficients["Note"].isin(["Intercept", "Carryover"])]
+    spend = coefficients[coefficients["Spend"] != 0]
+    roi_min, roi_max = _worker["roi_range"]
+
+    return {
+        "Channels": ", ".join(channels),
+        "Start Date": pd.Timestamp(start).date(),
+        "End Date": pd.Timestamp(end).date(),
+        "No. Observations": n,
+        "R-squared": model.rsquared,
+        "Adj. R-squared": model.rsquared_adj,
+        "AIC": model.aic,
+        "Signs Valid": bool((media["Coefficient"] > 0).all()),
+        "ROI Plausible": bool(spend["ROI"].between(roi_min, roi_max).all()),
+        "Min ROI": spend["ROI"].min() if len(spend) else np.nan,
+        "Max ROI": spend["ROI"].max() if len(spend) else np.nan,
+        "Long Term Factor": long_term_factor,
+    }
+
+
+def _evaluate_chunk(candidates):
+    return [_evaluate(candidate) for candidate in candidates]
+
+
+def search_models(
+    transformed_df,
+    granular_df,
+    date_column,
+    dependent_variable,
+    dependent_variable_user_input,
+    candidates,
+    roi_range=DEFAULT_ROI_RANGE,
+    workers=None
+):
+    """
+    Fits every candidate model and ranks them
+
+    Args:
+        transformed_df (dataframe): Transformed data over the full history (datetime date column)
+        granular_df (dataframe): Raw granular data over the full history (datetime date column)
+        date_column (string): Date column
+        dependent_variable (string): Raw dependent variable
+        dependent_variable_user_input (string): Dependent variable the models are fitted on
+        candidates (list): Output of candidate_models
+        roi_range (tuple): (min, max) ROI a channel with spend may have in a plausible model
+        workers (int): Worker processes, defaults to MAX_MODEL_WORKERS; 1 runs in this process
+
+    Returns
+        results (dataframe): RANKING_COLUMNS, best model first. Models with valid signs and
+            plausible ROIs rank above the rest, then by adjusted R-squared and AIC
+    """
+    channels = sorted({channel for subset, _, _ in candidates for channel in subset})
+    missing = [col for col in channels + [dependent_variable_user_input] if col not in transformed_df.columns]
+    if missing:
+        raise ValueError(f"Columns {missing} are not in the transformed data")
+    if dependent_variable not in granular_df.columns:
+        raise ValueError(f"{dependent_variable} is not in the raw data")
+
+    modelled = PeriodCrossProducts(transformed_df, date_column, list(dict.fromkeys(channels + [dependent_variable_user_input])))
+    raw_cols = [col for col in dict.fromkeys(raw_columns(channels) + [dependent_variable])
+                if col in granular_df.columns and pd.api.types.is_numeric_dtype(granular_df[col])]
+    raw = PeriodCrossProducts(granular_df, date_column, raw_cols, cross=False)
+    setup_args = (modelled, raw, dependent_variable, dependent_variable_user_input, tuple(roi_range))
+
+    tasks = [candidates[i:i + CANDIDATES_PER_TASK] for i in range(0, len(candidates), CANDIDATES_PER_TASK)]
+    workers = min(workers or MAX_MODEL_WORKERS, len(tasks)) or 1
+    rows = []
+    if workers == 1:
+        _init_worker(*setup_args)
+        for task in tasks:
+            rows.extend(_evaluate_chunk(task))
+        _worker.clear()
+    else:
+        with process_pool(workers, initializer=_init_worker, initargs=setup_args) as pool:
+            for task_rows in pool.map(_evaluate_chunk, tasks):
+                rows.extend(task_rows)
+
+    results = pd.DataFrame([row for row in rows if row is not None], columns=RANKING_COLUMNS[1:])
+    results = results.sort_values(
+        ["Signs Valid", "ROI Plausible", "Adj. R-squared", "AIC"],
+        ascending=[False, False, False, True],
+        na_position="last",
+        kind="stable"
+    ).reset_index(drop=True)
+    results.insert(0, "Rank", np.arange(1, len(results) + 1))
+    return results
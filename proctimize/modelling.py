@@ -0,0 +1,359 @@
+import os
+
+import pandas as pd
+import polars as pl
+
+from proctimize.pools import process_pool
+from proctimize.regression import CrossProducts, fit_cross_products, fit_fixed_effects, fit_least_squares
+
+# Streamlit-free modelling engines shared by the Modelling page and the
+# headless pipeline (proctimize.pipeline).
+
+LAGGED_COL = "Carryover"
+
+# Pooled OLS, or geo / geo and period fixed effects with geo-clustered standard errors
+FIXED_EFFECTS = ["None", "Geo", "Geo + Period"]
+
+# Streaming fits: Parquet files are split into row ranges accumulated in worker processes
+MAX_MODEL_WORKERS = int(os.environ.get("PROCTIMIZE_MODEL_WORKERS", os.cpu_count() or 1))
+PARTITION_ROWS = 1_000_000
+
+
+def default_modeling_range(transformed_df, date_column):
+    """
+    Default modelling window: the first year of data is excluded as adstock/lag burn-in
+
+    Args:
+        transformed_df (dataframe): Transformed data with a datetime date column
+        date_column (string): Date column
+
+    Returns
+        (date, date): First day of the second year and the last date in the data
+    """
+    max_date = transformed_df[date_column].max().date()
+    all_years = sorted(transformed_df[date_column].dt.year.unique())
+    if len(all_years) < 2:
+        raise ValueError("Not enough years of data to exclude the first year.")
+    adjusted_min_date = pd.to_datetime(f"{all_years[1]}-01-01").date()
+    return adjusted_min_date, max_date
+
+
+def modeling_windows(transformed_df, granular_df, date_column, start_date, end_date):
+    """
+    Slices the modelling window and the equally long window just before it
+
+    Args:
+        transformed_df (dataframe): Transformed data
+        granular_df (dataframe): Raw granular data
+        date_column (string): Date column (datetime in both dataframes)
+        start_date, end_date (date): Modelling window (inclusive)
+
+    Returns
+        (dataframe, dataframe, dataframe): Transformed and raw data in the window, and raw data in the prior window
+    """
+    modeling_duration_days = (end_date - start_date).days + 1
+    prior_end_date = start_date - pd.Timedelta(days=1)
+    prior_start_date = prior_end_date - pd.Timedelta(days=modeling_duration_days - 1)
+
+    transformed_df_date_filtered = transformed_df[(transformed_df[date_column] >= pd.to_datetime(start_date)) &
+                                                  (transformed_df[date_column] <= pd.to_datetime(end_date))]
+
+    granular_df_date_filtered = granular_df[(granular_df[date_column] >= pd.to_datetime(start_date)) &
+                                            (granular_df[date_column] <= pd.to_datetime(end_date))]
+
+    granular_df_prior_date_filtered = granular_df[(granular_df[date_column] >= pd.to_datetime(prior_start_date)) &
+                                                   (granular_df[date_column] <= pd.to_datetime(prior_end_date))]
+    return transformed_df_date_filtered, granular_df_date_filtered, granular_df_prior_date_filtered
+
+
+def fit_ols(
+    transformed_df_channel_filtered,
+    dependent_variable_user_input,
+    selected_channels,
+    fixed_effects="None",
+    geo_column=None,
+    date_column=None,
+    bounds=None
+):
+    """
+    Fits OLS of the dependent variable on the selected channels plus an intercept
+
+    Args:
+        transformed_df_channel_filtered (dataframe): Modelling data in the window
+        dependent_variable_user_input (string): Dependent variable
+        selected_channels (list): Regressor columns
+        fixed_effects (string): One of FIXED_EFFECTS; geo (and period) effects are absorbed by
+            demeaning and standard errors are clustered by geo
+        geo_column, date_column (string): Columns identifying the geo and period (for fixed effects)
+        bounds (dict): Variable to (lower, upper) coefficient bounds for a bounded least-squares
+            fit (see coefficient_bounds); result.active_bounds lists the variables held at a bound
+
+    Returns
+        result (OLSResult): Coefficients and fit statistics (the data is not retained; the
+            statsmodels-style summary is rendered on demand by result.summary())
+    """
+    if fixed_effects not in FIXED_EFFECTS:
+        raise ValueError(f"Unknown fixed effects {fixed_effects!r}; choose one of {FIXED_EFFECTS}")
+    y = transformed_df_channel_filtered[dependent_variable_user_input].to_numpy(dtype="float64")
+    X = transformed_df_channel_filtered[selected_channels].to_numpy(dtype="float64")
+    if fixed_effects == "None":
+        return fit_least_squares(y, X, selected_channels, yname=dependent_variable_user_input, bounds=bounds)
+
+    periods = transformed_df_channel_filtered[date_column].to_numpy() if fixed_effects == "Geo + Period" else None
+    return fit_fixed_effects(y, X, selected_channels, transformed_df_channel_filtered[geo_column].to_numpy(), periods,
+                             yname=dependent_variable_user_input, bounds=bounds)
+
+
+def coefficient_bounds(selected_channels, lower=0.0, upper=None):
+    """
+    Default coefficient bounds: every media channel between lower and upper; the intercept
+    (which fit_cross_products does not allow to be bounded) and the carryover term are left free
+
+    Returns
+        bounds (dict): Variable to (lower, upper), None meaning unbounded
+    """
+    return {channel: (lower, upper) for channel in selected_channels
+            if channel != 'const' and channel.replace('_transformed', '') != LAGGED_COL}
+
+
+def raw_columns(variables):
+    """Raw-data columns coefficient_table sums for the given model variables (activity and spend)"""
+    raw = [var.replace('_transformed', '') for var in variables if var != 'const']
+    return list(dict.fromkeys(raw + [var + ' Spend' for var in raw]))
+
+
+def coefficient_table(
+    params,
+    transformed_df_channel_filtered,
+    granular_df_date_filtered,
+    granular_df_prior_date_filtered,
+    dependent_variable,
+    dependent_variable_user_input
+):
+    """
+    Coefficients with activity, spend, impactable sales, ROI and long term ROI per variable
+
+    Args:
+        params (series): Fitted coefficients indexed by variable ('const' for the intercept)
+        transformed_df_channel_filtered (dataframe): Modelling data in the window
+        granular_df_date_filtered (dataframe): Raw data in the window
+        granular_df_prior_date_filtered (dataframe): Raw data in the prior window
+        dependent_variable (string): Raw dependent variable
+        dependent_variable_user_input (string): Dependent variable the model was fitted on
+
+    Returns
+        (dataframe, scalar): Coefficients table and the 3-year long term factor (None without a carryover term)
+    """
+    # Column totals (the intercept's activity is the number of rows)
+    modelled_sums = {var: transformed_df_channel_filtered[var].sum()
+                     for var in params.index if var in transformed_df_channel_filtered.columns}
+    modelled_sums['const'] = len(transformed_df_channel_filtered)
+    raw_sums = {col: granular_df_date_filtered[col].sum()
+                for col in raw_columns(params.index) if col in granular_df_date_filtered.columns}
+    raw_sums['const'] = len(granular_df_date_filtered)
+
+    return coefficient_table_from_sums(
+        params,
+        modelled_sums,
+        raw_sums,
+        transformed_df_channel_filtered[dependent_variable_user_input].sum(),
+        granular_df_date_filtered[dependent_variable].sum(),
+        granular_df_prior_date_filtered[dependent_variable].sum()
+    )
+
+
+def coefficient_table_from_sums(params, modelled_sums, raw_sums, sum_sales, sum_raw_sales, sum_raw_sales_prior):
+    """
+    coefficient_table from column totals, for fits whose data is never held in memory
+
+    Args:
+        params (series): Fitted coefficients indexed by variable ('const' for the intercept)
+        modelled_sums (dict): Total of each model variable in the window ('const': number of rows)
+        raw_sums (dict): Total of each raw_columns() column present in the raw data ('const': number of rows)
+        sum_sales (scalar): Total of the dependent variable the model was fitted on
+        sum_raw_sales (scalar): Total raw dependent variable in the window
+        sum_raw_sales_prior (scalar): Total raw dependent variable in the prior window
+
+    Returns
+        (dataframe, scalar): Coefficients table and the 3-year long term factor (None without a carryover term)
+    """
+    coefficients = pd.DataFrame({
+        'Variable': params.index,
+        'Coefficient': params.values
+    })
+
+    transformed_to_raw = { col: 'const' if col == 'const' else col.replace('_transformed', '')
+                          for col in coefficients['Variable']
+                          }
+
+    coefficients['Raw Variable'] = coefficients['Variable'].map(transformed_to_raw)
+
+    coefficients['Raw Activity'] = coefficients['Raw Variable'].apply(lambda var: raw_sums.get(var, 0))
+
+    coefficients['Modelled Activity'] = coefficients['Variable'].apply(lambda var: modelled_sums.get(var, 0))
+
+    no_spend_vars = ['const', LAGGED_COL]
+
+    coefficients['Spend'] = coefficients['Raw Variable'].apply(
+    lambda var: 0 if var in no_spend_vars else (
+        raw_sums[var]
+        if 'Spend' in var and var in raw_sums else raw_sums.get(var + ' Spend', 0)
+        )
+    )
+
+    coefficients['Impactable %'] = coefficients.apply(
+        lambda row: (row['Coefficient'] * row['Modelled Activity'] * 100) / sum_sales if sum_sales != 0 else 0,
+        axis=1
+    )
+
+    coefficients['Impactable (%)'] = coefficients['Impactable %'].map(lambda x: f"{x:.2f}%")
+    coefficients['Impactable Sales'] = coefficients['Impactable %'] * sum_raw_sales / 100  #this should be raw sales
+
+    coefficients['ROI'] = coefficients.apply(
+        lambda row: row['Impactable Sales'] / row['Spend'] if row['Spend'] != 0 else 0,
+        axis=1
+    )
+
+    coefficients['Note'] = coefficients['Raw Variable'].apply(
+        lambda var: 'Intercept' if var == 'const' else ('Carryover' if var == LAGGED_COL else '')
+    )
+
+    long_term_factor = None
+    carryover_percentage_series = coefficients[coefficients['Note'] == 'Carryover']['Impactable %'] / 100
+    if not carryover_percentage_series.empty:
+        carryover_percentage = carryover_percentage_series.iloc[0]
+        carryover_rate = (carryover_percentage * sum_raw_sales) / sum_raw_sales_prior
+        long_term_factor = three_year_factor(carryover_rate)
+        coefficients['Long Term ROI'] = long_term_factor * coefficients['ROI']
+    else:
+        coefficients['Long Term ROI'] = 0
+
+    coefficients = coefficients.drop(['Raw Variable'], axis=1)
+    return coefficients, long_term_factor
+
+
+def three_year_factor(carryover_rate):
+    """(3-year) long term factor of a carryover rate (scalar or array): sales retained over two further years"""
+    return (3 + 2 * carryover_rate + carryover_rate ** 2) / 3
+
+
+def _window_filter(schema, date_column, start_date, end_date):
+    """Polars predicate keeping rows dated within [start_date, end_date] (text dates are parsed)"""
+    if date_column is None or (start_date is None and end_date is None):
+        return pl.lit(True)
+    date = pl.col(date_column)
+    date = date.str.to_date(strict=False) if schema[date_column] == pl.Utf8 else date.cast(pl.Date)
+    predicate = pl.lit(True)
+    if start_date is not None:
+        predicate = predicate & (date >= pd.to_datetime(start_date).date())
+    if end_date is not None:
+        predicate = predicate & (date <= pd.to_datetime(end_date).date())
+    return predicate
+
+
+def _accumulate_partition(task):
+    """Cross-products of one row range of a Parquet file (runs in a worker process)"""
+    path, offset, length, dependent_variable, channels, date_column, start_date, end_date = task
+    lf = pl.scan_parquet(path).slice(offset, length)
+    chunk = lf.filter(_window_filter(lf.collect_schema(), date_column, start_date, end_date)).select(
+        channels + [dependent_variable]
+    ).collect()
+    return CrossProducts(len(channels)).update(
+        chunk.select(channels).to_numpy().astype("float64"),
+        chunk[dependent_variable].to_numpy().astype("float64")
+    )
+
+
+def fit_ols_parquet(
+    paths,
+    dependent_variable,
+    selected_channels,
+    date_column=None,
+    start_date=None,
+    end_date=None,
+    workers=None,
+    partition_rows=PARTITION_ROWS,
+    bounds=None
+):
+    """
+    Streaming equivalent of fit_ols over Parquet files that need not fit in memory
+
+    Each file is split into row ranges; every range is read, filtered to the modelling
+    window and reduced to its cross-products in a worker process, and the partial results
+    are merged before the (small) normal equations are solved. Coefficients and standard
+    errors match fit_ols on the same rows; the residual diagnostics of the summary (which
+    need the residuals themselves) are left out.
+
+    Args:
+        paths (list): Parquet files (a single path is accepted)
+        dependent_variable (string): Column the model is fitted on
+        selected_channels (list): Regressor columns
+        date_column (string): Date column used for the window
+        start_date, end_date (date): Modelling window (inclusive), either optional
+        workers (int): Worker processes, defaults to MAX_MODEL_WORKERS; 1 runs in this process
+        partition_rows (int): Rows per partition (bounds each worker's memory)
+        bounds (dict): Variable to (lower, upper) coefficient bounds, as in fit_ols
+
+    Returns
+        result (OLSResult): Coefficients and fit statistics
+    """
+    paths = [paths] if isinstance(paths, (str, os.PathLike)) else list(paths)
+    tasks = []
+    for path in paths:
+        n_rows = pl.scan_parquet(path).select(pl.len()).collect().item()
+        tasks.extend(
+            (path, offset, partition_rows, dependent_variable, list(selected_channels), date_column, start_date, end_date)
+            for offset in range(0, n_rows, partition_rows)
+        )
+
+    cross_products = CrossProducts(len(selected_channels))
+    workers = min(workers or MAX_MODEL_WORKERS, len(tasks)) or 1
+    if workers == 1:
+        for task in tasks:
+            cross_products.merge(_accumulate_partition(task))
+    else:
+        with process_pool(workers) as pool:
+            for partial in pool.map(_accumulate_partition, tasks):
+                cross_products.merge(partial)
+
+    return fit_cross_products(cross_products, selected_channels, yname=dependent_variable, bounds=bounds)
+
+
+def parquet_modeling_range(paths, date_column):
+    """default_modeling_range computed by a streaming scan of Parquet files"""
+    lf = pl.scan_parquet(paths)
+    date = pl.col(date_column).cast(pl.Date)
+    bounds = lf.select(date.max().alias("max"), date.dt.year().unique().sort().alias("years").implode()).collect(engine="streaming")
+    all_years = bounds["years"][0].to_list()
+    if len(all_years) < 2:
+        raise ValueError("Not enough years of data to exclude the first year.")
+    return pd.to_datetime(f"{all_years[1]}-01-01").date(), bounds["max"][0]
+
+
+def parquet_window_summary(paths, columns, date_column=None, start_date=None, end_date=None, distinct_columns=()):
+    """
+    Column totals, row count and distinct counts of Parquet data within a date window, by a streaming scan
+
+    Args:
+        paths (list): Parquet files (or a single path)
+        columns (list): Columns to total; those missing from the files are skipped
+        date_column (string): Date column used for the window
+        start_date, end_date (date): Window (inclusive), either optional
+        distinct_columns (list): Columns whose number of distinct values is counted
+
+    Returns
+        summary (dict): "sums" (column to total), "rows" and "distinct" (column to count)
+    """
+    lf = pl.scan_parquet(paths)
+    schema = lf.collect_schema()
+    present = [col for col in dict.fromkeys(columns) if col in schema]
+    totals = lf.filter(_window_filter(schema, date_column, start_date, end_date)).select(
+        [pl.col(col).cast(pl.Float64).sum().alias(f"sum:{col}") for col in present]
+        + [pl.col(col).n_unique().alias(f"distinct:{col}") for col in distinct_columns]
+        + [pl.len().alias("rows")]
+    ).collect(engine="streaming").row(0, named=True)
+    return {
+        "sums": {col: totals[f"sum:{col}"] for col in present},
+        "rows": int(totals["rows"]),
+        "distinct": {col: int(totals[f"distinct:{col}"]) for col in distinct_columns},
+    }
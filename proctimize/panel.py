@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from proctimize.transformation import apply_adstock, apply_saturation, lag_matrix, saturation_scale
+
+# Dense geo x period x channel panel.
+# The integrated dataset is a complete geo x date grid, so once it is laid out as a
+# (geo, period, channel) array every transformation step becomes an array op: lags are
+# slices along the period axis, adstock is a truncated convolution, saturation is
+# elementwise and date windows are period slices. Cells missing from the source frame are
+# padded (with zeros by default) and tracked in an observed mask, so totals and the scale of
+# the saturation functions only count observed cells. Label dictionaries map geos, periods
+# and channels to their positions, and the source row of every cell is kept so results
+# can be written back onto the original long frame without a join.
+
+
+class Panel:
+    """
+    Array-backed geo x period x channel panel
+
+    Args:
+        values (array): 3-D float array indexed (geo, period, channel)
+        geos (Index): Geo labels, in axis order (order of first appearance for from_frame)
+        periods (Index): Period labels, sorted, in axis order
+        channels (list): Channel labels, in axis order
+        geo_column (string): Name of the geo column in long frames
+        date_column (string): Name of the date column in long frames
+        observed (array): Boolean (geo, period) mask of cells present in the source frame
+        source_rows (tuple): (geo codes, period codes) of every source row, used by gather()
+    """
+
+    def __init__(self, values, geos, periods, channels, geo_column="geo", date_column="date", observed=None, source_rows=None):
+        self.values = values
+        self.geos = pd.Index(geos)
+        self.periods = pd.Index(periods)
+        self.channels = list(channels)
+        self.geo_column = geo_column
+        self.date_column = date_column
+        self.observed = np.ones(values.shape[:2], dtype=bool) if observed is None else observed
+        self.source_rows = source_rows
+
+        self.geo_index = {geo: i for i, geo in enumerate(self.geos)}
+        self.period_index = {period: i for i, period in enumerate(self.periods)}
+        self.channel_index = {channel: i for i, channel in enumerate(self.channels)}
+
+    @classmethod
+    def from_frame(cls, df, geo_column, date_column, channels=None, dtype=np.float64, fill_value=0.0):
+        """
+        Builds a panel from a long pandas or polars frame with one row per geo and period
+
+        Args:
+            df (dataframe | DataFrame): Long data
+            geo_column (string): Geo column
+            date_column (string): Date column
+            channels (list): Numeric columns to load, defaults to every numeric column
+            dtype (dtype): np.float64, or np.float32 to halve memory
+            fill_value (scalar): Value of (geo, period) cells missing from the frame
+
+        Returns
+            panel (Panel): Dense panel
+        """
+        if isinstance(df, (pl.DataFrame, pl.LazyFrame)):
+            df = df.lazy().collect() if isinstance(df, pl.LazyFrame) else df
+            numeric = [col for col, dtype_ in df.schema.items() if dtype_.is_numeric()]
+            column = lambda col: df[col].to_numpy()
+        else:
+            numeric = list(df.select_dtypes(include="number").columns)
+            column = lambda col: df[col].to_numpy()
+
+        if channels is None:
+            channels = [col for col in numeric if col not in [geo_column, date_column]]
+
+        geo_codes, geos = pd.factorize(column(geo_column))
+        period_codes, periods = pd.factorize(column(date_column), sort=True)
+        if (geo_codes < 0).any() or (period_codes < 0).any():
+            raise ValueError(f"Panel rows need a {geo_column} and a {date_column}")
+
+        n_geos, n_periods = len(geos), len(periods)
+        flat = geo_codes * n_periods + period_codes
+        if np.bincount(flat, minlength=n_geos * n_periods).max(initial=0) > 1:
+            raise ValueError(f"Panel needs one row per {geo_column} and {date_column}; found duplicates")
+
+        values = np.full((n_geos, n_periods, len(channels)), fill_value, dtype=dtype)
+        for c, channel in enumerate(channels):
+            values[geo_codes, period_codes, c] = np.asarray(column(channel), dtype=dtype)
+
+        observed = np.zeros((n_geos, n_periods), dtype=bool)
+        observed[geo_codes, period_codes] = True
+
+        return cls(values, geos, periods, channels, geo_column, date_column, observed, (geo_codes, period_codes))
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def matrix(self, channel):
+        """(geo x period) view of one channel"""
+        return self.values[:, :, self.channel_index[channel]]
+
+    def with_channels(self, matrices):
+        """
+        New panel with extra (or replaced) channels
+
+        Args:
+            matrices (dict): Channel name to (geo x period) array
+
+        Returns
+            panel (Panel): Panel sharing labels, mask and source rows with this one
+        """
+        channels = list(self.channels)
+        values = self.values
+        new = {}
+        for channel, matrix in matrices.items():
+            if channel in self.channel_index:
+                if values is self.values:
+                    values = values.copy()
+                values[:, :, self.channel_index[channel]] = matrix
+            else:
+                channels.append(channel)
+                new[channel] = matrix
+        if new:
+            values = np.concatenate(
+                [values, np.stack([np.asarray(m, dtype=values.dtype) for m in new.values()], axis=2)], axis=2
+            )
+        return Panel(values, self.geos, self.periods, channels, self.geo_column, self.date_column, self.observed, self.source_rows)
+
+    def select(self, channels):
+        """New panel restricted to the given channels (in that order)"""
+        index = [self.channel_index[channel] for channel in channels]
+        return Panel(self.values[:, :, index], self.geos, self.periods, channels,
+                     self.geo_column, self.date_column, self.observed, None)
+
+    def window(self, start=None, end=None):
+        """
+        New panel restricted to periods within [start, end] (either bound optional)
+
+        Returns
+            panel (Panel): View over the period slice (no copy of the values)
+        """
+        if isinstance(self.periods, pd.DatetimeIndex):
+            start = None if start is None else pd.Timestamp(start)
+            end = None if end is None else pd.Timestamp(end)
+        lo = 0 if start is None else self.periods.searchsorted(start, side="left")
+        hi = len(self.periods) if end is None else self.periods.searchsorted(end, side="right")
+        return Panel(self.values[:, lo:hi], self.geos, self.periods[lo:hi], self.channels,
+                     self.geo_column, self.date_column, self.observed[:, lo:hi], None)
+
+    def lag(self, channel, lags):
+        """Channel shifted lags periods later within each geo; the first periods (and NaN) become 0"""
+        return lag_matrix(self.matrix(channel), lags)
+
+    def adstock(self, channel, lags, adstock_coeff, adstock_type="Geometric", adstock_shape=None):
+        """Adstock of a channel along the period axis (any of transformation.ADSTOCK_TYPES)"""
+        return apply_adstock(self.matrix(channel), lags, adstock_coeff, adstock_type, adstock_shape)
+
+    def observed_scale(self, matrix):
+        """saturation_scale of a (geo x period) array over the observed cells only (padding is not activity)"""
+        return saturation_scale(np.asarray(matrix)[self.observed])
+
+    def saturate(self, channel, method, power_k=0.5, half_saturation=None, matrix=None):
+        """
+        Saturation function applied to a channel, or to a transformed (geo x period) array of it;
+        scaled functions use the mean over the observed cells, as the long-frame transformation does
+        """
+        matrix = self.matrix(channel) if matrix is None else matrix
+        return apply_saturation(matrix, method, power_k, half_saturation, scale=self.observed_scale(matrix))
+
+    def totals(self, channels=None):
+        """Sum of each channel over the observed cells"""
+        channels = self.channels if channels is None else channels
+        mask = self.observed[:, :, None]
+        sums = np.where(mask, self.values, 0).sum(axis=(0, 1), dtype=np.float64)
+        return {channel: float(sums[self.channel_index[channel]]) for channel in channels}
+
+    def by_period(self):
+        """National series: sum over geos per period and channel"""
+        sums = np.where(self.observed[:, :, None], self.values, 0).sum(axis=0, dtype=np.float64)
+        return pd.DataFrame(sums, index=pd.Index(self.periods, name=self.date_column), columns=self.channels)
+
+    def gather(self, matrix):
+        """Values of a (geo x period) array at the source frame's rows, in the source row order"""
+        if self.source_rows is None:
+            raise ValueError("Panel was not built from a frame (or was sliced); use to_pandas instead")
+        geo_codes, period_codes = self.source_rows
+        return np.asarray(matrix)[geo_codes, period_codes]
+
+    def _long_arrays(self, observed_only):
+        geo_codes, period_codes = np.nonzero(self.observed if observed_only else np.ones_like(self.observed))
+        columns = {
+            self.geo_column: np.asarray(self.geos, dtype=object)[geo_codes],
+            self.date_column: np.asarray(self.periods)[period_codes],
+        }
+        for c, channel in enumerate(self.channels):
+            columns[channel] = self.values[geo_codes, period_codes, c]
+        return columns
+
+    def to_pandas(self, observed_only=True):
+        """Long pandas frame (geo, date, channels...) grouped by geo in axis order, periods sorted within each geo"""
+        return pd.DataFrame(self._long_arrays(observed_only))
+
+    def to_polars(self, observed_only=True):
+        """Long polars frame (geo, date, channels...) grouped by geo in axis order, periods sorted within each geo"""
+        columns = self._long_arrays(observed_only)
+        columns[self.geo_column] = columns[self.geo_column].tolist()
+        return pl.DataFrame(columns)
@@ -0,0 +1,832 @@
+"""
+Headless MMM pipeline.
+
+Runs the app's stages without a browser, in order:
+
+    ingest -> integrate -> transform -> model -> curves -> optimize
+
+Each stage writes its artifacts to "<output_dir>/<stage>/" together with a manifest
+recording a fingerprint of the stage's settings and inputs (input file contents and
+upstream fingerprints). A stage whose fingerprint is unchanged and whose artifacts are
+still on disk is reused instead of recomputed, so refreshing one channel extract only
+reruns the stages that depend on it. --force reruns a stage and every stage after it.
+
+One brand:
+    python -m proctimize.pipeline brand_a.json
+
+Several brands in parallel processes (a config with a "brands" list, or several configs):
+    python -m proctimize.pipeline brands.json --workers 4
+    python -m proctimize.pipeline brand_a.json brand_b.yaml --force model
+
+Config (JSON, or YAML with PyYAML installed). Relative paths are resolved against the
+config's directory, input files against "input_dir". Stages that are left out are not
+run; a stage needs every stage after "ingest" before it.
+
+    {
+      "name": "brand_a",
+      "input_dir": "data/brand_a",
+      "output_dir": "out/brand_a",
+      "ingest": {"jobs": [{"recipe": "recipes/calls.json"}, {"recipe": "recipes/tv.json"}]},
+      "integrate": {
+        "granularity": "Weekly",
+        "hcp": [{"file": "ingest:calls", "hcp_col": "hcp_id", "date_col": "week", "zip_col": "zip",
+                 "columns": ["calls"], "rename": {"calls": "hcp_calls"}}],
+        "dtc": [{"file": "ingest:tv", "dma_col": "dma", "date_col": "week", "columns": ["tv_spend"]}],
+        "zip_dma": {"file": "zip_to_dma.csv", "zip_col": "zip", "dma_col": "dma_code"}
+      },
+      "transform": {
+        "dependent_variable": "sales",
+        "carryover_lags": 1,
+        "channels": [{"channel": "hcp_calls", "lags": 1, "adstock": 0.5, "saturation": "Power", "power": 0.5}]
+      },
+      "model": {"start_date": "2023-01-01", "end_date": "2023-12-31", "channels": ["hcp_calls", "Carryover"]},
+      "curves": {"start": 1000, "stop": 40000000, "step": 1000, "price": 49.6},
+      "optimize": {"type": "Budget Goal", "target": 12000000, "step": 1000, "max": {"hcp_calls": 5000000}}
+    }
+
+Transform channels also take "half_saturation", "adstock_type" and "adstock_shape" for the
+saturation and adstock families of proctimize.transformation. With "streaming": true the
+model stage fits from X'X accumulated over Parquet row ranges in worker processes
+("workers", "partition_rows") instead of loading the transformed data; coefficients and
+standard errors are unchanged but the summary leaves out the residual diagnostics.
+"fixed_effects" ("Geo" or "Geo + Period", see modelling.FIXED_EFFECTS) absorbs geo (and
+period) baselines by demeaning and clusters the standard errors by geo.
+"non_negative": true keeps media coefficients >= 0 and "bounds": {"hcp_calls": [0, 10]}
+sets per-variable limits (null for none; the intercept cannot be bounded); coefficients held at a bound are listed in
+window.json as "active_bounds". "penalty" ("Ridge", "Lasso" or "Elastic Net", with "l1_ratio",
+"folds", "horizon" and "rule") fits a regularized path tuned by rolling-origin folds instead; it
+does not take bounds, "non_negative", "fixed_effects" or "bayesian" (the config is rejected).
+"bayesian": true fits the conjugate Bayesian regression with "priors": {"hcp_calls": [mean, sd]}
+("draws", "credible_level", "seed"); the summary then lists credible intervals on ROI. It does not
+take bounds, "non_negative" or "fixed_effects" (the config is rejected). The noise
+variance prior is centred on "noise_variance" with weight "noise_df" (observations); without
+"noise_variance" it is centred on the window's OLS residual variance (empirical Bayes).
+
+Integrate files are ingest outputs ("ingest:<job name>") or CSV/Parquet paths. A config
+with a "brands" list runs one pipeline per entry; each entry (a mapping, or the path of
+another config) is merged over the top-level settings, and by default writes to
+"<output_dir>/<name>".
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+
+import pandas as pd
+import polars as pl
+
+from proctimize.batch import resolve_jobs, run_job
+from proctimize.bayesian import CREDIBLE_LEVEL, N_DRAWS, PRIOR_NOISE_DF, BayesianResult, fit_bayesian, roi_intervals
+from proctimize.file_cache import file_digest, read_csv_cached
+from proctimize.integration import DTC_KEYS, HCP_KEYS, attach_dtc, geo_date_base, join_to_base, parse_date_column
+from proctimize.modelling import (
+    LAGGED_COL,
+    PARTITION_ROWS,
+    coefficient_bounds,
+    coefficient_table,
+    coefficient_table_from_sums,
+    default_modeling_range,
+    fit_ols,
+    fit_ols_parquet,
+    modeling_windows,
+    parquet_modeling_range,
+    parquet_window_summary,
+    raw_columns,
+)
+from proctimize.optimization import dict_sum, min_max_check, optimizer_result, run_optimizer
+from proctimize.panel import Panel
+from proctimize.pools import process_pool
+from proctimize.recipe import load_recipe, read_config
+from proctimize.regularization import RegularizedResult, fit_regularized
+from proctimize.response_curves import create_final_merged_response_curve
+from proctimize.transformation import HALF_SATURATION_FUNCTIONS, SHAPED_SATURATIONS, transform_panel
+
+PIPELINE_VERSION = 1
+STAGES = ["ingest", "integrate", "transform", "model", "curves", "optimize"]
+
+# Column names standardized by the integrate stage (and expected by the app's pages)
+DEFAULT_COLUMNS = {"geo_column": "HCP_ID", "date_column": "Date", "dma_column": "DMA_CODE", "zip_column": "ZIP"}
+
+
+# ---------------------------------------------------------------------------------------------
+# Artifact reuse
+# ---------------------------------------------------------------------------------------------
+
+def fingerprint(*parts):
+    """SHA-256 of JSON-serialisable parts (stage settings, file digests, upstream fingerprints)"""
+    payload = json.dumps([PIPELINE_VERSION, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_fresh(manifest_path, stage_fingerprint, artifacts):
+    """True if the manifest records stage_fingerprint and every artifact is still on disk"""
+    if not os.path.exists(manifest_path):
+        return False
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return manifest.get("fingerprint") == stage_fingerprint and all(os.path.exists(path) for path in artifacts)
+
+
+def run_cached(manifest_path, stage_fingerprint, artifacts, compute, force=False):
+    """
+    Runs compute unless its artifacts are fresh, then records the fingerprint
+
+    Args:
+        manifest_path (string): Manifest file of the stage (or ingest job)
+        stage_fingerprint (string): Output of fingerprint() for the stage's settings and inputs
+        artifacts (list): Paths compute writes
+        compute (callable): Zero-argument function writing the artifacts
+        force (bool): Recompute even if the artifacts are fresh
+
+    Returns
+        (string, scalar): "reused" or "ran", and elapsed seconds
+    """
+    if not force and is_fresh(manifest_path, stage_fingerprint, artifacts):
+        return "reused", 0.0
+
+    # Drop the old manifest first so an interrupted run is never taken as fresh
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+
+    start = time.perf_counter()
+    compute()
+    seconds = round(time.perf_counter() - start, 2)
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "fingerprint": stage_fingerprint,
+            "artifacts": [os.path.basename(path) for path in artifacts],
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "seconds": seconds,
+        }, f, indent=2)
+    return "ran", seconds
+
+
+# ---------------------------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------------------------
+
+def _resolve(path, base_dir):
+    return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+
+def _read_table(path, columns=None):
+    """Reads selected columns of a Parquet or CSV file as a polars DataFrame"""
+    if str(path).lower().endswith(".parquet"):
+        return pl.read_parquet(path, columns=columns)
+    return read_csv_cached(path, columns=columns) if columns else read_csv_cached(path)
+
+
+def _read_pandas(path):
+    return pl.read_parquet(path).to_pandas()
+
+
+def _write_pandas(df, path):
+    pl.from_pandas(df).write_parquet(path)
+
+
+def _transformation_table(channels, dependent_variable, carryover_lags=None):
+    """
+    Transformation table in the Data Transformation page's editor layout
+
+    Args:
+        channels (list): Dicts with 'channel' and optional 'lags', 'adstock', 'adstock_type', 'adstock_shape',
+            'saturation', 'power' and 'half_saturation'
+        dependent_variable (string): Dependent variable (its lag and adstock are ignored)
+        carryover_lags (int): Lags of the 'Carryover' channel, None without a carryover term
+
+    Returns
+        edited_df (dataframe): Channel Name, Saturation Function, Power (k), Half Saturation, Lags, Adstock,
+            Adstock Type and Adstock Shape
+    """
+    rows = []
+    for channel in channels:
+        saturation = channel.get("saturation")
+        saturation = saturation.title() if saturation else None
+        method = saturation.lower() if saturation else None
+        adstock_type = (channel.get("adstock_type") or "Geometric").title()
+        rows.append({
+            "Channel Name": channel["channel"],
+            "Saturation Function": saturation,
+            "Power (k)": channel.get("power", 0.5) if method in SHAPED_SATURATIONS else None,
+            "Half Saturation": channel.get("half_saturation", 1.0) if method in HALF_SATURATION_FUNCTIONS else None,
+            "Lags": channel.get("lags"),
+            "Adstock": channel.get("adstock"),
+            "Adstock Type": adstock_type,
+            "Adstock Shape": channel.get("adstock_shape", 1.0) if adstock_type not in ["Geometric", "Infinite"] else None,
+        })
+    if carryover_lags is not None:
+        rows.append({"Channel Name": LAGGED_COL, "Saturation Function": None, "Power (k)": None, "Half Saturation": None,
+                     "Lags": carryover_lags, "Adstock": None, "Adstock Type": "Geometric", "Adstock Shape": None})
+
+    # Same overrides the page applies to the editor
+    edited_df = pd.DataFrame(rows, columns=["Channel Name", "Saturation Function", "Power (k)", "Half Saturation",
+                                            "Lags", "Adstock", "Adstock Type", "Adstock Shape"])
+    edited_df = edited_df.astype(object).where(edited_df.notna(), None)
+    edited_df.loc[edited_df["Channel Name"] == dependent_variable, ["Lags", "Adstock"]] = None
+    return edited_df
+
+
+def _model_result_table(coefficients, edited_df, names=None):
+    """
+    Response curve input (the CSV uploaded on the Response Curves page) from a fitted model
+
+    Args:
+        coefficients (dataframe): Output of coefficient_table
+        edited_df (dataframe): Transformation table the model's data was built with
+        names (dict): Optional mapping of channel to the name used in the curves
+
+    Returns
+        model_result_df (dataframe): channel, impactable%, impactable_sensors, coefficient, spend, saturation, power,
+            half_saturation
+    """
+    names = names or {}
+    saturation = dict(zip(edited_df["Channel Name"], edited_df["Saturation Function"]))
+    power = dict(zip(edited_df["Channel Name"], edited_df["Power (k)"]))
+    half_saturation = dict(zip(edited_df["Channel Name"], edited_df["Half Saturation"]))
+
+    rows = []
+    for _, row in coefficients.iterrows():
+        channel = row["Variable"].replace("_transformed", "")
+        if channel in ["const", LAGGED_COL] or row["Spend"] == 0:
+            continue
+        function = (saturation.get(channel) or "").lower()
+        if not function:
+            print(f"⚠️ {channel}: no saturation function, left out of the response curves", file=sys.stderr)
+            continue
+        rows.append({
+            "channel": names.get(channel, channel),
+            "impactable%": row["Impactable %"],
+            "impactable_sensors": row["Impactable Sales"],
+            "coefficient": row["Coefficient"],
+            "spend": row["Spend"],
+            "saturation": function,
+            "power": power.get(channel) if function in SHAPED_SATURATIONS else None,
+            "half_saturation": half_saturation.get(channel) if function in HALF_SATURATION_FUNCTIONS else None,
+        })
+    if not rows:
+        raise ValueError("No modelled channel with spend and a saturation function to build response curves for")
+    return pd.DataFrame(rows)
+
+
+# ---------------------------------------------------------------------------------------------
+# Stages
+# ---------------------------------------------------------------------------------------------
+# Every stage takes (settings, context) and returns its outputs: a fingerprint, the paths of
+# its artifacts and a status. context carries the brand's directories, earlier stage outputs
+# and the stages to force.
+
+def ingest_stage(settings, context):
+    stage_dir = os.path.join(context["output_dir"], "ingest")
+    jobs = resolve_jobs(
+        {"input_dir": context["input_dir"], "output_dir": stage_dir, "jobs": settings.get("jobs", [])},
+        context["base_dir"]
+    )
+
+    outputs, statuses, seconds = {}, [], 0.0
+    for job in jobs:
+        job_fingerprint = fingerprint("ingest", load_recipe(job["recipe"]), [file_digest(file) for file in job["files"]])
+        status, elapsed = run_cached(
+            os.path.join(stage_dir, f"{job['name']}.manifest.json"),
+            job_fingerprint,
+            [job["output"]],
+            lambda job=job: run_job(job),
+            force="ingest" in context["force"]
+        )
+        outputs[job["name"]] = {"fingerprint": job_fingerprint, "path": job["output"]}
+        statuses.append(status)
+        seconds += elapsed
+
+    return {
+        "fingerprint": fingerprint("ingest", {name: output["fingerprint"] for name, output in outputs.items()}),
+        "jobs": outputs,
+        "status": "ran" if "ran" in statuses else "reused",
+        "seconds": seconds,
+    }
+
+
+def _integrate_source(file, context):
+    """Path and fingerprint of an integrate input ('ingest:<job>' or a file path)"""
+    if file.startswith("ingest:"):
+        jobs = context["outputs"].get("ingest", {}).get("jobs", {})
+        name = file[len("ingest:"):]
+        if name not in jobs:
+            raise ValueError(f"Integrate input {file!r} does not match any ingest job")
+        return jobs[name]["path"], jobs[name]["fingerprint"]
+    path = _resolve(file, context["input_dir"])
+    return path, file_digest(path)
+
+
+def _read_channel_files(specs, key_cols, date_format, context):
+    """Reads each channel spec's key and KPI columns and standardizes the key names"""
+    frames = []
+    for spec in specs:
+        path, _ = _integrate_source(spec["file"], context)
+        source_cols = [spec[col] for col in key_cols.values()]
+        df = _read_table(path, list(dict.fromkeys(source_cols + spec.get("columns", []))))
+        df = df.rename({spec[col]: standard for standard, col in key_cols.items()})
+        if spec.get("rename"):
+            df = df.rename(spec["rename"])
+        frames.append(parse_date_column(df, "Date", spec.get("date_format", date_format)))
+    return frames
+
+
+def integrate_stage(settings, context):
+    stage_dir = os.path.join(context["output_dir"], "integrate")
+    output = os.path.join(stage_dir, "integrated.parquet")
+
+    files = [spec["file"] for spec in settings.get("hcp", []) + settings.get("dtc", [])]
+    if settings.get("zip_dma"):
+        files.append(settings["zip_dma"]["file"])
+    stage_fingerprint = fingerprint("integrate", settings, [_integrate_source(file, context)[1] for file in files])
+
+    def compute():
+        granularity = settings.get("granularity", "Weekly")
+        date_format = settings.get("date_format", "%Y-%m-%d")
+
+        final_df = None
+        if settings.get("hcp"):
+            key_cols = {"HCP_ID": "hcp_col", "Date": "date_col", "ZIP": "zip_col"}
+            frames = _read_channel_files(settings["hcp"], key_cols, date_format, context)
+            base_df = geo_date_base([df.select(["HCP_ID", "ZIP"]) for df in frames], frames, granularity)
+            final_df = join_to_base(base_df, frames, HCP_KEYS)
+
+        if settings.get("dtc"):
+            key_cols = {"DMA_CODE": "dma_col", "Date": "date_col"}
+            frames = _read_channel_files(settings["dtc"], key_cols, date_format, context)
+            base_df = geo_date_base([df.select(["DMA_CODE"]) for df in frames], frames, granularity)
+            dtc_df = join_to_base(base_df, frames, DTC_KEYS)
+
+            if final_df is None:
+                final_df = dtc_df
+            else:
+                mapping = settings.get("zip_dma")
+                if not mapping:
+                    raise ValueError("Integrating HCP and DTC files needs a 'zip_dma' mapping")
+                path, _ = _integrate_source(mapping["file"], context)
+                final_df = attach_dtc(final_df, dtc_df, _read_table(path), mapping["zip_col"], mapping["dma_col"])
+
+        if final_df is None:
+            raise ValueError("Integrate stage needs 'hcp' and/or 'dtc' files")
+        final_df.write_parquet(output)
+
+    status, seconds = run_cached(os.path.join(stage_dir, "manifest.json"), stage_fingerprint, [output], compute,
+                                 force="integrate" in context["force"])
+    return {"fingerprint": stage_fingerprint, "path": output, "status": status, "seconds": seconds}
+
+
+def transform_stage(settings, context):
+    stage_dir = os.path.join(context["output_dir"], "transform")
+    artifacts = {
+        "transformed": os.path.join(stage_dir, "transformed.parquet"),
+        "granular": os.path.join(stage_dir, "granular.parquet"),
+        "table": os.path.join(stage_dir, "transformations.csv"),
+    }
+    upstream = context["outputs"]["integrate"]
+    stage_fingerprint = fingerprint("transform", settings, upstream["fingerprint"])
+
+    def compute():
+        columns = {**DEFAULT_COLUMNS, **settings}
+        date_column, geo_column = columns["date_column"], columns["geo_column"]
+        dependent_variable = settings["dependent_variable"]
+
+        df = _read_pandas(upstream["path"])
+        df[date_column] = pd.to_datetime(df[date_column])
+
+        # Carryover: unlagged copy of the dependent variable, lagged by the transformation
+        carryover_lags = settings.get("carryover_lags")
+        if carryover_lags is not None:
+            column_list = [col for col in df.columns if col != dependent_variable]
+            df[LAGGED_COL] = df[dependent_variable]
+            df = df[[dependent_variable, LAGGED_COL] + column_list]
+
+        edited_df = _transformation_table(settings.get("channels", []), dependent_variable, carryover_lags)
+
+        # Transform on the dense geo x period panel and write the results back onto the rows
+        channels = [channel for channel in edited_df["Channel Name"] if channel in df.columns]
+        panel = Panel.from_frame(df, geo_column, date_column, channels)
+        transformed_df = df.copy()
+        for column, matrix in transform_panel(panel, edited_df).items():
+            transformed_df[column] = panel.gather(matrix)
+
+        # Raw activity of the carryover term is the lagged (unsaturated) dependent variable
+        granular_df = df.copy()
+        if carryover_lags is not None:
+            granular_df[LAGGED_COL] = panel.gather(panel.lag(LAGGED_COL, int(carryover_lags)))
+
+        column_list = [col for col in df.columns if col not in [geo_column, date_column]]
+        transformed_df = transformed_df[[col for col in transformed_df.columns if col not in column_list] + column_list]
+
+        _write_pandas(transformed_df, artifacts["transformed"])
+        _write_pandas(granular_df, artifacts["granular"])
+        edited_df.to_csv(artifacts["table"], index=False)
+
+    status, seconds = run_cached(os.path.join(stage_dir, "manifest.json"), stage_fingerprint, list(artifacts.values()),
+                                 compute, force="transform" in context["force"])
+    return {"fingerprint": stage_fingerprint, **artifacts, "status": status, "seconds": seconds}
+
+
+def model_stage(settings, context):
+    stage_dir = os.path.join(context["output_dir"], "model")
+    artifacts = {
+        "coefficients": os.path.join(stage_dir, "coefficients.csv"),
+        "summary": os.path.join(stage_dir, "summary.txt"),
+        "window": os.path.join(stage_dir, "window.json"),
+    }
+    upstream = context["outputs"]["transform"]
+    stage_fingerprint = fingerprint("model", settings, upstream["fingerprint"])
+
+    def compute():
+        transform_settings = {**DEFAULT_COLUMNS, **context["config"]["transform"]}
+        date_column, geo_column = transform_settings["date_column"], transform_settings["geo_column"]
+        dependent_variable = transform_settings["dependent_variable"]
+        dependent_variable_user_input = settings.get("dependent_variable", dependent_variable)
+
+        # Streaming mode fits from cross-products accumulated over Parquet partitions, so the
+        # transformed and granular data are never loaded whole
+        streaming = settings.get("streaming", False)
+        if streaming:
+            transformed_columns = list(pl.scan_parquet(upstream["transformed"]).collect_schema())
+            start_date, end_date = parquet_modeling_range(upstream["transformed"], date_column)
+        else:
+            transformed_df = _read_pandas(upstream["transformed"])
+            granular_df = _read_pandas(upstream["granular"])
+            transformed_df[date_column] = pd.to_datetime(transformed_df[date_column])
+            granular_df[date_column] = pd.to_datetime(granular_df[date_column])
+            transformed_columns = list(transformed_df.columns)
+            start_date, end_date = default_modeling_range(transformed_df, date_column)
+
+        if settings.get("start_date"):
+            start_date = pd.to_datetime(settings["start_date"]).date()
+        if settings.get("end_date"):
+            end_date = pd.to_datetime(settings["end_date"]).date()
+
+        # Channels may be given by their raw names; the transformed column is used when present
+        if settings.get("channels"):
+            selected_channels = [
+                f"{channel}_transformed" if f"{channel}_transformed" in transformed_columns else channel
+                for channel in settings["channels"]
+            ]
+        else:
+            excluded = [dependent_variable, dependent_variable_user_input, f"{dependent_variable}_transformed"]
+            selected_channels = [col for col in transformed_columns if col.endswith("_transformed") and col not in excluded]
+
+        missing = [col for col in selected_channels if col not in transformed_columns]
+        if missing:
+            raise ValueError(f"Channels {missing} are not in the transformed data")
+
+        # Bounds are given by raw or transformed name; "non_negative" keeps every media coefficient >= 0
+        bounds = coefficient_bounds(selected_channels) if settings.get("non_negative") else {}
+        for channel, (lower, upper) in settings.get("bounds", {}).items():
+            bounds[f"{channel}_transformed" if f"{channel}_transformed" in selected_channels else channel] = (lower, upper)
+
+        # "fixed_effects": null means none, like leaving it out
+        fixed_effects = settings.get("fixed_effects") or "None"
+        if streaming and (fixed_effects != "None" or settings.get("penalty") or settings.get("bayesian")):
+            raise ValueError("Fixed effects, penalties and priors are not available with streaming; fit in memory instead")
+        bounded = any(limit is not None for limits in bounds.values() for limit in limits)
+        if settings.get("bayesian") and (bounded or fixed_effects != "None"):
+            raise ValueError("Bounds, non_negative and fixed effects are not available with the Bayesian regression; "
+                             "express sign constraints as priors or fit OLS instead")
+        if settings.get("penalty") and (bounded or fixed_effects != "None" or settings.get("bayesian")):
+            raise ValueError("Bounds, non_negative, fixed effects and priors are not available with a penalty; "
+                             "fit the regularized path without them")
+        if streaming:
+            model = fit_ols_parquet(
+                upstream["transformed"], dependent_variable_user_input, selected_channels, date_column,
+                start_date, end_date, settings.get("workers"), settings.get("partition_rows", PARTITION_ROWS), bounds
+            )
+            modelled = parquet_window_summary(
+                upstream["transformed"], selected_channels + [dependent_variable_user_input], date_column,
+                start_date, end_date, distinct_columns=[date_column, geo_column]
+            )
+            raw = parquet_window_summary(
+                upstream["granular"], raw_columns(model.params.index) + [dependent_variable], date_column, start_date, end_date
+            )
+            prior_end_date = start_date - pd.Timedelta(days=1)
+            prior = parquet_window_summary(
+                upstream["granular"], [dependent_variable], date_column,
+                prior_end_date - pd.Timedelta(days=(end_date - start_date).days), prior_end_date
+            )
+            coefficients, long_term_factor = coefficient_table_from_sums(
+                model.params,
+                {**modelled["sums"], "const": modelled["rows"]},
+                {**raw["sums"], "const": raw["rows"]},
+                modelled["sums"][dependent_variable_user_input],
+                raw["sums"][dependent_variable],
+                prior["sums"][dependent_variable]
+            )
+            num_time, num_geo = modelled["distinct"][date_column], modelled["distinct"][geo_column]
+        else:
+            transformed_df_date_filtered, granular_df_date_filtered, granular_df_prior_date_filtered = modeling_windows(
+                transformed_df, granular_df, date_column, start_date, end_date
+            )
+            transformed_df_channel_filtered = transformed_df_date_filtered[
+                [date_column, geo_column, dependent_variable_user_input] + selected_channels
+            ]
+            intervals = None
+            if settings.get("bayesian"):
+                # Priors are given by raw or transformed name, like bounds
+                priors = {
+                    f"{channel}_transformed" if f"{channel}_transformed" in selected_channels else channel: tuple(prior)
+                    for channel, prior in settings.get("priors", {}).items()
+                }
+                model = fit_bayesian(transformed_df_channel_filtered, dependent_variable_user_input, selected_channels,
+                                     priors, settings.get("draws", N_DRAWS), settings.get("seed"),
+                                     settings.get("noise_variance"), settings.get("noise_df", PRIOR_NOISE_DF))
+                intervals = roi_intervals(model, transformed_df_channel_filtered, granular_df_date_filtered,
+                                          granular_df_prior_date_filtered, dependent_variable, dependent_variable_user_input,
+                                          settings.get("credible_level", CREDIBLE_LEVEL))
+            elif settings.get("penalty"):
+                model = fit_regularized(
+                    transformed_df_channel_filtered, date_column, dependent_variable_user_input, selected_channels,
+                    settings["penalty"], settings.get("l1_ratio"), settings.get("folds", 5), settings.get("horizon"),
+                    settings.get("rule", "min"), workers=settings.get("workers")
+                )
+            else:
+                model = fit_ols(transformed_df_channel_filtered, dependent_variable_user_input, selected_channels,
+                                fixed_effects, geo_column, date_column, bounds)
+            coefficients, long_term_factor = coefficient_table(
+                model.params,
+                transformed_df_channel_filtered,
+                granular_df_date_filtered,
+                granular_df_prior_date_filtered,
+                dependent_variable,
+                dependent_variable_user_input
+            )
+            num_time = int(transformed_df_channel_filtered[date_column].nunique())
+            num_geo = int(transformed_df_channel_filtered[geo_column].nunique())
+
+        coefficients.to_csv(artifacts["coefficients"], index=False)
+        with open(artifacts["summary"], "w", encoding="utf-8") as f:
+            if isinstance(model, BayesianResult):
+                f.write(model.summary_text(settings.get("credible_level", CREDIBLE_LEVEL)))
+                f.write("\n\n" + intervals.set_index("Variable").to_string(float_format="{:,.4g}".format) + "\n")
+            elif isinstance(model, RegularizedResult):
+                f.write(model.summary_text())
+            else:
+                f.write(model.summary().as_text())
+            if long_term_factor is not None:
+                f.write(f"\n\n(3-year) Long Term Factor: {long_term_factor:,.2f}\n")
+        with open(artifacts["window"], "w", encoding="utf-8") as f:
+            json.dump({
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat(),
+                "dependent_variable": dependent_variable_user_input,
+                "num_time": num_time,
+                "num_geo": num_geo,
+                "long_term_factor": long_term_factor,
+                "active_bounds": getattr(model, "active_bounds", {}),
+            }, f, indent=2)
+
+    status, seconds = run_cached(os.path.join(stage_dir, "manifest.json"), stage_fingerprint, list(artifacts.values()),
+                                 compute, force="model" in context["force"])
+    return {"fingerprint": stage_fingerprint, **artifacts, "status": status, "seconds": seconds}
+
+
+def curves_stage(settings, context):
+    stage_dir = os.path.join(context["output_dir"], "curves")
+    artifacts = {
+        "model_result": os.path.join(stage_dir, "model_result.csv"),
+        "merged_rc": os.path.join(stage_dir, "response_curves.parquet"),
+    }
+    model_output = context["outputs"]["model"]
+    transform_output = context["outputs"]["transform"]
+    stage_fingerprint = fingerprint("curves", settings, model_output["fingerprint"])
+
+    def compute():
+        coefficients = pd.read_csv(model_output["coefficients"])
+        edited_df = pd.read_csv(transform_output["table"])
+        edited_df = edited_df.astype(object).where(edited_df.notna(), None)
+        with open(model_output["window"], "r", encoding="utf-8") as f:
+            window = json.load(f)
+
+        model_result_df = _model_result_table(coefficients, edited_df, settings.get("names"))
+        merged_rc = create_final_merged_response_curve(
+            model_result_df,
+            int(settings.get("start", 1000)),
+            int(settings.get("stop", 40000000)),
+            int(settings.get("step", 1000)),
+            float(settings.get("price", 49.6)),
+            settings.get("num_time") or window["num_time"],
+            settings.get("num_geo") or window["num_geo"]
+        )
+
+        model_result_df.to_csv(artifacts["model_result"], index=False)
+        _write_pandas(merged_rc, artifacts["merged_rc"])
+
+    status, seconds = run_cached(os.path.join(stage_dir, "manifest.json"), stage_fingerprint, list(artifacts.values()),
+                                 compute, force="curves" in context["force"])
+    return {"fingerprint": stage_fingerprint, **artifacts, "status": status, "seconds": seconds}
+
+
+def optimize_stage(settings, context):
+    stage_dir = os.path.join(context["output_dir"], "optimize")
+    output = os.path.join(stage_dir, "optimizer_result.csv")
+    upstream = context["outputs"]["curves"]
+    stage_fingerprint = fingerprint("optimize", settings, upstream["fingerprint"])
+
+    def compute():
+        model_result_df = pd.read_csv(upstream["model_result"])
+        merged_rc = _read_pandas(upstream["merged_rc"])
+
+        if settings.get("channels"):
+            model_result_df = model_result_df[model_result_df["channel"].isin(settings["channels"])].reset_index(drop=True)
+        channel_names = list(model_result_df["channel"])
+
+        opt_type = settings.get("type", "Budget Goal")
+        target = settings["target"]
+        curve_step = int(context["config"].get("curves", {}).get("step", 1000))
+        k = max(1, int(round(settings.get("step", curve_step) / curve_step)))
+
+        optimizer_dict = {
+            channel: {
+                "iter": k - 1,
+                "min": settings.get("min", {}).get(channel, settings.get("default_min", 0)),
+                "max": settings.get("max", {}).get(channel, settings.get("default_max", 10000000)),
+            }
+            for channel in channel_names
+        }
+        if not ((dict_sum(optimizer_dict, "min") < target) and min_max_check(optimizer_dict) and target <= 1000000000):
+            raise ValueError("Ensure the constraints are met: sum of minimums below the target, "
+                             "every minimum below its maximum and a target of at most 1,000,000,000")
+
+        updated_optimizer_dict = run_optimizer(optimizer_dict, merged_rc, target, opt_type, k)
+        optimizer_result(updated_optimizer_dict, model_result_df, merged_rc, k).to_csv(output, index=False)
+
+    status, seconds = run_cached(os.path.join(stage_dir, "manifest.json"), stage_fingerprint, [output], compute,
+                                 force="optimize" in context["force"])
+    return {"fingerprint": stage_fingerprint, "path": output, "status": status, "seconds": seconds}
+
+
+STAGE_RUNNERS = {
+    "ingest": ingest_stage,
+    "integrate": integrate_stage,
+    "transform": transform_stage,
+    "model": model_stage,
+    "curves": curves_stage,
+    "optimize": optimize_stage,
+}
+
+
+# ---------------------------------------------------------------------------------------------
+# Brands
+# ---------------------------------------------------------------------------------------------
+
+def run_pipeline(config, base_dir=".", force=()):
+    """
+    Runs the configured stages of one brand in order (executed in a worker process)
+
+    Args:
+        config (dict): Brand config (see the module docstring)
+        base_dir (string): Directory relative paths in the config are resolved against
+        force (list): Stages to recompute even if their artifacts are fresh, together with every
+            stage after them ("all" for every stage)
+
+    Returns
+        summary (dict): Brand name, output directory, per-stage status and elapsed seconds
+    """
+    start = time.perf_counter()
+    name = config.get("name") or "pipeline"
+    forced = [STAGES.index(stage) for stage in STAGES if stage in force or "all" in force]
+    context = {
+        "config": config,
+        "base_dir": base_dir,
+        "input_dir": _resolve(config.get("input_dir", "."), base_dir),
+        "output_dir": _resolve(config.get("output_dir", os.path.join("pipeline_output", name)), base_dir),
+        "force": set(STAGES[min(forced):]) if forced else set(),
+        "outputs": {},
+    }
+
+    stages = {}
+    for stage in STAGES:
+        if stage not in config:
+            continue
+        missing = [upstream for upstream in STAGES[1:STAGES.index(stage)] if upstream not in config]
+        if missing:
+            raise ValueError(f"Stage '{stage}' needs the {missing} stage(s) in the config")
+
+        output = STAGE_RUNNERS[stage](config[stage] or {}, context)
+        context["outputs"][stage] = output
+        stages[stage] = {"status": output["status"], "seconds": output["seconds"]}
+
+    return {
+        "brand": name,
+        "output_dir": context["output_dir"],
+        "stages": stages,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def load_brands(path):
+    """
+    Reads a pipeline config and expands its "brands" list
+
+    Args:
+        path (string): Path of the config file
+
+    Returns
+        brands (list): (brand config, base directory) pairs accepted by run_pipeline
+    """
+    config = read_config(path)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    if "brands" not in config:
+        return [(config, base_dir)]
+
+    shared = {key: value for key, value in config.items() if key != "brands"}
+    brands = []
+    for entry in config["brands"]:
+        entry_dir = base_dir
+        if isinstance(entry, str):
+            entry_path = _resolve(entry, base_dir)
+            entry, entry_dir = read_config(entry_path), os.path.dirname(os.path.abspath(entry_path))
+        if not entry.get("name"):
+            raise ValueError(f"Every brand in {path} needs a 'name'")
+        brand = {**shared, **entry}
+        if "output_dir" not in entry:
+            brand["output_dir"] = os.path.join(_resolve(shared.get("output_dir", "pipeline_output"), base_dir), entry["name"])
+        brands.append((brand, entry_dir))
+    return brands
+
+
+def run_brands(brands, workers=None, force=()):
+    """
+    Runs one pipeline per brand in parallel processes, reporting each one as it finishes
+
+    Args:
+        brands (list): (brand config, base directory) pairs
+        workers (int): Number of worker processes, defaults to min(len(brands), cpu count)
+        force (list): Stages to recompute even if their artifacts are fresh
+
+    Returns
+        (list, dict): Summaries of successful brands and brand name to error message for failed brands
+    """
+    summaries, errors = [], {}
+    if not brands:
+        return summaries, errors
+
+    names = [config.get("name") or "pipeline" for config, _ in brands]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Brand names must be unique, got duplicates {duplicates}")
+
+    workers = workers or min(len(brands), os.cpu_count() or 1)
+    results = []
+    if workers == 1:
+        for name, (config, base_dir) in zip(names, brands):
+            try:
+                results.append((name, run_pipeline(config, base_dir, force), None))
+            except Exception as e:
+                results.append((name, None, e))
+    else:
+        with process_pool(workers) as pool:
+            futures = {
+                pool.submit(run_pipeline, config, base_dir, force): name
+                for name, (config, base_dir) in zip(names, brands)
+            }
+            for future in as_completed(futures):
+                try:
+                    results.append((futures[future], future.result(), None))
+                except Exception as e:
+                    results.append((futures[future], None, e))
+
+    for name, summary, error in results:
+        if error is None:
+            summaries.append(summary)
+            stages = ", ".join(
+                f"{stage} reused" if info["status"] == "reused" else f"{stage} {info['seconds']}s"
+                for stage, info in summary["stages"].items()
+            )
+            print(f"✅ {name}: {stages} -> {summary['output_dir']} ({summary['seconds']}s)")
+        else:
+            errors[name] = str(error)
+            print(f"❌ {name}: {error}", file=sys.stderr)
+    return summaries, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m proctimize.pipeline",
+        description="Run the MMM stages (ingest, integrate, transform, model, curves, optimize) without the app."
+    )
+    parser.add_argument("configs", nargs="+", help="Pipeline config file(s) (.json/.yaml), one brand or a 'brands' list each")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Number of brands run in parallel processes")
+    parser.add_argument("-f", "--force", action="append", default=[], choices=STAGES + ["all"],
+                        help="Recompute a stage, and every stage after it, even if the artifacts are up to date (repeatable)")
+    args = parser.parse_args(argv)
+
+    brands = [brand for path in args.configs for brand in load_brands(path)]
+    _, errors = run_brands(brands, args.workers, args.force)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Process pools shared by the batch runners and the model engines.
+# Every pool is spawned rather than forked. The pages, the ingestion engines and the
+# model engines all run polars (and Streamlit) thread pools, and a forked child inherits
+# their locks in whatever state they were in at the fork, which can deadlock the worker.
+# Spawned workers start a fresh interpreter and import the task's module, so tasks and
+# initializers must be module-level functions and their arguments picklable.
+
+START_METHOD = "spawn"
+
+
+def process_pool(workers, initializer=None, initargs=()):
+    """
+    Process pool with the start method every ProcTimize pool uses
+
+    Args:
+        workers (int): Number of worker processes
+        initializer (callable): Module-level function run once in each worker
+        initargs (tuple): Arguments of initializer
+
+    Returns
+        pool (ProcessPoolExecutor): Pool to use as a context manager
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(START_METHOD),
+        initializer=initializer,
+        initargs=initargs
+    )
@@ -0,0 +1,280 @@
+import datetime
+import json
+import os
+
+import polars as pl
+
+from proctimize.ingestion import (
+    build_file_plan, join_key_stats, merge_file_plans, modify_granularity,
+    normalize_columns, parse_date_like_columns, scan_uploaded_csv, source_name
+)
+from proctimize.filtering import categorical_condition, combine_conditions, numeric_condition
+
+# Declarative ingestion recipes.
+# A recipe records every choice made on the Data Ingestion page for one channel
+# (column selection, renames, date formats, merge, filters, KPI table operations,
+# granularity, normalization and output renames) so the same processing can be
+# replayed on a refreshed extract without Streamlit. Recipes are plain JSON; YAML
+# is read and written as well when PyYAML is installed.
+
+RECIPE_VERSION = 1
+
+
+def new_recipe(channel=None):
+    """
+    Empty recipe with every section present
+
+    Args:
+        channel (string): Name of the marketing channel the recipe processes
+
+    Returns
+        recipe (dict): Recipe skeleton
+    """
+    return {
+        "version": RECIPE_VERSION,
+        "channel": channel,
+        "files": [],
+        "merge": None,
+        "filters": None,
+        "granularity": None,
+        "normalize": [],
+        "output_rename": {},
+    }
+
+
+def file_recipe(name, columns, rename_dict, date_formats):
+    """
+    Recipe entry for one input file
+
+    Args:
+        name (string): Name of the file the choices were made on
+        columns (list): Columns kept, in their original names
+        rename_dict (dict): Mapping of current column name to new column name
+        date_formats (dict): Mapping of (renamed) date column to its strptime format
+
+    Returns
+        entry (dict): File section of the recipe
+    """
+    return {
+        "name": name,
+        "columns": list(columns),
+        "rename": {old: new for old, new in rename_dict.items() if old in columns and new and new != old},
+        "date_formats": {col: date_format for col, date_format in date_formats.items() if date_format},
+    }
+
+
+def compose_renames(output_rename, rename_dict):
+    """
+    Folds a rename applied to already renamed columns into the recipe's output renames
+
+    Args:
+        output_rename (dict): Mapping of original output column to its current name
+        rename_dict (dict): Mapping of current column name to new column name
+
+    Returns
+        output_rename (dict): Mapping of original output column to its new name
+    """
+    composed = dict(output_rename)
+    current_to_original = {current: original for original, current in output_rename.items()}
+    for current, new in rename_dict.items():
+        if not new or new == current:
+            continue
+        composed[current_to_original.get(current, current)] = new
+    return {original: new for original, new in composed.items() if original != new}
+
+
+def _to_serialisable(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not serialisable in a recipe")
+
+
+def _is_yaml(path):
+    return str(path).lower().endswith((".yaml", ".yml"))
+
+
+def _import_yaml():
+    try:
+        import yaml
+    except ImportError as e:
+        raise ImportError("YAML recipes need PyYAML (pip install pyyaml); use a .json recipe instead.") from e
+    return yaml
+
+
+def dumps_recipe(recipe, fmt="json"):
+    """
+    Serialises a recipe to JSON or YAML text
+
+    Args:
+        recipe (dict): Recipe to serialise
+        fmt (string): "json" or "yaml"
+
+    Returns
+        text (string): Serialised recipe
+    """
+    text = json.dumps(recipe, indent=2, default=_to_serialisable)
+    if fmt == "yaml":
+        return _import_yaml().safe_dump(json.loads(text), sort_keys=False)
+    return text
+
+
+def read_config(path):
+    """Reads a JSON file, or a .yaml/.yml file when PyYAML is installed"""
+    with open(path, "r", encoding="utf-8") as f:
+        if _is_yaml(path):
+            return _import_yaml().safe_load(f)
+        return json.load(f)
+
+
+def load_recipe(path):
+    """
+    Reads and validates a recipe file (.json, or .yaml/.yml when PyYAML is installed)
+
+    Args:
+        path (string): Path of the recipe file
+
+    Returns
+        recipe (dict): Validated recipe
+    """
+    recipe = read_config(path)
+    validate_recipe(recipe)
+    return recipe
+
+
+def validate_recipe(recipe):
+    """Raises ValueError if the recipe is missing required sections or has an unknown version"""
+    if not isinstance(recipe, dict):
+        raise ValueError("Recipe must be a mapping")
+    if recipe.get("version") != RECIPE_VERSION:
+        raise ValueError(f"Unsupported recipe version {recipe.get('version')!r} (expected {RECIPE_VERSION})")
+    if not recipe.get("files"):
+        raise ValueError("Recipe does not describe any input files")
+    for entry in recipe["files"]:
+        if not entry.get("columns"):
+            raise ValueError(f"Recipe entry for {entry.get('name')!r} does not select any columns")
+    if len(recipe["files"]) > 1 and not recipe.get("merge"):
+        raise ValueError("Recipe with several files needs a merge section")
+
+
+def _parse_date(value):
+    if value is None or isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value))
+
+
+def apply_recipe_filters(df, filters):
+    """
+    Applies the recorded date range, categorical and numerical filters as one predicate
+
+    Args:
+        df (DataFrame): Merged polars dataframe
+        filters (dict): Filters section of the recipe
+
+    Returns
+        df (DataFrame): Filtered polars dataframe
+    """
+    date_column = filters.get("date_column")
+    if date_column and df.schema[date_column] in [pl.Utf8, pl.Object]:
+        df = df.with_columns(pl.col(date_column).str.strptime(pl.Date, strict=False).alias(date_column))
+
+    conditions = []
+    start_date, end_date = _parse_date(filters.get("start_date")), _parse_date(filters.get("end_date"))
+    if date_column and start_date is not None:
+        conditions.append(pl.col(date_column) >= start_date)
+    if date_column and end_date is not None:
+        conditions.append(pl.col(date_column) <= end_date)
+
+    for col, selected_vals in (filters.get("categorical") or {}).items():
+        conditions.append(categorical_condition(col, selected_vals))
+    for col, operator, value in filters.get("numeric") or []:
+        conditions.append(numeric_condition(col, operator, value, df.schema[col]))
+
+    predicate = combine_conditions(conditions)
+    if predicate is None:
+        return df
+    return df.lazy().filter(predicate).collect()
+
+
+def run_recipe(recipe, files):
+    """
+    Replays a recipe on new input files
+
+    Args:
+        recipe (dict): Recipe produced by the Data Ingestion page
+        files (list): Paths (or uploaded files) of the new extract, in the same order as recipe["files"]
+
+    Returns
+        df (DataFrame): Processed channel dataset (polars)
+    """
+    validate_recipe(recipe)
+    if len(files) != len(recipe["files"]):
+        raise ValueError(f"Recipe expects {len(recipe['files'])} file(s), got {len(files)}")
+
+    # Column selection, renames and date parsing per file
+    plans = []
+    for file, entry in zip(files, recipe["files"]):
+        lf = scan_uploaded_csv(file)
+        missing = [col for col in entry["columns"] if col not in lf.collect_schema().names()]
+        if missing:
+            raise ValueError(f"{source_name(file)} is missing column(s) {missing} required by the recipe")
+        plans.append(build_file_plan(lf, entry["columns"], entry.get("rename", {}), entry.get("date_formats", {})))
+
+    # Merge (a single file is standardized exactly as on the page's single-file path)
+    if len(plans) == 1:
+        df = plans[0].collect()
+        df = df.with_columns(
+            [pl.col(col).fill_null("") for col, dtype in df.schema.items() if dtype == pl.Utf8]
+            + [pl.col(col).cast(pl.Date) for col, dtype in df.schema.items() if isinstance(dtype, pl.Datetime)]
+        )
+    else:
+        merge = recipe["merge"]
+        join_keys = merge.get("join_keys") or None
+        key_stats = None
+        if merge["strategy"] == "Horizontal Join":
+            key_stats = join_key_stats(plans, join_keys, files)
+        df = merge_file_plans(
+            plans,
+            merge["strategy"],
+            join_keys,
+            merge.get("join_type") or "inner",
+            key_stats,
+            merge.get("pre_aggregate", False)
+        ).collect()
+        df = parse_date_like_columns(df)
+
+    if recipe.get("filters"):
+        df = apply_recipe_filters(df, recipe["filters"])
+
+    granularity = recipe.get("granularity")
+    if not granularity:
+        return df
+
+    df, _ = modify_granularity(
+        df=df,
+        geo_column=granularity["geo_column"],
+        date_column=granularity["date_column"],
+        granularity_level_df=granularity["source"],
+        granularity_level_user_input=granularity["target"],
+        work_days=granularity.get("work_days", 7),
+        numerical_config_dict=granularity.get("numerical", {}),
+        categorical_config_dict=granularity.get("categorical", {})
+    )
+
+    df = df.to_pandas()
+    for step in recipe.get("normalize") or []:
+        df = normalize_columns(df, step["columns"], method=step["method"])
+    if recipe.get("output_rename"):
+        df = df.rename(columns=recipe["output_rename"])
+
+    # pandas round-trips dates as datetimes; store them as pl.Date again
+    df = pl.from_pandas(df)
+    return df.with_columns([
+        pl.col(col).cast(pl.Date) for col, dtype in df.schema.items() if isinstance(dtype, pl.Datetime)
+    ])
+
+
+def resolve_recipe_files(recipe, input_dir):
+    """Default input paths for a recipe: the recorded file names inside input_dir"""
+    return [os.path.join(input_dir, entry["name"]) for entry in recipe["files"]]
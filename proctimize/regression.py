@@ -0,0 +1,655 @@
+import numpy as np
+import pandas as pd
+from scipy import linalg, stats
+
+# Lean least-squares engine used by proctimize.modelling.
+# statsmodels' OLS keeps the design matrix (and several copies of it) alive on the
+# fitted results, which on multi-million-row HCP panels is most of the memory the
+# Modelling page holds per iteration. Here the fit is a Cholesky solve on the
+# (column-scaled) cross-product X'X; only the coefficients, their covariance and the
+# scalar fit statistics are kept, and the statsmodels-style summary is rendered from
+# them when it is asked for. X'X is assembled from mergeable per-chunk statistics
+# (CrossProducts), so the same fit runs on data streamed in chunks that never fit in
+# memory at once. Geo (and period) fixed effects are absorbed by demeaning in grouped
+# passes rather than by dummy columns, so they scale to hundreds of thousands of geos.
+
+
+class OLSResult:
+    """
+    Coefficients and fit statistics of an ordinary least squares fit (no data retained)
+
+    Attributes mirror statsmodels' RegressionResults where they overlap: params, bse,
+    tvalues and pvalues are Series indexed by variable name, and nobs, df_model, df_resid,
+    rsquared, rsquared_adj, fvalue, f_pvalue, llf, aic, bic and ssr are scalars.
+
+    Args:
+        params (series): Coefficients
+        normalized_cov (array): (X'X)^-1 (or its pseudo-inverse) matching params
+        nobs (int): Number of observations
+        rank (int): Rank of the design matrix
+        ssr (scalar): Residual sum of squares
+        centered_tss (scalar): Total sum of squares around the mean of y
+        k_constant (int): 1 if the design includes an intercept
+        eigenvals (array): Eigenvalues of X'X, largest first
+        residual_stats (dict): Omnibus, Jarque-Bera and Durbin-Watson statistics of the residuals
+        yname (string): Dependent variable
+        df_absorbed (int): Fixed-effect parameters absorbed by a within transformation (beyond the intercept)
+        cluster_cov (array): Cluster-robust covariance replacing the nonrobust one
+        n_clusters (int): Number of clusters behind cluster_cov (inference uses n_clusters - 1 degrees of freedom)
+        active_bounds (dict): Variables held at a bound by a constrained fit ("lower" or "upper");
+            they have no standard error
+    """
+
+    def __init__(self, params, normalized_cov, nobs, rank, ssr, centered_tss, k_constant, eigenvals,
+                 residual_stats=None, yname="y", df_absorbed=0, cluster_cov=None, n_clusters=None, active_bounds=None):
+        self.params = params
+        self.normalized_cov_params = normalized_cov
+        self.nobs = float(nobs)
+        self.rank = int(rank)
+        self.ssr = float(ssr)
+        self.centered_tss = float(centered_tss)
+        self.k_constant = int(k_constant)
+        self.eigenvals = eigenvals
+        self.residual_stats = residual_stats or {}
+        self.yname = yname
+        self.active_bounds = active_bounds or {}
+
+        self.df_absorbed = int(df_absorbed)
+        self.df_model = float(self.rank - self.k_constant)
+        self.df_resid = float(self.nobs - self.rank - self.df_absorbed)
+        self.use_t = True
+        self.mse_resid = self.ssr / self.df_resid if self.df_resid > 0 else np.nan
+
+        if cluster_cov is None:
+            self.cov_type = "nonrobust"
+            self.cov_kwds = {"description": "Standard Errors assume that the covariance matrix of the errors is correctly specified."}
+            self._cov = normalized_cov * self.mse_resid
+            self.df_resid_inference = self.df_resid
+        else:
+            self.cov_type = "cluster"
+            self.cov_kwds = {"description": f"Standard Errors are robust to cluster correlation ({int(n_clusters):,} clusters)."}
+            self._cov = cluster_cov
+            self.df_resid_inference = float(n_clusters - 1)
+
+        self.bse = pd.Series(np.sqrt(np.clip(np.diag(self._cov), 0, None)), index=params.index)
+        self.bse[list(self.active_bounds)] = np.nan
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.tvalues = self.params / self.bse
+        self.pvalues = pd.Series(2 * stats.t.sf(np.abs(self.tvalues), self.df_resid_inference), index=params.index)
+
+        self.ess = self.centered_tss - self.ssr
+        self.rsquared = 1 - self.ssr / self.centered_tss if self.centered_tss > 0 else np.nan
+        self.rsquared_adj = 1 - (self.nobs - self.k_constant) / self.df_resid * (1 - self.rsquared) if self.df_resid > 0 else np.nan
+        if cluster_cov is None:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                self.fvalue = (self.ess / self.df_model) / self.mse_resid if self.df_model > 0 else np.nan
+        else:
+            # Wald test that every slope is zero, using the robust covariance
+            slopes = slice(self.k_constant, None)
+            b = self.params.to_numpy()[slopes]
+            self.fvalue = float(b @ np.linalg.pinv(self._cov[slopes, slopes]) @ b / self.df_model) if self.df_model > 0 else np.nan
+        self.f_pvalue = stats.f.sf(self.fvalue, self.df_model, self.df_resid_inference) if self.df_model > 0 else np.nan
+        self.llf = -self.nobs / 2 * (np.log(2 * np.pi) + np.log(self.ssr / self.nobs) + 1)
+        self.aic = -2 * self.llf + 2 * (self.rank + self.df_absorbed)
+        self.bic = -2 * self.llf + np.log(self.nobs) * (self.rank + self.df_absorbed)
+        self.condition_number = float(np.sqrt(eigenvals[0] / eigenvals[-1])) if eigenvals[-1] > 0 else np.inf
+
+    def cov_params(self):
+        """Covariance of the coefficients"""
+        return pd.DataFrame(self._cov, index=self.params.index, columns=self.params.index)
+
+    def conf_int(self, alpha=0.05):
+        """Two-sided (1 - alpha) confidence intervals, one row per variable"""
+        q = stats.t.ppf(1 - alpha / 2, self.df_resid_inference)
+        return pd.DataFrame({0: self.params - q * self.bse, 1: self.params + q * self.bse})
+
+    def params_table(self, alpha=0.05):
+        """Coefficients with standard errors, t-stats, p-values and confidence intervals"""
+        ci = self.conf_int(alpha)
+        return pd.DataFrame({
+            "Variable": self.params.index,
+            "Coefficient": self.params.values,
+            "Std Err": self.bse.values,
+            "t": self.tvalues.values,
+            "P>|t|": self.pvalues.values,
+            f"[{alpha / 2}": ci[0].values,
+            f"{1 - alpha / 2}]": ci[1].values,
+        })
+
+    def summary(self, yname=None, xname=None, title=None, alpha=0.05):
+        """
+        statsmodels-style summary, rendered from the stored statistics
+
+        Returns
+            summary (Summary): statsmodels Summary (use .as_text() for the familiar text block)
+        """
+        from statsmodels.iolib.summary import Summary
+
+        yname = yname or self.yname
+        xname = xname or list(self.params.index)
+        top_left = [
+            ("Dep. Variable:", [yname]),
+            ("Model:", ["OLS"]),
+            ("Method:", ["Within" if self.df_absorbed else "Least Squares"]),
+            ("Date:", None),
+            ("Time:", None),
+            ("No. Observations:", None),
+            ("Df Residuals:", None),
+            ("Df Model:", None),
+            ("Covariance Type:", [self.cov_type]),
+        ]
+        rsquared_type = " (within)" if self.df_absorbed else ("" if self.k_constant else " (uncentered)")
+        top_right = [
+            ("R-squared" + rsquared_type + ":", [f"{self.rsquared:#8.3f}"]),
+            ("Adj. R-squared" + rsquared_type + ":", [f"{self.rsquared_adj:#8.3f}"]),
+            ("F-statistic:", [f"{self.fvalue:#8.4g}"]),
+            ("Prob (F-statistic):", [f"{self.f_pvalue:#6.3g}"]),
+            ("Log-Likelihood:", None),
+            ("AIC:", [f"{self.aic:#8.4g}"]),
+            ("BIC:", [f"{self.bic:#8.4g}"]),
+        ]
+
+        smry = Summary()
+        smry.add_table_2cols(self, gleft=top_left, gright=top_right, yname=yname, xname=xname,
+                             title=title or "OLS Regression Results")
+        smry.add_table_params(self, yname=yname, xname=xname, alpha=alpha, use_t=self.use_t)
+
+        residual = self.residual_stats
+        if residual:
+            diagn_left = [
+                ("Omnibus:", [f"{residual['omni']:#6.3f}"]),
+                ("Prob(Omnibus):", [f"{residual['omnipv']:#6.3f}"]),
+                ("Skew:", [f"{residual['skew']:#6.3f}"]),
+                ("Kurtosis:", [f"{residual['kurtosis']:#6.3f}"]),
+            ]
+            diagn_right = [
+                ("Durbin-Watson:", [f"{residual['durbin_watson']:#8.3f}"]),
+                ("Jarque-Bera (JB):", [f"{residual['jb']:#8.3f}"]),
+                ("Prob(JB):", [f"{residual['jbpv']:#8.3g}"]),
+                ("Cond. No.", [f"{self.condition_number:#8.3g}"]),
+            ]
+            smry.add_table_2cols(self, gleft=diagn_left, gright=diagn_right, yname=yname, xname=xname, title="")
+
+        notes = [self.cov_kwds["description"]]
+        if self.df_absorbed:
+            notes.append(f"{self.df_absorbed:,} fixed effects are absorbed; const is their average.")
+        if self.active_bounds:
+            held = ", ".join(f"{name} ({side})" for name, side in self.active_bounds.items())
+            notes.append(f"Coefficients held at a bound (no standard error): {held}.")
+        if self.eigenvals[-1] < 1e-10:
+            notes.append(f"The smallest eigenvalue is {self.eigenvals[-1]:6.3g}. This might indicate that there are\n"
+                         "strong multicollinearity problems or that the design matrix is singular.")
+        elif self.condition_number > 1000:
+            notes.append(f"The condition number is large, {self.condition_number:6.3g}. This might indicate that there are\n"
+                         "strong multicollinearity or other numerical problems.")
+        smry.add_extra_txt(["Notes:"] + [f"[{i + 1}] {note}" for i, note in enumerate(notes)])
+        return smry
+
+
+def residual_statistics(resid):
+    """Omnibus, Jarque-Bera, skew, kurtosis and Durbin-Watson of the residuals (as in statsmodels' summary)"""
+    from statsmodels.stats.stattools import durbin_watson, jarque_bera, omni_normtest
+
+    jb, jbpv, skew, kurtosis = jarque_bera(resid)
+    omni, omnipv = omni_normtest(resid)
+    return {
+        "omni": float(omni), "omnipv": float(omnipv), "jb": float(jb), "jbpv": float(jbpv),
+        "skew": float(skew), "kurtosis": float(kurtosis), "durbin_watson": float(durbin_watson(resid)),
+    }
+
+
+def solve_normal_equations(xtx, xty, rcond=1e-12):
+    """
+    Least-squares coefficients from the cross-products X'X and X'y
+
+    Columns are scaled to unit diagonal before a Cholesky factorisation; a rank-deficient
+    X'X falls back to the pseudo-inverse of the scaled X'X. That is the minimum-norm solution
+    in the scaled coordinates, so aliased coefficients can be split differently from
+    statsmodels' pinv, while fitted values, the residual sum of squares and identifiable
+    combinations of the coefficients agree.
+
+    Args:
+        xtx (array): k x k cross-product X'X
+        xty (array): X'y
+        rcond (scalar): Eigenvalues below rcond times the largest (of the scaled X'X) count as zero
+
+    Returns
+        (array, array, int): Coefficients, (X'X)^-1 and the rank of X'X
+    """
+    scale = np.sqrt(np.diag(xtx))
+    scale[scale == 0] = 1.0
+    scaled = xtx / np.outer(scale, scale)
+
+    eigenvalues = np.linalg.eigvalsh(scaled)
+    rank = int((eigenvalues > rcond * eigenvalues.max()).sum()) if eigenvalues.max() > 0 else 0
+
+    if rank == len(xtx):
+        try:
+            factor = linalg.cho_factor(scaled)
+            inverse = linalg.cho_solve(factor, np.eye(len(xtx)))
+        except linalg.LinAlgError:
+            inverse = np.linalg.pinv(scaled, rcond=rcond, hermitian=True)
+    else:
+        inverse = np.linalg.pinv(scaled, rcond=rcond, hermitian=True)
+
+    inverse = inverse / np.outer(scale, scale)
+    return inverse @ xty, inverse, rank
+
+
+def solve_bounded(xtx, xty, lower, upper, rcond=1e-12):
+    """
+    Bounded least-squares coefficients from the cross-products X'X and X'y
+
+    Minimises b'X'Xb - 2b'X'y subject to lower <= b <= upper by bounded-variable least
+    squares on a square root of the (column-scaled) X'X, so the rows are never revisited.
+
+    Args:
+        xtx (array): k x k cross-product X'X
+        xty (array): X'y
+        lower, upper (array): Bounds per coefficient (-inf / inf where unbounded)
+        rcond (scalar): Eigenvalues below rcond times the largest (of the scaled X'X) count as zero
+
+    Returns
+        (array, array): Coefficients, and the active constraints (-1 at the lower bound, 1 at the upper, 0 free)
+    """
+    from scipy.optimize import lsq_linear
+
+    lower = np.asarray(lower, dtype=np.float64)
+    upper = np.asarray(upper, dtype=np.float64)
+    if (lower > upper).any():
+        raise ValueError("Lower bounds must not exceed upper bounds")
+
+    scale = np.sqrt(np.diag(xtx))
+    scale[scale == 0] = 1.0
+    eigenvalues, eigenvectors = np.linalg.eigh(xtx / np.outer(scale, scale))
+    keep = eigenvalues > rcond * max(eigenvalues.max(), 0)
+    root = np.sqrt(eigenvalues[keep])
+    # ||R b - d||^2 equals b'X'Xb - 2b'X'y up to a constant
+    R = root[:, None] * eigenvectors[:, keep].T
+    d = (eigenvectors[:, keep].T @ (xty / scale)) / root
+
+    solution = lsq_linear(R, d, bounds=(lower * scale, upper * scale), method="bvls", tol=1e-12)
+    return solution.x / scale, solution.active_mask.astype(int)
+
+
+class CrossProducts:
+    """
+    Mergeable sufficient statistics of [X, y] for least squares
+
+    Holds the row count, the column means and the centered co-moment matrix of the regressors
+    and the dependent variable (last column). Chunks are folded in with update() and partial
+    results from other partitions or processes combined with merge() (pairwise update of
+    means and co-moments, which stays accurate where raw sums of squares would cancel).
+
+    Args:
+        k (int): Number of regressors (without the intercept)
+    """
+
+    def __init__(self, k):
+        self.n = 0
+        self.mean = np.zeros(k + 1)
+        self.comoment = np.zeros((k + 1, k + 1))
+
+    @classmethod
+    def from_moments(cls, n, mean, comoment):
+        """Statistics of n rows with the given column means and centered co-moments ([X, y] order)"""
+        cross_products = cls(len(mean) - 1)
+        return cross_products._combine(int(n), np.asarray(mean, dtype=np.float64), np.asarray(comoment, dtype=np.float64))
+
+    def _combine(self, n, mean, comoment):
+        if n == 0:
+            return self
+        if self.n == 0:
+            self.n, self.mean, self.comoment = n, mean, comoment
+            return self
+        total = self.n + n
+        delta = mean - self.mean
+        self.comoment = self.comoment + comoment + np.outer(delta, delta) * (self.n * n / total)
+        self.mean = self.mean + delta * (n / total)
+        self.n = total
+        return self
+
+    def update(self, X, y):
+        """
+        Folds a chunk of rows into the statistics
+
+        Args:
+            X (array): Chunk of regressors, n x k
+            y (array): Chunk of the dependent variable
+
+        Returns
+            self (CrossProducts)
+        """
+        data = np.column_stack([np.asarray(X, dtype=np.float64), np.asarray(y, dtype=np.float64)])
+        if len(data) == 0:
+            return self
+        if not np.isfinite(data).all():
+            raise ValueError("Modelling data contains missing or infinite values; fill or filter them before fitting")
+        mean = data.mean(axis=0)
+        data -= mean
+        return self._combine(len(data), mean, data.T @ data)
+
+    def merge(self, other):
+        """Adds the statistics of another partition"""
+        return self._combine(other.n, other.mean, other.comoment)
+
+
+class PeriodCrossProducts:
+    """
+    Prefix sums over sorted periods of row counts, column sums and (optionally) cross-products
+
+    The statistics of any contiguous range of periods (a modelling window, a training or
+    validation fold) are the difference of two prefixes, so fits over many windows and
+    column subsets need a single pass over the rows.
+
+    Args:
+        df (dataframe): Long data
+        date_column (string): Period column
+        columns (list): Numeric columns to accumulate
+        cross (bool): Also accumulate cross-products (needed by cross_products())
+    """
+
+    def __init__(self, df, date_column, columns, cross=True):
+        periods = pd.to_datetime(df[date_column])
+        codes, self.periods = pd.factorize(periods, sort=True)
+        self.periods = pd.DatetimeIndex(self.periods)
+        values = df[columns].to_numpy(dtype=np.float64, copy=True)
+
+        # Missing values count as 0 in totals (as in a pandas sum); they are also counted per
+        # period so only the fits whose window contains them are rejected
+        invalid = ~np.isfinite(values)
+        values[invalid] = 0.0
+
+        # Centering on the overall means keeps window differences accurate
+        self.columns = {col: i for i, col in enumerate(columns)}
+        self.center = values.mean(axis=0) if len(values) else np.zeros(len(columns))
+        values = values - self.center
+
+        n_periods = len(self.periods)
+        counts = np.bincount(codes, minlength=n_periods)
+        missing = np.zeros((n_periods, len(columns)))
+        np.add.at(missing, codes, invalid)
+        self.missing = np.vstack([np.zeros(len(columns)), np.cumsum(missing, axis=0)])
+        sums = np.zeros((n_periods, len(columns)))
+        np.add.at(sums, codes, values)
+        self.count = np.concatenate([[0], np.cumsum(counts)])
+        self.sum = np.vstack([np.zeros(len(columns)), np.cumsum(sums, axis=0)])
+
+        self.cross = None
+        if cross:
+            order = np.argsort(codes, kind="stable")
+            bounds = np.concatenate([[0], np.cumsum(counts)])
+            products = np.zeros((n_periods + 1, len(columns), len(columns)))
+            for t in range(n_periods):
+                block = values[order[bounds[t]:bounds[t + 1]]]
+                products[t + 1] = products[t] + block.T @ block
+            self.cross = products
+
+    def bounds(self, start, end):
+        """Period positions [lo, hi) of the dates within [start, end]"""
+        lo = self.periods.searchsorted(pd.Timestamp(start), side="left")
+        hi = self.periods.searchsorted(pd.Timestamp(end), side="right")
+        return lo, max(lo, hi)
+
+    def totals(self, columns, lo, hi):
+        """Row count and column totals (uncentered) of periods [lo, hi)"""
+        n = int(self.count[hi] - self.count[lo])
+        index = [self.columns[col] for col in columns]
+        sums = self.sum[hi, index] - self.sum[lo, index] + n * self.center[index]
+        return n, dict(zip(columns, sums))
+
+    def cross_products(self, columns, lo, hi):
+        """CrossProducts of the given columns ([X, y] order) over periods [lo, hi)"""
+        index = [self.columns[col] for col in columns]
+        if (self.missing[hi, index] - self.missing[lo, index]).any():
+            raise ValueError("Modelling data contains missing or infinite values; fill or filter them before fitting")
+        n = int(self.count[hi] - self.count[lo])
+        if n == 0:
+            return CrossProducts(len(columns) - 1)
+        sums = self.sum[hi, index] - self.sum[lo, index]
+        products = self.cross[hi][np.ix_(index, index)] - self.cross[lo][np.ix_(index, index)]
+        mean = sums / n
+        return CrossProducts.from_moments(n, mean + self.center[index], products - n * np.outer(mean, mean))
+
+
+def fit_cross_products(cross_products, names, yname="y", add_constant=True, ssr=None, residual_stats=None, bounds=None):
+    """
+    OLS fit from accumulated cross-products (no pass over the data)
+
+    Args:
+        cross_products (CrossProducts): Statistics of every row used in the fit
+        names (list): Regressor names
+        yname (string): Dependent variable name
+        add_constant (bool): Include an intercept named 'const'
+        ssr (scalar): Residual sum of squares if it was computed from the residuals
+        residual_stats (dict): Residual diagnostics if the residuals were available
+        bounds (dict): Variable name to (lower, upper) coefficient bounds (None for unbounded)
+            for a bounded least-squares fit; variables held at a bound are reported in
+            result.active_bounds and the covariance is that of the free coefficients. The
+            intercept cannot be bounded: the degrees of freedom assume it is always estimated
+
+    Returns
+        result (OLSResult): Coefficients and fit statistics
+    """
+    n, mean, comoment = cross_products.n, cross_products.mean, cross_products.comoment
+    if n == 0:
+        raise ValueError("No rows to fit the model on")
+    mean_x, mean_y = mean[:-1], mean[-1]
+    cxx, cxy, cyy = comoment[:-1, :-1], comoment[:-1, -1], comoment[-1, -1]
+
+    if add_constant:
+        xtx = np.empty((len(mean), len(mean)))
+        xtx[0, 0] = n
+        xtx[0, 1:] = xtx[1:, 0] = n * mean_x
+        xtx[1:, 1:] = cxx + n * np.outer(mean_x, mean_x)
+        xty = np.concatenate([[n * mean_y], cxy + n * mean_x * mean_y])
+        names = ["const"] + list(names)
+    else:
+        xtx = cxx + n * np.outer(mean_x, mean_x)
+        xty = cxy + n * mean_x * mean_y
+
+    active_bounds = {}
+    bounds = bounds or {}
+    unknown = [name for name in bounds if name not in names]
+    if unknown:
+        raise ValueError(f"Bounds given for {unknown}, which are not in the model")
+    if add_constant and any(limit is not None for limit in bounds.get("const", (None, None))):
+        raise ValueError("The intercept cannot be bounded; bound the channel coefficients instead")
+    lower = np.array([-np.inf if bounds.get(name, (None, None))[0] is None else bounds[name][0] for name in names], dtype=float)
+    upper = np.array([np.inf if bounds.get(name, (None, None))[1] is None else bounds[name][1] for name in names], dtype=float)
+
+    if np.isfinite(lower).any() or np.isfinite(upper).any():
+        params, active = solve_bounded(xtx, xty, lower, upper)
+        active_bounds = {name: "lower" if side < 0 else "upper" for name, side in zip(names, active) if side}
+
+        # Covariance of the free coefficients, with the bound ones held fixed
+        free = active == 0
+        inverse = np.zeros_like(xtx)
+        free_inverse = np.zeros((0, 0))
+        rank = 0
+        if free.any():
+            _, free_inverse, rank = solve_normal_equations(xtx[np.ix_(free, free)], xty[free])
+        inverse[np.ix_(free, free)] = free_inverse
+    else:
+        params, inverse, rank = solve_normal_equations(xtx, xty)
+
+    if ssr is None:
+        # Residual sum of squares around the mean, plus the part the intercept leaves unexplained
+        slopes = params[1:] if add_constant else params
+        if add_constant:
+            ssr = cyy - 2 * slopes @ cxy + slopes @ cxx @ slopes + n * (mean_y - params[0] - mean_x @ slopes) ** 2
+        else:
+            ssr = (cyy + n * mean_y ** 2) - 2 * params @ xty + params @ xtx @ params
+        ssr = max(float(ssr), 0.0)
+
+    return OLSResult(
+        pd.Series(params, index=names),
+        inverse,
+        n,
+        rank,
+        ssr,
+        cyy if add_constant else cyy + n * mean_y ** 2,
+        int(add_constant),
+        np.sort(np.linalg.eigvalsh(xtx))[::-1],
+        residual_stats,
+        yname,
+        active_bounds=active_bounds,
+    )
+
+
+def fit_least_squares(y, X, names, yname="y", add_constant=True, residual_stats=True, bounds=None):
+    """
+    OLS fit that keeps no reference to the data
+
+    Args:
+        y (array): Dependent variable
+        X (array): n x k regressors (without the intercept)
+        names (list): Regressor names
+        yname (string): Dependent variable name
+        add_constant (bool): Include an intercept named 'const'
+        residual_stats (bool): Compute the residual diagnostics shown in the summary
+        bounds (dict): Variable name to (lower, upper) coefficient bounds, see fit_cross_products
+
+    Returns
+        result (OLSResult): Coefficients and fit statistics
+    """
+    y = np.asarray(y, dtype=np.float64)
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[:, None]
+
+    # Same path as the streaming fit, with the whole frame as a single chunk
+    cross_products = CrossProducts(X.shape[1]).update(X, y)
+    params = fit_cross_products(cross_products, names, yname, add_constant, bounds=bounds).params.to_numpy()
+
+    # The data is at hand, so the residual sum of squares and diagnostics come from the residuals
+    resid = y - X @ (params[1:] if add_constant else params) - (params[0] if add_constant else 0.0)
+    return fit_cross_products(
+        cross_products, names, yname, add_constant,
+        ssr=float(resid @ resid), residual_stats=residual_statistics(resid) if residual_stats else None, bounds=bounds
+    )
+
+
+def _group_means(values, codes, n_groups):
+    """Per-group column means of a 2-D array (one bincount pass per column)"""
+    counts = np.bincount(codes, minlength=n_groups).astype(np.float64)
+    counts[counts == 0] = 1.0
+    return np.column_stack([np.bincount(codes, weights=values[:, j], minlength=n_groups) for j in range(values.shape[1])]) / counts[:, None]
+
+
+def within_transform(values, groups, periods=None, tol=1e-10, max_iter=50):
+    """
+    Removes group (and optionally period) means from every column, keeping the overall mean
+
+    One-way demeaning is a single grouped pass. With periods, group and period means are
+    removed alternately until the columns stop changing (one round on a balanced panel).
+
+    Args:
+        values (array): n x k data
+        groups (array): Integer group code of every row (0..G-1)
+        periods (array): Integer period code of every row, for two-way effects
+        tol (scalar): Convergence tolerance relative to each column's scale
+        max_iter (int): Maximum rounds of the two-way alternation
+
+    Returns
+        values (array): Demeaned copy plus the column means
+    """
+    values = np.array(values, dtype=np.float64)
+    grand_mean = values.mean(axis=0)
+    n_groups = int(groups.max()) + 1 if len(groups) else 0
+    values -= _group_means(values, groups, n_groups)[groups]
+    if periods is None:
+        return values + grand_mean
+
+    n_periods = int(periods.max()) + 1 if len(periods) else 0
+    scale = np.maximum(np.abs(values).max(axis=0), 1e-300)
+    for _ in range(max_iter):
+        period_means = _group_means(values, periods, n_periods)
+        values -= period_means[periods]
+        group_means = _group_means(values, groups, n_groups)
+        values -= group_means[groups]
+        if (np.abs(period_means).max(axis=0, initial=0) <= tol * scale).all() and \
+                (np.abs(group_means).max(axis=0, initial=0) <= tol * scale).all():
+            break
+    return values + grand_mean
+
+
+def fit_fixed_effects(y, X, names, groups, periods=None, yname="y", cluster=True, residual_stats=True, bounds=None):
+    """
+    Fixed-effects OLS by within transformation (no dummy columns)
+
+    y and X are demeaned by group (and period) and the small k x k system is solved as
+    usual; 'const' is the average fixed effect. Standard errors are clustered by group
+    (small-sample factor G / (G - 1) * (n - 1) / (n - K), inference on G - 1 degrees of
+    freedom) unless cluster is False.
+
+    Args:
+        y (array): Dependent variable
+        X (array): n x k regressors (without the intercept)
+        names (list): Regressor names
+        groups (array): Group label of every row (e.g. the geo)
+        periods (array): Period label of every row, for two-way (geo and period) effects
+        yname (string): Dependent variable name
+        cluster (bool): Cluster-robust standard errors by group
+        residual_stats (bool): Compute the residual diagnostics shown in the summary
+        bounds (dict): Variable name to (lower, upper) coefficient bounds, see fit_cross_products
+
+    Returns
+        result (OLSResult): Coefficients and fit statistics
+    """
+    y = np.asarray(y, dtype=np.float64)
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[:, None]
+    if not (np.isfinite(y).all() and np.isfinite(X).all()):
+        raise ValueError("Modelling data contains missing or infinite values; fill or filter them before fitting")
+
+    group_codes, group_labels = pd.factorize(np.asarray(groups))
+    if (group_codes < 0).any():
+        raise ValueError("Fixed effects need a group for every row")
+    n_groups = len(group_labels)
+    period_codes, n_periods = None, 0
+    if periods is not None:
+        period_codes, period_labels = pd.factorize(np.asarray(periods))
+        if (period_codes < 0).any():
+            raise ValueError("Fixed effects need a period for every row")
+        n_periods = len(period_labels)
+
+    data = within_transform(np.column_stack([X, y]), group_codes, period_codes)
+    result = fit_least_squares(data[:, -1], data[:, :-1], names, yname, add_constant=True, residual_stats=residual_stats,
+                               bounds=bounds)
+
+    # Group effects beyond the intercept, plus period effects (connected panel)
+    df_absorbed = (n_groups - 1) + max(n_periods - 1, 0)
+    cluster_cov = None
+    if cluster:
+        if n_groups < 2:
+            raise ValueError("Clustered standard errors need at least two groups")
+        params = result.params.to_numpy()
+        resid = data[:, -1] - data[:, :-1] @ params[1:] - params[0]
+        scores = np.column_stack(
+            [np.bincount(group_codes, weights=resid, minlength=n_groups)]
+            + [np.bincount(group_codes, weights=data[:, j] * resid, minlength=n_groups) for j in range(X.shape[1])]
+        )
+        # Group effects are nested in the clusters, so only period effects count towards K
+        n, k = len(y), result.rank + max(n_periods - 1, 0)
+        correction = n_groups / (n_groups - 1) * (n - 1) / (n - k)
+        bread = result.normalized_cov_params
+        cluster_cov = correction * bread @ (scores.T @ scores) @ bread
+
+    return OLSResult(
+        result.params,
+        result.normalized_cov_params,
+        result.nobs,
+        result.rank,
+        result.ssr,
+        result.centered_tss,
+        1,
+        result.eigenvals,
+        result.residual_stats,
+        yname,
+        df_absorbed=df_absorbed,
+        cluster_cov=cluster_cov,
+        n_clusters=n_groups if cluster else None,
+        active_bounds=result.active_bounds,
+    )
@@ -0,0 +1,266 @@
+import numpy as np
+import pandas as pd
+
+from proctimize.kernels import elastic_net_path
+from proctimize.modelling import MAX_MODEL_WORKERS
+from proctimize.pools import process_pool
+from proctimize.regression import PeriodCrossProducts
+
+# Regularized regression paths for the Modelling page.
+# Ridge, lasso and elastic net are fitted on standardized regressors from the cross-products
+# of the data (the intercept is not penalized): ridge in closed form from an eigen
+# decomposition of X'X, lasso and elastic net by coordinate descent on X'X, walking the
+# penalty from the largest value (all coefficients zero) down the grid and starting each
+# fit from the previous solution. Tuning uses rolling-origin folds over periods: each fold
+# trains on every period before a validation block and scores the whole path on that
+# block. Each fold builds its penalty grid from its own training periods, as the same
+# fractions of its largest penalty as the final grid, so no validation period shapes the
+# penalties it is scored on; the validation curve is indexed by the fraction (reported as
+# the whole window's penalty at that fraction). Training and validation statistics of every fold are differences of per-period
+# prefix sums, so the folds need no further pass over the rows; they are evaluated in a
+# process pool.
+
+PENALTIES = {"Ridge": 0.0, "Lasso": 1.0, "Elastic Net": 0.5}
+SELECTION_RULES = {
+    "min": "Penalty with the lowest mean validation error",
+    "1se": "Largest penalty within one standard error of the lowest mean validation error",
+}
+
+N_LAMBDAS = 100
+LAMBDA_RATIO = 1e-3
+# Ridge has no penalty at which every coefficient is zero; its grid starts as if l1_ratio were this
+RIDGE_L1_FLOOR = 1e-3
+
+# Worker state, set once per process by _init_worker
+_worker = {}
+
+
+def _standardized(cross_products):
+    """Gram matrix and X'y of the standardized, centered regressors (divided by n) and the scales"""
+    n, mean, comoment = cross_products.n, cross_products.mean, cross_products.comoment
+    scale = np.sqrt(np.clip(np.diag(comoment)[:-1], 0, None) / n)
+    scale[scale == 0] = 1.0
+    gram = comoment[:-1, :-1] / n / np.outer(scale, scale)
+    xy = comoment[:-1, -1] / n / scale
+    return gram, xy, scale, mean
+
+
+def lambda_grid(cross_products, l1_ratio, n_lambdas=N_LAMBDAS, ratio=LAMBDA_RATIO):
+    """
+    Decreasing, log-spaced penalties from the smallest that zeroes every coefficient
+
+    Args:
+        cross_products (CrossProducts): Statistics of the training rows
+        l1_ratio (scalar): Share of the L1 penalty (0 ridge, 1 lasso)
+        n_lambdas (int): Number of penalties
+        ratio (scalar): Smallest penalty as a fraction of the largest
+
+    Returns
+        lambdas (array): Penalties, largest first
+    """
+    _, xy, _, _ = _standardized(cross_products)
+    lambda_max = np.abs(xy).max() / max(l1_ratio, RIDGE_L1_FLOOR)
+    lambda_max = lambda_max if lambda_max > 0 else 1.0
+    return np.geomspace(lambda_max, lambda_max * ratio, n_lambdas)
+
+
+def regularization_path(cross_products, lambdas, l1_ratio):
+    """
+    Coefficients along the penalty grid
+
+    Minimizes ||y - a - Xb||^2 / (2n) + lambda * (l1_ratio * |b|_1 + (1 - l1_ratio) / 2 * |b|^2)
+    over standardized regressors; the intercept is not penalized.
+
+    Args:
+        cross_products (CrossProducts): Statistics of the training rows
+        lambdas (array): Penalties, largest first (warm starts follow this order)
+        l1_ratio (scalar): Share of the L1 penalty (0 ridge, 1 lasso)
+
+    Returns
+        (array, array): Intercepts (one per penalty) and coefficients on the original scale (penalties x k)
+    """
+    gram, xy, scale, mean = _standardized(cross_products)
+    lambdas = np.asarray(lambdas, dtype=np.float64)
+    if l1_ratio == 0:
+        eigenvalues, eigenvectors = np.linalg.eigh(gram)
+        rotated = eigenvectors.T @ xy
+        path = (rotated[None, :] / (eigenvalues[None, :] + lambdas[:, None])) @ eigenvectors.T
+    else:
+        path = elastic_net_path(gram, xy, lambdas, l1_ratio)
+    coefficients = path / scale
+    intercepts = mean[-1] - coefficients @ mean[:-1]
+    return intercepts, coefficients
+
+
+def squared_errors(cross_products, intercepts, coefficients):
+    """Sum of squared errors of every (intercept, coefficients) pair on the rows behind cross_products"""
+    n, mean, comoment = cross_products.n, cross_products.mean, cross_products.comoment
+    cxx, cxy, cyy = comoment[:-1, :-1], comoment[:-1, -1], comoment[-1, -1]
+    quadratic = np.einsum("lj,jk,lk->l", coefficients, cxx, coefficients)
+    offset = mean[-1] - intercepts - coefficients @ mean[:-1]
+    return np.clip(cyy - 2 * coefficients @ cxy + quadratic + n * offset ** 2, 0, None)
+
+
+def rolling_origin_folds(n_periods, n_folds=5, horizon=None):
+    """
+    Expanding-window folds over periods: each trains on every period before its validation block
+
+    Args:
+        n_periods (int): Periods in the modelling window
+        n_folds (int): Number of folds (the last n_folds blocks of periods are validated)
+        horizon (int): Periods per validation block, defaults to n_periods // (2 * n_folds)
+
+    Returns
+        folds (list): (train_end, validation_end) period positions; training is [0, train_end)
+            and validation [train_end, validation_end)
+    """
+    horizon = horizon or max(1, n_periods // (2 * n_folds))
+    first = n_periods - n_folds * horizon
+    if first < 2:
+        raise ValueError(f"{n_periods} periods are too few for {n_folds} folds of {horizon} periods")
+    return [(first + i * horizon, first + (i + 1) * horizon) for i in range(n_folds)]
+
+
+def _init_worker(periods, columns, n_lambdas, l1_ratio):
+    _worker.update({"periods": periods, "columns": columns, "n_lambdas": n_lambdas, "l1_ratio": l1_ratio})
+
+
+def _score_fold(fold):
+    """Mean squared validation error of the whole path for one fold (penalty grid of its training periods)"""
+    train_end, validation_end = fold
+    periods, columns, l1_ratio = _worker["periods"], _worker["columns"], _worker["l1_ratio"]
+    train = periods.cross_products(columns, 0, train_end)
+    validation = periods.cross_products(columns, train_end, validation_end)
+    lambdas = lambda_grid(train, l1_ratio, _worker["n_lambdas"])
+    intercepts, coefficients = regularization_path(train, lambdas, l1_ratio)
+    return squared_errors(validation, intercepts, coefficients) / max(validation.n, 1)
+
+
+class RegularizedResult:
+    """
+    Regularized fit chosen by cross-validation, with its path and validation curve
+
+    Attributes:
+        params (series): Coefficients of the chosen penalty ('const' first), fitted on the whole window
+        penalty (string): Key of PENALTIES
+        l1_ratio (scalar): Share of the L1 penalty
+        lambdas (array): Penalty grid of the whole window, largest first
+        chosen_lambda (scalar): Selected penalty
+        path (dataframe): Coefficients per penalty (index lambda, columns variables)
+        cv (dataframe): Mean and standard error of the validation MSE per penalty, one column per fold;
+            row i holds each fold's error at the i-th penalty of its own training grid
+        rsquared (scalar): In-window R-squared of the chosen fit
+        nobs (int): Rows in the window
+        yname (string): Dependent variable
+    """
+
+    def __init__(self, params, penalty, l1_ratio, lambdas, chosen_lambda, path, cv, rsquared, nobs, rule, yname):
+        self.params = params
+        self.penalty = penalty
+        self.l1_ratio = l1_ratio
+        self.lambdas = lambdas
+        self.chosen_lambda = chosen_lambda
+        self.path = path
+        self.cv = cv
+        self.rsquared = rsquared
+        self.nobs = nobs
+        self.rule = rule
+        self.yname = yname
+
+    def summary_text(self):
+        """Plain-text summary in the spirit of the OLS summary"""
+        best = self.cv.loc[self.chosen_lambda]
+        lines = [
+            f"{self.penalty} Regression Results".center(78),
+            "=" * 78,
+            f"Dep. Variable: {self.yname:>20}    Penalty (lambda): {self.chosen_lambda:>18.6g}",
+            f"L1 ratio:      {self.l1_ratio:>20.3g}    Selection rule: {self.rule:>20}",
+            f"No. Observations: {int(self.nobs):>17,}    R-squared: {self.rsquared:>25.3f}",
+            f"CV folds:      {len(self.cv.columns) - 2:>20}    CV MSE (+/- s.e.): {best['mean']:>10.4g} +/- {best['se']:.3g}",
+            "-" * 78,
+            f"{'':<30}{'coef':>15}",
+        ]
+        lines += [f"{name:<30}{value:>15.4f}" for name, value in self.params.items()]
+        lines += ["=" * 78, "Coefficients are shrunk towards zero; no standard errors are reported."]
+        return "\n".join(lines)
+
+
+def fit_regularized(
+    transformed_df,
+    date_column,
+    dependent_variable_user_input,
+    selected_channels,
+    penalty="Lasso",
+    l1_ratio=None,
+    n_folds=5,
+    horizon=None,
+    rule="min",
+    n_lambdas=N_LAMBDAS,
+    workers=None
+):
+    """
+    Ridge, lasso or elastic-net path over the modelling window with rolling-origin cross-validation
+
+    Args:
+        transformed_df (dataframe): Modelling data in the window (datetime date column)
+        date_column (string): Date column (folds are contiguous blocks of periods)
+        dependent_variable_user_input (string): Dependent variable
+        selected_channels (list): Regressor columns
+        penalty (string): Key of PENALTIES
+        l1_ratio (scalar): Share of the L1 penalty, defaults to the penalty's (Elastic Net only)
+        n_folds, horizon (int): Rolling-origin folds, see rolling_origin_folds
+        rule (string): Key of SELECTION_RULES
+        n_lambdas (int): Size of the penalty grid
+        workers (int): Worker processes, defaults to MAX_MODEL_WORKERS; 1 runs in this process
+
+    Returns
+        result (RegularizedResult): Chosen fit (refitted on the whole window), path and validation curve
+    """
+    if penalty not in PENALTIES:
+        raise ValueError(f"Unknown penalty {penalty!r}; choose one of {list(PENALTIES)}")
+    if rule not in SELECTION_RULES:
+        raise ValueError(f"Unknown selection rule {rule!r}; choose one of {list(SELECTION_RULES)}")
+    l1_ratio = PENALTIES[penalty] if l1_ratio is None or penalty != "Elastic Net" else float(l1_ratio)
+    if not 0 <= l1_ratio <= 1:
+        raise ValueError("L1 ratio must be between 0 and 1")
+
+    columns = list(selected_channels) + [dependent_variable_user_input]
+    periods = PeriodCrossProducts(transformed_df, date_column, columns)
+    n_periods = len(periods.periods)
+    whole = periods.cross_products(columns, 0, n_periods)
+    lambdas = lambda_grid(whole, l1_ratio, n_lambdas)
+
+    folds = rolling_origin_folds(n_periods, n_folds, horizon)
+    setup_args = (periods, columns, n_lambdas, l1_ratio)
+    workers = min(workers or MAX_MODEL_WORKERS, len(folds)) or 1
+    if workers == 1:
+        _init_worker(*setup_args)
+        errors = [_score_fold(fold) for fold in folds]
+        _worker.clear()
+    else:
+        with process_pool(workers, initializer=_init_worker, initargs=setup_args) as pool:
+            errors = list(pool.map(_score_fold, folds))
+
+    errors = np.column_stack(errors)
+    cv = pd.DataFrame(errors, index=pd.Index(lambdas, name="lambda"), columns=[f"fold {i + 1}" for i in range(len(folds))])
+    cv.insert(0, "se", errors.std(axis=1, ddof=1) / np.sqrt(len(folds)) if len(folds) > 1 else 0.0)
+    cv.insert(0, "mean", errors.mean(axis=1))
+
+    best = int(np.argmin(cv["mean"].to_numpy()))
+    if rule == "1se":
+        threshold = cv["mean"].iloc[best] + cv["se"].iloc[best]
+        best = int(np.argmax(cv["mean"].to_numpy() <= threshold))  # largest penalty comes first
+    chosen_lambda = float(lambdas[best])
+
+    intercepts, coefficients = regularization_path(whole, lambdas, l1_ratio)
+    names = ["const"] + list(selected_channels)
+    path = pd.DataFrame(np.column_stack([intercepts, coefficients]), index=pd.Index(lambdas, name="lambda"), columns=names)
+    params = path.iloc[best].copy()
+    params.name = None
+
+    ssr = squared_errors(whole, intercepts[best:best + 1], coefficients[best:best + 1])[0]
+    tss = whole.comoment[-1, -1]
+    rsquared = 1 - ssr / tss if tss > 0 else np.nan
+
+    return RegularizedResult(params, penalty, l1_ratio, lambdas, chosen_lambda, path, cv, rsquared, whole.n, rule,
+                             dependent_variable_user_input)
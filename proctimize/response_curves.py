@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+from proctimize.transformation import apply_saturation
+
+# Streamlit-free response curve engines shared by the Response Curves page and
+# the headless pipeline (proctimize.pipeline).
+
+# Default calibration grid: number of time periods and number of geos (bricks)
+NUM_TIME = 12
+NUM_GEO = 2614
+
+
+def saturated_spend(spend_geo_time, saturation_function, power_value, half_saturation=None, spend_nation=None, num_time=NUM_TIME, num_geo=NUM_GEO):
+    """
+    Saturation of the spend per geo and period for the families other than log and power
+
+    The scaled families (hill, logistic, michaelis-menten, negative exponential) were fitted on
+    activity in multiples of its mean, so spend is expressed in multiples of the modelled
+    spend per geo and period.
+    """
+    scale = spend_nation / (num_time * num_geo) if spend_nation else None
+    if not scale or scale <= 0:
+        scale = 1.0
+    return apply_saturation(spend_geo_time, saturation_function, power_value, half_saturation, scale)
+
+
+def calc_calibration_factor(impactable_sales_nation, beta_coeff, spend_nation, saturation_function, power_value, num_time=NUM_TIME, num_geo=NUM_GEO, half_saturation=None):   #to fetch choice of function  
+    
+    if saturation_function == 'log':
+        calib_factor = (impactable_sales_nation / (num_time * num_geo)) / (
+        beta_coeff * np.log(1 + (spend_nation / (num_time * num_geo))))   
+
+    elif saturation_function == 'power':
+        calib_factor = (impactable_sales_nation / (num_time * num_geo)) / (
+        beta_coeff * np.power(spend_nation / (num_time * num_geo), power_value))  
+
+    else:
+        calib_factor = (impactable_sales_nation / (num_time * num_geo)) / (
+        beta_coeff * saturated_spend(spend_nation / (num_time * num_geo), saturation_function, power_value,
+                                     half_saturation, spend_nation, num_time, num_geo))
+
+    return calib_factor
+
+
+def create_response_curve(channel_name, impactable_sales_nation, beta_coeff, spend_nation, start, stop, step, price, saturation_function, power_value, num_time=NUM_TIME, num_geo=NUM_GEO, half_saturation=None):
+    calibration_factor = calc_calibration_factor(impactable_sales_nation, beta_coeff, spend_nation, saturation_function, power_value, num_time, num_geo, half_saturation)
+    spend_values = range(start, stop + 1, step)
+
+    response_df = pd.DataFrame({
+        'spend': spend_values,
+        'impactable_geo_time': [None] * len(spend_values),
+        'impactable_nation': [None] * len(spend_values),
+        'impactable_nation_currency': [None] * len(spend_values),
+        'roi': [None] * len(spend_values),
+        'mroi': [None] * len(spend_values)
+    })
+
+    if saturation_function == 'log':
+        response_df['impactable_geo_time'] = calibration_factor * beta_coeff * np.log(1 + (response_df['spend'] / (num_time * num_geo)))
+
+    elif saturation_function == 'power':
+        response_df['impactable_geo_time'] = calibration_factor * beta_coeff * np.power((response_df['spend'] / (num_time * num_geo)),power_value)
+
+    else:
+        response_df['impactable_geo_time'] = calibration_factor * beta_coeff * saturated_spend(
+            response_df['spend'] / (num_time * num_geo), saturation_function, power_value,
+            half_saturation, spend_nation, num_time, num_geo)
+
+
+    response_df['impactable_nation'] = num_time * num_geo * response_df['impactable_geo_time']
+    response_df['impactable_nation_currency'] = price * response_df['impactable_nation']
+    response_df['roi'] = response_df['impactable_nation_currency'] / response_df['spend']
+    response_df['mroi'] = (response_df['impactable_nation_currency'].shift(-1) -
+                           response_df['impactable_nation_currency']) / (response_df['spend'].shift(-1) -
+                                                                          response_df['spend'])
+
+    channel_prefix = channel_name + '_'
+    response_df = response_df.add_prefix(channel_prefix)
+
+    return response_df
+
+
+def create_final_merged_response_curve(model_result_df, start, stop, step, price, num_time=NUM_TIME, num_geo=NUM_GEO):
+    final_merged_response_curve = pd.DataFrame()
+
+    for channel_name in model_result_df['channel']:
+        impactable_sales_nation = float(model_result_df[model_result_df['channel'] == channel_name]['impactable_sensors'].iloc[0])
+        beta_coeff = float(model_result_df[model_result_df['channel'] == channel_name]['coefficient'].iloc[0])
+        spend_nation = float(model_result_df[model_result_df['channel'] == channel_name]['spend'].iloc[0])
+        saturation_function = model_result_df[model_result_df['channel'] == channel_name]['saturation'].values[0]
+        power_value = model_result_df[model_result_df['channel'] == channel_name]['power'].values[0]
+        half_saturation = None
+        if 'half_saturation' in model_result_df.columns:
+            half_saturation = model_result_df[model_result_df['channel'] == channel_name]['half_saturation'].values[0]
+            half_saturation = float(half_saturation) if pd.notna(half_saturation) else None
+
+        response_curve = create_response_curve(channel_name, impactable_sales_nation, beta_coeff, spend_nation,
+                                               start, stop, step, price,saturation_function,power_value, num_time, num_geo,
+                                               half_saturation)
+
+        if final_merged_response_curve.empty:
+            final_merged_response_curve = response_curve
+        else:
+            final_spend_col = final_merged_response_curve.columns[0]
+            new_spend_col = response_curve.columns[0]
+            final_merged_response_curve = final_merged_response_curve.merge(response_curve,
+                                                                            left_on=final_spend_col,
+                                                                            right_on=new_spend_col,
+                                                                            how='inner')
+
+    return final_merged_response_curve
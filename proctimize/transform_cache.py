@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Memo of transformed channels shared by all pages.
+# "Process Data" reruns the whole transformation table, but between two clicks usually
+# only one channel's parameters change. Each transformed column is keyed on a digest of
+# its source column (and of the geo column it is grouped by) plus the row's parameters,
+# so unchanged channels are served from an in-memory LRU bounded by size and only the
+# edited rows are recomputed.
+
+TRANSFORM_CACHE_MB = float(os.environ.get("PROCTIMIZE_TRANSFORM_CACHE_MB", 512))
+
+
+class TransformCache:
+    """
+    LRU of transformed columns (read-only NumPy arrays) bounded by memory
+
+    Args:
+        max_memory_mb (scalar): Upper bound on the bytes held by the cached arrays
+    """
+
+    def __init__(self, max_memory_mb=TRANSFORM_CACHE_MB):
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def _evict(self):
+        # Always keep the most recently used array, even if it alone exceeds the bound
+        while self._memory_bytes > self.max_memory_bytes and len(self._entries) > 1:
+            _, values = self._entries.popitem(last=False)
+            self._memory_bytes -= values.nbytes
+
+    def get(self, key):
+        """Returns the cached array for key or None"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        return None
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached array for key, computing and caching it on a miss
+
+        Args:
+            key (string): Key built by transform_key
+            compute (callable): Zero-argument function producing the transformed values
+
+        Returns
+            values (array): Read-only array (writes through a frame holding it copy first)
+        """
+        values = self.get(key)
+        if values is None:
+            values = np.array(compute())
+            values.setflags(write=False)
+            with self._lock:
+                self.misses += 1
+                if key not in self._entries:
+                    self._entries[key] = values
+                    self._memory_bytes += values.nbytes
+                    self._evict()
+        return values
+
+    def clear(self):
+        """Drops all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+
+    @property
+    def memory_mb(self):
+        return self._memory_bytes / (1024 * 1024)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_transform_cache = TransformCache()
+
+
+def get_transform_cache():
+    """Returns the process-wide transformation cache shared by all pages and sessions"""
+    return _transform_cache
+
+
+def column_digest(series):
+    """
+    Content digest of a column (values, order and dtype; the index is ignored)
+
+    Args:
+        series (series): Pandas column
+
+    Returns
+        digest (string): Hex digest
+    """
+    values = series.to_numpy()
+    if values.dtype.kind in "biufcmM":
+        payload = np.ascontiguousarray(values).tobytes()
+    else:
+        payload = pd.util.hash_pandas_object(series, index=False).to_numpy().tobytes()
+    return hashlib.blake2b(str(values.dtype).encode("utf-8") + payload, digest_size=16).hexdigest()
+
+
+def transform_key(source_digest, geo_digest, params):
+    """Builds a cache key from the source and geo column digests and the row's transformation parameters"""
+    payload = json.dumps({"source": source_digest, "geo": geo_digest, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
@@ -0,0 +1,438 @@
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from proctimize.kernels import recursive_adstock
+from proctimize.transform_cache import column_digest, get_transform_cache, transform_key
+
+# Streamlit-free transformation engines shared by the Data Transformation page
+# and the headless pipeline (proctimize.pipeline).
+
+SATURATION_FUNCTIONS = ["Power", "Log", "Hill", "Logistic", "Michaelis-Menten", "Negative Exponential"]
+ADSTOCK_TYPES = ["Geometric", "Weibull", "Delayed", "Infinite"]
+
+# Saturations shaped by "Power (k)" (exponent, slope, steepness or rate)
+SHAPED_SATURATIONS = ["power", "hill", "logistic", "negative exponential"]
+# Saturations with a "Half Saturation" point, given in multiples of the channel's mean activity
+# so the same parameters apply to activity in the model and to spend on the response curves
+SCALED_SATURATIONS = ["hill", "logistic", "michaelis-menten", "negative exponential"]
+HALF_SATURATION_FUNCTIONS = ["hill", "logistic", "michaelis-menten"]
+
+
+# Define Adstock function
+def adstock_matrix(matrix, lags, adstock_coeff):
+    """
+    Geometric Adstock of every row of a (geo x time) matrix in one call.
+    Truncated convolution over the time axis: out[:, i] = sum over j <= lags of adstock_coeff**j * x[:, i - j].
+    The terms are added in the same order as the original per-geo loop, so results are identical.
+
+    Args:
+        matrix (array): 2-D array, one row per geo and one column per period
+        lags (int): Number of past periods carried over
+        adstock_coeff (scalar): Decay applied per period
+
+    Returns
+        adstocked (array): float64 array of the same shape
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    adstocked = np.zeros_like(matrix)
+    n_periods = matrix.shape[-1]
+
+    for j in range(min(lags, n_periods - 1) + 1):
+        adstocked[..., j:] += (adstock_coeff ** j) * matrix[..., :n_periods - j]
+
+    return adstocked
+
+
+def lag_matrix(matrix, lags):
+    """Rows of a (geo x time) matrix shifted lags periods later; the first periods (and NaN) become 0"""
+    matrix = np.asarray(matrix)
+    lagged = np.zeros_like(matrix)
+    n_periods = matrix.shape[-1]
+    if lags < n_periods:
+        lagged[..., lags:] = matrix[..., :n_periods - lags]
+    return np.where(np.isnan(lagged), 0, lagged)
+
+
+def geometric_adstock(series, lags, adstock_coeff):
+    """Applies geometric Adstock transformation within each region."""
+    return adstock_matrix(np.array(series, dtype=np.float64), lags, adstock_coeff)
+
+
+def _check_adstock_coeff(adstock_coeff):
+    """Retention must lie in [0, 1]: above 1 carryover grows without bound, below 0 it flips sign every period"""
+    if not 0 <= adstock_coeff <= 1:
+        raise ValueError(f"Adstock must be between 0 and 1, got {adstock_coeff}")
+
+
+def adstock_weights(lags, adstock_coeff, adstock_type="Geometric", adstock_shape=None):
+    """
+    Carryover weight of each lag 0..lags (the current period has weight 1 at the peak)
+
+    Args:
+        lags (int): Number of past periods carried over
+        adstock_coeff (scalar): Retention per period, in [0, 1]
+        adstock_type (string): "Geometric" (retention ** j), "Weibull" (retention ** (j ** shape);
+            shape < 1 gives a long tail, shape > 1 a sharp drop) or "Delayed" (retention ** ((j - peak) ** 2))
+        adstock_shape (scalar): Weibull shape, or the Delayed peak lag
+
+    Returns
+        weights (array): float64 weights indexed by lag
+    """
+    j = np.arange(lags + 1, dtype=np.float64)
+    adstock_type = (adstock_type or "Geometric").lower()
+
+    if adstock_type == "weibull":
+        return adstock_coeff ** (j ** (1.0 if adstock_shape is None else adstock_shape))
+    if adstock_type == "delayed":
+        return adstock_coeff ** ((j - (0.0 if adstock_shape is None else adstock_shape)) ** 2)
+    return adstock_coeff ** j
+
+
+def apply_adstock(matrix, lags, adstock_coeff, adstock_type="Geometric", adstock_shape=None):
+    """
+    Adstock of every row of a (geo x time) matrix with any of the ADSTOCK_TYPES
+
+    "Infinite" carries every past period over (y[t] = x[t] + retention * y[t - 1]) through the
+    recursive kernel of proctimize.kernels; Lags is not used as a horizon there.
+
+    Args:
+        matrix (array): 2-D array, one row per geo and one column per period
+        lags (int): Number of past periods carried over
+        adstock_coeff (scalar): Retention per period, in [0, 1] (ValueError otherwise)
+        adstock_type (string): One of ADSTOCK_TYPES
+        adstock_shape (scalar): Weibull shape, or the Delayed peak lag
+
+    Returns
+        adstocked (array): float64 array of the same shape
+    """
+    _check_adstock_coeff(adstock_coeff)
+    if (adstock_type or "Geometric").lower() == "geometric":
+        return adstock_matrix(matrix, lags, adstock_coeff)
+    if adstock_type.lower() == "infinite":
+        return recursive_adstock(matrix, adstock_coeff)
+
+    matrix = np.asarray(matrix, dtype=np.float64)
+    adstocked = np.zeros_like(matrix)
+    n_periods = matrix.shape[-1]
+    weights = adstock_weights(lags, adstock_coeff, adstock_type, adstock_shape)
+
+    for j in range(min(lags, n_periods - 1) + 1):
+        adstocked[..., j:] += weights[j] * matrix[..., :n_periods - j]
+
+    return adstocked
+
+
+# Define Saturation function
+def saturation_scale(series):
+    """Mean activity used to express half saturation points in multiples of the mean (1 if not positive)"""
+    scale = np.nanmean(np.asarray(series, dtype=np.float64)) if np.size(series) else np.nan
+    return float(scale) if np.isfinite(scale) and scale > 0 else 1.0
+
+
+def apply_saturation(series, method, power_k=0.5, half_saturation=None, scale=None):
+    """
+    Applies saturation function on a Pandas Series or NumPy array (whole panels at once).
+
+    Args:
+        series (array): Activity (any shape)
+        method (string): One of SATURATION_FUNCTIONS (case-insensitive)
+        power_k (scalar): Power exponent, Hill slope, Logistic steepness or Negative Exponential rate
+        half_saturation (scalar): Hill / Michaelis-Menten half saturation point, or Logistic midpoint,
+            in multiples of scale (defaults to 1)
+        scale (scalar): Activity that counts as 1 for the scaled functions, defaults to the mean of series
+
+    Returns
+        saturated (array): float64 array of the same shape
+    """
+    series = np.array(series, dtype=np.float64)  # Ensure it's numeric
+    method = method.lower()
+
+    if method == "log":
+        return np.log1p(series)  # log(1 + x) to avoid log(0)
+    elif method == "power":
+        return np.power(series, power_k)
+
+    if method in SCALED_SATURATIONS:
+        ratio = series / (saturation_scale(series) if scale is None else scale)
+        half = 1.0 if half_saturation is None else half_saturation
+        k = 1.0 if power_k is None else power_k
+
+        if method == "hill":
+            return np.power(ratio, k) / (np.power(ratio, k) + half ** k)
+        elif method == "michaelis-menten":
+            return ratio / (half + ratio)
+        elif method == "logistic":
+            # Shifted so that zero activity has zero effect
+            return 1 / (1 + np.exp(-k * (ratio - half))) - 1 / (1 + np.exp(k * half))
+        elif method == "negative exponential":
+            return 1 - np.exp(-k * ratio)
+
+    return series  # Return unchanged if no valid method is given
+
+
+def _row_parameters(row):
+    """Transformation parameters of one row of the transformation table (optional columns may be absent)"""
+    def value(col):
+        val = row.get(col)
+        return None if val is None or (not isinstance(val, str) and pd.isna(val)) else val
+
+    sat_function = value("Saturation Function")
+    method = sat_function.lower() if sat_function else None
+    adstock_type = value("Adstock Type") or "Geometric"
+    return {
+        "lags": int(value("Lags")) if value("Lags") is not None else None,
+        "adstock_coeff": float(value("Adstock")) if value("Adstock") is not None else None,
+        "adstock_type": adstock_type,
+        "adstock_shape": float(value("Adstock Shape")) if adstock_type not in ["Geometric", "Infinite"] and value("Adstock Shape") is not None else None,
+        "sat_function": sat_function,
+        "power_k": float(value("Power (k)")) if method in SHAPED_SATURATIONS and value("Power (k)") is not None else None,
+        "half_saturation": float(value("Half Saturation")) if method in HALF_SATURATION_FUNCTIONS and value("Half Saturation") is not None else None,
+    }
+
+
+def _recursive_adstock_runs(values, geos, decay):
+    """
+    recursive_adstock within each run of equal geos (rows sorted by period within geo).
+    Rows are laid out on a (geo x position) matrix so the kernel runs once for every geo;
+    padding sits after each geo's last row, and Adstock only looks back, so it never leaks in.
+    """
+    codes, _ = pd.factorize(geos)
+    positions = pd.Series(codes).groupby(codes).cumcount().to_numpy()
+    if not len(codes):
+        return np.asarray(values, dtype=np.float64)
+    matrix = np.zeros((codes.max() + 1, positions.max() + 1))
+    matrix[codes, positions] = values
+    return recursive_adstock(matrix, decay)[codes, positions]
+
+
+def adstock_expression(expr, geo_column, lags, adstock_coeff, adstock_type="Geometric", adstock_shape=None):
+    """
+    Polars window expression of apply_adstock within each geo (rows must be sorted by period within geo)
+
+    Args:
+        expr (Expr): Activity
+        geo_column (string): Column the carryover is computed within
+        lags (int): Number of past periods carried over
+        adstock_coeff (scalar): Retention per period, in [0, 1] (ValueError otherwise)
+        adstock_type (string): One of ADSTOCK_TYPES
+        adstock_shape (scalar): Weibull shape, or the Delayed peak lag
+
+    Returns
+        expr (Expr): Adstocked activity
+    """
+    _check_adstock_coeff(adstock_coeff)
+    adstock_type = (adstock_type or "Geometric").lower()
+
+    if adstock_type == "infinite":
+        # The recurrence runs through the same kernel as apply_adstock (compiled when Numba is
+        # available), so a missing value carries into every later period exactly as it does there
+        return pl.struct(expr.cast(pl.Float64).alias("x"), pl.col(geo_column).alias("geo")).map_batches(
+            lambda batch: pl.Series(_recursive_adstock_runs(
+                batch.struct.field("x").to_numpy(), batch.struct.field("geo").to_numpy(), adstock_coeff
+            )),
+            return_dtype=pl.Float64
+        ).fill_nan(None)
+
+    if adstock_type == "geometric":
+        weights = [adstock_coeff ** j for j in range(lags + 1)]  # Same weights as adstock_matrix
+    else:
+        weights = adstock_weights(lags, adstock_coeff, adstock_type, adstock_shape).tolist()
+
+    adstocked = weights[0] * expr
+    for j in range(1, lags + 1):
+        adstocked = adstocked + weights[j] * expr.shift(j, fill_value=0).over(geo_column)
+    return adstocked
+
+
+def saturation_expression(expr, method, power_k=0.5, half_saturation=None):
+    """Polars expression of apply_saturation (scaled functions use the column's mean, as apply_saturation does)"""
+    method = method.lower()
+
+    if method == "log":
+        return expr.log1p()
+    elif method == "power":
+        return expr.pow(power_k)
+
+    if method in SCALED_SATURATIONS:
+        mean = expr.mean()
+        ratio = expr / pl.when(mean > 0).then(mean).otherwise(1.0)
+        half = 1.0 if half_saturation is None else half_saturation
+        k = 1.0 if power_k is None else power_k
+
+        if method == "hill":
+            return ratio.pow(k) / (ratio.pow(k) + half ** k)
+        elif method == "michaelis-menten":
+            return ratio / (half + ratio)
+        elif method == "logistic":
+            return 1 / (1 + (-k * (ratio - half)).exp()) - 1 / (1 + np.exp(k * half))
+        elif method == "negative exponential":
+            return 1 - (-k * ratio).exp()
+
+    return expr
+
+
+def transform_expression(channel, geo_column, params):
+    """
+    Polars expression of one row of the transformation table (cases 3 to 8), named '<channel>_transformed'
+
+    Args:
+        channel (string): Channel column
+        geo_column (string): Column the lags and adstocks are computed within
+        params (dict): Row parameters (see _row_parameters)
+
+    Returns
+        expr (Expr): Window expression over a frame sorted by geo and period
+    """
+    lags, adstock_coeff, sat_function = params["lags"], params["adstock_coeff"], params["sat_function"]
+    expr = pl.col(channel)
+
+    # Case 3: Lag only, and Case 7: Lag + Saturation (missing activity counts as 0)
+    if lags is not None and adstock_coeff is None:
+        expr = expr.shift(lags, fill_value=0).over(geo_column).fill_nan(0).fill_null(0)
+
+    # Case 4: Lag + Adstock, and Case 8: Full pipeline – Lag + Adstock + Saturation
+    elif lags is not None:
+        expr = adstock_expression(expr, geo_column, lags, adstock_coeff, params["adstock_type"], params["adstock_shape"])
+
+    # Cases 5, 7 and 8: Saturation
+    if sat_function is not None:
+        expr = saturation_expression(expr, sat_function, params["power_k"], params["half_saturation"])
+
+    return expr.alias(f"{channel}_transformed")
+
+
+def _sorted_frame(df, geo_column, date_column, columns):
+    """Polars copy of the given columns, sorted by (geo, date) once, with each row's position in df"""
+    frame = pl.from_pandas(df[[geo_column] + ([date_column] if date_column else []) + columns].reset_index(drop=True))
+    frame = frame.with_row_index("__row")
+    return frame.sort([geo_column, date_column], maintain_order=True) if date_column else frame
+
+
+def _unsorted(frame, columns):
+    """Values of the columns in the original row order (nulls become NaN)"""
+    frame = frame.sort("__row")
+    return {col: frame[col].to_numpy() for col in columns}
+
+
+def transform_edited_df(df, edited_df, geo_column, dependent_variable, cache=None, date_column=None):
+    """
+    Applies the transformation table to the granular data, adding a '<channel>_transformed' column per row
+
+    The rows are sorted by (geo, date) once and every channel's lag, adstock and saturation is
+    computed as a polars window expression in a single pass, so the result does not depend on
+    the input's row order. Transformed columns are memoised on the source column's content and
+    the row's parameters, so re-processing after editing one row recomputes only that channel.
+    The output shares the untouched columns with df instead of copying them.
+
+    Args:
+        df (dataframe): Granular data
+        edited_df (dataframe): Transformation table in the Data Transformation page's layout
+        geo_column (string): Column the transformations are applied within
+        dependent_variable (string): Dependent variable
+        cache (TransformCache): Memo of transformed columns, defaults to the process-wide one
+        date_column (string): Period column; without it the rows are taken to be in period order
+
+    Returns
+        transformed_df (dataframe): df with the transformed columns appended
+    """
+    cache = get_transform_cache() if cache is None else cache
+    order_digest = None
+    transformed, pending = {}, {}
+
+    for _, row in edited_df.iterrows():
+        channel = row["Channel Name"]
+        params = _row_parameters(row)
+
+        if channel in df.columns:
+            # Case 1: No transformation
+            if params["sat_function"] is None and params["adstock_coeff"] is None and params["lags"] is None:
+                continue
+
+            # Cases 2 and 6: Adstock (with or without saturation) but no lag – invalid
+            if params["lags"] is None and params["adstock_coeff"] is not None:
+                raise ValueError("Please ensure value for Lag is not 'None' when applying Ad Stock")
+
+            if order_digest is None:
+                order_digest = column_digest(df[geo_column]) + (column_digest(df[date_column]) if date_column else "")
+            key = transform_key(column_digest(df[channel]), order_digest, params)
+            values = cache.get(key)
+            if values is None:
+                pending[f"{channel}_transformed"] = (key, transform_expression(channel, geo_column, params))
+            else:
+                transformed[f"{channel}_transformed"] = values
+
+    if pending:
+        channels = list(dict.fromkeys(col for col in df.columns if f"{col}_transformed" in pending))
+        frame = _sorted_frame(df, geo_column, date_column, channels)
+        frame = frame.with_columns([expr for _, expr in pending.values()])
+        for column, values in _unsorted(frame, list(pending)).items():
+            transformed[column] = cache.get_or_compute(pending[column][0], lambda: values)
+
+    # Keep the transformation table's order
+    order = [f"{row['Channel Name']}_transformed" for _, row in edited_df.iterrows()]
+    return df.assign(**{column: transformed[column] for column in order if column in transformed})
+
+
+def transform_panel(panel, edited_df):
+    """
+    Array equivalent of transform_edited_df on a Panel (proctimize.panel)
+
+    Lags and adstocks run along calendar periods with unobserved cells counted as no activity,
+    and the saturation scale is the mean over observed cells. The results match
+    transform_edited_df when every geo's periods are contiguous (geos may start and end at
+    different periods); across a gap inside a geo's history transform_edited_df carries over
+    from the previous row instead.
+
+    Args:
+        panel (Panel): Geo x period x channel panel of the untransformed data
+        edited_df (dataframe): Transformation table in the Data Transformation page's layout
+
+    Returns
+        matrices (dict): '<channel>_transformed' to its (geo x period) array
+    """
+    matrices = {}
+    for _, row in edited_df.iterrows():
+        channel = row["Channel Name"]
+        params = _row_parameters(row)
+        lags, adstock_coeff, sat_function = params["lags"], params["adstock_coeff"], params["sat_function"]
+
+        if channel not in panel.channel_index or (sat_function is None and adstock_coeff is None and lags is None):
+            continue
+        if lags is None and adstock_coeff is not None:
+            raise ValueError("Please ensure value for Lag is not 'None' when applying Ad Stock")
+
+        if lags is None:
+            matrix = panel.matrix(channel)
+        elif adstock_coeff is None:
+            matrix = panel.lag(channel, lags)
+        else:
+            matrix = panel.adstock(channel, lags, adstock_coeff, params["adstock_type"], params["adstock_shape"])
+
+        if sat_function is not None:
+            matrix = panel.saturate(channel, sat_function, params["power_k"], params["half_saturation"], matrix=matrix)
+        matrices[f"{channel}_transformed"] = matrix
+    return matrices
+
+
+def lagged_carryover(df, edited_df, geo_column, date_column=None):
+    """
+    Raw (unsaturated) lagged dependent variable used as the 'Carryover' channel
+
+    Args:
+        df (dataframe): Granular data containing the 'Carryover' column
+        edited_df (dataframe): Transformation table with 'Channel Name' and 'Lags'
+        geo_column (string): Column to lag within
+        date_column (string): Period column; without it the rows are taken to be in period order
+
+    Returns
+        lagged_series (series): Lagged carryover, None if no lagged 'Carryover' row is configured
+    """
+    rows = edited_df[edited_df["Channel Name"] == "Carryover"]
+    if "Carryover" not in df.columns or rows.empty or pd.isna(rows["Lags"].iloc[0]):
+        return None
+    lags = int(rows["Lags"].iloc[0])
+    frame = _sorted_frame(df, geo_column, date_column, ["Carryover"]).with_columns(
+        pl.col("Carryover").shift(lags, fill_value=0).over(geo_column).fill_nan(0).fill_null(0)
+    )
+    return pd.Series(_unsorted(frame, ["Carryover"])["Carryover"], index=df.index, name="Carryover")
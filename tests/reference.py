@@ -0,0 +1,123 @@
+"""
+Reference implementations the engines in proctimize replaced, kept as close to the
+originals as possible so that tests and benchmarks can check the new engines against them.
+Inputs are copied instead of modified in place, and numerical aggregations are passed to
+groupby.agg as (column, function) pairs (the original bare strings are rejected by
+named aggregation).
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+
+def last_working_day(year, month, work_days):
+    """Last working day of a month (row-wise original from pages/1_Data_Ingestion.py)"""
+    if month == 12:
+        month = 0
+        year += 1
+
+    last_day = datetime(year, month + 1, 1) - timedelta(days=1)
+
+    if work_days == 5:
+        while last_day.weekday() > 4:  # Friday is weekday 4
+            last_day -= timedelta(days=1)
+
+    return last_day
+
+
+def last_week_apportion(tactic_df, date_col_name, kpi_col_list, work_days):
+    """Row-wise last-week apportioning (original from pages/1_Data_Ingestion.py)"""
+    def rename_adjusted(kpi_name):
+        return "adjusted_" + kpi_name
+
+    tactic_df = tactic_df.copy()
+    tactic_df['month'] = tactic_df[date_col_name].dt.to_period('M')
+    last_working_day_dict = {month: last_working_day(month.year, month.month, work_days) for month in tactic_df['month'].unique()}
+    tactic_df['last_working_date'] = tactic_df['month'].map(last_working_day_dict)
+
+    tactic_df['day_diff'] = (tactic_df['last_working_date'] - tactic_df[date_col_name] + timedelta(days=1)).dt.days
+
+    adjusted_col_list = []
+    for kpi_name in kpi_col_list:
+        tactic_df[rename_adjusted(kpi_name)] = tactic_df.apply(lambda row: ((work_days - row['day_diff']) / work_days) * row[kpi_name] if row['day_diff'] < work_days else 0, axis=1)
+        adjusted_col_list.append(rename_adjusted(kpi_name))
+
+    for kpi_name in kpi_col_list:
+        tactic_df[kpi_name] = tactic_df[kpi_name] - tactic_df[rename_adjusted(kpi_name)]
+
+    new_rows = tactic_df[tactic_df[adjusted_col_list].gt(0).any(axis=1)].copy()
+    new_rows[date_col_name] = new_rows[date_col_name] + pd.offsets.MonthBegin()
+
+    for kpi_name in kpi_col_list:
+        new_rows[kpi_name] = new_rows[rename_adjusted(kpi_name)]
+
+    tactic_df = pd.concat([tactic_df, new_rows], ignore_index=True)
+    tactic_df.drop(['last_working_date', 'day_diff', 'month'], axis=1, inplace=True)
+
+    for adj_col in adjusted_col_list:
+        tactic_df.drop(adj_col, axis=1, inplace=True)
+
+    return tactic_df
+
+
+def modify_granularity_pandas(
+    df,
+    geo_column,
+    date_column,
+    granularity_level_df,
+    granularity_level_user_input,
+    work_days,
+    numerical_config_dict,
+    categorical_config_dict
+):
+    """pandas granularity change (original from pages/1_Data_Ingestion.py)"""
+    def get_agg_dict(numerical_dict, categorical_dict):
+        agg_dict = {}
+
+        for col, op in numerical_dict.items():
+            if op == "sum":
+                agg_dict[col] = (col, "sum")
+            elif op == "average":
+                agg_dict[col] = (col, "mean")
+            elif op == "min":
+                agg_dict[col] = (col, "min")
+            elif op == "max":
+                agg_dict[col] = (col, "max")
+            elif op == "product":
+                agg_dict[col] = (col, lambda x: np.prod(x.dropna()))
+
+        for col, op in categorical_dict.items():
+            if op == "count":
+                agg_dict[col] = (col, "count")
+            elif op == "distinct count":
+                agg_dict[col] = (col, pd.Series.nunique)
+
+        return agg_dict
+
+    if granularity_level_df == granularity_level_user_input:
+        selected_cols = [geo_column, date_column] + list(numerical_config_dict.keys()) + list(categorical_config_dict.keys())
+        return df[selected_cols], date_column
+
+    df = df.copy()
+    df[date_column] = pd.to_datetime(df[date_column])
+    agg_dict = get_agg_dict(numerical_config_dict, categorical_config_dict)
+
+    if granularity_level_df == "Daily" and granularity_level_user_input == "Weekly":
+        df["week_date"] = df[date_column] - pd.to_timedelta(df[date_column].dt.weekday, unit='D')
+        grouped = df.groupby([geo_column, "week_date"]).agg(**agg_dict).reset_index()
+        return grouped, "week_date"
+
+    elif granularity_level_df == "Daily" and granularity_level_user_input == "Monthly":
+        df["month_date"] = df[date_column].values.astype('datetime64[M]')
+        grouped = df.groupby([geo_column, "month_date"]).agg(**agg_dict).reset_index()
+        return grouped, "month_date"
+
+    elif granularity_level_df == "Weekly" and granularity_level_user_input == "Monthly":
+        df = last_week_apportion(df, date_column, list(numerical_config_dict.keys()), work_days)
+        df["month_date"] = df[date_column].values.astype('datetime64[M]')
+        grouped = df.groupby([geo_column, "month_date"]).agg(**agg_dict).reset_index()
+        return grouped, "month_date"
+
+    else:
+        raise ValueError("Unsupported granularity transformation")
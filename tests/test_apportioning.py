@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import polars as pl
+import pytest
+
+from proctimize.ingestion import last_week_apportion_lazy
+from tests.reference import last_week_apportion
+
+
+def weekly_frame(n_geos=20, n_weeks=60, seed=0):
+    rng = np.random.default_rng(seed)
+    weeks = pd.date_range("2022-12-26", periods=n_weeks, freq="W-MON")
+    df = pd.DataFrame({
+        "geo": np.repeat([f"G{i:03d}" for i in range(n_geos)], n_weeks),
+        "week": np.tile(weeks, n_geos),
+        "calls": rng.poisson(5, n_geos * n_weeks).astype(float),
+        "spend": rng.gamma(2.0, 50.0, n_geos * n_weeks),
+    })
+    # Rows without any activity must not produce carry-over rows
+    df.loc[df.index % 7 == 0, ["calls", "spend"]] = 0.0
+    return df
+
+
+def sorted_frame(df):
+    return df.sort_values(["geo", "week", "calls", "spend"]).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("work_days", [5, 7])
+def test_lazy_apportioning_matches_row_wise_original(work_days):
+    df = weekly_frame()
+    expected = last_week_apportion(df, "week", ["calls", "spend"], work_days)
+
+    result = last_week_apportion_lazy(pl.from_pandas(df).lazy(), "week", ["calls", "spend"], work_days).collect().to_pandas()
+    result["week"] = pd.to_datetime(result["week"]).astype(expected["week"].dtype)
+
+    assert len(result) == len(expected)
+    pd.testing.assert_frame_equal(sorted_frame(result), sorted_frame(expected), check_exact=False, rtol=1e-12)
+
+
+def test_apportioning_preserves_totals():
+    df = weekly_frame(seed=1)
+    result = last_week_apportion_lazy(pl.from_pandas(df).lazy(), "week", ["calls", "spend"], 5).collect()
+
+    assert result["calls"].sum() == pytest.approx(df["calls"].sum())
+    assert result["spend"].sum() == pytest.approx(df["spend"].sum())
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from proctimize.bayesian import fit_bayesian
+from proctimize.modelling import fit_ols
+
+
+def bayes_frame(n=400, seed=2):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.gamma(2.0, 5.0, size=(n, 3)), columns=["calls", "emails", "tv"])
+    df["sales"] = 20 + df @ [3.0, 1.0, 0.5] + rng.normal(0, 8, n)
+    return df
+
+
+def test_flat_priors_reproduce_ols():
+    df = bayes_frame()
+    channels = ["calls", "emails", "tv"]
+    ols = fit_ols(df, "sales", channels)
+    result = fit_bayesian(df, "sales", channels, n_draws=100, seed=0, noise_df=0)
+
+    np.testing.assert_allclose(result.params.to_numpy(), ols.params.to_numpy(), rtol=1e-10)
+    # Flat priors on the intercept and the slopes leave the OLS residual degrees of freedom
+    assert 2 * result.shape == ols.df_resid
+    X = df[channels].to_numpy() - df[channels].to_numpy().mean(axis=0)
+    posterior_scale = np.sqrt(result.scale / result.shape * np.diag(np.linalg.inv(X.T @ X)))
+    np.testing.assert_allclose(posterior_scale, ols.bse[channels].to_numpy(), rtol=1e-10)
+
+
+def test_proper_priors_match_the_closed_form_posterior():
+    df = bayes_frame()
+    channels = ["calls", "emails", "tv"]
+    priors = {"calls": (2.0, 0.5), "tv": (0.0, 0.1)}
+    result = fit_bayesian(df, "sales", channels, priors, n_draws=100, seed=0, noise_variance=50.0, noise_df=4.0)
+    assert result.noise_prior == (50.0, 4.0, "given")
+
+    X = df[channels].to_numpy() - df[channels].to_numpy().mean(axis=0)
+    y = df["sales"].to_numpy() - df["sales"].mean()
+    precision = np.diag([50.0 / 0.5 ** 2, 0.0, 50.0 / 0.1 ** 2])
+    mean = np.linalg.solve(X.T @ X + precision, X.T @ y + precision @ [2.0, 0.0, 0.0])
+    np.testing.assert_allclose(result.params[channels].to_numpy(), mean, rtol=1e-10)
+
+    # Only the intercept and the one flat-prior slope use up observations
+    assert 2 * result.shape == 4.0 + len(df) - 1 - 1
+    resid = y - X @ mean
+    offset = mean - [2.0, 0.0, 0.0]
+    assert result.scale == pytest.approx((4.0 * 50.0 + resid @ resid + offset @ precision @ offset) / 2, rel=1e-10)
+
+
+def test_default_noise_prior_is_the_ols_residual_variance():
+    df = bayes_frame()
+    result = fit_bayesian(df, "sales", ["calls", "emails", "tv"], {"calls": (0.0, 1.0)}, n_draws=100, seed=0)
+    ols = fit_ols(df, "sales", ["calls", "emails", "tv"])
+    assert result.noise_prior[0] == pytest.approx(ols.ssr / ols.df_resid, rel=1e-10)
+    assert result.noise_prior[2] == "OLS residual variance"
+    assert "OLS residual variance" in result.summary_text()
+
+    with pytest.raises(ValueError, match="noise variance"):
+        fit_bayesian(df, "sales", ["calls"], noise_variance=0.0)
@@ -0,0 +1,70 @@
+from datetime import date
+
+import polars as pl
+import pytest
+
+from proctimize.date_inference import infer_date_format, parse_dates
+
+
+def test_ambiguous_day_month_defaults_to_month_first():
+    result = infer_date_format(pl.Series(["8/8/2024", "8/8/2024"]))
+    assert result == {"format": "%m/%d/%Y", "failure_rate": 0.0, "ambiguous": True, "sample_size": 2}
+
+    parsed, date_format, failure_rate = parse_dates(pl.Series("week", ["8/8/2024", "3/4/2024"]))
+    assert date_format == "%m/%d/%Y"
+    assert parsed.to_list() == [date(2024, 8, 8), date(2024, 3, 4)]
+    assert failure_rate == 0.0
+
+
+def test_a_day_above_twelve_settles_the_order():
+    result = infer_date_format(pl.Series(["8/8/2024", "13/8/2024"]))
+    assert (result["format"], result["ambiguous"], result["failure_rate"]) == ("%d/%m/%Y", False, 0.0)
+
+    parsed, date_format, _ = parse_dates(pl.Series(["8/8/2024", "3/4/2024", "4/13/2024"]))
+    assert date_format == "%m/%d/%Y"
+    assert parsed.to_list() == [date(2024, 8, 8), date(2024, 3, 4), date(2024, 4, 13)]
+
+
+def test_ambiguous_order_follows_the_more_regular_spacing():
+    # Read day first these are consecutive days, month first the irregular first days of months
+    values = pl.Series([f"{day:02d}/01/2024" for day in range(1, 13)])
+    result = infer_date_format(values)
+    assert (result["format"], result["ambiguous"]) == ("%d/%m/%Y", True)
+
+
+def test_failure_rate_counts_unparseable_values():
+    values = pl.Series("Date", ["2024-01-01", "2024-01-08", "n/a", None, "", "2024-13-01", "2024-01-22", "2024-01-29"])
+    result = infer_date_format(values)
+    # Null and empty values are left out of the sample
+    assert result["format"] == "%Y-%m-%d"
+    assert result["sample_size"] == 6
+    assert result["failure_rate"] == pytest.approx(2 / 6)
+
+    parsed, date_format, failure_rate = parse_dates(values)
+    assert date_format == "%Y-%m-%d"
+    assert parsed.null_count() == 4
+    assert failure_rate == pytest.approx(2 / 6)
+
+
+def test_datetime_strings_are_truncated_to_dates():
+    values = pl.Series(["2024-03-01 10:15:00", "2024-03-02 23:59:59"])
+    parsed, date_format, failure_rate = parse_dates(values)
+    assert date_format == "%Y-%m-%d %H:%M:%S"
+    assert parsed.dtype == pl.Date
+    assert parsed.to_list() == [date(2024, 3, 1), date(2024, 3, 2)]
+    assert failure_rate == 0.0
+
+    assert parse_dates(pl.Series(["2024-03-01T10:15:00"]))[1] == "%Y-%m-%dT%H:%M:%S"
+    timestamps = pl.Series([None, "2024-03-01 10:15:00"]).str.to_datetime()
+    parsed, date_format, failure_rate = parse_dates(timestamps)
+    assert parsed.to_list() == [None, date(2024, 3, 1)]
+    assert (date_format, failure_rate) == (None, 0.0)
+
+
+def test_all_null_column_has_no_format():
+    values = pl.Series("Date", [None, None, None], dtype=pl.Utf8)
+    assert infer_date_format(values) == {"format": None, "failure_rate": 1.0, "ambiguous": False, "sample_size": 0}
+
+    parsed, date_format, failure_rate = parse_dates(values)
+    assert parsed.dtype == pl.Date and parsed.null_count() == 3 and parsed.name == "Date"
+    assert (date_format, failure_rate) == (None, 1.0)
@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+import polars as pl
+import pytest
+
+from proctimize import file_cache
+from proctimize.file_cache import ParseCache, read_csvs_parallel
+
+
+def frame(seed, n=20_000):
+    return pl.DataFrame({"x": np.random.default_rng(seed).normal(size=n)})
+
+
+def spilled_bytes(cache):
+    return sum(os.path.getsize(os.path.join(cache.spill_dir, name)) for name in os.listdir(cache.spill_dir))
+
+
+def test_evicted_frames_are_read_back_from_the_spill(tmp_path):
+    cache = ParseCache(max_memory_mb=0.2, spill_dir=str(tmp_path), max_spill_mb=10)
+    frames = {f"k{i}": frame(i) for i in range(5)}
+    for key, df in frames.items():
+        cache.get_or_compute(key, lambda df=df: df)
+
+    assert len(cache._entries) == 1
+    for key, df in frames.items():
+        assert cache.get(key).equals(df)
+
+
+def test_spill_is_bounded_on_disk(tmp_path):
+    cache = ParseCache(max_memory_mb=0.01, spill_dir=str(tmp_path), max_spill_mb=0.5)
+    for i in range(20):
+        cache.get_or_compute(f"k{i}", lambda i=i: frame(i))
+
+    assert spilled_bytes(cache) <= 0.5 * 1024 * 1024
+    assert cache.spill_mb <= 0.5
+    # The oldest frames were deleted from disk and are recomputed
+    assert cache.get("k0") is None
+    assert cache.get("k18") is not None
+
+
+def test_digest_memo_is_capped(monkeypatch):
+    class Upload:
+        def __init__(self, file_id):
+            self.file_id = file_id
+
+        def getvalue(self):
+            return self.file_id.encode()
+
+    monkeypatch.setattr(file_cache, "MAX_DIGEST_MEMO", 3)
+    monkeypatch.setattr(file_cache, "_digest_memo", type(file_cache._digest_memo)())
+    for i in range(10):
+        file_cache.file_digest(Upload(f"upload-{i}"))
+    assert list(file_cache._digest_memo) == ["upload-7", "upload-8", "upload-9"]
+
+
+def test_parallel_reads_report_errors_per_file_in_input_order(tmp_path):
+    rng = np.random.default_rng(11)
+    tasks = {}
+    # The first file is the largest, so it finishes last
+    for name, n in [("large.csv", 200_000), ("small.csv", 10), ("medium.csv", 5_000)]:
+        path = tmp_path / name
+        pl.DataFrame({"geo": rng.integers(0, 100, n), "calls": rng.normal(size=n)}).write_csv(path)
+        tasks[name] = (str(path), {})
+    (tmp_path / "ragged.csv").write_text("geo,calls\n1,2.0\n3,4.0,5,6\n")
+    tasks = {"large.csv": tasks["large.csv"], "ragged.csv": (str(tmp_path / "ragged.csv"), {}),
+             "small.csv": tasks["small.csv"], "medium.csv": (tasks["medium.csv"][0], {"columns": ["calls"]})}
+
+    frames, errors = read_csvs_parallel(tasks, max_workers=4)
+    assert list(frames) == ["large.csv", "small.csv", "medium.csv"]
+    assert list(errors) == ["ragged.csv"]
+    assert isinstance(errors["ragged.csv"], pl.exceptions.ComputeError)
+
+    for key, df in frames.items():
+        path, read_options = tasks[key]
+        assert df.equals(pl.read_csv(path, **read_options))
+    assert frames["medium.csv"].columns == ["calls"]
+
+    # A failed parse is not cached
+    with pytest.raises(pl.exceptions.ComputeError):
+        file_cache.read_csv_cached(str(tmp_path / "ragged.csv"))
@@ -0,0 +1,40 @@
+import datetime as dt
+
+import polars as pl
+
+from proctimize.filtering import (
+    BLANK_LABEL, categorical_condition, combine_conditions, dataset_fingerprint, distinct_value_counts, numeric_condition
+)
+from proctimize.recipe import file_recipe
+
+
+def recipes(rename):
+    return [file_recipe("calls.csv", ["hcp", "week", "calls"], rename, {"week": "%Y-%m-%d"})]
+
+
+def test_dataset_fingerprint_follows_contents_and_choices():
+    data = b"hcp,week,calls\na,2024-01-01,1\n"
+    base = dataset_fingerprint([data], recipes({}), None, "week")
+
+    assert dataset_fingerprint([bytes(data)], recipes({}), None, "week") == base
+    assert dataset_fingerprint([data + b"b,2024-01-08,2\n"], recipes({}), None, "week") != base
+    assert dataset_fingerprint([data], recipes({"calls": "hcp_calls"}), None, "week") != base
+    assert dataset_fingerprint([data], recipes({}), None, "hcp") != base
+
+
+def test_distinct_values_and_combined_filter():
+    df = pl.DataFrame({
+        "segment": ["x", "y", None, " ", "x"],
+        "value": [1.0, 2.0, 3.0, 4.0, 5.0],
+        "date": [dt.date(2024, 1, day) for day in range(1, 6)],
+    })
+    fingerprint = dataset_fingerprint([b"segments"], [], None, "date")
+    counts = distinct_value_counts(df, "segment", fingerprint)
+    assert counts == {BLANK_LABEL: 2, "x": 2, "y": 1}
+
+    predicate = combine_conditions([
+        pl.col("date").is_between(dt.date(2024, 1, 1), dt.date(2024, 1, 4)),
+        categorical_condition("segment", ["x", BLANK_LABEL], list(counts)),
+        numeric_condition("value", "Greater than", 1.0, pl.Float64),
+    ])
+    assert df.filter(predicate)["value"].to_list() == [3.0, 4.0]
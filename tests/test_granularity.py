@@ -0,0 +1,93 @@
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import polars as pl
+import pytest
+
+from proctimize.date_inference import date_parse_expr
+from proctimize.ingestion import modify_granularity, stream_granularity
+from tests.reference import modify_granularity_pandas
+
+NUMERICAL = {"calls": "sum", "reach": "average", "index": "product", "low": "min", "high": "max"}
+CATEGORICAL = {"rep": "count", "segment": "distinct count"}
+
+
+def activity_frame(freq, periods, n_geos=15, seed=0):
+    rng = np.random.default_rng(seed)
+    n = n_geos * periods
+    dates = pd.date_range("2023-01-02", periods=periods, freq=freq)
+    df = pd.DataFrame({
+        "geo": np.repeat([f"G{i:02d}" for i in range(n_geos)], periods),
+        "date": np.tile(dates, n_geos),
+        "calls": rng.poisson(4, n).astype(float),
+        "reach": rng.normal(10, 3, n),
+        "index": rng.uniform(0.9, 1.1, n) * np.where(rng.random(n) < 0.05, -1, 1),
+        "low": rng.normal(0, 1, n),
+        "high": rng.normal(0, 1, n),
+        "rep": rng.choice(["a", "b", "c", None], n),
+        "segment": rng.choice(["x", "y", None], n),
+    })
+    df.loc[rng.random(n) < 0.05, "reach"] = np.nan
+    # Shuffle: the engine must not depend on the input order
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("source, target, freq, periods", [
+    ("Daily", "Weekly", "D", 120),
+    ("Daily", "Monthly", "D", 120),
+    ("Weekly", "Monthly", "W-MON", 60),
+])
+@pytest.mark.parametrize("work_days", [5, 7])
+def test_polars_granularity_matches_pandas_original(source, target, freq, periods, work_days):
+    df = activity_frame(freq, periods)
+    expected, expected_date = modify_granularity_pandas(df, "geo", "date", source, target, work_days, NUMERICAL, CATEGORICAL)
+
+    result, date_col = modify_granularity(pl.from_pandas(df), "geo", "date", source, target, work_days, NUMERICAL, CATEGORICAL)
+    result = result.to_pandas()
+    result[date_col] = pd.to_datetime(result[date_col]).astype(expected[expected_date].dtype)
+
+    assert date_col == expected_date
+    pd.testing.assert_frame_equal(
+        result[list(expected.columns)], expected, check_dtype=False, check_exact=False, rtol=1e-9
+    )
+
+
+@pytest.mark.parametrize("target, first", [("Quarterly", "2023-01-01"), ("Yearly", "2023-01-01")])
+def test_quarterly_and_yearly_sums(target, first):
+    df = activity_frame("D", 400)
+    result, date_col = modify_granularity(pl.from_pandas(df), "geo", "date", "Daily", target, 5, {"calls": "sum"}, {})
+
+    period = "Q" if target == "Quarterly" else "Y"
+    expected = df.groupby(["geo", df["date"].dt.to_period(period).dt.start_time])["calls"].sum()
+    assert result[date_col].min() == pd.Timestamp(first).date()
+    np.testing.assert_allclose(result["calls"].to_numpy(), expected.to_numpy())
+
+
+def test_unsupported_direction_raises():
+    df = pl.from_pandas(activity_frame("W-MON", 10))
+    with pytest.raises(ValueError):
+        modify_granularity(df, "geo", "date", "Monthly", "Weekly", 5, {"calls": "sum"}, {})
+
+
+SAMPLE_CALLS = str(Path(__file__).parents[1] / "input_data" / "Data Ingestion Page Inputs" / "raw_calls_file*.csv")
+
+
+@pytest.mark.parametrize("target", ["Weekly", "Monthly"])
+def test_streaming_matches_in_memory_granularity_on_the_sample_files(target):
+    categorical = {"call_type": "count", "territory": "distinct count"}
+    start, end = date(2024, 3, 1), date(2024, 10, 31)
+    filters = {"call_record_type": ["Non-Sampled Call"], "call_type": ["Detail Only", "Detail with Sample"]}
+    # A tiny budget, so the files are streamed in many small batches
+    streamed, streamed_date = stream_granularity(SAMPLE_CALLS, "account_npi", "date", "%m/%d/%Y", start, end, filters,
+                                                 "Daily", target, 5, {}, categorical, memory_budget_mb=1)
+
+    df = pl.read_csv(SAMPLE_CALLS).with_columns(date_parse_expr(pl.col("date"), "%m/%d/%Y"))
+    df = df.filter(pl.col("date").is_between(start, end) & pl.col("call_record_type").is_in(filters["call_record_type"])
+                   & pl.col("call_type").is_in(filters["call_type"]))
+    expected, expected_date = modify_granularity(df, "account_npi", "date", "Daily", target, 5, {}, categorical)
+
+    assert streamed_date == expected_date
+    assert streamed.height == expected.height > 1000
+    assert streamed.equals(expected.select(streamed.columns))
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from proctimize.grid_search import best_transformations, search_transformations
+from proctimize.panel import Panel
+from proctimize.transformation import transform_panel
+from tests.test_transformation import staggered_frame, table
+
+
+def sales_panel():
+    df = staggered_frame()
+    df["sales"] = 3.0 * df["calls"] + 10.0 * df["emails"] + np.random.default_rng(1).normal(0, 5, len(df))
+    return Panel.from_frame(df, "geo", "week", ["calls", "emails", "sales"])
+
+
+def expected_score(panel, row, start):
+    """Correlation of the page's transformation of one table row with sales, over the observed window"""
+    matrix = transform_panel(panel, table([row]))[f"{row[0]}_transformed"]
+    lo = panel.periods.searchsorted(pd.Timestamp(start))
+    scored = panel.observed[:, lo:]
+    return np.corrcoef(matrix[:, lo:][scored], panel.matrix("sales")[:, lo:][scored])[0, 1]
+
+
+@pytest.mark.parametrize("adstock_type, adstock_shape", [
+    ("Geometric", None), ("Weibull", 0.7), ("Delayed", 1.0), ("Infinite", None)
+])
+def test_scores_match_transformation_over_observed_cells(adstock_type, adstock_shape):
+    panel = sales_panel()
+    start = panel.periods[10]
+    results = search_transformations(
+        panel, ["calls"], "sales", start=start, lags=[2], adstock=[0.6], saturation=["Hill"], power=[1.5],
+        half_saturation=[1.0], adstock_type=adstock_type, adstock_shape=adstock_shape, workers=1
+    )
+    assert len(results) == 1
+    candidate = results.iloc[0]
+    assert candidate["Adstock Type"] == adstock_type
+    row = ["calls", 2, 0.6, adstock_type, adstock_shape, "Hill", 1.5, 1.0]
+    assert candidate["Score"] == pytest.approx(expected_score(panel, row, start), rel=1e-10)
+
+
+def test_worker_pool_matches_in_process_search():
+    panel = sales_panel()
+    grid = dict(lags=[None, 0, 2], adstock=[None, 0.3, 0.7], saturation=[None, "Log", "Power"], power=[0.5])
+    for scoring, controls in [("correlation", None), ("partial_fit", ["emails"])]:
+        serial = search_transformations(panel, ["calls"], "sales", scoring=scoring, controls=controls, workers=1, **grid)
+        pooled = search_transformations(panel, ["calls"], "sales", scoring=scoring, controls=controls, workers=2, **grid)
+        pd.testing.assert_frame_equal(serial, pooled)
+    assert best_transformations(pooled)["Channel Name"].tolist() == ["calls"]
+
+
+def test_unknown_adstock_type_is_rejected():
+    with pytest.raises(ValueError, match="Adstock Type"):
+        search_transformations(sales_panel(), ["calls"], "sales", adstock_type="Hyperbolic", workers=1)
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import polars as pl
+import pytest
+
+from proctimize.ingestion import (
+    build_file_plan, join_key_stats, merge_file_plans, plan_join_order, scan_uploaded_csv
+)
+
+
+def channel_files(tmp_path, seed=0):
+    """Three extracts keyed on (geo, week): unique keys, a fanned-out key set and a smaller unique set"""
+    rng = np.random.default_rng(seed)
+    keys = pd.DataFrame([(f"G{g:02d}", f"2024-01-{d:02d}") for g in range(10) for d in (1, 8, 15, 22, 29)],
+                        columns=["geo", "week"])
+    calls = keys.assign(calls=rng.poisson(5, len(keys)), rep=rng.choice(["a", "b"], len(keys)))
+    calls.loc[3, "geo"] = None  # a null key, ignored by the statistics and the join
+
+    samples = keys.sample(40, random_state=seed)
+    samples = samples.loc[samples.index.repeat(rng.integers(1, 4, len(samples)))].reset_index(drop=True)
+    samples["samples"] = rng.poisson(2, len(samples))
+
+    sales = keys.sample(30, random_state=seed + 1).assign(sales=rng.gamma(2.0, 50.0, 30))
+
+    paths = []
+    for name, df in [("calls", calls), ("samples", samples), ("sales", sales)]:
+        paths.append(str(tmp_path / f"{name}.csv"))
+        df.to_csv(paths[-1], index=False)
+    return paths, [calls, samples, sales]
+
+
+def plans_of(paths, frames):
+    return [build_file_plan(scan_uploaded_csv(path), list(df.columns), {}, {}) for path, df in zip(paths, frames)]
+
+
+def sorted_frame(df, columns):
+    return df[columns].sort_values(columns).reset_index(drop=True)
+
+
+def test_key_statistics_report_the_fan_out(tmp_path):
+    paths, frames = channel_files(tmp_path)
+    stats = join_key_stats(plans_of(paths, frames), ["geo", "week"], paths)
+
+    assert stats["file"].tolist() == ["calls.csv", "samples.csv", "sales.csv"]
+    for (_, row), df in zip(stats.iterrows(), frames):
+        counts = df.dropna(subset=["geo", "week"]).groupby(["geo", "week"]).size()
+        assert (row["rows"], row["distinct_keys"], row["duplicated_keys"], row["max_rows_per_key"]) == (
+            counts.sum(), len(counts), (counts > 1).sum(), counts.max()
+        )
+    # Only the samples file fans out, which is what the page warns about
+    assert stats.loc[stats["duplicated_keys"] > 0, "file"].tolist() == ["samples.csv"]
+    assert stats["max_rows_per_key"].tolist()[1] == 3
+
+
+def test_pre_aggregation_leaves_one_row_per_key(tmp_path):
+    paths, frames = channel_files(tmp_path)
+    plans = plans_of(paths, frames)
+    stats = join_key_stats(plans, ["geo", "week"], paths)
+    merged = merge_file_plans(plans, "Horizontal Join", ["geo", "week"], "inner", stats, pre_aggregate=True).collect()
+
+    calls, samples, sales = frames
+    totals = samples.groupby(["geo", "week"], as_index=False)["samples"].sum()
+    expected = calls.dropna(subset=["geo"]).merge(totals, on=["geo", "week"]).merge(sales, on=["geo", "week"])
+    assert merged.height == len(expected) == merged.select(["geo", "week"]).n_unique()
+    columns = ["geo", "week", "calls", "rep", "samples", "sales"]
+    pd.testing.assert_frame_equal(sorted_frame(merged.to_pandas(), columns), sorted_frame(expected, columns),
+                                  check_dtype=False)
+
+
+@pytest.mark.parametrize("join_type", ["inner", "left"])
+def test_reordered_joins_match_left_to_right_merges(tmp_path, join_type):
+    paths, frames = channel_files(tmp_path)
+    plans = plans_of(paths, frames)
+    stats = join_key_stats(plans, ["geo", "week"], paths)
+
+    order = plan_join_order(plans, ["geo", "week"], join_type, stats)
+    # Inner joins start from the fewest distinct keys; left joins keep the base and fan out last
+    assert order == ([2, 1, 0] if join_type == "inner" else [0, 2, 1])
+
+    merged = merge_file_plans(plans, "Horizontal Join", ["geo", "week"], join_type, stats).collect().to_pandas()
+    calls, samples, sales = frames
+    expected = calls.merge(samples, on=["geo", "week"], how=join_type).merge(sales, on=["geo", "week"], how=join_type)
+    expected = expected.dropna(subset=["geo", "week"])
+
+    assert len(merged) > len(merged[["geo", "week"]].drop_duplicates())  # the fan-out is kept
+    assert list(merged.columns) == list(expected.columns)
+    columns = list(expected.columns)
+    pd.testing.assert_frame_equal(sorted_frame(merged, columns), sorted_frame(expected, columns), check_dtype=False)
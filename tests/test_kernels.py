@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from proctimize.kernels import numba, recursive_adstock
+from proctimize.transformation import adstock_matrix, apply_adstock
+
+
+def activity(seed=0, shape=(7, 60)):
+    return np.random.default_rng(seed).gamma(2.0, 10.0, size=shape)
+
+
+@pytest.mark.skipif(numba is None, reason="Numba is not installed")
+@pytest.mark.parametrize("decay", [0.0, 0.35, 0.9, 1.0])
+def test_recursive_adstock_backends_agree(decay):
+    matrix = activity()
+    np.testing.assert_array_equal(
+        recursive_adstock(matrix, decay, backend="numba"), recursive_adstock(matrix, decay, backend="numpy")
+    )
+
+
+@pytest.mark.parametrize("backend", ["numba", "numpy"])
+def test_recursive_adstock_is_the_untruncated_geometric_adstock(backend):
+    matrix = activity(1)
+    n_periods = matrix.shape[1]
+    np.testing.assert_allclose(
+        recursive_adstock(matrix, 0.6, backend=backend), adstock_matrix(matrix, n_periods - 1, 0.6), rtol=1e-12
+    )
+
+
+def test_recursive_adstock_keeps_leading_axes():
+    matrix = activity(2, shape=(3, 4, 25))
+    adstocked = recursive_adstock(matrix, 0.5)
+    assert adstocked.shape == matrix.shape
+    np.testing.assert_array_equal(adstocked[1, 2], recursive_adstock(matrix[1, 2], 0.5))
+
+
+def test_infinite_adstock_ignores_lags():
+    matrix = activity(3)
+    np.testing.assert_array_equal(apply_adstock(matrix, 1, 0.4, "Infinite"), apply_adstock(matrix, 8, 0.4, "Infinite"))
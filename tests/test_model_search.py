@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from proctimize import model_search
+from proctimize.model_search import candidate_models, search_models
+from proctimize.modelling import fit_ols, modeling_windows
+
+
+def modelling_frames(n_geos=20, n_periods=104, seed=0):
+    """Granular (raw activity and spend) and transformed weekly data over two years"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2023-01-02", periods=n_periods, freq="W-MON")
+    granular = pd.DataFrame({
+        "Date": np.tile(dates, n_geos),
+        "geo": np.repeat([f"G{g:02d}" for g in range(n_geos)], n_periods),
+    })
+    for channel in ["calls", "emails", "tv"]:
+        granular[channel] = rng.gamma(2.0, 10.0, len(granular))
+        granular[f"{channel} Spend"] = granular[channel] * rng.uniform(5, 20)
+    granular["sales"] = 50 + granular[["calls", "emails", "tv"]] @ [3.0, 1.0, 0.2] + rng.normal(0, 10, len(granular))
+
+    transformed = granular[["Date", "geo", "sales"]].copy()
+    for channel in ["calls", "emails", "tv"]:
+        transformed[f"{channel}_transformed"] = np.sqrt(granular[channel])
+    return transformed, granular
+
+
+def test_search_ranks_the_same_fits_in_a_worker_pool(monkeypatch):
+    monkeypatch.setattr(model_search, "CANDIDATES_PER_TASK", 2)  # several tasks, so the pool is used
+    transformed, granular = modelling_frames()
+    windows = [(pd.Timestamp("2024-01-01").date(), pd.Timestamp("2024-12-30").date()),
+               (pd.Timestamp("2024-04-01").date(), pd.Timestamp("2024-12-30").date())]
+    candidates = candidate_models(["calls_transformed"], ["emails_transformed", "tv_transformed"], windows)
+
+    serial = search_models(transformed, granular, "Date", "sales", "sales", candidates, workers=1)
+    pooled = search_models(transformed, granular, "Date", "sales", "sales", candidates, workers=2)
+    pd.testing.assert_frame_equal(serial, pooled)
+
+    best = serial.iloc[0]
+    window, _, _ = modeling_windows(transformed, granular, "Date", best["Start Date"], best["End Date"])
+    expected = fit_ols(window, "sales", best["Channels"].split(", "))
+    assert best["Adj. R-squared"] == pytest.approx(expected.rsquared_adj, rel=1e-9)
+    assert best["AIC"] == pytest.approx(expected.aic, rel=1e-9)
@@ -0,0 +1,91 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from proctimize.modelling import coefficient_table, fit_ols, modeling_windows
+from proctimize.pipeline import load_brands, run_pipeline
+
+
+@pytest.fixture
+def brand(tmp_path):
+    """Tiny HCP extract and a config running every stage after ingest"""
+    rng = np.random.default_rng(0)
+    rows = []
+    for hcp in range(12):
+        for week in pd.date_range("2022-01-03", periods=110, freq="W-MON"):
+            calls = rng.poisson(4)
+            rows.append((f"H{hcp}", week.date().isoformat(), 10000 + hcp % 3, calls, 150.0 * calls, 5 + 2 * calls + rng.normal()))
+    pd.DataFrame(rows, columns=["hcp_id", "week", "zip", "calls", "calls_spend", "sales"]).to_csv(tmp_path / "hcp.csv", index=False)
+
+    config = {
+        "name": "tiny",
+        "output_dir": "out",
+        "integrate": {"granularity": "Weekly", "hcp": [{
+            "file": "hcp.csv", "hcp_col": "hcp_id", "date_col": "week", "zip_col": "zip",
+            "columns": ["calls", "calls_spend", "sales"], "rename": {"calls": "hcp_calls", "calls_spend": "hcp_calls Spend"}
+        }]},
+        "transform": {"dependent_variable": "sales", "carryover_lags": 1, "channels": [
+            {"channel": "hcp_calls", "lags": 1, "adstock": 0.5, "saturation": "Power", "power": 0.5}
+        ]},
+        "model": {"channels": ["hcp_calls", "Carryover"]},
+        "curves": {"start": 100, "stop": 200000, "step": 100, "price": 49.6},
+        "optimize": {"type": "Budget Goal", "target": 50000, "step": 100},
+    }
+    (tmp_path / "tiny.json").write_text(json.dumps(config))
+    (config, base_dir), = load_brands(str(tmp_path / "tiny.json"))
+    return config, base_dir
+
+
+def statuses(summary):
+    return {stage: info["status"] for stage, info in summary["stages"].items()}
+
+
+def test_second_run_reuses_every_stage(brand):
+    config, base_dir = brand
+    assert set(statuses(run_pipeline(config, base_dir)).values()) == {"ran"}
+    assert set(statuses(run_pipeline(config, base_dir)).values()) == {"reused"}
+
+
+def test_force_reruns_the_stage_and_every_later_stage(brand):
+    config, base_dir = brand
+    run_pipeline(config, base_dir)
+    assert statuses(run_pipeline(config, base_dir, ["model"])) == {
+        "integrate": "reused", "transform": "reused", "model": "ran", "curves": "ran", "optimize": "ran"
+    }
+    assert set(statuses(run_pipeline(config, base_dir, ["all"])).values()) == {"ran"}
+
+
+def test_changed_settings_rerun_from_that_stage(brand):
+    config, base_dir = brand
+    run_pipeline(config, base_dir)
+    config["curves"]["price"] = 60.0
+    assert statuses(run_pipeline(config, base_dir)) == {
+        "integrate": "reused", "transform": "reused", "model": "reused", "curves": "ran", "optimize": "ran"
+    }
+
+
+def test_model_stage_matches_the_modelling_engine(brand):
+    config, base_dir = brand
+    summary = run_pipeline(config, base_dir)
+    out = summary["output_dir"]
+
+    transformed = pd.read_parquet(f"{out}/transform/transformed.parquet")
+    granular = pd.read_parquet(f"{out}/transform/granular.parquet")
+    with open(f"{out}/model/window.json", encoding="utf-8") as f:
+        window = json.load(f)
+    start, end = pd.Timestamp(window["start_date"]).date(), pd.Timestamp(window["end_date"]).date()
+    transformed_window, granular_window, granular_prior = modeling_windows(transformed, granular, "Date", start, end)
+
+    channels = ["hcp_calls_transformed", "Carryover_transformed"]
+    model = fit_ols(transformed_window, "sales", channels)
+    expected, long_term_factor = coefficient_table(model.params, transformed_window, granular_window, granular_prior,
+                                                   "sales", "sales")
+    coefficients = pd.read_csv(f"{out}/model/coefficients.csv")
+
+    assert coefficients["Variable"].tolist() == expected["Variable"].tolist()
+    for column in ["Coefficient", "Impactable Sales", "ROI"]:
+        np.testing.assert_allclose(coefficients[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float),
+                                   rtol=1e-9, err_msg=column)
+    assert window["long_term_factor"] == pytest.approx(long_term_factor, rel=1e-9)
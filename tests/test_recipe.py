@@ -0,0 +1,93 @@
+import glob
+import os
+from datetime import date, timedelta
+
+import pandas as pd
+import polars as pl
+import pytest
+
+from proctimize import batch
+from proctimize.filtering import categorical_condition, combine_conditions
+from proctimize.ingestion import (
+    build_file_plan, merge_file_plans, modify_granularity, normalize_columns, parse_date_like_columns,
+    scan_uploaded_csv
+)
+from proctimize.recipe import dumps_recipe, file_recipe, load_recipe, new_recipe, run_recipe
+from tests.test_granularity import SAMPLE_CALLS
+
+SAMPLE_FILES = sorted(glob.glob(SAMPLE_CALLS))
+COLUMNS = ["account_npi", "call_type", "date", "territory"]
+RENAME = {"account_npi": "npi"}
+DATE_FORMATS = {"date": "%m/%d/%Y"}
+START, END = date(2024, 3, 1), date(2024, 10, 31)
+CALL_TYPES = ["Detail Only", "Detail with Sample"]
+GRANULARITY = {
+    "geo_column": "npi", "date_column": "date", "source": "Daily", "target": "Weekly", "work_days": 7,
+    "numerical": {}, "categorical": {"call_type": "count", "territory": "distinct count"},
+}
+
+
+def page_output(files):
+    """The Data Ingestion page's steps for the recipe below, run through the same engines"""
+    plans = [build_file_plan(scan_uploaded_csv(file), COLUMNS, RENAME, DATE_FORMATS) for file in files]
+    df = parse_date_like_columns(merge_file_plans(plans, "Vertical Stack", ["npi"]).collect())
+
+    call_types = sorted(df["call_type"].unique().to_list())
+    predicate = combine_conditions([pl.col("date").is_between(START, END),
+                                    categorical_condition("call_type", CALL_TYPES, call_types)])
+    df = df.lazy().filter(predicate).collect()
+
+    df, _ = modify_granularity(df, "npi", "date", "Daily", "Weekly", 7, {}, GRANULARITY["categorical"])
+    df = normalize_columns(df.to_pandas(), ["call_type"], method="zscore").rename(columns={"npi": "HCP_ID"})
+    return pl.from_pandas(df).with_columns(pl.col("week_date").cast(pl.Date))
+
+
+def write_recipe(path):
+    recipe = new_recipe("calls")
+    recipe["files"] = [file_recipe(os.path.basename(file), COLUMNS, RENAME, DATE_FORMATS) for file in SAMPLE_FILES]
+    recipe["merge"] = {"strategy": "Vertical Stack", "join_keys": ["npi"], "join_type": "inner", "pre_aggregate": False}
+    recipe["filters"] = {"date_column": "date", "start_date": START, "end_date": END,
+                         "categorical": {"call_type": CALL_TYPES}, "numeric": []}
+    recipe["granularity"] = GRANULARITY
+    recipe["normalize"] = [{"columns": ["call_type"], "method": "zscore"}]
+    recipe["output_rename"] = {"npi": "HCP_ID"}
+    path.write_text(dumps_recipe(recipe))
+    return str(path)
+
+
+def test_exported_recipe_replays_the_page(tmp_path):
+    recipe = load_recipe(write_recipe(tmp_path / "calls.json"))
+    result = run_recipe(recipe, SAMPLE_FILES)
+    expected = page_output(SAMPLE_FILES)
+
+    assert result.columns == expected.columns
+    assert result.height == expected.height > 1000
+    # Weeks are labelled by their Monday, which may fall before the start of the date filter
+    assert result["week_date"].min() > START - timedelta(days=7) and result["week_date"].max() <= END
+    pd.testing.assert_frame_equal(result.to_pandas(), expected.to_pandas(), check_exact=False, rtol=1e-12)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_a_failing_batch_job_does_not_stop_the_others(tmp_path, capsys, workers):
+    write_recipe(tmp_path / "calls.json")
+    manifest = {
+        "input_dir": os.path.dirname(SAMPLE_FILES[0]),
+        "output_dir": "out",
+        "jobs": [
+            {"recipe": "calls.json", "name": "calls"},
+            {"recipe": "calls.json", "name": "broken", "files": ["raw_calls_file1.csv", "missing_file.csv", "raw_calls_file3.csv"]},
+            {"recipe": "calls.json", "name": "calls_reversed", "files": [os.path.basename(f) for f in SAMPLE_FILES[::-1]]},
+        ],
+    }
+    (tmp_path / "manifest.json").write_text(dumps_recipe(manifest))
+
+    assert batch.main(["--manifest", str(tmp_path / "manifest.json"), "--workers", str(workers)]) == 1
+    out, err = capsys.readouterr()
+    assert "❌ broken" in err and "missing_file.csv" in err
+    assert "✅ calls:" in out and "✅ calls_reversed:" in out
+
+    assert not (tmp_path / "out" / "broken.parquet").exists()
+    expected = page_output(SAMPLE_FILES)
+    for name in ["calls", "calls_reversed"]:
+        written = pl.read_parquet(tmp_path / "out" / f"{name}.parquet").sort(["HCP_ID", "week_date"])
+        assert written.equals(expected.sort(["HCP_ID", "week_date"]))
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.api as sm
+from scipy.optimize import lsq_linear
+
+from proctimize.modelling import coefficient_bounds, fit_ols, fit_ols_parquet
+from proctimize.regression import fit_fixed_effects, fit_least_squares
+
+
+def ols_frame(n=2000, seed=0):
+    """Regressors on very different scales, as spend and activity columns are"""
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.gamma(2.0, 3.0, size=(n, 3)) * [1, 100, 1e4], columns=["calls_transformed", "emails", "tv Spend"])
+    return X.assign(sales=5 + X @ [2, 0.03, 1e-4] + rng.normal(size=n))
+
+
+def test_ols_matches_statsmodels():
+    df = ols_frame()
+    channels = ["calls_transformed", "emails", "tv Spend"]
+    result = fit_ols(df, "sales", channels)
+    expected = sm.OLS(df["sales"], sm.add_constant(df[channels])).fit()
+
+    for attribute in ["params", "bse", "tvalues", "pvalues"]:
+        np.testing.assert_allclose(getattr(result, attribute).to_numpy(), getattr(expected, attribute).to_numpy(),
+                                   rtol=1e-8, err_msg=attribute)
+    for attribute in ["rsquared", "rsquared_adj", "fvalue", "llf", "aic", "bic", "df_model", "df_resid"]:
+        assert getattr(result, attribute) == pytest.approx(getattr(expected, attribute), rel=1e-8), attribute
+    np.testing.assert_allclose(result.conf_int().to_numpy(), expected.conf_int().to_numpy(), rtol=1e-8)
+
+
+@pytest.mark.filterwarnings("ignore:The design matrix is rank-deficient")
+def test_ols_on_collinear_channels_matches_statsmodels_fit():
+    df = ols_frame(seed=1)
+    df["calls_twice"] = 2 * df["calls_transformed"]
+    channels = ["calls_transformed", "emails", "tv Spend", "calls_twice"]
+    result = fit_ols(df, "sales", channels)
+    expected = sm.OLS(df["sales"], sm.add_constant(df[channels])).fit()
+
+    # The aliased pair may be split differently; the fit and the identifiable combination may not
+    assert result.df_model == expected.df_model == 3
+    assert result.ssr == pytest.approx(expected.ssr, rel=1e-8)
+    combined = lambda params: params["calls_transformed"] + 2 * params["calls_twice"]
+    assert combined(result.params) == pytest.approx(combined(expected.params), rel=1e-8)
+    np.testing.assert_allclose(result.params[["const", "emails", "tv Spend"]].to_numpy(),
+                               expected.params[["const", "emails", "tv Spend"]].to_numpy(), rtol=1e-8)
+
+
+def panel_arrays(n_geos=40, n_periods=30, seed=0):
+    """Unbalanced geo x period panel with geo and period effects correlated with the regressors"""
+    rng = np.random.default_rng(seed)
+    geo = np.repeat(np.arange(n_geos), n_periods)
+    period = np.tile(np.arange(n_periods), n_geos)
+    geo_effect = 5 * rng.normal(size=n_geos)[geo]
+    X = rng.gamma(2.0, size=(len(geo), 2)) + 0.3 * geo_effect[:, None]
+    y = X @ [1.5, -0.7] + geo_effect + 2 * rng.normal(size=n_periods)[period] + rng.normal(size=len(geo)) * (1 + geo % 3)
+    keep = rng.random(len(geo)) > 0.1
+    return y[keep], X[keep], geo[keep], period[keep]
+
+
+@pytest.mark.parametrize("two_way", [False, True])
+def test_fixed_effects_match_explicit_dummies(two_way):
+    y, X, geo, period = panel_arrays()
+    periods = period if two_way else None
+    dummies = [pd.get_dummies(geo, drop_first=True, dtype=float).to_numpy()]
+    if two_way:
+        dummies.append(pd.get_dummies(period, drop_first=True, dtype=float).to_numpy())
+    design = sm.add_constant(np.column_stack([X] + dummies))
+    n_period_effects = len(np.unique(period)) - 1 if two_way else 0
+
+    result = fit_fixed_effects(y, X, ["a", "b"], geo, periods, cluster=False)
+    expected = sm.OLS(y, design).fit()
+    np.testing.assert_allclose(result.params[["a", "b"]].to_numpy(), expected.params[1:3], rtol=1e-10)
+    np.testing.assert_allclose(result.bse[["a", "b"]].to_numpy(), expected.bse[1:3], rtol=1e-10)
+    assert result.ssr == pytest.approx(expected.ssr, rel=1e-10)
+    assert result.df_resid == expected.df_resid
+    assert result.llf == pytest.approx(expected.llf, rel=1e-10)
+
+    # Clustered: statsmodels counts every dummy in the small-sample factor, the within fit only
+    # the slopes and period effects (the geo effects are absorbed by the clusters)
+    result = fit_fixed_effects(y, X, ["a", "b"], geo, periods)
+    expected = sm.OLS(y, design).fit(cov_type="cluster", cov_kwds={"groups": geo})
+    n, k_within = len(y), result.rank + n_period_effects
+    factor = np.sqrt((n - design.shape[1]) / (n - k_within))
+    np.testing.assert_allclose(result.bse[["a", "b"]].to_numpy(), expected.bse[1:3] * factor, rtol=1e-10)
+
+
+def test_bounded_fit_matches_lsq_linear():
+    rng = np.random.default_rng(3)
+    n = 3000
+    X = rng.gamma(2.0, size=(n, 5)) * [1, 10, 100, 1, 1]
+    X[:, 4] = 0.9 * X[:, 3] + 0.1 * rng.normal(size=n)
+    y = 3 + X @ [1, -0.2, 0.01, 0.5, 0.3] + 2 * rng.normal(size=n)
+    names = list("abcde")
+    bounds = {name: (0, None) for name in names}
+    bounds["c"] = (0, 0.005)
+
+    result = fit_least_squares(y, X, names, bounds=bounds)
+    design = sm.add_constant(X)
+    expected = lsq_linear(design, y, bounds=([-np.inf, 0, 0, 0, 0, 0], [np.inf, np.inf, np.inf, 0.005, np.inf, np.inf]),
+                          method="bvls", tol=1e-14)
+    np.testing.assert_allclose(result.params.to_numpy(), expected.x, rtol=1e-7, atol=1e-10)
+    sides = {-1: "lower", 1: "upper"}
+    assert result.active_bounds == {name: sides[side] for name, side in zip(["const"] + names, expected.active_mask) if side}
+    assert {"b": "lower", "c": "upper"}.items() <= result.active_bounds.items()
+
+    # The free coefficients and their standard errors are those of OLS with the bound terms as an offset
+    held = list(result.active_bounds)
+    free_names = [name for name in names if name not in held]
+    offset = X[:, [names.index(name) for name in held]] @ result.params[held].to_numpy()
+    free = fit_least_squares(y - offset, X[:, [names.index(name) for name in free_names]], free_names)
+    np.testing.assert_allclose(result.params[["const"] + free_names].to_numpy(), free.params.to_numpy(), rtol=1e-7)
+    np.testing.assert_allclose(result.bse[["const"] + free_names].to_numpy(), free.bse.to_numpy(), rtol=1e-7)
+    assert (result.df_model, result.df_resid) == (free.df_model, free.df_resid)
+
+
+def test_intercept_cannot_be_bounded():
+    rng = np.random.default_rng(4)
+    X, y = rng.normal(size=(100, 2)), rng.normal(size=100)
+    with pytest.raises(ValueError, match="intercept"):
+        fit_least_squares(y, X, ["a", "b"], bounds={"const": (0, None)})
+    assert fit_least_squares(y, X, ["a", "b"], bounds={"const": (None, None), "a": (0, None)}).params["a"] >= 0
+    assert "const" not in coefficient_bounds(["const", "a_transformed", "Carryover_transformed"])
+
+
+@pytest.mark.parametrize("text_dates", [False, True])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_streaming_fit_matches_in_memory_fit(tmp_path, text_dates, workers):
+    rng = np.random.default_rng(8)
+    df = ols_frame(n=1500, seed=8)
+    df["Date"] = pd.Timestamp("2023-01-02") + pd.to_timedelta(rng.integers(0, 104, len(df)) * 7, unit="D")
+    channels = ["calls_transformed", "emails", "tv Spend"]
+    start, end = pd.Timestamp("2023-04-01").date(), pd.Timestamp("2024-06-30").date()
+
+    stored = df.assign(Date=df["Date"].dt.strftime("%Y-%m-%d")) if text_dates else df
+    paths = [tmp_path / "part_1.parquet", tmp_path / "part_2.parquet"]
+    stored.iloc[:900].to_parquet(paths[0])
+    stored.iloc[900:].to_parquet(paths[1])
+
+    result = fit_ols_parquet(paths, "sales", channels, "Date", start, end, workers=workers, partition_rows=128)
+    window = df[(df["Date"] >= pd.Timestamp(start)) & (df["Date"] <= pd.Timestamp(end))]
+    expected = fit_ols(window, "sales", channels)
+
+    assert result.nobs == expected.nobs == len(window)
+    np.testing.assert_allclose(result.params.to_numpy(), expected.params.to_numpy(), rtol=1e-9)
+    np.testing.assert_allclose(result.bse.to_numpy(), expected.bse.to_numpy(), rtol=1e-9)
+    assert result.rsquared == pytest.approx(expected.rsquared, rel=1e-9)
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.api as sm
+
+from proctimize.kernels import elastic_net_path, numba
+from proctimize.regression import CrossProducts, PeriodCrossProducts
+from proctimize.regularization import (
+    fit_regularized, lambda_grid, regularization_path, rolling_origin_folds, squared_errors
+)
+
+
+def correlated_arrays(n=3000, seed=5):
+    rng = np.random.default_rng(seed)
+    base = rng.gamma(2.0, size=n)
+    X = np.column_stack([base + 0.1 * rng.normal(size=n), 2 * base + 0.2 * rng.normal(size=n),
+                         10 * rng.normal(size=n), rng.normal(size=n)])
+    return X, 4 + X @ [1, 0.5, 0, -2] + rng.normal(size=n)
+
+
+@pytest.mark.parametrize("l1_ratio", [1.0, 0.5, 0.0])
+def test_path_matches_statsmodels_elastic_net(l1_ratio):
+    X, y = correlated_arrays()
+    cross_products = CrossProducts(X.shape[1]).update(X, y)
+    lambdas = lambda_grid(cross_products, l1_ratio, 20)
+    intercepts, coefficients = regularization_path(cross_products, lambdas, l1_ratio)
+
+    # statsmodels minimizes the same objective on the standardized, centered data
+    standardized, centered = (X - X.mean(axis=0)) / X.std(axis=0), y - y.mean()
+    for i in [3, 10, 19]:
+        lam = lambdas[i]
+        objective = lambda b: (((centered - standardized @ b) ** 2).sum() / (2 * len(y))
+                               + lam * (l1_ratio * np.abs(b).sum() + (1 - l1_ratio) / 2 * b @ b))
+        expected = sm.OLS(centered, standardized).fit_regularized(
+            method="elastic_net", alpha=lam, L1_wt=l1_ratio, cnvrg_tol=1e-12, maxiter=10000
+        ).params
+        beta = coefficients[i] * X.std(axis=0)
+        assert objective(beta) == pytest.approx(objective(expected), rel=1e-10)
+        # The objective is flat along the near-collinear pair, so the coefficients agree to the solver tolerance
+        np.testing.assert_allclose(beta, expected, atol=1e-4)
+
+        # Optimality: the smooth gradient equals the L1 subgradient on the support and is within it elsewhere
+        gradient = standardized.T @ (centered - standardized @ beta) / len(y) - lam * (1 - l1_ratio) * beta
+        violation = np.where(beta != 0, np.abs(gradient - lam * l1_ratio * np.sign(beta)),
+                             np.maximum(np.abs(gradient) - lam * l1_ratio, 0))
+        assert violation.max() < 1e-6
+
+    direct = ((y[:, None] - intercepts - X @ coefficients.T) ** 2).sum(axis=0)
+    np.testing.assert_allclose(squared_errors(cross_products, intercepts, coefficients), direct, rtol=1e-8)
+
+
+@pytest.mark.skipif(numba is None, reason="Numba is not installed")
+def test_elastic_net_backends_agree():
+    X, y = correlated_arrays(seed=6)
+    standardized = (X - X.mean(axis=0)) / X.std(axis=0)
+    gram, xy = standardized.T @ standardized / len(y), standardized.T @ (y - y.mean()) / len(y)
+    lambdas = np.geomspace(np.abs(xy).max(), np.abs(xy).max() * 1e-3, 30)
+    np.testing.assert_allclose(elastic_net_path(gram, xy, lambdas, 0.5, backend="numba"),
+                               elastic_net_path(gram, xy, lambdas, 0.5, backend="numpy"), rtol=1e-12, atol=1e-15)
+
+
+def weekly_frame(n_geos=30, n_periods=60, seed=7):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"Date": np.tile(pd.date_range("2022-01-02", periods=n_periods, freq="W"), n_geos)})
+    base = rng.gamma(2.0, size=len(df))
+    df["calls"] = base + 0.1 * rng.normal(size=len(df))
+    df["samples"] = 2 * base + 0.2 * rng.normal(size=len(df))
+    df["print"] = rng.normal(size=len(df))
+    df["sales"] = 3 + df["calls"] + 0.5 * df["samples"] + 2 * rng.normal(size=len(df))
+    return df
+
+
+@pytest.mark.parametrize("penalty", ["Ridge", "Lasso", "Elastic Net"])
+def test_folds_are_scored_on_a_grid_of_their_training_periods(penalty):
+    df = weekly_frame()
+    channels = ["calls", "samples", "print"]
+    result = fit_regularized(df, "Date", "sales", channels, penalty, n_folds=4, n_lambdas=30, workers=1)
+
+    columns = channels + ["sales"]
+    periods = PeriodCrossProducts(df, "Date", columns)
+    for i, (train_end, validation_end) in enumerate(rolling_origin_folds(len(periods.periods), 4)):
+        train = periods.cross_products(columns, 0, train_end)
+        validation = periods.cross_products(columns, train_end, validation_end)
+        intercepts, coefficients = regularization_path(train, lambda_grid(train, result.l1_ratio, 30), result.l1_ratio)
+        expected = squared_errors(validation, intercepts, coefficients) / validation.n
+        np.testing.assert_allclose(result.cv[f"fold {i + 1}"].to_numpy(), expected, rtol=1e-12)
+
+    pooled = fit_regularized(df, "Date", "sales", channels, penalty, n_folds=4, n_lambdas=30, workers=2)
+    pd.testing.assert_frame_equal(result.cv, pooled.cv)
+    pd.testing.assert_series_equal(result.params, pooled.params)
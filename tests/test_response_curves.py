@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from proctimize.response_curves import calc_calibration_factor, create_response_curve
+
+
+@pytest.mark.parametrize("saturation_function, power_value, half_saturation", [
+    ("hill", 2.0, 1.5),
+    ("logistic", 1.2, 0.8),
+    ("michaelis-menten", None, 0.5),
+    ("negative exponential", 0.7, None),
+    ("log", None, None),
+    ("power", 0.5, None),
+])
+def test_curve_at_the_modelled_spend_returns_the_impactable_sales(saturation_function, power_value, half_saturation):
+    impactable_sales_nation, beta_coeff, spend_nation = 125000.0, 3.2, 2400000
+    num_time, num_geo = 12, 100
+    factor = calc_calibration_factor(impactable_sales_nation, beta_coeff, spend_nation, saturation_function, power_value,
+                                     num_time, num_geo, half_saturation)
+    assert np.isfinite(factor) and factor > 0
+
+    curve = create_response_curve("calls", impactable_sales_nation, beta_coeff, spend_nation, 100000, 4000000, 100000,
+                                  2.0, saturation_function, power_value, num_time, num_geo, half_saturation)
+    at_spend = curve.loc[curve["calls_spend"] == spend_nation].iloc[0]
+    assert at_spend["calls_impactable_nation"] == pytest.approx(impactable_sales_nation, rel=1e-12)
+    assert at_spend["calls_roi"] == pytest.approx(2.0 * impactable_sales_nation / spend_nation, rel=1e-12)
+
+    # Increasing everywhere, with diminishing returns for the families that are not S-shaped
+    response = curve["calls_impactable_nation"].to_numpy(dtype=float)
+    assert (np.diff(response) > 0).all()
+    if saturation_function not in ["hill", "logistic"]:
+        assert (np.diff(response, 2) < 0).all()
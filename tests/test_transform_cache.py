@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from proctimize.transform_cache import TransformCache
+from proctimize.transformation import transform_edited_df
+from tests.test_transformation import staggered_frame, table
+
+
+def test_eviction_bound_in_bytes_keeps_the_most_recent_entry():
+    # Room for two 8 kB arrays but not three
+    cache = TransformCache(max_memory_mb=20000 / (1024 * 1024))
+    block = lambda value: (lambda: np.full(1000, value, dtype=np.float64))
+    cache.get_or_compute("a", block(1.0))
+    cache.get_or_compute("b", block(2.0))
+    assert cache.get("a") is not None  # "a" is now more recent than "b"
+    cache.get_or_compute("c", block(3.0))
+
+    assert len(cache) == 2 and cache.get("b") is None
+    assert cache.get("a")[0] == 1.0 and cache.get("c")[0] == 3.0
+    assert cache.memory_mb * 1024 * 1024 == 16000
+
+    # An entry larger than the bound on its own is still kept, alone
+    cache.get_or_compute("big", lambda: np.zeros(5000))
+    assert len(cache) == 1 and cache.get("big") is not None
+    assert cache.memory_mb * 1024 * 1024 == 40000
+
+
+def test_rerunning_an_unchanged_table_is_served_from_the_cache():
+    df = staggered_frame()
+    edited_df = table([["calls", 1, 0.5, "Geometric", None, "Hill", 2.0, 1.5],
+                       ["emails", 2, None, None, None, "Power", 0.5, None]])
+    cache = TransformCache()
+    first = transform_edited_df(df, edited_df, "geo", "sales", cache=cache, date_column="week")
+    assert (cache.hits, cache.misses) == (0, 2)
+
+    second = transform_edited_df(df, edited_df, "geo", "sales", cache=cache, date_column="week")
+    assert (cache.hits, cache.misses) == (2, 2)
+    for column in ["calls_transformed", "emails_transformed"]:
+        np.testing.assert_array_equal(second[column].to_numpy(), first[column].to_numpy())
+
+
+@pytest.mark.parametrize("change", ["source", "geo", "params"])
+def test_changed_source_geo_or_params_miss(change):
+    df = staggered_frame()
+    edited_df = table([["calls", 1, 0.5, "Geometric", None, "Hill", 2.0, 1.5],
+                       ["emails", 2, None, None, None, "Power", 0.5, None]])
+    cache = TransformCache()
+    transform_edited_df(df, edited_df, "geo", "sales", cache=cache, date_column="week")
+
+    if change == "source":
+        df = df.assign(calls=df["calls"] * 2)
+        expected_misses = 1
+    elif change == "geo":
+        df = df.assign(geo=df["geo"].str.lower())
+        expected_misses = 2
+    else:
+        edited_df.loc[0, "Adstock"] = 0.6
+        expected_misses = 1
+    result = transform_edited_df(df, edited_df, "geo", "sales", cache=cache, date_column="week")
+    assert (cache.hits, cache.misses) == (2 - expected_misses, 2 + expected_misses)
+
+    fresh = transform_edited_df(df, edited_df, "geo", "sales", cache=TransformCache(), date_column="week")
+    for column in ["calls_transformed", "emails_transformed"]:
+        np.testing.assert_array_equal(result[column].to_numpy(), fresh[column].to_numpy())
+
+
+def test_cached_arrays_are_read_only():
+    cache = TransformCache()
+    values = cache.get_or_compute("key", lambda: [1.0, 2.0, 3.0])
+    assert not values.flags.writeable
+    with pytest.raises(ValueError):
+        values[0] = 0.0
+
+    # Writing through a frame holding a cached column copies it instead of changing the cache
+    df = staggered_frame()
+    edited_df = table([["calls", 1, 0.5, "Geometric", None, None, None, None]])
+    result = transform_edited_df(df, edited_df, "geo", "sales", cache=cache, date_column="week")
+    expected = result["calls_transformed"].to_numpy().copy()
+    result.loc[0, "calls_transformed"] = -1.0
+    again = transform_edited_df(df, edited_df, "geo", "sales", cache=cache, date_column="week")
+    assert cache.hits == 1
+    np.testing.assert_array_equal(again["calls_transformed"].to_numpy(), expected)
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from proctimize.panel import Panel
+from proctimize.transformation import (
+    adstock_weights, apply_adstock, apply_saturation, transform_edited_df, transform_panel
+)
+
+
+def staggered_frame(n_geos=12, n_periods=40, seed=0):
+    """Long data where geos enter and leave the panel at different periods (no interior gaps)"""
+    rng = np.random.default_rng(seed)
+    periods = pd.date_range("2023-01-02", periods=n_periods, freq="W-MON")
+    rows = []
+    for g in range(n_geos):
+        start, end = rng.integers(0, 10), n_periods - rng.integers(0, 10)
+        for t in range(start, end):
+            rows.append({"geo": f"G{g:02d}", "week": periods[t], "calls": rng.gamma(2.0, 20.0), "emails": rng.poisson(3.0)})
+    return pd.DataFrame(rows).sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def table(rows):
+    columns = ["Channel Name", "Lags", "Adstock", "Adstock Type", "Adstock Shape", "Saturation Function",
+               "Power (k)", "Half Saturation"]
+    return pd.DataFrame(rows, columns=columns)
+
+
+@pytest.mark.parametrize("rows", [
+    [["calls", 1, 0.5, "Geometric", None, "Hill", 2.0, 1.5], ["emails", 2, None, None, None, "Michaelis-Menten", None, 0.8]],
+    [["calls", 3, 0.6, "Weibull", 0.7, "Logistic", 1.2, 1.0], ["emails", 0, 0.4, "Delayed", 1.0, "Negative Exponential", 0.5, None]],
+    [["calls", 2, 0.7, "Infinite", None, "Power", 0.5, None], ["emails", 1, 0.3, "Geometric", None, None, None, None]],
+])
+def test_panel_transform_matches_frame_transform_on_unbalanced_geos(rows):
+    df = staggered_frame()
+    edited_df = table(rows)
+    expected = transform_edited_df(df, edited_df, "geo", "sales", date_column="week")
+
+    panel = Panel.from_frame(df, "geo", "week", ["calls", "emails"])
+    assert not panel.observed.all()
+    for column, matrix in transform_panel(panel, edited_df).items():
+        np.testing.assert_allclose(panel.gather(matrix), expected[column].to_numpy(), rtol=1e-10, atol=1e-12)
+
+
+@pytest.mark.parametrize("adstock_coeff", [0.0, 1.0])
+def test_infinite_adstock_expression_at_the_edges_of_the_range(adstock_coeff):
+    df = staggered_frame()
+    edited_df = table([["calls", 1, adstock_coeff, "Infinite", None, None, None, None]])
+    expected = transform_edited_df(df, edited_df, "geo", "sales", date_column="week")
+
+    panel = Panel.from_frame(df, "geo", "week", ["calls"])
+    matrix = transform_panel(panel, edited_df)["calls_transformed"]
+    np.testing.assert_allclose(panel.gather(matrix), expected["calls_transformed"].to_numpy(), rtol=1e-10)
+
+
+@pytest.mark.parametrize("adstock_type", ["Geometric", "Weibull", "Infinite"])
+@pytest.mark.parametrize("adstock_coeff", [-0.2, 1.5])
+def test_adstock_outside_unit_interval_is_rejected(adstock_type, adstock_coeff):
+    df = staggered_frame()
+    edited_df = table([["calls", 2, adstock_coeff, adstock_type, 0.7, None, None, None]])
+    with pytest.raises(ValueError, match="Adstock must be between 0 and 1"):
+        transform_edited_df(df, edited_df, "geo", "sales", date_column="week")
+    with pytest.raises(ValueError, match="Adstock must be between 0 and 1"):
+        transform_panel(Panel.from_frame(df, "geo", "week", ["calls"]), edited_df)
+
+
+@pytest.mark.parametrize("rows", [
+    [["calls", 1, 0.5, "Infinite", None, None, None, None]],
+    [["calls", 2, 0.7, "Infinite", None, "Hill", 2.0, 1.5], ["emails", 1, 1.0, "Infinite", None, None, None, None]],
+    [["calls", 2, 0.5, "Geometric", None, "Power", 0.5, None], ["emails", 3, 0.6, "Weibull", 0.7, "Log", None, None]],
+])
+def test_frame_transform_matches_panel_on_missing_values(rows):
+    df = staggered_frame()
+    rng = np.random.default_rng(3)
+    df["emails"] = df["emails"].astype(float)
+    for column in ["calls", "emails"]:
+        df.loc[rng.random(len(df)) < 0.05, column] = np.nan
+    edited_df = table(rows)
+    expected = transform_edited_df(df, edited_df, "geo", "sales", date_column="week")
+
+    panel = Panel.from_frame(df, "geo", "week", ["calls", "emails"])
+    for column, matrix in transform_panel(panel, edited_df).items():
+        np.testing.assert_allclose(panel.gather(matrix), expected[column].to_numpy(), rtol=1e-10, atol=1e-12)
+
+
+def test_infinite_adstock_carries_a_missing_value_forward():
+    df = pd.DataFrame({"geo": ["A"] * 6, "week": pd.date_range("2024-01-01", periods=6, freq="W-MON"),
+                       "calls": [1, 2, np.nan, 4, 5, 6]})
+    edited_df = table([["calls", 1, 0.5, "Infinite", None, None, None, None]])
+    result = transform_edited_df(df, edited_df, "geo", "sales", date_column="week")["calls_transformed"].to_numpy()
+    np.testing.assert_allclose(result, [1, 2.5, np.nan, np.nan, np.nan, np.nan])
+
+
+@pytest.mark.parametrize("method, closed_form", [
+    ("Log", lambda x, m, k, h: np.log(1 + x)),
+    ("Power", lambda x, m, k, h: x ** k),
+    # Scaled families, written in activity units with the half saturation point h * mean
+    ("Hill", lambda x, m, k, h: x ** k / (x ** k + (h * m) ** k)),
+    ("Michaelis-Menten", lambda x, m, k, h: x / (h * m + x)),
+    ("Logistic", lambda x, m, k, h: 1 / (1 + np.exp(-k * (x - h * m) / m)) - 1 / (1 + np.exp(k * h))),
+    ("Negative Exponential", lambda x, m, k, h: 1 - np.exp(-k * x / m)),
+])
+def test_saturation_matches_its_closed_form(method, closed_form):
+    x = np.random.default_rng(4).gamma(2.0, 30.0, size=(5, 20))
+    k, h = 1.7, 0.8
+    np.testing.assert_allclose(apply_saturation(x, method, k, h), closed_form(x, x.mean(), k, h), rtol=1e-12)
+    np.testing.assert_allclose(apply_saturation(x, method, k, h, scale=25.0), closed_form(x, 25.0, k, h), rtol=1e-12)
+
+
+def test_saturation_reference_points():
+    # Half saturation at the half saturation point, no effect at zero activity
+    np.testing.assert_allclose(apply_saturation([0.0, 20.0], "Hill", 3.0, 1.0, scale=20.0), [0.0, 0.5])
+    np.testing.assert_allclose(apply_saturation([0.0, 20.0], "Michaelis-Menten", None, 1.0, scale=20.0), [0.0, 0.5])
+    assert apply_saturation([0.0], "Logistic", 2.0, 1.0, scale=20.0)[0] == 0.0
+    np.testing.assert_allclose(apply_saturation([0.0, 20.0], "Negative Exponential", 1.0, scale=20.0),
+                               [0.0, 1 - np.exp(-1)])
+
+
+@pytest.mark.parametrize("adstock_type, shape, expected", [
+    ("Geometric", None, [1, 0.5, 0.25, 0.125]),
+    ("Weibull", 2.0, [1, 0.5, 0.5 ** 4, 0.5 ** 9]),
+    ("Weibull", 0.5, [1, 0.5, 0.5 ** np.sqrt(2), 0.5 ** np.sqrt(3)]),
+    ("Delayed", 1.0, [0.5, 1, 0.5, 0.5 ** 4]),
+    ("Delayed", 2.0, [0.5 ** 4, 0.5, 1, 0.5]),
+])
+def test_adstock_weights_match_their_closed_form(adstock_type, shape, expected):
+    weights = adstock_weights(3, 0.5, adstock_type, shape)
+    np.testing.assert_allclose(weights, expected, rtol=1e-14)
+
+    # Every row is the causal convolution of its activity with the weights
+    matrix = np.random.default_rng(5).gamma(2.0, 10.0, size=(3, 12))
+    convolved = np.array([np.convolve(row, weights)[:matrix.shape[1]] for row in matrix])
+    np.testing.assert_allclose(apply_adstock(matrix, 3, 0.5, adstock_type, shape), convolved, rtol=1e-12)